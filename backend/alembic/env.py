@@ -1,3 +1,4 @@
+import logging
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
@@ -38,6 +39,17 @@ import app.database.models.feature_flags
 import app.database.models.system_settings
 import app.database.models.floor_balance
 import app.database.models.reprocess
+import app.database.models.financial_periods
+import app.database.models.storage_fifo
+import app.database.models.net_stock
+import app.database.models.outbound_email
+import app.database.models.search_index
+import app.database.models.notification_counters
+import app.database.models.lineage
+import app.database.models.production_cost_pools
+import app.database.models.job_leases
+import app.database.models.hr_kpi_rollups
+import app.database.models.derived_tables
 
 target_metadata = Base.metadata
 
@@ -91,6 +103,11 @@ def run_migrations_online() -> None:
 
         with context.begin_transaction():
             context.run_migrations()
+            # Runtime "ensure schema" steps run here, at deploy, instead of on
+            # the first request of every worker.
+            from app.services.schema_readiness import apply_schema_steps
+            for name, outcome in apply_schema_steps(connection).items():
+                logging.getLogger("alembic.runtime.migration").info("schema step %s: %s", name, outcome)
 
 
 if context.is_offline_mode():
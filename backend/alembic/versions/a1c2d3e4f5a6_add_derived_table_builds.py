@@ -0,0 +1,53 @@
+"""add derived_table_builds and company-first lineage indexes
+
+Revision ID: a1c2d3e4f5a6
+Revises: z0b1c2d3e4f5
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a1c2d3e4f5a6"
+down_revision: Union[str, Sequence[str], None] = "z0b1c2d3e4f5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Companies are built by the derived_table_backfill job
+# (app.services.derived_tables), one company per transaction, not here.
+LINEAGE_INDEXES = (
+    ("ix_lineage_edges_parent", ["parent_type", "parent_key"], ["company_id", "parent_type", "parent_key"]),
+    ("ix_lineage_edges_child", ["child_type", "child_key"], ["company_id", "child_type", "child_key"]),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    tables = sa.inspect(bind).get_table_names()
+    if "derived_table_builds" not in tables:
+        op.create_table(
+            "derived_table_builds",
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column("name", sa.String(length=50), nullable=False),
+            sa.Column("company_id", sa.String(length=100), nullable=False),
+            sa.Column("built_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("name", "company_id", name="uix_derived_table_build"),
+        )
+    if "lineage_edges" in tables:
+        indexes = {index["name"] for index in sa.inspect(bind).get_indexes("lineage_edges")}
+        for name, _, columns in LINEAGE_INDEXES:
+            if name in indexes:
+                op.drop_index(name, table_name="lineage_edges")
+            op.create_index(name, "lineage_edges", columns)
+
+
+def downgrade() -> None:
+    for name, columns, _ in LINEAGE_INDEXES:
+        op.drop_index(name, table_name="lineage_edges")
+        op.create_index(name, "lineage_edges", columns)
+    op.drop_table("derived_table_builds")
@@ -0,0 +1,60 @@
+"""unique inventory_summary grain index for the delta upsert
+
+Revision ID: b2d3e4f5a6b7
+Revises: a1c2d3e4f5a6
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b2d3e4f5a6b7"
+down_revision: Union[str, Sequence[str], None] = "a1c2d3e4f5a6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+KEY_COLUMNS = "species, variety, grade, packing_style, glaze, production_for, production_at, freezer"
+GRAIN = ", ".join(["company_id"] + [f"COALESCE({name}, '')" for name in KEY_COLUMNS.split(", ")])
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "inventory_summary" not in inspector.get_table_names():
+        return
+    if "uq_inventory_summary" in {constraint["name"] for constraint in inspector.get_unique_constraints("inventory_summary")}:
+        with op.batch_alter_table("inventory_summary") as batch:
+            batch.drop_constraint("uq_inventory_summary", type_="unique")
+    # Keys with NULL parts could hold several rows; rederive the table (same
+    # statement as InventorySummaryService.refresh_inventory_summary) so the
+    # grain is unique before it is indexed.
+    op.execute("DELETE FROM inventory_summary")
+    op.execute(
+        f"""
+        INSERT INTO inventory_summary (
+            company_id, {KEY_COLUMNS},
+            available_qty, available_mc, available_loose, avg_rate, inventory_value,
+            reserved_qty, pending_prod_qty, last_transaction_date,
+            rate_total, rate_count, row_count, updated_at
+        )
+        SELECT
+            {GRAIN},
+            COALESCE(SUM(quantity), 0), COALESCE(SUM(no_of_mc), 0), COALESCE(SUM(loose), 0),
+            COALESCE(AVG(product_kg_value), 0),
+            COALESCE(SUM(quantity), 0) * COALESCE(AVG(product_kg_value), 0),
+            0, 0, MAX(date),
+            COALESCE(SUM(product_kg_value), 0), COUNT(product_kg_value), COUNT(*), CURRENT_TIMESTAMP
+        FROM stock_entry
+        WHERE company_id IS NOT NULL AND is_cancelled = false
+        GROUP BY {GRAIN}
+        """
+    )
+    op.execute(f"CREATE UNIQUE INDEX uix_inventory_summary_grain ON inventory_summary ({GRAIN})")
+
+
+def downgrade() -> None:
+    op.drop_index("uix_inventory_summary_grain", table_name="inventory_summary")
@@ -0,0 +1,36 @@
+"""add production_cost_pool_generations so stale pools are not stored
+
+Revision ID: c3e4f5a6b7c8
+Revises: b2d3e4f5a6b7
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c3e4f5a6b7c8"
+down_revision: Union[str, Sequence[str], None] = "b2d3e4f5a6b7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "production_cost_pool_generations" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "production_cost_pool_generations",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("company_id", sa.String(length=50), nullable=False),
+        sa.Column("generation", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("company_id", name="uix_production_cost_pool_generation"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("production_cost_pool_generations")
@@ -0,0 +1,35 @@
+"""drop ix_gate_entry_company_sequence, superseded by the receiving-centre expression index
+
+Revision ID: d4e5f6a7b8c9
+Revises: c3e4f5a6b7c8
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4e5f6a7b8c9"
+down_revision: Union[str, Sequence[str], None] = "c3e4f5a6b7c8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # latest_gate_sequences groups by the normalised receiving centre, which
+    # ix_gate_entry_company_center_sequence (a startup performance index) serves.
+    if "gate_entry" not in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.execute("DROP INDEX IF EXISTS ix_gate_entry_company_sequence")
+
+
+def downgrade() -> None:
+    if "gate_entry" not in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_gate_entry_company_sequence "
+        "ON gate_entry (company_id, production_for, receiving_center, id)"
+    )
@@ -0,0 +1,41 @@
+"""add schema ensure steps
+
+Revision ID: n8b9c0d1e2f3
+Revises: 02bec41e1023
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "n8b9c0d1e2f3"
+down_revision: Union[str, Sequence[str], None] = "02bec41e1023"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "schema_ensure_steps" not in inspector.get_table_names():
+        op.create_table(
+            "schema_ensure_steps",
+            sa.Column("name", sa.String(length=100), nullable=False),
+            sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+            sa.Column(
+                "applied_at",
+                sa.DateTime(timezone=True),
+                server_default=sa.text("now()"),
+                nullable=True,
+            ),
+            sa.PrimaryKeyConstraint("name"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("schema_ensure_steps")
@@ -0,0 +1,87 @@
+"""add financial periods index
+
+Revision ID: o9c0d1e2f3a4
+Revises: n8b9c0d1e2f3
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "o9c0d1e2f3a4"
+down_revision: Union[str, Sequence[str], None] = "n8b9c0d1e2f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tables indexed by app.services.financial_periods.PERIOD_SOURCES (all on "date").
+PERIOD_SOURCES = (
+    "gate_entry",
+    "raw_material_purchasing",
+    "reprocess_entries",
+    "de_heading",
+    "peeling",
+    "soaking",
+    "production",
+    "grading",
+    "stock_entry",
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "financial_periods" not in inspector.get_table_names():
+        op.create_table(
+            "financial_periods",
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column("company_id", sa.String(length=50), nullable=False),
+            sa.Column("source", sa.String(length=50), nullable=False),
+            sa.Column("period_month", sa.Date(), nullable=False),
+            sa.Column("fy_start_year", sa.Integer(), nullable=False),
+            sa.Column("row_count", sa.Integer(), server_default="0", nullable=False),
+            sa.Column(
+                "updated_at",
+                sa.DateTime(timezone=True),
+                server_default=sa.text("now()"),
+                nullable=True,
+            ),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("company_id", "source", "period_month", name="uix_financial_period_month"),
+        )
+        op.create_index(
+            "ix_financial_periods_company_source_fy",
+            "financial_periods",
+            ["company_id", "source", "fy_start_year"],
+        )
+
+    if bind.dialect.name != "postgresql":
+        return
+    existing = set(inspector.get_table_names())
+    fy_start = (
+        "CASE WHEN EXTRACT(MONTH FROM date) >= 4 "
+        "THEN EXTRACT(YEAR FROM date)::int ELSE EXTRACT(YEAR FROM date)::int - 1 END"
+    )
+    for source in PERIOD_SOURCES:
+        if source not in existing:
+            continue
+        op.execute(
+            f"""
+            INSERT INTO financial_periods (company_id, source, period_month, fy_start_year, row_count)
+            SELECT company_id, '{source}', date_trunc('month', date)::date, {fy_start}, COUNT(*)
+            FROM {source}
+            WHERE company_id IS NOT NULL AND date IS NOT NULL
+            GROUP BY company_id, date_trunc('month', date)::date, {fy_start}
+            ON CONFLICT (company_id, source, period_month)
+            DO UPDATE SET row_count = EXCLUDED.row_count, updated_at = now()
+            """
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_financial_periods_company_source_fy", table_name="financial_periods")
+    op.drop_table("financial_periods")
@@ -0,0 +1,121 @@
+"""add storage fifo layers and combo closings
+
+Revision ID: p0d1e2f3a4b5
+Revises: o9c0d1e2f3a4
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "p0d1e2f3a4b5"
+down_revision: Union[str, Sequence[str], None] = "o9c0d1e2f3a4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# History is replayed per company by scripts/rebuild_storage_fifo.py (or on
+# the first storage cost report of a company), not in SQL here.
+
+COMBO_COLUMNS = (
+    ("batch_number", 255),
+    ("freezer", 255),
+    ("glaze", 50),
+    ("grade", 255),
+    ("variety", 255),
+    ("packing_style", 255),
+)
+
+
+def _combo_columns():
+    return [sa.Column(name, sa.String(length=length), nullable=True) for name, length in COMBO_COLUMNS]
+
+
+def _updated_at():
+    return sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True)
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "storage_fifo_layers" not in existing:
+        op.create_table(
+            "storage_fifo_layers",
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column("company_id", sa.String(length=50), nullable=False),
+            sa.Column("combo_key", sa.String(length=40), nullable=False),
+            *_combo_columns(),
+            sa.Column("stock_entry_id", sa.Integer(), nullable=False),
+            sa.Column("sequence", sa.Integer(), nullable=False),
+            sa.Column("in_date", sa.Date(), nullable=False),
+            sa.Column("qty_received", sa.Integer(), nullable=False),
+            sa.Column("quantity_kg", sa.Float(), nullable=False),
+            sa.Column("remaining_mc", sa.Integer(), nullable=False),
+            sa.Column("depleted_on", sa.Date(), nullable=True),
+            _updated_at(),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_storage_fifo_layers_company_combo", "storage_fifo_layers", ["company_id", "combo_key"])
+        op.create_index(
+            "ix_storage_fifo_layers_company_depleted",
+            "storage_fifo_layers",
+            ["company_id", "depleted_on", "in_date"],
+        )
+
+    if "storage_fifo_consumptions" not in existing:
+        op.create_table(
+            "storage_fifo_consumptions",
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column("company_id", sa.String(length=50), nullable=False),
+            sa.Column("layer_id", sa.Integer(), nullable=False),
+            sa.Column("stock_entry_id", sa.Integer(), nullable=False),
+            sa.Column("out_date", sa.Date(), nullable=False),
+            sa.Column("mc_taken", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(["layer_id"], ["storage_fifo_layers.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_storage_fifo_consumptions_layer", "storage_fifo_consumptions", ["layer_id", "out_date"])
+
+    if "storage_combo_closings" not in existing:
+        op.create_table(
+            "storage_combo_closings",
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column("company_id", sa.String(length=50), nullable=False),
+            sa.Column("combo_key", sa.String(length=40), nullable=False),
+            *_combo_columns(),
+            sa.Column("production_for", sa.String(length=255), nullable=True),
+            sa.Column("production_at", sa.String(length=255), nullable=True),
+            sa.Column("species", sa.String(length=100), nullable=True),
+            sa.Column("brand", sa.String(length=255), nullable=True),
+            sa.Column("period_month", sa.Date(), nullable=False),
+            sa.Column("next_period_month", sa.Date(), nullable=True),
+            sa.Column("opening_mc", sa.Integer(), nullable=False),
+            sa.Column("in_mc", sa.Integer(), nullable=False),
+            sa.Column("in_qty", sa.Float(), nullable=False),
+            sa.Column("out_mc", sa.Integer(), nullable=False),
+            sa.Column("closing_mc", sa.Integer(), nullable=False),
+            sa.Column("first_entry_id", sa.Integer(), nullable=True),
+            sa.Column("first_movement_date", sa.Date(), nullable=True),
+            _updated_at(),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_storage_combo_closings_company_combo", "storage_combo_closings", ["company_id", "combo_key"])
+        op.create_index(
+            "ix_storage_combo_closings_company_month",
+            "storage_combo_closings",
+            ["company_id", "period_month", "next_period_month"],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_storage_combo_closings_company_month", table_name="storage_combo_closings")
+    op.drop_index("ix_storage_combo_closings_company_combo", table_name="storage_combo_closings")
+    op.drop_table("storage_combo_closings")
+    op.drop_index("ix_storage_fifo_consumptions_layer", table_name="storage_fifo_consumptions")
+    op.drop_table("storage_fifo_consumptions")
+    op.drop_index("ix_storage_fifo_layers_company_depleted", table_name="storage_fifo_layers")
+    op.drop_index("ix_storage_fifo_layers_company_combo", table_name="storage_fifo_layers")
+    op.drop_table("storage_fifo_layers")
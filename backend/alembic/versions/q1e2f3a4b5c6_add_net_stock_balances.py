@@ -0,0 +1,64 @@
+"""add net stock balances
+
+Revision ID: q1e2f3a4b5c6
+Revises: p0d1e2f3a4b5
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "q1e2f3a4b5c6"
+down_revision: Union[str, Sequence[str], None] = "p0d1e2f3a4b5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Keys are normalised in Python (app.services.net_stock.movement_key), so
+# balances are built per company on the first production page view rather
+# than backfilled here.
+
+KEY_COLUMNS = (
+    ("production_for", 255, ""),
+    ("species", 100, ""),
+    ("variety", 255, ""),
+    ("grade", 255, ""),
+    ("packing_style", 255, ""),
+    ("glaze", 20, "0"),
+    ("freezer", 255, "n/a"),
+    ("production_at", 255, ""),
+    ("location", 255, ""),
+)
+
+
+def upgrade() -> None:
+    if "net_stock_balances" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "net_stock_balances",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("company_id", sa.String(length=50), nullable=False),
+        *[
+            sa.Column(name, sa.String(length=length), server_default=default, nullable=False)
+            for name, length, default in KEY_COLUMNS
+        ],
+        sa.Column("net_qty", sa.Float(), server_default="0", nullable=False),
+        sa.Column("in_qty", sa.Float(), server_default="0", nullable=False),
+        sa.Column("row_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("company_id", *(name for name, _, _ in KEY_COLUMNS), name="uix_net_stock_balance_key"),
+    )
+    op.create_index(
+        "ix_net_stock_balances_company_scope",
+        "net_stock_balances",
+        ["company_id", "production_at", "production_for"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_net_stock_balances_company_scope", table_name="net_stock_balances")
+    op.drop_table("net_stock_balances")
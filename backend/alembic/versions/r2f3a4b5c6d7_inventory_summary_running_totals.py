@@ -0,0 +1,67 @@
+"""inventory summary running totals for delta maintenance
+
+Revision ID: r2f3a4b5c6d7
+Revises: q1e2f3a4b5c6
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "r2f3a4b5c6d7"
+down_revision: Union[str, Sequence[str], None] = "q1e2f3a4b5c6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NEW_COLUMNS = (
+    ("rate_total", sa.Float()),
+    ("rate_count", sa.Integer()),
+    ("row_count", sa.Integer()),
+)
+KEY_COLUMNS = "species, variety, grade, packing_style, glaze, production_for, production_at, freezer"
+GRAIN = ", ".join(["company_id"] + [f"COALESCE({name}, '')" for name in KEY_COLUMNS.split(", ")])
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "inventory_summary" not in inspector.get_table_names():
+        return
+    existing = {column["name"] for column in inspector.get_columns("inventory_summary")}
+    for name, column_type in NEW_COLUMNS:
+        if name not in existing:
+            op.add_column("inventory_summary", sa.Column(name, column_type, server_default="0", nullable=True))
+
+    if bind.dialect.name != "postgresql":
+        return
+    # Same statement as InventorySummaryService.refresh_inventory_summary, for every company.
+    op.execute("DELETE FROM inventory_summary")
+    op.execute(
+        f"""
+        INSERT INTO inventory_summary (
+            company_id, {KEY_COLUMNS},
+            available_qty, available_mc, available_loose, avg_rate, inventory_value,
+            reserved_qty, pending_prod_qty, last_transaction_date,
+            rate_total, rate_count, row_count, updated_at
+        )
+        SELECT
+            {GRAIN},
+            COALESCE(SUM(quantity), 0), COALESCE(SUM(no_of_mc), 0), COALESCE(SUM(loose), 0),
+            COALESCE(AVG(product_kg_value), 0),
+            COALESCE(SUM(quantity), 0) * COALESCE(AVG(product_kg_value), 0),
+            0, 0, MAX(date),
+            COALESCE(SUM(product_kg_value), 0), COUNT(product_kg_value), COUNT(*), now()
+        FROM stock_entry
+        WHERE company_id IS NOT NULL AND is_cancelled = false
+        GROUP BY {GRAIN}
+        """
+    )
+
+
+def downgrade() -> None:
+    for name, _ in reversed(NEW_COLUMNS):
+        op.drop_column("inventory_summary", name)
@@ -0,0 +1,51 @@
+"""add outbound email queue
+
+Revision ID: s3a4b5c6d7e8
+Revises: r2f3a4b5c6d7
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "s3a4b5c6d7e8"
+down_revision: Union[str, Sequence[str], None] = "r2f3a4b5c6d7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "outbound_emails" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "outbound_emails",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("company_id", sa.String(length=50), nullable=True),
+        sa.Column("category", sa.String(length=50), server_default="general", nullable=False),
+        sa.Column("recipients", sa.Text(), nullable=False),
+        sa.Column("subject", sa.String(length=500), nullable=False),
+        sa.Column("html", sa.Text(), nullable=False),
+        sa.Column("text", sa.Text(), nullable=True),
+        sa.Column("reply_to", sa.String(length=255), nullable=True),
+        sa.Column("status", sa.String(length=20), server_default="PENDING", nullable=False),
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+        sa.Column("claim_token", sa.String(length=36), nullable=True),
+        sa.Column("locked_until", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_outbound_emails_due", "outbound_emails", ["status", "next_attempt_at"])
+    op.create_index("ix_outbound_emails_claim_token", "outbound_emails", ["claim_token"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_outbound_emails_claim_token", table_name="outbound_emails")
+    op.drop_index("ix_outbound_emails_due", table_name="outbound_emails")
+    op.drop_table("outbound_emails")
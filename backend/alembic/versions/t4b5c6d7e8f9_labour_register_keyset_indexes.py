@@ -0,0 +1,52 @@
+"""labour and visitor register keyset indexes
+
+Revision ID: t4b5c6d7e8f9
+Revises: s3a4b5c6d7e8
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "t4b5c6d7e8f9"
+down_revision: Union[str, Sequence[str], None] = "s3a4b5c6d7e8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# index name -> (table, columns); matches the keyset orderings in
+# app/routers/attendance/labour_management.py REGISTERS.
+INDEXES = {
+    "ix_contract_labour_company_id_id": ("contract_labour", ["company_id", "id"]),
+    "ix_contract_labour_attendance_register": (
+        "contract_labour_attendance", ["company_id", "attendance_date", "in_time", "id"],
+    ),
+    "ix_daily_temporary_workers_register": ("daily_temporary_workers", ["company_id", "work_date", "id"]),
+    "ix_daily_temporary_workers_type_register": (
+        "daily_temporary_workers", ["company_id", "worker_type", "work_date", "id"],
+    ),
+    "ix_visitor_entries_register": ("visitor_entries", ["company_id", "visit_date", "id"]),
+}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for name, (table, columns) in INDEXES.items():
+        if table not in tables:
+            continue
+        if name in {index["name"] for index in inspector.get_indexes(table)}:
+            continue
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for name, (table, _) in INDEXES.items():
+        if table in tables and name in {index["name"] for index in inspector.get_indexes(table)}:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,71 @@
+"""add search_documents global search index
+
+Revision ID: u5c6d7e8f9a0
+Revises: t4b5c6d7e8f9
+Create Date: 2026-10-19
+"""
+
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "u5c6d7e8f9a0"
+down_revision: Union[str, Sequence[str], None] = "t4b5c6d7e8f9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+# Documents are built per company on its first search
+# (app.services.search_index), not backfilled here.
+
+
+def _enable_trigram(bind) -> bool:
+    if bind.exec_driver_sql("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'").first():
+        return True
+    savepoint = bind.begin_nested()
+    try:
+        bind.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except sa.exc.DBAPIError as exc:
+        savepoint.rollback()
+        logger.warning("pg_trgm unavailable, global search will scan search_documents: %s", exc)
+        return False
+    savepoint.commit()
+    return True
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "search_documents" not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            "search_documents",
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column("company_id", sa.String(length=50), nullable=False),
+            sa.Column("entity_type", sa.String(length=30), nullable=False),
+            sa.Column("entity_id", sa.Integer(), nullable=False),
+            sa.Column("title", sa.String(length=255), nullable=False),
+            sa.Column("subtitle", sa.String(length=500), nullable=True),
+            sa.Column("title_key", sa.String(length=255), nullable=False),
+            sa.Column("search_text", sa.Text(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("entity_type", "entity_id", name="uix_search_documents_entity"),
+        )
+        op.create_index("ix_search_documents_company_type", "search_documents", ["company_id", "entity_type"])
+
+    if bind.dialect.name == "postgresql" and _enable_trigram(bind):
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_search_documents_text_trgm "
+            "ON search_documents USING gin (search_text gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_search_documents_text_trgm")
+    op.drop_index("ix_search_documents_company_type", table_name="search_documents")
+    op.drop_table("search_documents")
@@ -0,0 +1,41 @@
+"""add notification_counters for the header bell
+
+Revision ID: v6d7e8f9a0b1
+Revises: u5c6d7e8f9a0
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "v6d7e8f9a0b1"
+down_revision: Union[str, Sequence[str], None] = "u5c6d7e8f9a0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Counters are counted per company on its first read
+# (app.services.notification_counters), not backfilled here.
+
+
+def upgrade() -> None:
+    if "notification_counters" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "notification_counters",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("company_id", sa.String(length=50), nullable=False),
+        sa.Column("name", sa.String(length=40), nullable=False),
+        sa.Column("bucket", sa.String(length=10), nullable=False, server_default=""),
+        sa.Column("value", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("company_id", "name", "bucket", name="uix_notification_counter_key"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("notification_counters")
@@ -0,0 +1,49 @@
+"""add lineage_edges for batched traceability walks
+
+Revision ID: w7e8f9a0b1c2
+Revises: v6d7e8f9a0b1
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "w7e8f9a0b1c2"
+down_revision: Union[str, Sequence[str], None] = "v6d7e8f9a0b1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Edges are derived per company by the derived_table_backfill job
+# (app.services.derived_tables), not backfilled here.
+
+
+def upgrade() -> None:
+    if "lineage_edges" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "lineage_edges",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("company_id", sa.String(length=100), nullable=True),
+        sa.Column("parent_type", sa.String(length=20), nullable=False),
+        sa.Column("parent_key", sa.String(length=255), nullable=False),
+        sa.Column("child_type", sa.String(length=20), nullable=False),
+        sa.Column("child_key", sa.String(length=255), nullable=False),
+        sa.Column("source_table", sa.String(length=50), nullable=False),
+        sa.Column("source_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_lineage_edges_parent", "lineage_edges", ["parent_type", "parent_key"])
+    op.create_index("ix_lineage_edges_child", "lineage_edges", ["child_type", "child_key"])
+    op.create_index("ix_lineage_edges_source", "lineage_edges", ["source_table", "source_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_lineage_edges_source", table_name="lineage_edges")
+    op.drop_index("ix_lineage_edges_child", table_name="lineage_edges")
+    op.drop_index("ix_lineage_edges_parent", table_name="lineage_edges")
+    op.drop_table("lineage_edges")
@@ -0,0 +1,41 @@
+"""add production_cost_pools for cached monthly cost totals
+
+Revision ID: x8f9a0b1c2d3
+Revises: w7e8f9a0b1c2
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "x8f9a0b1c2d3"
+down_revision: Union[str, Sequence[str], None] = "w7e8f9a0b1c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Pools are aggregated on the first preview of each month
+# (app.services.production_cost_pools), not backfilled here.
+
+
+def upgrade() -> None:
+    if "production_cost_pools" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "production_cost_pools",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("company_id", sa.String(length=50), nullable=False),
+        sa.Column("month", sa.String(length=7), nullable=False),
+        sa.Column("pools", sa.Text(), nullable=False),
+        sa.Column("source_rows", sa.Integer(), nullable=False),
+        sa.Column("built_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("company_id", "month", name="uix_production_cost_pool_month"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("production_cost_pools")
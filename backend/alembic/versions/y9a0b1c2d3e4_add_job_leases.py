@@ -0,0 +1,46 @@
+"""add job_leases for scheduled jobs that run in one worker at a time
+
+Revision ID: y9a0b1c2d3e4
+Revises: x8f9a0b1c2d3
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "y9a0b1c2d3e4"
+down_revision: Union[str, Sequence[str], None] = "x8f9a0b1c2d3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    tables = sa.inspect(bind).get_table_names()
+    if "job_leases" not in tables:
+        op.create_table(
+            "job_leases",
+            sa.Column("name", sa.String(length=100), nullable=False),
+            sa.Column("holder", sa.String(length=36), nullable=True),
+            sa.Column("locked_until", sa.DateTime(), nullable=True),
+            sa.Column("acquired_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("name"),
+        )
+    # The auto-close job scans open duties by first_in.
+    if "daily_attendance" in tables:
+        indexes = {index["name"] for index in sa.inspect(bind).get_indexes("daily_attendance")}
+        if "ix_daily_attendance_open_first_in" not in indexes:
+            op.create_index(
+                "ix_daily_attendance_open_first_in", "daily_attendance", ["first_in"],
+                postgresql_where=sa.text("status <> 'CLOSED'"),
+                sqlite_where=sa.text("status <> 'CLOSED'"),
+            )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_daily_attendance_open_first_in", table_name="daily_attendance")
+    op.drop_table("job_leases")
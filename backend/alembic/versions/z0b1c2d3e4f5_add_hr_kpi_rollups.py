@@ -0,0 +1,53 @@
+"""add hr_kpi_rollups and the HR drill-down indexes
+
+Revision ID: z0b1c2d3e4f5
+Revises: y9a0b1c2d3e4
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "z0b1c2d3e4f5"
+down_revision: Union[str, Sequence[str], None] = "y9a0b1c2d3e4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rollups are built on the first HR command center load of each day
+# (app.services.hr_kpi_rollups), not backfilled here.
+INDEXES = (
+    ("daily_attendance", "ix_daily_attendance_company_duty_date", ["company_id", "duty_date"]),
+    ("employee_registration", "ix_employee_registration_company_employee", ["company_id", "employee_id"]),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    tables = sa.inspect(bind).get_table_names()
+    if "hr_kpi_rollups" not in tables:
+        op.create_table(
+            "hr_kpi_rollups",
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column("company_id", sa.String(length=50), nullable=False),
+            sa.Column("day", sa.Date(), nullable=False),
+            sa.Column("location", sa.String(length=255), nullable=False),
+            sa.Column("kpis", sa.Text(), nullable=False),
+            sa.Column("built_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("company_id", "day", "location", name="uix_hr_kpi_rollup_day"),
+        )
+    for table, name, columns in INDEXES:
+        if table in tables:
+            indexes = {index["name"] for index in sa.inspect(bind).get_indexes(table)}
+            if name not in indexes:
+                op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for table, name, _ in INDEXES:
+        op.drop_index(name, table_name=table)
+    op.drop_table("hr_kpi_rollups")
@@ -1,9 +1,8 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from app.config import DATABASE_URL
+from app.database.pools import build_engine, pool_settings
 
 
 def normalize_batch_number(value):
@@ -13,45 +12,74 @@ def normalize_batch_number(value):
     return str(value).strip().upper()
 
 
-database_host = (make_url(DATABASE_URL).host or "").lower()
-is_render_database = "render.com" in database_host or os.getenv("RENDER") == "true"
-
-connect_args = {}
-if is_render_database:
-    # Render's external PostgreSQL endpoint requires TLS. TCP keepalives help
-    # stale cross-region connections fail fast so pool_pre_ping can replace them.
-    connect_args = {
-        "sslmode": os.getenv("PGSSLMODE", "require"),
-        "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "10")),
-        "keepalives": 1,
-        "keepalives_idle": 30,
-        "keepalives_interval": 10,
-        "keepalives_count": 5,
-        "application_name": os.getenv("RENDER_SERVICE_NAME", "bknr_erp"),
-    }
-
 # -----------------------------------------------------
-# 🟡 Create SQLAlchemy Engine
+# 🟡 Create SQLAlchemy Engines (one pool per purpose, see pools.py)
 # -----------------------------------------------------
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
-    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "5")),
-    pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "15")),
-    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "300")),
-    pool_pre_ping=True,
-    pool_use_lifo=True,
-    connect_args=connect_args,
-)
+web_settings = pool_settings("web", DATABASE_URL)
+background_settings = pool_settings("background", DATABASE_URL)
+reporting_settings = pool_settings("reporting", os.getenv("DATABASE_REPORTING_URL", "").strip() or DATABASE_URL)
+
+engine = build_engine(web_settings)
+background_engine = build_engine(background_settings)
+reporting_engine = build_engine(reporting_settings)
+ENGINES = {
+    web_settings.purpose: (engine, web_settings),
+    background_settings.purpose: (background_engine, background_settings),
+    reporting_settings.purpose: (reporting_engine, reporting_settings),
+}
+
+from app.services.connection_leaks import install_leak_detector
+
+for _purpose, (_engine, _settings) in ENGINES.items():
+    install_leak_detector(_engine, _purpose, _settings.leak_seconds)
+
+if os.getenv("METRICS_ENABLED", "true").strip().lower() in {"1", "true", "yes"}:
+    from app.services.metrics import install_pool_metrics
+
+    for _purpose, (_engine, _settings) in ENGINES.items():
+        install_pool_metrics(_engine, pool=_purpose)
+
+if os.getenv("SQL_DIAGNOSTICS", "").strip().lower() in {"1", "true", "yes"}:
+    from app.services.query_diagnostics import install_query_instrumentation
+
+    for _purpose, (_engine, _settings) in ENGINES.items():
+        install_query_instrumentation(_engine)
 
 # -----------------------------------------------------
-# 🟠 Create Session Factory
+# 🟠 Create Session Factories
 # -----------------------------------------------------
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine
 )
+# Scheduler jobs and worker threads.
+BackgroundSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=background_engine)
+# Long read-only exports; may be a read replica, so never write through it.
+ReportingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=reporting_engine)
+
+from app.services.financial_periods import install_period_tracking
+from app.services.hr_kpi_rollups import install_hr_kpi_tracking
+from app.services.inventory_summary_service import install_inventory_summary_tracking
+from app.services.lineage import install_lineage_tracking
+from app.services.master_data import install_master_data_tracking
+from app.services.net_stock import install_net_stock_tracking
+from app.services.notification_counters import install_notification_tracking
+from app.services.production_cost_pools import install_cost_pool_tracking
+from app.services.search_index import install_search_index_tracking
+from app.services.storage_fifo import install_fifo_tracking
+
+for _factory in (SessionLocal, BackgroundSessionLocal):
+    install_period_tracking(_factory)
+    install_fifo_tracking(_factory)
+    install_net_stock_tracking(_factory)
+    install_inventory_summary_tracking(_factory)
+    install_search_index_tracking(_factory)
+    install_notification_tracking(_factory)
+    install_lineage_tracking(_factory)
+    install_cost_pool_tracking(_factory)
+    install_hr_kpi_tracking(_factory)
+    install_master_data_tracking(_factory)
 
 # -----------------------------------------------------
 # 🔵 Base Class for All ORM Models
@@ -68,3 +96,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_reporting_db():
+    """Provide a read-only reporting session (read replica when configured)."""
+    db = ReportingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
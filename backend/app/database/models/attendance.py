@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Time, Text, ForeignKey, Boolean, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Time, Text, ForeignKey, Boolean, Index, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 from app.database import Base
@@ -6,6 +6,10 @@ from app.database.models.criteria import metacolumns
 
 class EmployeeRegistration(Base, metacolumns):
     __tablename__ = "employee_registration"
+    __table_args__ = (
+        # HR drill-downs list a company's register in employee_id order.
+        Index("ix_employee_registration_company_employee", "company_id", "employee_id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
 
     # 🌐 GLOBAL FILTER
@@ -62,6 +66,16 @@ class EmployeeRegistration(Base, metacolumns):
 
 class DailyAttendance(Base, metacolumns):
     __tablename__ = "daily_attendance"
+    __table_args__ = (
+        # Open duties by first punch, for the scheduled 24-hour auto-close.
+        Index(
+            "ix_daily_attendance_open_first_in", "first_in",
+            postgresql_where=text("status <> 'CLOSED'"),
+            sqlite_where=text("status <> 'CLOSED'"),
+        ),
+        # HR rollups and drill-downs read a company's duties by day.
+        Index("ix_daily_attendance_company_duty_date", "company_id", "duty_date"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     production_at = Column(String(255), index=True, nullable=True)
 
@@ -97,6 +111,7 @@ class ContractLabour(Base, metacolumns):
     __tablename__ = "contract_labour"
     __table_args__ = (
         UniqueConstraint("company_id", "labour_id", name="uq_company_contract_labour_id"),
+        Index("ix_contract_labour_company_id_id", "company_id", "id"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -121,6 +136,7 @@ class ContractLabourAttendance(Base, metacolumns):
             "company_id", "labour_id", "attendance_date",
             name="uq_company_contract_labour_attendance_day"
         ),
+        Index("ix_contract_labour_attendance_register", "company_id", "attendance_date", "in_time", "id"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -137,6 +153,10 @@ class ContractLabourAttendance(Base, metacolumns):
 
 class DailyTemporaryWorker(Base, metacolumns):
     __tablename__ = "daily_temporary_workers"
+    __table_args__ = (
+        Index("ix_daily_temporary_workers_register", "company_id", "work_date", "id"),
+        Index("ix_daily_temporary_workers_type_register", "company_id", "worker_type", "work_date", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     worker_name = Column(String(120), nullable=False)
@@ -161,6 +181,9 @@ class DailyTemporaryWorker(Base, metacolumns):
 
 class VisitorEntry(Base, metacolumns):
     __tablename__ = "visitor_entries"
+    __table_args__ = (
+        Index("ix_visitor_entries_register", "company_id", "visit_date", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     visitor_name = Column(String(120), nullable=False)
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, UniqueConstraint
+
+from app.database import Base
+
+
+class DerivedTableBuild(Base):
+    """
+    One company whose rows of a derived table (services/derived_tables)
+    have been built from its source tables, so reads can trust them.
+
+    Written by the backfill job and by the per-company rebuilds, even when
+    the company had nothing to build; until then reads fall back to the
+    source tables. Example: ("lineage", "VNBK2162"), ("search_index", "C1").
+    """
+    __tablename__ = "derived_table_builds"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(50), nullable=False)
+    company_id = Column(String(100), nullable=False)
+    built_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("name", "company_id", name="uix_derived_table_build"),
+    )
+
+    def __repr__(self):
+        return f"<DerivedTableBuild {self.name} {self.company_id}>"
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Date, DateTime, Index, Integer, String, UniqueConstraint
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+
+class FinancialPeriod(Base):
+    """
+    Active months per company and source table, with row counts.
+    Maintained on ORM writes by services/financial_periods so FY dropdowns
+    and bounds never scan the source table.
+
+    Example row:
+        company_id    = "BKNR9879"
+        source        = "gate_entry"
+        period_month  = 2026-04-01
+        fy_start_year = 2026            # FY 2026-27
+        row_count     = 148
+    """
+    __tablename__ = "financial_periods"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(50), nullable=False)
+    source = Column(String(50), nullable=False)
+    period_month = Column(Date, nullable=False)       # first day of the month
+    fy_start_year = Column(Integer, nullable=False)   # April-March year the month belongs to
+    row_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("company_id", "source", "period_month", name="uix_financial_period_month"),
+        Index("ix_financial_periods_company_source_fy", "company_id", "source", "fy_start_year"),
+    )
+
+    def __repr__(self):
+        return f"<FinancialPeriod {self.company_id} {self.source} {self.period_month} rows={self.row_count}>"
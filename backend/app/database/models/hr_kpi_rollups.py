@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Date, DateTime, Integer, String, Text, UniqueConstraint
+
+from app.database import Base
+
+
+class HrKpiRollup(Base):
+    """
+    One company × location × day of HR command center KPIs, built by
+    services/hr_kpi_rollups and dropped whenever an attendance or production
+    row behind it is written. Employee and statutory writes instead set
+    ``kpis`` to "" (stale) at the employee's locations, which the next load
+    rebuilds.
+
+    ``location`` is the upper-cased employee / production location ("" for
+    employees without one). ``kpis`` is JSON of additive totals, e.g.:
+        {"active": 212, "present": 187, "half_day": 4, "ot_workers": 23,
+         "ot_pending": 41, "duty_pending": 6,
+         "production_kg": {"PRODUCTION": 5120.0, "PEELING": 8730.5},
+         "departments": {"PEELING": {"employees": 96, "active": 90, "present": 84, ...}},
+         "events": [["dob", "E-104", "RAVI", "1990-10-22", 3]], ...}
+    """
+    __tablename__ = "hr_kpi_rollups"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(50), nullable=False)
+    day = Column(Date, nullable=False)
+    location = Column(String(255), nullable=False, default="")
+    kpis = Column(Text, nullable=False)
+    built_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("company_id", "day", "location", name="uix_hr_kpi_rollup_day"),
+    )
+
+    def __repr__(self):
+        return f"<HrKpiRollup {self.company_id} {self.day} {self.location or '-'}>"
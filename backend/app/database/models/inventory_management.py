@@ -8,8 +8,9 @@ from sqlalchemy import (
     Text,
     DateTime,
     Boolean,
-    UniqueConstraint,
-    Index
+    Index,
+    func,
+    literal_column,
 )
 from datetime import datetime  # ✅ Idhi kachithanga undali
 from app.utils.timezone import ist_now
@@ -280,23 +281,32 @@ class InventorySummary(Base):
 
     last_transaction_date = Column(Date)
 
+    # Running totals for delta maintenance (services/inventory_summary_service)
+    rate_total = Column(Float, default=0)      # sum of product_kg_value
+    rate_count = Column(Integer, default=0)    # rows with a product_kg_value
+    row_count = Column(Integer, default=0)     # non-cancelled stock rows
+
     updated_at = Column(
         DateTime,
         default=datetime.utcnow
     )
 
     __table_args__ = (
-        UniqueConstraint(
-            "company_id",
-            "species",
-            "variety",
-            "grade",
-            "packing_style",
-            "glaze",
-            "production_for",
-            "production_at",
-            "freezer",
-            name="uq_inventory_summary"
+        # One row per summary grain. Key columns are nullable and NULLs never
+        # conflict in a plain unique constraint, so the grain is indexed with
+        # NULL folded to "" (the delta upsert's ON CONFLICT target).
+        Index(
+            "uix_inventory_summary_grain",
+            company_id,
+            func.coalesce(species, literal_column("''")),
+            func.coalesce(variety, literal_column("''")),
+            func.coalesce(grade, literal_column("''")),
+            func.coalesce(packing_style, literal_column("''")),
+            func.coalesce(glaze, literal_column("''")),
+            func.coalesce(production_for, literal_column("''")),
+            func.coalesce(production_at, literal_column("''")),
+            func.coalesce(freezer, literal_column("''")),
+            unique=True,
         ),
         Index("ix_inventory_summary_company_prod_for_at", "company_id", "production_for", "production_at"),
         Index("ix_inventory_summary_company_product_dims", "company_id", "species", "variety", "grade", "glaze"),
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, DateTime, String
+
+from app.database import Base
+
+
+class JobLease(Base):
+    """
+    Cluster-wide lease on a scheduled job, taken by services/job_leases so a
+    job started by every web worker runs in one of them at a time.
+
+    Example row:
+        name         = "attendance_auto_close"
+        holder       = "4f0c..."              # token of the run holding it
+        locked_until = 2026-10-19 06:35:00    # UTC; an expired lease is free
+    """
+    __tablename__ = "job_leases"
+
+    name = Column(String(100), primary_key=True)
+    holder = Column(String(36), nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+    acquired_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<JobLease {self.name} until {self.locked_until}>"
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String
+
+from app.database import Base
+
+
+class LineageEdge(Base):
+    """
+    One traceability hop, derived from a source row by services/lineage.
+
+    Lots, purchase, production and stock rows share the batch number, and
+    dispatches reference it through po_number, so every stage hangs off the
+    lot node; containers hang off their dispatch lines.
+
+    Example rows (source raw_material_purchasing#41, sales_dispatch#9):
+        parent=("lot", "B-104")       child=("rmp", "41")
+        parent=("lot", "B-104")       child=("dispatch", "9")
+        parent=("dispatch", "9")      child=("container", "TGHU8472930")
+    """
+    __tablename__ = "lineage_edges"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(100), nullable=True)
+    parent_type = Column(String(20), nullable=False)
+    parent_key = Column(String(255), nullable=False)
+    child_type = Column(String(20), nullable=False)
+    child_key = Column(String(255), nullable=False)
+    source_table = Column(String(50), nullable=False)
+    source_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_lineage_edges_parent", "company_id", "parent_type", "parent_key"),
+        Index("ix_lineage_edges_child", "company_id", "child_type", "child_key"),
+        Index("ix_lineage_edges_source", "source_table", "source_id"),
+    )
+
+    def __repr__(self):
+        return f"<LineageEdge {self.parent_type}:{self.parent_key} -> {self.child_type}:{self.child_key}>"
@@ -0,0 +1,51 @@
+from sqlalchemy import Column, DateTime, Float, Index, Integer, String, UniqueConstraint
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+
+class NetStockBalance(Base):
+    """
+    Net stock (IN minus OUT quantity, cancelled rows excluded) per planning
+    key, maintained on stock_entry writes by services/net_stock. Key columns
+    hold the normalised values production planning matches pending orders on.
+
+    Example row:
+        production_for = "EXPORT"        # upper-cased
+        species        = "vannamei"      # species/variety/grade/packing lower-cased
+        glaze          = "20"            # whole-number glaze percent
+        freezer        = "iqf"           # "n/a" when blank
+        production_at  = "UNIT-1"
+        location       = "CS-2"
+        net_qty        = 420.0           # kg
+        in_qty         = 900.0           # kg of positive movements (reference stock)
+    """
+    __tablename__ = "net_stock_balances"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(50), nullable=False)
+    production_for = Column(String(255), nullable=False, default="")
+    species = Column(String(100), nullable=False, default="")
+    variety = Column(String(255), nullable=False, default="")
+    grade = Column(String(255), nullable=False, default="")
+    packing_style = Column(String(255), nullable=False, default="")
+    glaze = Column(String(20), nullable=False, default="0")
+    freezer = Column(String(255), nullable=False, default="n/a")
+    production_at = Column(String(255), nullable=False, default="")
+    location = Column(String(255), nullable=False, default="")
+    net_qty = Column(Float, nullable=False, default=0.0)
+    in_qty = Column(Float, nullable=False, default=0.0)
+    row_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint(
+            "company_id", "production_for", "species", "variety", "grade", "packing_style",
+            "glaze", "freezer", "production_at", "location",
+            name="uix_net_stock_balance_key",
+        ),
+        Index("ix_net_stock_balances_company_scope", "company_id", "production_at", "production_for"),
+    )
+
+    def __repr__(self):
+        return f"<NetStockBalance {self.company_id} {self.production_for} {self.grade} net={self.net_qty}>"
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, UniqueConstraint
+
+from app.database import Base
+
+
+class NotificationCounter(Base):
+    """
+    One header-bell counter for a company, kept in step with its source table
+    by services/notification_counters.
+
+    Example rows:
+        company_id="BKNR9879", name="gate_entries", bucket="2026-10-19", value=14   # daily counter
+        company_id="BKNR9879", name="pending_orders", bucket="",          value=37
+        company_id="*",        name="open_tickets",   bucket="",          value=5    # shared by every company
+    """
+    __tablename__ = "notification_counters"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(50), nullable=False)
+    name = Column(String(40), nullable=False)
+    bucket = Column(String(10), nullable=False, default="")
+    value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("company_id", "name", "bucket", name="uix_notification_counter_key"),
+    )
+
+    def __repr__(self):
+        return f"<NotificationCounter {self.company_id} {self.name}[{self.bucket}]={self.value}>"
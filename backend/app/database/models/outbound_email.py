@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+
+from app.database import Base
+
+
+class OutboundEmail(Base):
+    """
+    One queued outbound email, written in the same transaction as the record
+    that triggers it and delivered by services/email_queue's dispatcher.
+
+    Example row:
+        category        = "gate_entry"
+        recipients      = '["qc@example.com", "stores@example.com"]'   # JSON list
+        subject         = "SVBK - Vehicle Arrived: Batch B-104"
+        status          = "PENDING"      # PENDING -> SENDING -> SENT | FAILED
+        attempts        = 1
+        next_attempt_at = 2026-10-19 06:31:00   # UTC, retry backoff
+        claim_token     = "4f0c..."      # dispatcher run holding the row
+        locked_until    = 2026-10-19 06:35:00   # lease; expired leases are re-claimed
+    """
+    __tablename__ = "outbound_emails"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(50), nullable=True)
+    category = Column(String(50), nullable=False, default="general")
+    recipients = Column(Text, nullable=False)
+    subject = Column(String(500), nullable=False)
+    html = Column(Text, nullable=False)
+    text = Column(Text, nullable=True)
+    reply_to = Column(String(255), nullable=True)
+    status = Column(String(20), nullable=False, default="PENDING")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = Column(String(36), nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_outbound_emails_due", "status", "next_attempt_at"),
+        Index("ix_outbound_emails_claim_token", "claim_token"),
+    )
+
+    def __repr__(self):
+        return f"<OutboundEmail {self.id} {self.category} {self.status}>"
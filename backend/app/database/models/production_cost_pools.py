@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, Text, UniqueConstraint
+
+from app.database import Base
+
+
+class ProductionCostPool(Base):
+    """
+    One company-month of production cost pools, aggregated in SQL by
+    services/production_cost_pools and dropped whenever a source row of that
+    month is written.
+
+    ``pools`` is JSON holding day/location grained totals, e.g.:
+        {"output":      [["2026-10-03", "UNIT-1", "PO-7", "PD", 1250.0, 4]],
+         "salary":      [["UNIT-1", 482000.0, 61]],
+         "electricity": [["2026-10-03", "UNIT-1", 18450.0, 1]],
+         "diesel":      [["2026-10-03", "UNIT-1", 7200.0, 2]],
+         "other_expense": [["2026-10-03", "UNIT-1", "CANTEEN", 3100.0, 1]],
+         "consumable":  [["2026-10-03", "UNIT-1", "PO-7", "MASTER CARTON", 9800.0, 3]]}
+    The trailing number of every entry is the source-row count.
+    """
+    __tablename__ = "production_cost_pools"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(50), nullable=False)
+    month = Column(String(7), nullable=False)
+    pools = Column(Text, nullable=False)
+    source_rows = Column(Integer, nullable=False, default=0)
+    built_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("company_id", "month", name="uix_production_cost_pool_month"),
+    )
+
+    def __repr__(self):
+        return f"<ProductionCostPool {self.company_id} {self.month} rows={self.source_rows}>"
+
+
+class ProductionCostPoolGeneration(Base):
+    """
+    Per-company invalidation counter for production_cost_pools.
+
+    Every drop of a company's pools bumps ``generation`` first; a pool
+    aggregated before the bump is not stored (see
+    services/production_cost_pools).
+    """
+    __tablename__ = "production_cost_pool_generations"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(50), nullable=False)
+    generation = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("company_id", name="uix_production_cost_pool_generation"),
+    )
+
+    def __repr__(self):
+        return f"<ProductionCostPoolGeneration {self.company_id} {self.generation}>"
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, UniqueConstraint
+
+from app.database import Base
+
+
+class SearchDocument(Base):
+    """
+    One searchable record for the menu's global search, kept in step with its
+    source row by services/search_index.
+
+    Example row:
+        company_id  = "BKNR9879"
+        entity_type = "batch"            # key of search_index.SOURCES
+        entity_id   = 5120               # gate_entry.id
+        title       = "Batch #B-104"
+        subtitle    = "Vehicle: AP39TX1234 | Supplier: Sri Sai Aqua"
+        title_key   = "batch #b-104"     # lower-cased title, for exact/prefix ranking
+        search_text = "batch #b-104 b-104 ap39tx1234 sri sai aqua"
+    """
+    __tablename__ = "search_documents"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(50), nullable=False)
+    entity_type = Column(String(30), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    title = Column(String(255), nullable=False)
+    subtitle = Column(String(500), nullable=True)
+    title_key = Column(String(255), nullable=False)
+    search_text = Column(Text, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_id", name="uix_search_documents_entity"),
+        Index("ix_search_documents_company_type", "company_id", "entity_type"),
+    )
+
+    def __repr__(self):
+        return f"<SearchDocument {self.entity_type}:{self.entity_id} {self.title}>"
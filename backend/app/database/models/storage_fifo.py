@@ -0,0 +1,111 @@
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Index, Integer, String
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+
+class StorageFifoLayer(Base):
+    """
+    One FIFO layer per IN stock movement of a batch/freezer/glaze/grade/
+    variety/packing-style combo, with the cartons still held after all OUT
+    movements. Maintained by services/storage_fifo on stock_entry writes.
+
+    Example row:
+        combo_key      = "3f1c..."       # sha1 of the six combo fields
+        stock_entry_id = 5012             # the IN movement
+        in_date        = 2026-04-03
+        qty_received   = 120
+        remaining_mc   = 45
+        depleted_on    = None             # date the layer reached 0
+    """
+    __tablename__ = "storage_fifo_layers"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(50), nullable=False)
+    combo_key = Column(String(40), nullable=False)
+    batch_number = Column(String(255))
+    freezer = Column(String(255))
+    glaze = Column(String(50))
+    grade = Column(String(255))
+    variety = Column(String(255))
+    packing_style = Column(String(255))
+    stock_entry_id = Column(Integer, nullable=False)
+    sequence = Column(Integer, nullable=False, default=0)    # FIFO order within the combo
+    in_date = Column(Date, nullable=False)
+    qty_received = Column(Integer, nullable=False, default=0)
+    quantity_kg = Column(Float, nullable=False, default=0.0)
+    remaining_mc = Column(Integer, nullable=False, default=0)
+    depleted_on = Column(Date, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_storage_fifo_layers_company_combo", "company_id", "combo_key"),
+        Index("ix_storage_fifo_layers_company_depleted", "company_id", "depleted_on", "in_date"),
+    )
+
+
+class StorageFifoConsumption(Base):
+    """
+    Cartons an OUT movement took from one FIFO layer. Dispatch billing for a
+    month reads the consumptions dated inside it.
+    """
+    __tablename__ = "storage_fifo_consumptions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(50), nullable=False)
+    layer_id = Column(Integer, ForeignKey("storage_fifo_layers.id", ondelete="CASCADE"), nullable=False)
+    stock_entry_id = Column(Integer, nullable=False)          # the OUT movement
+    out_date = Column(Date, nullable=False)
+    mc_taken = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_storage_fifo_consumptions_layer", "layer_id", "out_date"),
+    )
+
+
+class StorageComboClosing(Base):
+    """
+    Month-end closing state of a combo for one production_for/production_at,
+    written for every month the combo moved. A month without movements
+    carries the previous row's closing as its opening.
+
+    Example row:
+        period_month       = 2026-04-01
+        opening_mc         = 80
+        in_mc / out_mc     = 120 / 155
+        closing_mc         = 45
+        next_period_month  = 2026-06-01   # next month with movements
+    """
+    __tablename__ = "storage_combo_closings"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(50), nullable=False)
+    combo_key = Column(String(40), nullable=False)
+    batch_number = Column(String(255))
+    freezer = Column(String(255))
+    glaze = Column(String(50))
+    grade = Column(String(255))
+    variety = Column(String(255))
+    packing_style = Column(String(255))
+    production_for = Column(String(255))
+    production_at = Column(String(255))
+    species = Column(String(100))
+    brand = Column(String(255))
+    period_month = Column(Date, nullable=False)                 # first day of the month
+    next_period_month = Column(Date, nullable=True)
+    opening_mc = Column(Integer, nullable=False, default=0)
+    in_mc = Column(Integer, nullable=False, default=0)
+    in_qty = Column(Float, nullable=False, default=0.0)
+    out_mc = Column(Integer, nullable=False, default=0)
+    closing_mc = Column(Integer, nullable=False, default=0)
+    first_entry_id = Column(Integer)                            # first movement of the combo
+    first_movement_date = Column(Date)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_storage_combo_closings_company_combo", "company_id", "combo_key"),
+        Index("ix_storage_combo_closings_company_month", "company_id", "period_month", "next_period_month"),
+    )
+
+    def __repr__(self):
+        return f"<StorageComboClosing {self.company_id} {self.batch_number} {self.period_month} closing={self.closing_mc}>"
@@ -39,6 +39,22 @@ class SystemVersion(Base):
         return f"<SystemVersion v{self.version} current={self.is_current}>"
 
 
+class SchemaEnsureStep(Base):
+    """
+    Legacy "ensure schema" steps already applied to this database.
+    Written by `alembic upgrade head`; read once per worker so request
+    handlers can skip their runtime DDL checks (see services/schema_readiness).
+    """
+    __tablename__ = "schema_ensure_steps"
+
+    name = Column(String(100), primary_key=True)                 # e.g. "crm_quotation"
+    version = Column(Integer, nullable=False, default=1)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<SchemaEnsureStep {self.name} v{self.version}>"
+
+
 class DeploymentAuditLog(Base):
     """
     Immutable audit log — one row per deployment-related action.
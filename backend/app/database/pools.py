@@ -0,0 +1,147 @@
+"""Per-purpose database engines and their pool settings.
+
+The app opens sessions for three kinds of work, each with its own pool so
+one cannot starve another:
+
+* ``web`` - request handlers and the auth middleware (``SessionLocal``);
+* ``background`` - scheduler jobs and worker threads
+  (``BackgroundSessionLocal``), so a slow reconcile never holds a
+  connection a request is waiting for;
+* ``reporting`` - long read-only exports (``ReportingSessionLocal``). Set
+  ``DATABASE_REPORTING_URL`` to send them to a read replica; without it
+  they use the primary through their own small pool.
+
+Pools are sized with ``DB_<PURPOSE>_POOL_SIZE`` and
+``DB_<PURPOSE>_MAX_OVERFLOW``; the web pool keeps the original
+``DB_POOL_SIZE`` / ``DB_MAX_OVERFLOW`` names. ``DB_<PURPOSE>_LEAK_SECONDS``
+sets how long a connection may stay checked out before the leak detector
+logs it (0 disables it).
+
+``DB_POOL_MODE=transaction`` is for PgBouncer (or any pooler) in
+transaction pooling mode, where consecutive transactions of one client
+connection can land on different server connections. Nothing may outlive
+a transaction there: server-side prepared statements are disabled for
+drivers that use them (psycopg2 never does), pre-ping stays on because it
+is a plain ``SELECT 1``, and statements that set session-level state
+(``SET`` without ``LOCAL``, ``LISTEN``, ``PREPARE``, advisory locks,
+``WITH HOLD`` cursors) are logged once each so they can be fixed.
+"""
+import logging
+import os
+import re
+from dataclasses import dataclass
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger("BKNR_ERP.db")
+
+PURPOSES = ("web", "background", "reporting")
+POOL_MODE = os.getenv("DB_POOL_MODE", "session").strip().lower()
+TRANSACTION_POOLING = POOL_MODE == "transaction"
+
+# purpose -> (pool_size, max_overflow, leak_seconds)
+DEFAULTS = {
+    "web": (5, 5, 30),
+    "background": (2, 3, 900),
+    "reporting": (2, 2, 300),
+}
+
+_SESSION_STATE = re.compile(
+    r"^\s*(?:SET\s+(?!LOCAL\b|TRANSACTION\b|CONSTRAINTS\b)|RESET\b|LISTEN\b|PREPARE\b|DISCARD\b)"
+    r"|\bpg_advisory_(?:try_)?lock(?:_shared)?\s*\(|\bWITH\s+HOLD\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    purpose: str
+    url: str
+    pool_size: int
+    max_overflow: int
+    pool_timeout: int
+    pool_recycle: int
+    leak_seconds: float
+    transaction_pooling: bool
+
+
+def _setting(purpose: str, name: str, default) -> str:
+    value = os.getenv(f"DB_{purpose.upper()}_{name}")
+    if value is None and purpose == "web":
+        value = os.getenv(f"DB_{name}")
+    return value if value not in (None, "") else str(default)
+
+
+def pool_settings(purpose: str, url: str) -> PoolSettings:
+    """Read the pool settings for ``purpose`` from the environment."""
+    pool_size, max_overflow, leak_seconds = DEFAULTS[purpose]
+    return PoolSettings(
+        purpose=purpose,
+        url=url,
+        pool_size=int(_setting(purpose, "POOL_SIZE", pool_size)),
+        max_overflow=int(_setting(purpose, "MAX_OVERFLOW", max_overflow)),
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "15")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "300")),
+        leak_seconds=float(_setting(purpose, "LEAK_SECONDS", leak_seconds)),
+        transaction_pooling=TRANSACTION_POOLING,
+    )
+
+
+def connect_args_for(url: str, transaction_pooling: bool = False) -> dict:
+    """DBAPI connect arguments for ``url``."""
+    parsed = make_url(url)
+    connect_args = {}
+    is_render_database = "render.com" in (parsed.host or "").lower() or os.getenv("RENDER") == "true"
+    if is_render_database and parsed.get_backend_name() == "postgresql":
+        # Render's external PostgreSQL endpoint requires TLS. TCP keepalives help
+        # stale cross-region connections fail fast so pool_pre_ping can replace them.
+        connect_args = {
+            "sslmode": os.getenv("PGSSLMODE", "require"),
+            "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "10")),
+            "keepalives": 1,
+            "keepalives_idle": 30,
+            "keepalives_interval": 10,
+            "keepalives_count": 5,
+            "application_name": os.getenv("RENDER_SERVICE_NAME", "bknr_erp"),
+        }
+    if transaction_pooling:
+        driver = parsed.get_driver_name()
+        if driver == "psycopg":
+            connect_args["prepare_threshold"] = None
+        elif driver == "asyncpg":
+            connect_args["statement_cache_size"] = 0
+    return connect_args
+
+
+def _warn_on_session_state(engine) -> None:
+    seen = set()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def check(conn, cursor, statement, parameters, context, executemany):
+        if _SESSION_STATE.search(statement):
+            key = statement.strip()[:120]
+            if key not in seen:
+                seen.add(key)
+                logger.warning(
+                    "Session-level state under DB_POOL_MODE=transaction will leak to other clients: %s", key,
+                )
+
+
+def build_engine(settings: PoolSettings, connect_args: dict | None = None):
+    """Create the engine for one purpose; pool metrics and the leak detector are installed by the caller."""
+    if connect_args is None:
+        connect_args = connect_args_for(settings.url, settings.transaction_pooling)
+    options = {"pool_pre_ping": True, "connect_args": connect_args}
+    if make_url(settings.url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+            pool_recycle=settings.pool_recycle,
+            pool_use_lifo=True,
+        )
+    engine = create_engine(settings.url, **options)
+    if settings.transaction_pooling:
+        _warn_on_session_state(engine)
+    return engine
@@ -6,8 +6,9 @@ from starlette.middleware.sessions import SessionMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from app.database import SessionLocal, engine
+from app.database import BackgroundSessionLocal, SessionLocal, background_engine, engine
 from app.services.cache import cache_get_or_set, invalidate_live_company_caches
+from app.services.master_data import bump_master_data_version
 import logging
 import json
 import os
@@ -23,9 +24,26 @@ except ImportError:
 try:
     from app.services.inventory_snapshot_scheduler import create_inventory_snapshot
     from app.services.floor_balance_snapshot_scheduler import create_floor_balance_snapshot
+    from app.services.inventory_summary_service import run_inventory_summary_verifier
+    from app.services.notification_counters import run_notification_counter_reconcile
+    from app.services.production_cost_pools import run_cost_pool_reconcile
+    from app.services.attendance_auto_close import ATTENDANCE_AUTO_CLOSE_MINUTES, run_attendance_auto_close
+    from app.services.hr_kpi_rollups import HR_KPI_RECONCILE_MINUTES, run_hr_kpi_reconcile
+    from app.services.financial_periods import run_financial_period_reconcile
+    from app.services.derived_tables import DERIVED_TABLE_BACKFILL_MINUTES, run_derived_table_backfill
 except Exception:
     create_inventory_snapshot = None
     create_floor_balance_snapshot = None
+    run_inventory_summary_verifier = None
+    run_notification_counter_reconcile = None
+    run_cost_pool_reconcile = None
+    run_attendance_auto_close = None
+    ATTENDANCE_AUTO_CLOSE_MINUTES = 10
+    run_hr_kpi_reconcile = None
+    HR_KPI_RECONCILE_MINUTES = 60
+    run_financial_period_reconcile = None
+    run_derived_table_backfill = None
+    DERIVED_TABLE_BACKFILL_MINUTES = 60
 from app.config import (
     CORS_ORIGINS,
     DEPLOYMENT_TOKEN,
@@ -60,6 +78,8 @@ SESSION_IDLE_TIMEOUT_SECONDS = int(
     os.getenv("SESSION_IDLE_TIMEOUT_SECONDS", str(30 * 60))
 )
 SCREEN_POPUP_SETTING_KEY = "screen_popup_broadcast"
+# Successful writes under these prefixes may change criteria masters.
+MASTER_DATA_WRITE_PREFIXES = ("/criteria", "/data-management")
 
 
 def get_screen_popup_config(db):
@@ -143,6 +163,17 @@ import app.database.models.assets
 import app.database.models.advanced_seafood_erp
 import app.database.models.feature_flags
 import app.database.models.system_settings
+import app.database.models.financial_periods
+import app.database.models.storage_fifo
+import app.database.models.net_stock
+import app.database.models.outbound_email
+import app.database.models.search_index
+import app.database.models.notification_counters
+import app.database.models.lineage
+import app.database.models.production_cost_pools
+import app.database.models.job_leases
+import app.database.models.hr_kpi_rollups
+import app.database.models.derived_tables
 
 # Create all tables on startup if they don't exist
 #Base.metadata.create_all(bind=engine)
@@ -161,9 +192,11 @@ def start_snapshot_scheduler():
     if scheduler and scheduler.running:
         return
 
+    from app.services.metrics import timed_job
+
     scheduler = BackgroundScheduler(timezone="Asia/Kolkata")
     scheduler.add_job(
-        create_inventory_snapshot,
+        timed_job("daily_inventory_snapshot", create_inventory_snapshot),
         trigger="cron",
         hour=9,
         minute=0,
@@ -171,21 +204,127 @@ def start_snapshot_scheduler():
         replace_existing=True,
     )
     scheduler.add_job(
-        create_floor_balance_snapshot,
+        timed_job("daily_floor_balance_snapshot", create_floor_balance_snapshot),
         trigger="cron",
         hour=9,
         minute=0,
         id="daily_floor_balance_snapshot",
         replace_existing=True,
     )
+    scheduler.add_job(
+        timed_job("inventory_summary_verifier", run_inventory_summary_verifier),
+        trigger="cron",
+        hour=2,
+        minute=30,
+        id="inventory_summary_verifier",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        timed_job("notification_counters_reconcile", run_notification_counter_reconcile),
+        trigger="cron",
+        hour=0,
+        minute=5,
+        id="notification_counters_reconcile",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        timed_job("production_cost_pools_reconcile", run_cost_pool_reconcile),
+        trigger="cron",
+        hour=0,
+        minute=15,
+        id="production_cost_pools_reconcile",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        timed_job("financial_periods_reconcile", run_financial_period_reconcile),
+        trigger="cron",
+        hour=0,
+        minute=45,
+        id="financial_periods_reconcile",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        timed_job("attendance_auto_close", run_attendance_auto_close),
+        trigger="interval",
+        minutes=ATTENDANCE_AUTO_CLOSE_MINUTES,
+        id="attendance_auto_close",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        timed_job("hr_kpi_rollups_reconcile", run_hr_kpi_reconcile),
+        trigger="interval",
+        minutes=HR_KPI_RECONCILE_MINUTES,
+        id="hr_kpi_rollups_reconcile",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        timed_job("derived_table_backfill", run_derived_table_backfill),
+        trigger="interval",
+        minutes=DERIVED_TABLE_BACKFILL_MINUTES,
+        id="derived_table_backfill",
+        replace_existing=True,
+    )
     scheduler.start()
     logger.info("Daily Inventory Snapshot Scheduler Started")
     logger.info("Daily Floor Balance Snapshot Scheduler Started")
 
+# =====================================================
+# 📬 CRM INBOUND EMAIL WATCHER (opt-in)
+# =====================================================
+inbound_email_stop = threading.Event()
+
+
+def start_inbound_email_watcher():
+    if os.getenv("CRM_IMAP_WATCH", "").strip().lower() not in {"1", "true", "yes"}:
+        return
+    from app.services.email_poller import watch_inbound_emails
+
+    threading.Thread(
+        target=watch_inbound_emails,
+        args=(BackgroundSessionLocal, inbound_email_stop),
+        name="crm-inbound-email-watcher",
+        daemon=True,
+    ).start()
+    logger.info("CRM inbound email IMAP watcher started")
+
+# =====================================================
+# ✉️ OUTBOUND EMAIL DISPATCHER
+# =====================================================
+email_dispatcher_stop = threading.Event()
+
+
+def start_email_dispatcher():
+    # EMAIL_DISPATCHER=external runs scripts/run_email_dispatcher.py as its own process instead.
+    if os.getenv("EMAIL_DISPATCHER", "inline").strip().lower() != "inline":
+        return
+    from app.services.email_queue import run_email_dispatcher
+
+    threading.Thread(
+        target=run_email_dispatcher,
+        args=(BackgroundSessionLocal, email_dispatcher_stop),
+        name="email-dispatcher",
+        daemon=True,
+    ).start()
+    logger.info("Outbound email dispatcher started")
+
 # =====================================================
 # 🔐 3. SESSION & AUTH MIDDLEWARE (ORDER IS CRITICAL)
 # =====================================================
 
+PUBLIC_EXACT_PATHS = frozenset({
+    "/", "/app", "/health", "/health/live", "/health/ready", "/docs",
+    "/openapi.json", "/robots.txt", "/sitemap.xml", "/brand-dp-3d.png",
+    "/svbk-it-solutions-logo-3d.png", "/svbk-it-solutions-logo-3d-transparent.png",
+    "/auth/login", "/auth/landing", "/auth/register", "/auth/verify-otp",
+    "/auth/set-password", "/auth/verify-login-otp", "/auth/session-info",
+    "/auth/forgot-password", "/auth/reset-password", "/auth/auto-login",
+    "/auth/logout", "/index.html", "/processing.html", "/inventory.html",
+    "/hrms.html", "/export.html", "/finance.html", "/quality.html",
+    "/website_styles.css", "/metrics",
+})
+PUBLIC_PREFIX_PATHS = ("/app/", "/static/", "/website-assets/", "/create-all", "/admin/maintenance")
+
+
 # 1. First, define the Auth Middleware
 class AuthMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
@@ -195,19 +334,6 @@ class AuthMiddleware(BaseHTTPMiddleware):
 
         path = request.url.path
 
-        exact_paths = [
-            "/", "/app", "/health", "/health/live", "/health/ready", "/docs",
-            "/openapi.json", "/robots.txt", "/sitemap.xml", "/brand-dp-3d.png",
-            "/svbk-it-solutions-logo-3d.png", "/svbk-it-solutions-logo-3d-transparent.png",
-            "/auth/login", "/auth/landing", "/auth/register", "/auth/verify-otp",
-            "/auth/set-password", "/auth/verify-login-otp", "/auth/session-info",
-            "/auth/forgot-password", "/auth/reset-password", "/auth/auto-login",
-            "/auth/logout", "/index.html", "/processing.html", "/inventory.html",
-            "/hrms.html", "/export.html", "/finance.html", "/quality.html",
-            "/website_styles.css",
-        ]
-        prefix_paths = ["/app/", "/static/", "/website-assets/", "/create-all", "/admin/maintenance"]
-
         # Check deployment token header bypass
         deploy_token = request.headers.get("X-Deploy-Token")
         expected_token = DEPLOYMENT_TOKEN
@@ -220,7 +346,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
             return await call_next(request)
 
         # PUBLIC URLS BYPASS
-        if path in exact_paths or any(path.startswith(p) for p in prefix_paths):
+        if path in PUBLIC_EXACT_PATHS or path.startswith(PUBLIC_PREFIX_PATHS):
             # Maintenance check on login page — non-logged-in visitors see maintenance page
             if path == "/" and not request.session.get("email"):
                 try:
@@ -388,6 +514,8 @@ class AuthMiddleware(BaseHTTPMiddleware):
         response.headers.setdefault("X-Robots-Tag", "noindex, nofollow")
         if request.method in {"POST", "PUT", "PATCH", "DELETE"} and response.status_code < 400:
             invalidate_live_company_caches(company_code)
+            if path.startswith(MASTER_DATA_WRITE_PREFIXES):
+                bump_master_data_version(company_code)
         return response
 
 
@@ -432,6 +560,17 @@ application.add_middleware(
 application.add_middleware(GZipMiddleware, minimum_size=1000)
 application.add_middleware(PerformanceHeadersMiddleware)
 
+if os.getenv("SQL_DIAGNOSTICS", "").strip().lower() in {"1", "true", "yes"}:
+    from app.services.query_diagnostics import QueryDiagnosticsMiddleware
+
+    # Outermost, so queries issued by the auth middleware are counted too.
+    application.add_middleware(QueryDiagnosticsMiddleware)
+
+if os.getenv("METRICS_ENABLED", "true").strip().lower() in {"1", "true", "yes"}:
+    from app.services.metrics import MetricsMiddleware
+
+    application.add_middleware(MetricsMiddleware)
+
 
 @application.on_event("startup")
 def on_startup():
@@ -439,10 +578,20 @@ def on_startup():
         logger.info("Startup schedulers and background migrations disabled by environment")
         return
     start_snapshot_scheduler()
+    start_inbound_email_watcher()
+    start_email_dispatcher()
+
+    try:
+        from app.services.schema_readiness import load_schema_readiness
+        with SessionLocal() as db:
+            ready = load_schema_readiness(db)
+        logger.info("Schema readiness loaded: %s ensure steps already applied", len(ready))
+    except Exception as exc:
+        logger.warning("Schema readiness warm-up skipped: %s", exc)
 
     def maintain_database_performance():
         from app.services.database_performance import apply_database_performance_maintenance
-        apply_database_performance_maintenance(engine)
+        apply_database_performance_maintenance(background_engine)
 
     threading.Thread(
         target=maintain_database_performance,
@@ -482,6 +631,11 @@ def on_startup():
 @application.on_event("shutdown")
 def on_shutdown():
     global scheduler
+    inbound_email_stop.set()
+    email_dispatcher_stop.set()
+    from app.services.email_poller import close_inbound_mailboxes
+
+    close_inbound_mailboxes()
     if scheduler and scheduler.running:
         scheduler.shutdown(wait=False)
         logger.info("Snapshot Scheduler Stopped")
@@ -536,6 +690,7 @@ from app.routers.export_documents import router as export_documents_router
 from app.routers.admin_feature_flags import router as feature_flags_router
 from app.routers.admin_maintenance import router as maintenance_router
 from app.routers.admin_deploy import router as deploy_router
+from app.routers.admin_diagnostics import router as diagnostics_router
 from app.routers.crm_quotation_router import router as crm_quotation_router
 from app.routers.page_tokens import router as page_tokens_router
 
@@ -569,6 +724,7 @@ application.include_router(export_documents_router, prefix="/export_documents")
 application.include_router(feature_flags_router)
 application.include_router(maintenance_router)
 application.include_router(deploy_router)
+application.include_router(diagnostics_router)
 application.include_router(crm_quotation_router)
 application.include_router(page_tokens_router)  # opaque page-token resolver
 
@@ -844,6 +1000,19 @@ def health_ready():
     return status
 
 
+@application.get("/metrics", response_class=PlainTextResponse)
+def metrics(request: Request):
+    """Prometheus scrape endpoint (bearer METRICS_TOKEN, or an admin session)."""
+    from app.services.metrics import render_metrics
+
+    token = os.getenv("METRICS_TOKEN", "").strip()
+    if token and request.headers.get("Authorization") == f"Bearer {token}":
+        pass
+    elif request.session.get("role") not in ("admin", "super_admin"):
+        return PlainTextResponse("Forbidden", status_code=403)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @application.get("/api/version")
 def api_version():
     """
@@ -14,7 +14,8 @@ import re
 from app.database import get_db
 from app.database.models.users import User, Company, OTPTable
 from app.security.password_handler import hash_password
-from app.routers.auth import get_ist_time, professional_email_html, send_email, send_security_email
+from app.routers.auth import get_ist_time, professional_email_html, send_security_email
+from app.services.email_queue import enqueue_email
 from app.utils.access_control import has_permission, is_super_admin, normalize_permission
 
 # ==========================================================
@@ -691,31 +692,32 @@ def toggle_user(uid: int, request: Request, db: Session = Depends(get_db)):
     user.is_active = not getattr(user, "is_active", True)
     if not user.is_active:
         user.current_session_id = None
+    else:
+        activated_at = ist_now().strftime("%d-%m-%Y %I:%M %p IST")
+        # Queued with the activation, so a slow mail provider never holds the request.
+        enqueue_email(
+            db,
+            [user.email],
+            "SVBK - User Access Activated",
+            professional_email_html(
+                title="Your SVBK access is active",
+                intro=f"Your user profile under {company.company_name} has been activated by your administrator.",
+                content_html=f"""
+                  <table role="presentation" width="100%" cellspacing="0" cellpadding="0" style="border-collapse:collapse;font-size:14px;margin-top:14px;">
+                    <tr><td style="padding:8px;border-bottom:1px solid #e5eefb;color:#64748b;width:36%;">Company ID</td><td style="padding:8px;border-bottom:1px solid #e5eefb;color:#0f172a;font-weight:700;">{company.company_code}</td></tr>
+                    <tr><td style="padding:8px;border-bottom:1px solid #e5eefb;color:#64748b;">Email</td><td style="padding:8px;border-bottom:1px solid #e5eefb;color:#0f172a;">{user.email}</td></tr>
+                  </table>
+                  <p style="margin:14px 0 0;color:#475569;font-size:14px;line-height:1.6;"><strong>Activated At:</strong> {activated_at}</p>
+                  <p style="margin:16px 0 0;color:#475569;font-size:14px;line-height:1.6;">You can now log in and continue your assigned ERP work.</p>
+                """,
+                note="If you did not expect this activation, please contact your company administrator."
+            ),
+            company_id=company.company_code,
+            category="user_activation",
+        )
     db.commit()
 
     status_str = "Activated" if user.is_active else "Deactivated"
-    if user.is_active:
-        activated_at = ist_now().strftime("%d-%m-%Y %I:%M %p IST")
-        try:
-            send_email(
-                user.email,
-                "SVBK - User Access Activated",
-                professional_email_html(
-                    title="Your SVBK access is active",
-                    intro=f"Your user profile under {company.company_name} has been activated by your administrator.",
-                    content_html=f"""
-                      <table role="presentation" width="100%" cellspacing="0" cellpadding="0" style="border-collapse:collapse;font-size:14px;margin-top:14px;">
-                        <tr><td style="padding:8px;border-bottom:1px solid #e5eefb;color:#64748b;width:36%;">Company ID</td><td style="padding:8px;border-bottom:1px solid #e5eefb;color:#0f172a;font-weight:700;">{company.company_code}</td></tr>
-                        <tr><td style="padding:8px;border-bottom:1px solid #e5eefb;color:#64748b;">Email</td><td style="padding:8px;border-bottom:1px solid #e5eefb;color:#0f172a;">{user.email}</td></tr>
-                      </table>
-                      <p style="margin:14px 0 0;color:#475569;font-size:14px;line-height:1.6;"><strong>Activated At:</strong> {activated_at}</p>
-                      <p style="margin:16px 0 0;color:#475569;font-size:14px;line-height:1.6;">You can now log in and continue your assigned ERP work.</p>
-                    """,
-                    note="If you did not expect this activation, please contact your company administrator."
-                )
-            )
-        except Exception as e:
-            print(f"USER ACTIVATION EMAIL ERROR: {e}")
 
     if _wants_json(request):
         return JSONResponse({"status": "success", "msg": f"User {status_str.lower()} successfully.", "user": _serialize_user(user)})
@@ -0,0 +1,91 @@
+"""
+Diagnostics Admin Router — BKNR ERP
+Per-request SQL counters collected when SQL_DIAGNOSTICS is enabled.
+Figures are per worker process and reset on restart.
+"""
+
+from html import escape
+
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import HTMLResponse
+
+from app.services.query_diagnostics import (
+    DUPLICATE_THRESHOLD,
+    SQL_DIAGNOSTICS_ENABLED,
+    clear_recent_requests,
+    recent_requests,
+)
+from app.utils.access_control import is_super_admin
+
+router = APIRouter(prefix="/admin/diagnostics", tags=["Admin - Diagnostics"])
+
+SORT_KEYS = {"query_count", "db_ms", "pool_wait_ms", "total_ms"}
+
+
+def _require_min_admin(request: Request):
+    if is_super_admin(request.session.get("email")):
+        return
+    if request.session.get("role") not in ("admin", "super_admin"):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+
+def _sort_key(value: str) -> str:
+    return value if value in SORT_KEYS else "query_count"
+
+
+@router.get("/queries")
+def query_diagnostics(request: Request, order_by: str = "query_count"):
+    """Most expensive recent requests on this worker, as JSON."""
+    _require_min_admin(request)
+    return {
+        "enabled": SQL_DIAGNOSTICS_ENABLED,
+        "duplicate_threshold": DUPLICATE_THRESHOLD,
+        "requests": recent_requests(_sort_key(order_by)),
+    }
+
+
+@router.post("/queries/reset")
+def reset_query_diagnostics(request: Request):
+    _require_min_admin(request)
+    clear_recent_requests()
+    return {"status": "ok"}
+
+
+@router.get("", response_class=HTMLResponse)
+def diagnostics_page(request: Request, order_by: str = "query_count"):
+    _require_min_admin(request)
+    if not SQL_DIAGNOSTICS_ENABLED:
+        return HTMLResponse(
+            "<h2>SQL diagnostics are off</h2><p>Set SQL_DIAGNOSTICS=1 and restart the worker.</p>"
+        )
+
+    rows = []
+    for entry in recent_requests(_sort_key(order_by)):
+        duplicates = "<br>".join(
+            f"<b>{item['count']}&times;</b> <code>{escape(item['sql'])}</code>" for item in entry["duplicates"]
+        )
+        flagged = any(item["count"] >= DUPLICATE_THRESHOLD for item in entry["duplicates"])
+        row_style = ' style="background:#fff4e5"' if flagged else ""
+        rows.append(
+            f"<tr{row_style}>"
+            f"<td>{escape(entry['label'])}</td><td>{entry['status']}</td>"
+            f"<td>{entry['query_count']}</td><td>{entry['db_ms']}</td>"
+            f"<td>{entry['pool_wait_ms']}</td><td>{entry['total_ms']}</td><td>{duplicates}</td></tr>"
+        )
+
+    headers = "".join(
+        f"<th><a href=\"?order_by={key}\">{label}</a></th>" if key else f"<th>{label}</th>"
+        for key, label in (
+            (None, "Request"), (None, "Status"), ("query_count", "Queries"), ("db_ms", "DB ms"),
+            ("pool_wait_ms", "Pool wait ms"), ("total_ms", "Total ms"), (None, "Repeated statements"),
+        )
+    )
+    return HTMLResponse(
+        "<html><head><title>SQL diagnostics</title>"
+        "<style>body{font-family:sans-serif;margin:24px}table{border-collapse:collapse;width:100%}"
+        "td,th{border:1px solid #ddd;padding:6px;vertical-align:top;font-size:13px}"
+        "code{white-space:pre-wrap}</style></head><body>"
+        f"<h2>SQL diagnostics (this worker)</h2><p>Highlighted rows repeat one statement "
+        f"{DUPLICATE_THRESHOLD}+ times.</p>"
+        f"<table><tr>{headers}</tr>{''.join(rows)}</table></body></html>"
+    )
@@ -20,23 +20,42 @@ class WorkflowActionPayload(BaseModel):
     document_id: int
     approver_role: str # e.g. MANAGER, GM, CEO
 
+class TraceBatchPayload(BaseModel):
+    lot_numbers: list[str] = []
+    container_nos: list[str] = []
+
 # =========================================================================
 # 1. TRACEABILITY ENDPOINTS
 # =========================================================================
+def _trace_company(request: Request) -> str:
+    # Lots and containers are only unique per company: never trace without one.
+    company_code = request.session.get("company_code")
+    if not company_code:
+        raise HTTPException(status_code=401, detail="Company session is required")
+    return company_code
+
 @router.get("/traceability/trace-forward/{lot_no}")
 def get_trace_forward(lot_no: str, request: Request, db: Session = Depends(get_db)):
-    comp_code = request.session.get("company_code", "VNBK2162")
+    comp_code = _trace_company(request)
     # Execute forward traceability map query
-    result = TraceabilityWorkflowService.trace_lot_forward(db, lot_no)
+    result = TraceabilityWorkflowService.trace_lot_forward(db, comp_code, lot_no)
     return {"success": True, "traceability_map": result}
 
 @router.get("/traceability/trace-backward/{container_no}")
 def get_trace_backward(container_no: str, request: Request, db: Session = Depends(get_db)):
-    comp_code = request.session.get("company_code", "VNBK2162")
+    comp_code = _trace_company(request)
     # Execute backward traceability map query
-    result = TraceabilityWorkflowService.trace_container_backward(db, container_no)
+    result = TraceabilityWorkflowService.trace_container_backward(db, comp_code, container_no)
     return {"success": True, "traceability_map": result}
 
+@router.post("/traceability/trace-batch")
+def post_trace_batch(payload: TraceBatchPayload, request: Request, db: Session = Depends(get_db)):
+    comp_code = _trace_company(request)
+    # Buyer audits: whole sets of lots / containers resolved in a fixed number of queries
+    forward = TraceabilityWorkflowService.trace_lots_forward(db, comp_code, payload.lot_numbers)
+    backward = TraceabilityWorkflowService.trace_containers_backward(db, comp_code, payload.container_nos)
+    return {"success": True, "lots": forward, "containers": backward}
+
 # =========================================================================
 # 2. WORKFLOW ENGINE ENDPOINTS
 # =========================================================================
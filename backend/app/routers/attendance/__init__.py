@@ -1,29 +1,43 @@
+# The application mounts ``app.routers.attendance_router``; this package
+# aggregate is only built when ``app.routers.attendance.router`` is first
+# accessed, so importing one attendance module does not copy every route.
+
 from fastapi import APIRouter
 
-from app.routers.attendance.employee_registration import router as employee_router
-from app.routers.attendance.daily_attendance import router as daily_router
-from app.routers.attendance.analytics import router as analytics_router
-from app.routers.attendance.salary_reports import router as salary_router
-from app.routers.attendance.tax_master import router as tax_master_router
-from app.routers.attendance.salary_advance import router as salary_advance_router  # ✅ ADD
-
-router = APIRouter()
-
-# ==================================================
-# 1️⃣ ATTENDANCE API ROUTES (WITH /attendance PREFIX)
-# ==================================================
-attendance_api = APIRouter(prefix="/attendance")
-
-attendance_api.include_router(employee_router)        # /attendance/employee/*
-attendance_api.include_router(daily_router)           # /attendance/daily/*
-attendance_api.include_router(tax_master_router)      # /attendance/tax-master
-attendance_api.include_router(salary_advance_router)  # /attendance/salary-advance ✅
-
-# ==================================================
-# 2️⃣ INCLUDE INTO MAIN ROUTER
-# ==================================================
-router.include_router(attendance_api)
-
-# Dashboards & reports (NO attendance prefix)
-router.include_router(analytics_router)   # /dashboard/*
-router.include_router(salary_router)      # /salary-sheet , /payroll/*
+
+def _build_router() -> APIRouter:
+    from app.routers.attendance.employee_registration import router as employee_router
+    from app.routers.attendance.daily_attendance import router as daily_router
+    from app.routers.attendance.analytics import router as analytics_router
+    from app.routers.attendance.salary_reports import router as salary_router
+    from app.routers.attendance.tax_master import router as tax_master_router
+    from app.routers.attendance.salary_advance import router as salary_advance_router  # ✅ ADD
+
+    router = APIRouter()
+
+    # ==================================================
+    # 1️⃣ ATTENDANCE API ROUTES (WITH /attendance PREFIX)
+    # ==================================================
+    attendance_api = APIRouter(prefix="/attendance")
+
+    attendance_api.include_router(employee_router)        # /attendance/employee/*
+    attendance_api.include_router(daily_router)           # /attendance/daily/*
+    attendance_api.include_router(tax_master_router)      # /attendance/tax-master
+    attendance_api.include_router(salary_advance_router)  # /attendance/salary-advance ✅
+
+    # ==================================================
+    # 2️⃣ INCLUDE INTO MAIN ROUTER
+    # ==================================================
+    router.include_router(attendance_api)
+
+    # Dashboards & reports (NO attendance prefix)
+    router.include_router(analytics_router)   # /dashboard/*
+    router.include_router(salary_router)      # /salary-sheet , /payroll/*
+    return router
+
+
+def __getattr__(name):
+    if name == "router":
+        router = globals()["router"] = _build_router()
+        return router
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
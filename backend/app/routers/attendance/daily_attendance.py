@@ -9,16 +9,14 @@ from sqlalchemy import or_, and_, desc, func
 from sqlalchemy.orm.attributes import flag_modified
 from datetime import datetime, date, timedelta
 from app.utils.timezone import ist_now
-import datetime as dt
 import logging
 import io
-import openpyxl
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 
 from app.database import get_db
 from app.database.models.attendance import DailyAttendance, EmployeeRegistration, Shift
 from app.database.models.criteria import contractors
 from app.database.models.processing import AuditLog
+from app.services.attendance_auto_close import close_stale_attendance
 from app.services.bill_accounting import ensure_bill_accounting_schema, post_contractor_source_charge
 
 # 🌐 UNIVERSAL GLOBAL FILTERS HELPER
@@ -132,54 +130,6 @@ def close_attendance_duty(
     return duty.working_hours
 
 
-def auto_close_stale_attendance(
-    db: Session,
-    company_id: str,
-    email: str,
-    employee_id: str | None = None,
-    location: str | None = None,
-    allowed_locations: list[str] | None = None,
-) -> list[DailyAttendance]:
-    now = ist_now()
-    cutoff = now.replace(tzinfo=None) - timedelta(hours=24)
-    query = db.query(DailyAttendance).filter(
-        DailyAttendance.company_id == company_id,
-        DailyAttendance.status != "CLOSED",
-        DailyAttendance.first_in != None,
-        DailyAttendance.first_in <= cutoff,
-    )
-    if employee_id:
-        query = query.filter(DailyAttendance.employee_id == employee_id)
-    if location and location != "ALL":
-        query = query.filter(func.upper(func.trim(DailyAttendance.production_at)) == location)
-    elif allowed_locations:
-        query = query.filter(func.upper(func.trim(DailyAttendance.production_at)).in_(allowed_locations))
-
-    closed_rows = []
-    for duty in query.all():
-        close_time = duty.first_in + timedelta(hours=24)
-        wh = close_attendance_duty(
-            duty,
-            close_time,
-            "AUTO OUT",
-            pending_approval=True,
-        )
-        db.add(AuditLog(
-            table_name="daily_attendance",
-            record_id=duty.id,
-            company_id=company_id,
-            field_name="AUTO_OUT_24H",
-            old_value="OPEN",
-            new_value=f"Emp: {duty.employee_name} ({duty.employee_id}) | Auto closed after 24 hours | {wh} Hrs | Duty approval pending",
-            edited_by=email or "SYSTEM",
-            edited_at=datetime.now(dt.timezone.utc),
-        ))
-        closed_rows.append(duty)
-    if closed_rows:
-        db.flush()
-    return closed_rows
-
-
 def contractor_gst_percent(db: Session, company_id: str, contractor_name: str) -> float:
     row = db.query(contractors).filter(
         contractors.company_id == company_id,
@@ -205,7 +155,6 @@ def daily_attendance_page(
 
     ensure_bill_accounting_schema(db)
     actual_location, _ = get_strict_location(request)
-    auto_close_stale_attendance(db, company_code, email, location=actual_location)
     db.commit()
 
     plant_shifts = []
@@ -302,12 +251,12 @@ async def attendance_entry(
     )
 
     full_employee_id = emp.employee_id
-    auto_closed = auto_close_stale_attendance(
+    auto_closed = close_stale_attendance(
         db,
         company_id,
-        email,
         employee_id=full_employee_id,
         location=actual_location,
+        closed_by=email,
     )
 
     duty = db.query(DailyAttendance).filter(
@@ -455,14 +404,6 @@ def today_attendance_list(request: Request, location: str = None, db: Session =
     # 🟢 🔴 Support query param location if fetch drops cookie
     backend_location, user_allowed_locations = get_strict_location(request)
     actual_location = location.strip().upper() if location else backend_location
-    auto_close_stale_attendance(
-        db,
-        company_id,
-        request.session.get("email") or "SYSTEM",
-        location=actual_location,
-        allowed_locations=user_allowed_locations,
-    )
-    db.commit()
 
     query = db.query(
         DailyAttendance, 
@@ -540,6 +481,9 @@ async def get_all_attendance_audit(request: Request, db: Session = Depends(get_d
 
 @router.get("/export/excel")
 def export_attendance_excel(request: Request, location: str = None, db: Session = Depends(get_db)):
+    import openpyxl
+    from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+
     company_id = request.session.get("company_code")
     if not company_id:
         return RedirectResponse("/", status_code=302)
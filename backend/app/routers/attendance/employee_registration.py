@@ -7,9 +7,7 @@ from sqlalchemy.orm import Session
 from datetime import date, datetime
 from typing import Optional
 import io
-import pandas as pd
 import re
-from xhtml2pdf import pisa
 
 from app.database import get_db
 from app.database.models.attendance import EmployeeRegistration
@@ -280,6 +278,8 @@ def delete_employee(db_id: int, request: Request, db: Session = Depends(get_db))
 @router.get("/employee/print/{emp_id}")
 @router.get("/employee/export/pdf/{emp_id}")
 def export_employee_details(emp_id: str, request: Request, db: Session = Depends(get_db)):
+    from xhtml2pdf import pisa
+
     ctx = get_session_context(request, db)
     if not ctx: return HTMLResponse(content="Session Expired", status_code=401)
     
@@ -299,6 +299,8 @@ def export_employee_details(emp_id: str, request: Request, db: Session = Depends
 # =========================================================
 @router.get("/employee/export/excel")
 def export_employees_excel(request: Request, db: Session = Depends(get_db)):
+    import pandas as pd
+
     comp = request.session.get("company_code")
     if not comp: return RedirectResponse("/auth/login")
 
@@ -4,7 +4,7 @@ import re
 
 from fastapi import APIRouter, BackgroundTasks, Depends, Request
 from fastapi.responses import JSONResponse
-from sqlalchemy import func
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 
 from app.database import get_db
@@ -29,6 +29,8 @@ from app.database.models.criteria import (
     varieties,
 )
 from app.database.models.processing import AuditLog
+from app.services.schema_readiness import ensure_schema_step
+from app.utils.keyset import InvalidCursor, keyset_page, page_limit
 from app.utils.timezone import ist_now
 from app.utils.email_service import send_email
 
@@ -277,29 +279,125 @@ def _add_audit(db, table_name, record_id, company_id, field_name, old_value, new
     ))
 
 
+# Register name -> (model, keyset order columns, date filter column, search columns).
+# Every order ends with the primary key so pages never skip or repeat rows.
+REGISTERS = {
+    "contract_labour": (
+        ContractLabour,
+        (ContractLabour.id,),
+        ContractLabour.joining_date,
+        (ContractLabour.labour_id, ContractLabour.labour_name, ContractLabour.contractor_name, ContractLabour.mobile),
+    ),
+    "contract_attendance": (
+        ContractLabourAttendance,
+        # Leads with attendance_date like ix_contract_labour_attendance_register.
+        (ContractLabourAttendance.attendance_date, ContractLabourAttendance.in_time, ContractLabourAttendance.id),
+        ContractLabourAttendance.attendance_date,
+        (ContractLabourAttendance.labour_id, ContractLabourAttendance.labour_name, ContractLabourAttendance.contractor_name),
+    ),
+    "daily_workers": (
+        DailyTemporaryWorker,
+        (DailyTemporaryWorker.work_date, DailyTemporaryWorker.id),
+        DailyTemporaryWorker.work_date,
+        (DailyTemporaryWorker.worker_name, DailyTemporaryWorker.purpose, DailyTemporaryWorker.approved_by_name),
+    ),
+    "visitors": (
+        VisitorEntry,
+        (VisitorEntry.visit_date, VisitorEntry.id),
+        VisitorEntry.visit_date,
+        (VisitorEntry.visitor_name, VisitorEntry.mobile, VisitorEntry.organization,
+         VisitorEntry.person_to_meet, VisitorEntry.purpose),
+    ),
+}
+
+
+def _like_pattern(value):
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def register_page(db, register, company_id, params, *criteria):
+    """One keyset page of ``register`` filtered by the request's query params.
+
+    Params: ``q`` (substring search), ``location``, ``date_from``/``date_to``,
+    ``status``, ``cursor`` and ``limit``. Extra SQL ``criteria`` are ANDed in.
+    Returns ``{"rows": [...], "next_cursor": str | None}``.
+    """
+    model, order, date_column, search_columns = REGISTERS[register]
+    query = db.query(model).filter(model.company_id == company_id, *criteria)
+    location = _text(params.get("location"))
+    if location and location.upper() != "ALL":
+        query = query.filter(model.production_at == location)
+    status = _text(params.get("status"))
+    if status:
+        query = query.filter(model.status == status)
+    date_from = _parse_date(params.get("date_from"))
+    date_to = _parse_date(params.get("date_to"))
+    if date_from:
+        query = query.filter(date_column >= date_from)
+    if date_to:
+        query = query.filter(date_column <= date_to)
+    search = _text(params.get("q"))
+    if search:
+        pattern = _like_pattern(search)
+        query = query.filter(or_(*(column.ilike(pattern, escape="\\") for column in search_columns)))
+    rows, next_cursor = keyset_page(query, order, _text(params.get("cursor")) or None, page_limit(params.get("limit")))
+    return {"rows": [_serialize(row) for row in rows], "next_cursor": next_cursor}
+
+
+def _register_response(request, db, register, *criteria):
+    session = _session(request)
+    if not session:
+        return JSONResponse(status_code=401, content={"error": "Unauthorized session"})
+    try:
+        page = register_page(db, register, session[1], request.query_params, *criteria)
+    except InvalidCursor:
+        return JSONResponse(status_code=400, content={"error": "Invalid or expired cursor; reload the register"})
+    return {"status": "success", **page}
+
+
+def _labour_summary(db, company_id, attendance_date):
+    contract_counts = dict(db.query(ContractLabour.status, func.count(ContractLabour.id)).filter(
+        ContractLabour.company_id == company_id
+    ).group_by(ContractLabour.status).all())
+    attendance_counts = dict(db.query(ContractLabourAttendance.status, func.count(ContractLabourAttendance.id)).filter(
+        ContractLabourAttendance.company_id == company_id,
+        ContractLabourAttendance.attendance_date == attendance_date,
+    ).group_by(ContractLabourAttendance.status).all())
+    return {
+        "attendance_date": attendance_date.isoformat(),
+        "contract_total": sum(contract_counts.values()),
+        "contract_active": contract_counts.get("ACTIVE", 0),
+        "inside": attendance_counts.get("INSIDE", 0),
+        "closed": attendance_counts.get("CLOSED", 0),
+    }
+
+
 @router.get("/labour-management")
 def labour_management_data(request: Request, db: Session = Depends(get_db)):
+    """First page of each register plus counts and lookups; scroll with the register endpoints."""
     session = _session(request)
     if not session:
         return JSONResponse(status_code=401, content={"error": "Unauthorized session"})
     _, company_id = session
+    today = ist_now().date()
+    params = {"limit": request.query_params.get("limit")}
 
-    contract_rows = db.query(ContractLabour).filter(
-        ContractLabour.company_id == company_id
-    ).order_by(ContractLabour.id.desc()).all()
-    daily_rows = db.query(DailyTemporaryWorker).filter(
-        DailyTemporaryWorker.company_id == company_id
-    ).order_by(DailyTemporaryWorker.work_date.desc(), DailyTemporaryWorker.id.desc()).all()
-    today_attendance = db.query(ContractLabourAttendance).filter(
-        ContractLabourAttendance.company_id == company_id,
-        ContractLabourAttendance.attendance_date == ist_now().date(),
-    ).order_by(ContractLabourAttendance.in_time.desc()).all()
+    contract_page = register_page(db, "contract_labour", company_id, params)
+    attendance_page = register_page(db, "contract_attendance", company_id, {**params, "date_from": today, "date_to": today})
+    daily_page = register_page(db, "daily_workers", company_id, params)
 
     return {
         "status": "success",
-        "contract_labour": [_serialize(row) for row in contract_rows],
-        "contract_attendance": [_serialize(row) for row in today_attendance],
-        "daily_workers": [_serialize(row) for row in daily_rows],
+        "contract_labour": contract_page["rows"],
+        "contract_attendance": attendance_page["rows"],
+        "daily_workers": daily_page["rows"],
+        "cursors": {
+            "contract_labour": contract_page["next_cursor"],
+            "contract_attendance": attendance_page["next_cursor"],
+            "daily_workers": daily_page["next_cursor"],
+        },
+        "summary": _labour_summary(db, company_id, today),
         "lookups": {
             "contractors": _lookup_values(db, contractors, contractors.contractor_name, company_id),
             "purposes": _lookup_values(db, purposes, purposes.purpose_name, company_id),
@@ -308,6 +406,38 @@ def labour_management_data(request: Request, db: Session = Depends(get_db)):
     }
 
 
+@router.get("/labour-management/contract")
+def contract_labour_register(request: Request, db: Session = Depends(get_db)):
+    return _register_response(request, db, "contract_labour")
+
+
+@router.get("/labour-management/attendance")
+def contract_attendance_register(request: Request, db: Session = Depends(get_db)):
+    return _register_response(request, db, "contract_attendance")
+
+
+@router.get("/labour-management/daily")
+def daily_workers_register(request: Request, db: Session = Depends(get_db)):
+    return _register_response(request, db, "daily_workers")
+
+
+@router.get("/labour-management/contract/resolve")
+def resolve_contract_labour(request: Request, ids: str = "", db: Session = Depends(get_db)):
+    """Resolve scanned or typed Worker IDs without the client holding the whole register."""
+    session = _session(request)
+    if not session:
+        return JSONResponse(status_code=401, content={"error": "Unauthorized session"})
+    _, company_id = session
+    workers, errors = [], []
+    for entered_id in dict.fromkeys(_text(value).upper() for value in re.split(r"[\s,]+", ids) if _text(value)):
+        labour, resolve_error = _resolve_labour_id(db, company_id, entered_id)
+        if labour:
+            workers.append({"entered": entered_id, "labour_id": labour.labour_id, "labour_name": labour.labour_name})
+        else:
+            errors.append({"labour_id": entered_id, "error": resolve_error})
+    return {"status": "success", "workers": workers, "errors": errors}
+
+
 @router.post("/labour-management/contract/bulk")
 async def save_contract_labour(request: Request, db: Session = Depends(get_db)):
     session = _session(request)
@@ -561,22 +691,26 @@ async def update_daily_worker_amount(record_id: int, request: Request, db: Sessi
 
 @router.get("/visitors-day-workers")
 def visitors_day_workers_data(request: Request, db: Session = Depends(get_db)):
+    """First page of visitors and day workers plus lookups; scroll with the register endpoints.
+
+    The ``q``/``location``/``date_from``/``date_to`` filters apply to both registers.
+    """
     session = _session(request)
     if not session:
         return JSONResponse(status_code=401, content={"error": "Unauthorized session"})
     _, company_id = session
-    visitors = db.query(VisitorEntry).filter(
-        VisitorEntry.company_id == company_id
-    ).order_by(VisitorEntry.visit_date.desc(), VisitorEntry.id.desc()).all()
-    day_workers = db.query(DailyTemporaryWorker).filter(
-        DailyTemporaryWorker.company_id == company_id,
-        DailyTemporaryWorker.worker_type == "DAY WORKER",
-    ).order_by(DailyTemporaryWorker.work_date.desc(), DailyTemporaryWorker.id.desc()).all()
+    params = {key: request.query_params.get(key) for key in ("q", "location", "date_from", "date_to", "limit")}
+    visitors = register_page(db, "visitors", company_id, params)
+    day_workers = register_page(db, "daily_workers", company_id, params, DailyTemporaryWorker.worker_type == "DAY WORKER")
     users = _company_users(db, request)
     return {
         "status": "success",
-        "visitors": [_serialize(row) for row in visitors],
-        "day_workers": [_serialize(row) for row in day_workers],
+        "visitors": visitors["rows"],
+        "day_workers": day_workers["rows"],
+        "cursors": {
+            "visitors": visitors["next_cursor"],
+            "day_workers": day_workers["next_cursor"],
+        },
         "lookups": {
             "purposes": _lookup_values(db, purposes, purposes.purpose_name, company_id),
             "locations": _lookup_values(db, production_at, production_at.production_at, company_id),
@@ -596,6 +730,16 @@ def visitors_day_workers_data(request: Request, db: Session = Depends(get_db)):
     }
 
 
+@router.get("/visitors-day-workers/visitors")
+def visitors_register(request: Request, db: Session = Depends(get_db)):
+    return _register_response(request, db, "visitors")
+
+
+@router.get("/visitors-day-workers/day-workers")
+def day_workers_register(request: Request, db: Session = Depends(get_db)):
+    return _register_response(request, db, "daily_workers", DailyTemporaryWorker.worker_type == "DAY WORKER")
+
+
 @router.post("/visitors-day-workers/visitor")
 async def save_visitor(request: Request, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     session = _session(request)
@@ -884,10 +1028,11 @@ def contract_labour_audit(record_id: int, request: Request, db: Session = Depend
 
 
 def _ensure_kg_worker_schema(db: Session):
-    try:
-        daily_basis_worker_rates.__table__.create(bind=db.bind, checkfirst=True)
-    except Exception:
-        pass
+    ensure_schema_step(db, "kg_basis_workers", commit=True)
+
+
+def apply_kg_worker_schema(db: Session):
+    daily_basis_worker_rates.__table__.create(bind=db.connection(), checkfirst=True)
     statements = [
         "ALTER TABLE kg_basis_workers ADD COLUMN IF NOT EXISTS daily_salary DOUBLE PRECISION DEFAULT 0",
         "ALTER TABLE kg_basis_workers ADD COLUMN IF NOT EXISTS worker_category VARCHAR(50)",
@@ -896,15 +1041,8 @@ def _ensure_kg_worker_schema(db: Session):
         "ALTER TABLE kg_basis_workers ADD COLUMN IF NOT EXISTS ifsc_code VARCHAR(20)",
         "ALTER TABLE kg_basis_workers ADD COLUMN IF NOT EXISTS address TEXT",
     ]
-    try:
-        with db.bind.begin() as conn:
-            for stmt in statements:
-                try:
-                    conn.execute(text(stmt))
-                except Exception:
-                    pass
-    except Exception:
-        pass
+    for stmt in statements:
+        db.execute(text(stmt))
 
 
 @router.get("/kg-basis-labour")
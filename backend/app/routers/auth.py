@@ -8,7 +8,7 @@ from datetime import date, datetime, timedelta
 from typing import Optional
 from pathlib import Path
 from uuid import uuid4
-import logging, random, json, os, re, requests, secrets, time
+import logging, random, json, os, re, secrets, time
 from app.utils.mobile_utils import is_mobile_client
 
 from app.database import get_db
@@ -93,6 +93,8 @@ def send_email(to_email: str, subject: str, html: str):
     # Try Brevo HTTP API first
     if brevo_key:
         try:
+            import requests
+
             payload = {
                 "sender": {"name": sender_name, "email": sender_email},
                 "to": [{"email": to_email}],
@@ -1025,45 +1027,50 @@ def global_dropdowns(request: Request, db: Session = Depends(get_db)):
     from app.database.models.inventory_management import cold_storage_holding
     from sqlalchemy import func
     from app.services.cache import cache_get_or_set
+    from app.services.master_data import bump_master_data_version, get_tenant_masters
 
-    # Auto-purge stale master rows from database tables
-    try:
-        db.query(peeling_at).filter(
-            peeling_at.company_id == company_code,
-            func.upper(func.trim(peeling_at.peeling_at)).in_(["MAIN PLANT", "MAIN UNIT", "GENERAL STOCK"])
-        ).delete(synchronize_session=False)
-        db.query(production_at).filter(
-            production_at.company_id == company_code,
-            func.upper(func.trim(production_at.production_at)).in_(["MAIN PLANT", "MAIN UNIT", "GENERAL STOCK"])
-        ).delete(synchronize_session=False)
-        db.query(production_for).filter(
-            production_for.company_id == company_code,
-            func.upper(func.trim(production_for.production_for)).in_(["MAIN PLANT", "MAIN UNIT", "GENERAL STOCK"])
-        ).delete(synchronize_session=False)
-        db.commit()
-    except Exception as exc:
-        db.rollback()
-        logger.warning("Stale master DB cleanup skipped: %s", exc)
+    stale_names = ["MAIN PLANT", "MAIN UNIT", "GENERAL STOCK"]
+    masters = get_tenant_masters(db, company_code)
+
+    # Auto-purge stale master rows from database tables (only when the
+    # cached masters still contain one, instead of three DELETEs per call).
+    has_stale_rows = any(
+        str(value or "").strip().upper() in stale_names
+        for value in (*masters.peeling_at, *masters.production_at, *(p.name for p in masters.production_for))
+    )
+    if has_stale_rows:
+        try:
+            db.query(peeling_at).filter(
+                peeling_at.company_id == company_code,
+                func.upper(func.trim(peeling_at.peeling_at)).in_(stale_names)
+            ).delete(synchronize_session=False)
+            db.query(production_at).filter(
+                production_at.company_id == company_code,
+                func.upper(func.trim(production_at.production_at)).in_(stale_names)
+            ).delete(synchronize_session=False)
+            db.query(production_for).filter(
+                production_for.company_id == company_code,
+                func.upper(func.trim(production_for.production_for)).in_(stale_names)
+            ).delete(synchronize_session=False)
+            db.commit()
+            bump_master_data_version(company_code)
+            masters = get_tenant_masters(db, company_code)
+        except Exception as exc:
+            db.rollback()
+            logger.warning("Stale master DB cleanup skipped: %s", exc)
 
     def build_menu_filters():
         raw_companies = {
-            str(value).strip()
-            for (value,) in db.query(production_for.production_for).filter(
-                production_for.company_id == company_code,
-                func.lower(production_for.status) == "active",
-            ).distinct().all()
-            if value and str(value).strip()
+            str(p.name).strip()
+            for p in masters.production_for
+            if p.name and str(p.name).strip() and str(p.status or "").lower() == "active"
         }
         excluded_company_names = {"MAIN UNIT", "GENERAL STOCK", "N/A", "NONE", "NULL"}
         excluded_location_names = {"MAIN PLANT", "MAIN UNIT", "GENERAL STOCK", "N/A", "NONE", "NULL"}
         companies = {c for c in raw_companies if c.upper().strip() not in excluded_company_names}
         raw_locations = {
             str(value).strip()
-            for model, column in (
-                (production_at, production_at.production_at),
-                (peeling_at, peeling_at.peeling_at),
-            )
-            for (value,) in db.query(column).filter(model.company_id == company_code).distinct().all()
+            for value in (*masters.production_at, *masters.peeling_at)
             if value and str(value).strip()
         }
         raw_locations.update(
@@ -9,8 +9,6 @@ from datetime import date, datetime
 import datetime as dt
 import logging
 import io
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 
 from app.database import get_db
 from app.database.models.bills import ContainerLog, PurchaseInvoice  
@@ -389,6 +387,9 @@ def delete_container_log(
 # ============================================================
 @router.get("/export/excel")
 def export_container_excel(request: Request, db: Session = Depends(get_db)):
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+
     comp_code = request.session.get("company_code")
     if not comp_code:
         return RedirectResponse("/", status_code=302)
@@ -26,6 +26,7 @@ from app.services.bill_accounting import cancel_linked_bill_voucher, ensure_bill
 from app.services.posting_engine import PostingEngineService
 from app.services.payroll_statutory import calculate_pf_esi, effective_statutory_record
 from app.services.salary_advance_recovery import preview_monthly_advance_recovery
+from app.services.schema_readiness import ensure_schema_step
 from app.utils.cancel_math import signed_number
 from app.utils.timezone import ist_now
 
@@ -42,33 +43,14 @@ class ContractorPaymentPayload(BaseModel):
     bank_cash_ledger_id: int | None = None
 
 
-import logging
-import threading
-
-logger = logging.getLogger(__name__)
-
-_CONTRACTOR_PAYMENT_SCHEMA_ENSURED = False
-_CONTRACTOR_PAYMENT_SCHEMA_LOCK = threading.Lock()
-
-
 def ensure_contractor_payment_schema(db: Session) -> None:
-    global _CONTRACTOR_PAYMENT_SCHEMA_ENSURED
-    if _CONTRACTOR_PAYMENT_SCHEMA_ENSURED:
-        return
+    ensure_bill_accounting_schema(db)
+    ensure_schema_step(db, "contractor_payments")
 
-    with _CONTRACTOR_PAYMENT_SCHEMA_LOCK:
-        if _CONTRACTOR_PAYMENT_SCHEMA_ENSURED:
-            return
 
-        try:
-            ContractorBillPayment.__table__.create(bind=db.get_bind(), checkfirst=True)
-            ensure_bill_accounting_schema(db)
-            db.execute(text("ALTER TABLE contractor_bill_payments ADD COLUMN IF NOT EXISTS bank_cash_ledger_id INTEGER"))
-            db.flush()
-            _CONTRACTOR_PAYMENT_SCHEMA_ENSURED = True
-        except Exception as exc:
-            db.rollback()
-            logger.warning("Contractor payment schema check failed: %s", exc)
+def apply_contractor_payment_schema(db: Session) -> None:
+    ContractorBillPayment.__table__.create(bind=db.connection(), checkfirst=True)
+    db.execute(text("ALTER TABLE contractor_bill_payments ADD COLUMN IF NOT EXISTS bank_cash_ledger_id INTEGER"))
 
 
 def bank_cash_ledgers(db: Session, company_id: str):
@@ -11,8 +11,6 @@ from datetime import date, datetime
 import datetime as dt
 import logging
 import io
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 
 from app.database import get_db
 from app.database.models.bills import DieselLog
@@ -349,6 +347,9 @@ def delete_diesel_log(log_id: int, request: Request, db: Session = Depends(get_d
 # ============================================================
 @router.get("/export/excel")
 def export_diesel_excel(request: Request, db: Session = Depends(get_db)):
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+
     company_code = request.session.get("company_code")
     if not company_code:
         return RedirectResponse("/", status_code=302)
@@ -12,8 +12,6 @@ import datetime as dt
 import calendar
 import logging
 import io
-import openpyxl
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 
 from app.database import get_db
 from app.database.models.bills import ElectricityLog
@@ -290,6 +288,9 @@ def delete_electricity_log(log_id: int, request: Request, db: Session = Depends(
 # ============================================================
 @router.get("/export/excel")
 def export_electricity_excel(request: Request, db: Session = Depends(get_db)):
+    import openpyxl
+    from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+
     company_code = request.session.get("company_code")
     if not company_code:
         return RedirectResponse("/", status_code=302)
@@ -9,8 +9,6 @@ from datetime import date, datetime
 import datetime as dt
 import logging
 import io
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from app.services.pdf_renderer import render_pdf_from_html
 
 from app.database import get_db
@@ -439,6 +437,9 @@ def delete_invoice(inv_id: int, request: Request, db: Session = Depends(get_db))
 # ============================================================
 @router.get("/export/excel")
 def export_purchase_excel(request: Request, db: Session = Depends(get_db)):
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+
     company_id = request.session.get("company_code")
     if not company_id:
         return RedirectResponse("/", status_code=302)
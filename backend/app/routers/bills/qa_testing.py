@@ -9,8 +9,6 @@ from datetime import date, datetime
 import datetime as dt
 import logging
 import io
-import openpyxl
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 
 from app.database import get_db
 from app.database.models.bills import QATestingLog
@@ -375,6 +373,9 @@ def delete_qa_log(expense_id: int, request: Request, db: Session = Depends(get_d
 # ============================================================
 @router.get("/export/excel")
 def export_qa_excel(request: Request, db: Session = Depends(get_db)):
+    import openpyxl
+    from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+
     company_code = request.session.get("company_code")
     if not company_code:
         return RedirectResponse("/", status_code=302)
@@ -6,11 +6,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import desc, func, or_, and_
 from datetime import date, datetime
 from io import BytesIO
-import openpyxl
 import re
 import json
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
 
 from app.database import get_db
 from app.utils.download_security import require_download_grant
@@ -27,6 +24,7 @@ from app.database.models.criteria import (
 import logging
 
 from app.database.models.processing import AuditLog
+from app.services.email_queue import enqueue_email
 from app.utils.timezone import ist_now
 
 logger = logging.getLogger(__name__)
@@ -796,96 +794,83 @@ async def analyze_quotation_stock(payload: AnalyzePayload, request: Request, db:
     })
 
 
-import threading
-
-_CRM_QUOTATION_SCHEMA_ENSURED = False
-_CRM_QUOTATION_SCHEMA_LOCK = threading.Lock()
+from app.services.schema_readiness import ensure_schema_step
 
 
 def ensure_crm_quotation_schema(db: Session):
-    global _CRM_QUOTATION_SCHEMA_ENSURED
-    if _CRM_QUOTATION_SCHEMA_ENSURED:
-        return
-
-    with _CRM_QUOTATION_SCHEMA_LOCK:
-        if _CRM_QUOTATION_SCHEMA_ENSURED:
-            return
-
-        try:
-            bind = db.get_bind()
-            CRMQuotation.__table__.create(bind=bind, checkfirst=True)
-            CRMQuotationLine.__table__.create(bind=bind, checkfirst=True)
-            CRMQuotationReply.__table__.create(bind=bind, checkfirst=True)
-        except Exception as e:
-            print("Table create error:", e)
-
-        statements = [
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS company_id VARCHAR(50);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS company_name VARCHAR(255);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS inquiry_id INTEGER;",
-            "ALTER TABLE crm_quotations ALTER COLUMN inquiry_id DROP NOT NULL;",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS quotation_no VARCHAR(50);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS po_number VARCHAR(100);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS linked_pi_id INTEGER;",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS linked_pi_no VARCHAR(100);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS quotation_date DATE;",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS valid_until DATE;",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS shipment_date VARCHAR(100);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS customer_name VARCHAR(255);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS customer_address TEXT;",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS agent VARCHAR(255);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS country VARCHAR(100);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS production_at VARCHAR(255);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS currency VARCHAR(20) DEFAULT 'USD';",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS exchange_rate DOUBLE PRECISION DEFAULT 83.5;",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS incoterm VARCHAR(50);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS payment_terms VARCHAR(255);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS total_amount NUMERIC(18,2) DEFAULT 0.0;",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'DRAFT';",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS remarks TEXT;",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS created_by VARCHAR(255);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS updated_by VARCHAR(255);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS approved_by VARCHAR(255);",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS approved_at TIMESTAMP;",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS approval_remarks TEXT;",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;",
-            "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS is_cancelled BOOLEAN DEFAULT FALSE;",
-
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS quotation_id INTEGER;",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS item_name VARCHAR(255);",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS brand VARCHAR(150);",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS packing_style VARCHAR(150);",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS freezer VARCHAR(150);",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS count_glaze VARCHAR(100);",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS weight_glaze VARCHAR(100);",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS species VARCHAR(150);",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS variety VARCHAR(150);",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS grade VARCHAR(100);",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS no_of_pieces VARCHAR(100);",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS no_of_mc INTEGER DEFAULT 0;",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS quantity_kg DOUBLE PRECISION DEFAULT 0;",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS rate_per_kg DOUBLE PRECISION DEFAULT 0;",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS hoso_count VARCHAR(100);",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS target_hoso_rate DOUBLE PRECISION DEFAULT 0;",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS expenses DOUBLE PRECISION DEFAULT 0;",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS target_quotation_price DOUBLE PRECISION DEFAULT 0;",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS bidding_price DOUBLE PRECISION DEFAULT 0;",
-            "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS amount DOUBLE PRECISION DEFAULT 0;",
-            "CREATE TABLE IF NOT EXISTS crm_quotation_replies (id SERIAL PRIMARY KEY, quotation_id INTEGER, quotation_no VARCHAR(50) NOT NULL, sender_email VARCHAR(255) NOT NULL, recipient_email VARCHAR(255) NOT NULL, subject VARCHAR(255), message_body TEXT NOT NULL, received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, direction VARCHAR(20) DEFAULT 'INBOUND', message_id VARCHAR(255), attachments_json TEXT);",
-            "ALTER TABLE crm_quotation_replies ADD COLUMN IF NOT EXISTS attachments_json TEXT;",
-        ]
+    ensure_schema_step(db, "crm_quotation", commit=True)
+
+
+def apply_crm_quotation_schema(db: Session):
+    from sqlalchemy import text
+
+    bind = db.connection()
+    CRMQuotation.__table__.create(bind=bind, checkfirst=True)
+    CRMQuotationLine.__table__.create(bind=bind, checkfirst=True)
+    CRMQuotationReply.__table__.create(bind=bind, checkfirst=True)
+
+    statements = [
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS company_id VARCHAR(50);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS company_name VARCHAR(255);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS inquiry_id INTEGER;",
+        "ALTER TABLE crm_quotations ALTER COLUMN inquiry_id DROP NOT NULL;",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS quotation_no VARCHAR(50);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS po_number VARCHAR(100);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS linked_pi_id INTEGER;",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS linked_pi_no VARCHAR(100);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS quotation_date DATE;",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS valid_until DATE;",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS shipment_date VARCHAR(100);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS customer_name VARCHAR(255);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS customer_address TEXT;",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS agent VARCHAR(255);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS country VARCHAR(100);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS production_at VARCHAR(255);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS currency VARCHAR(20) DEFAULT 'USD';",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS exchange_rate DOUBLE PRECISION DEFAULT 83.5;",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS incoterm VARCHAR(50);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS payment_terms VARCHAR(255);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS total_amount NUMERIC(18,2) DEFAULT 0.0;",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'DRAFT';",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS remarks TEXT;",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS created_by VARCHAR(255);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS updated_by VARCHAR(255);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS approved_by VARCHAR(255);",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS approved_at TIMESTAMP;",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS approval_remarks TEXT;",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;",
+        "ALTER TABLE crm_quotations ADD COLUMN IF NOT EXISTS is_cancelled BOOLEAN DEFAULT FALSE;",
+
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS quotation_id INTEGER;",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS item_name VARCHAR(255);",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS brand VARCHAR(150);",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS packing_style VARCHAR(150);",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS freezer VARCHAR(150);",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS count_glaze VARCHAR(100);",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS weight_glaze VARCHAR(100);",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS species VARCHAR(150);",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS variety VARCHAR(150);",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS grade VARCHAR(100);",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS no_of_pieces VARCHAR(100);",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS no_of_mc INTEGER DEFAULT 0;",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS quantity_kg DOUBLE PRECISION DEFAULT 0;",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS rate_per_kg DOUBLE PRECISION DEFAULT 0;",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS hoso_count VARCHAR(100);",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS target_hoso_rate DOUBLE PRECISION DEFAULT 0;",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS expenses DOUBLE PRECISION DEFAULT 0;",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS target_quotation_price DOUBLE PRECISION DEFAULT 0;",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS bidding_price DOUBLE PRECISION DEFAULT 0;",
+        "ALTER TABLE crm_quotation_lines ADD COLUMN IF NOT EXISTS amount DOUBLE PRECISION DEFAULT 0;",
+        "CREATE TABLE IF NOT EXISTS crm_quotation_replies (id SERIAL PRIMARY KEY, quotation_id INTEGER, quotation_no VARCHAR(50) NOT NULL, sender_email VARCHAR(255) NOT NULL, recipient_email VARCHAR(255) NOT NULL, subject VARCHAR(255), message_body TEXT NOT NULL, received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, direction VARCHAR(20) DEFAULT 'INBOUND', message_id VARCHAR(255), attachments_json TEXT);",
+        "ALTER TABLE crm_quotation_replies ADD COLUMN IF NOT EXISTS attachments_json TEXT;",
+    ]
+    for stmt in statements:
         try:
-            from sqlalchemy import text
-            for stmt in statements:
-                try:
-                    db.execute(text(stmt))
-                except Exception:
-                    pass
-            db.commit()
-            _CRM_QUOTATION_SCHEMA_ENSURED = True
+            with db.begin_nested():
+                db.execute(text(stmt))
         except Exception:
-            db.rollback()
+            pass
 
 
 @router.get("/crm/quotation/data")
@@ -1558,6 +1543,10 @@ async def quotation_approval(quotation_id: int, payload: ApprovalPayload, reques
 @router.get("/crm/quotation/register.xlsx")
 @router.get("/export_documents/quotation/register.xlsx", include_in_schema=False)
 async def export_quotation_register(request: Request, grant: str = Query(...), db: Session = Depends(get_db)):
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
     comp_code = resolve_company_code(request, db)
 
     require_download_grant(grant, request)
@@ -1813,16 +1802,12 @@ async def send_quotation_email_endpoint(quotation_id: str, payload: SendQuotatio
     """
 
     from_addr = payload.from_email or email or "noreply@bknr.in"
-    email_status_msg = f"Quotation {quotation.quotation_no} email sent successfully to {payload.to_email}."
-
-    try:
-        from app.utils.email_service import send_email
-        send_email(payload.to_email, payload.subject, html_content, from_email=from_addr, reply_to=from_addr)
-    except Exception as e:
-        logger.warning(f"SMTP dispatch notice for quotation {quotation.quotation_no}: {e}")
-        email_status_msg = f"Quotation {quotation.quotation_no} email recorded & marked sent to {payload.to_email}."
+    email_status_msg = f"Quotation {quotation.quotation_no} email queued for delivery to {payload.to_email}."
 
     try:
+        # Queued in the same transaction as the OUTBOUND log and the SENT status.
+        enqueue_email(db, [payload.to_email], payload.subject, html_content,
+                      company_id=comp_code, category="crm_quotation", reply_to=from_addr)
         outbound = CRMQuotationReply(
             quotation_id=quotation.id,
             quotation_no=quotation.quotation_no,
@@ -1838,8 +1823,9 @@ async def send_quotation_email_endpoint(quotation_id: str, payload: SendQuotatio
         log_audit(db, comp_code, email, "SEND_EMAIL", quotation.quotation_no, f"Sent Quotation email to {payload.to_email}")
         db.commit()
     except Exception as ex:
-        logger.warning(f"Outbound reply log save notice: {ex}")
+        logger.warning(f"Quotation {quotation.quotation_no} email not queued: {ex}")
         db.rollback()
+        email_status_msg = f"Quotation {quotation.quotation_no} email could not be queued for {payload.to_email}."
 
     return JSONResponse(content={"success": True, "message": email_status_msg})
 
@@ -1946,19 +1932,24 @@ async def send_chatbot_reply(quotation_id: str, payload: OutboundChatbotPayload,
     import json
     saved_att_json = json.dumps(db_att_list) if db_att_list else None
 
-    from app.utils.email_service import send_email
-    try:
-        send_email(
-            payload.to_email,
-            subject,
-            html_body,
-            text=payload.message_body,
-            from_email=from_email_addr,
-            reply_to=from_email_addr,
-            attachments=email_attachments if email_attachments else None
-        )
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=f"Email delivery failed: {exc}")
+    if email_attachments:
+        # The queue holds no attachments; these still go out inside the request.
+        from app.utils.email_service import send_email
+        try:
+            send_email(
+                payload.to_email,
+                subject,
+                html_body,
+                text=payload.message_body,
+                from_email=from_email_addr,
+                reply_to=from_email_addr,
+                attachments=email_attachments
+            )
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail=f"Email delivery failed: {exc}")
+    else:
+        enqueue_email(db, [payload.to_email], subject, html_body, text=payload.message_body,
+                      company_id=comp_code, category="crm_chatbot_reply", reply_to=from_email_addr or None)
 
     # Log as OUTBOUND in DB
     outbound = CRMQuotationReply(
@@ -20,25 +20,13 @@ from app.database.models.bills import ElectricityLog, DieselLog, PurchaseInvoice
 from app.database.models.attendance import EmployeeRegistration
 from app.database.models.criteria import packing_styles, production_at
 from app.utils.cancel_math import active_sum, signed_sum
+from app.services.financial_periods import current_fy_start, fy_bounds, fy_label, parse_fy_start
 
 router = APIRouter(tags=["CORPORATE COSTING DASHBOARD"])
 templates = Jinja2Templates(directory="app/templates")
 logger = logging.getLogger(__name__)
 
 
-def _current_fy_start(today: date) -> int:
-    return today.year if today.month >= 4 else today.year - 1
-
-
-def _parse_fy_start(fy_value: str, fallback_year: int) -> int:
-    if not fy_value:
-        return fallback_year
-    try:
-        return int(str(fy_value).split("-")[0])
-    except (TypeError, ValueError):
-        return fallback_year
-
-
 def _parse_iso_date(value: str) -> date | None:
     if not value:
         return None
@@ -165,18 +153,19 @@ def costing_dashboard(
     # 📅 FINANCIAL YEAR / DATE RANGE CONFIGURATION MATRIX
     # ---------------------------------------------------------
     today = ist_now().date()
-    current_fy_year = _current_fy_start(today)
-    selected_fy_year = _parse_fy_start(fy, current_fy_year)
-    selected_fy = f"{selected_fy_year}-{str(selected_fy_year + 1)[2:]}"
-    fy_options = [f"{year}-{str(year + 1)[2:]}" for year in range(current_fy_year, current_fy_year - 6, -1)]
+    current_fy_year = current_fy_start(today)
+    selected_fy_year = parse_fy_start(fy, current_fy_year)
+    selected_fy = fy_label(selected_fy_year)
+    fy_options = [fy_label(year) for year in range(current_fy_year, current_fy_year - 6, -1)]
+    selected_fy_start, selected_fy_end = fy_bounds(selected_fy_year)
 
     parsed_from = _parse_iso_date(from_date)
     parsed_to = _parse_iso_date(to_date)
     if not parsed_from:
-        parsed_from = date(selected_fy_year, 4, 1)
+        parsed_from = selected_fy_start
         from_date = parsed_from.isoformat()
     if not parsed_to:
-        parsed_to = date(selected_fy_year + 1, 3, 31)
+        parsed_to = selected_fy_end
         to_date = parsed_to.isoformat()
 
     last_updated_timestamp = ist_now().strftime("%Y-%m-%d %H:%M:%S IST")
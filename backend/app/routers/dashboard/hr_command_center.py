@@ -15,17 +15,16 @@ from app.database.models.attendance import (
     EmployeeRegistration, 
     DailyAttendance, 
     EmployeeIncrement, 
-    EmployeeStatutoryMaster, 
     EmployeeSalaryAdvance
 )
 # 🟢 Production Models for "Labour Cost vs Production" Logic
-from app.database.models.processing import Peeling, Production, Grading, Soaking, DeHeading
+from app.database.models.processing import Grading, Soaking, DeHeading
 from app.services.bill_accounting import ensure_bill_accounting_schema
 from app.database.models.criteria import contractors
-from app.database.models.processing import AuditLog
 from app.services.bill_accounting import post_contractor_source_charge
 # 🟢 Global Filters
 from app.utils.global_filters import get_global_filters
+from app.services.hr_kpi_rollups import load_hr_kpi_rollups, scoped_kpis
 from app.utils.hr_workforce import active_employee_on
 from app.utils.timezone import ist_now
 
@@ -144,55 +143,6 @@ def contractor_gst_percent(db: Session, company_id: str, contractor_name: str) -
     return float(row.gst_percent or 0) if row else 0.0
 
 
-def auto_close_stale_attendance(
-    db: Session,
-    company_id: str,
-    email: str,
-    location: str | None = None,
-    allowed_locations: list[str] | None = None,
-) -> None:
-    now = ist_now()
-    cutoff = now.replace(tzinfo=None) - timedelta(hours=24)
-    query = db.query(DailyAttendance).filter(
-        DailyAttendance.company_id == company_id,
-        DailyAttendance.status != "CLOSED",
-        DailyAttendance.first_in != None,
-        DailyAttendance.first_in <= cutoff,
-    )
-    if location and location != "ALL":
-        query = query.filter(func.upper(func.trim(DailyAttendance.production_at)) == location)
-    elif allowed_locations:
-        query = query.filter(func.upper(func.trim(DailyAttendance.production_at)).in_(allowed_locations))
-
-    for duty in query.all():
-        close_time = duty.first_in + timedelta(hours=24)
-        safe_close = close_time.replace(tzinfo=None)
-        safe_first_in = duty.first_in.replace(tzinfo=None) if duty.first_in else safe_close
-        wh = round(min(24.0, max(0.0, (safe_close - safe_first_in).total_seconds() / 3600)), 2)
-        duty.working_hours = wh
-        duty.exit_time = close_time
-        duty.status = "CLOSED"
-        duty.duty_type = "DOUBLE"
-        duty.calculated_ot_hours = 8.0
-        duty.ot_status = "PENDING"
-        duty.approved_ot_hours = 0.0
-        duty.duty_status = "PENDING"
-        duty.duty_approved_by = None
-        movements = list(duty.movements) if duty.movements else []
-        movements.append({"type": "AUTO OUT", "time": close_time.strftime("%H:%M"), "date": close_time.strftime("%Y-%m-%d")})
-        duty.movements = movements
-        db.add(AuditLog(
-            table_name="daily_attendance",
-            record_id=duty.id,
-            company_id=company_id,
-            field_name="AUTO_OUT_24H",
-            old_value="OPEN",
-            new_value=f"Emp: {duty.employee_name} ({duty.employee_id}) | Auto closed after 24 hours | Duty approval pending",
-            edited_by=email or "SYSTEM",
-            edited_at=datetime.now(),
-        ))
-
-
 # ============================================================
 # ⚡ HELPER: LOCATION SCOPE BOUNDING UTILITY
 # ============================================================
@@ -243,7 +193,6 @@ def hr_command_center(
     user_allowed_locations = [loc.strip().upper() for loc in session_locations.split(",") if loc.strip()] if isinstance(session_locations, str) else [str(loc).strip().upper() for loc in session_locations if str(loc).strip()]
 
     today = dashboard_date or ist_now().date()
-    start_of_month = today.replace(day=1)
     current_year = today.year
     upcoming_festivals = get_upcoming_festivals(today)
 
@@ -262,102 +211,61 @@ def hr_command_center(
 
         base_emp = secure_hr(db.query(EmployeeRegistration), EmployeeRegistration)
         base_att = secure_hr(db.query(DailyAttendance), DailyAttendance)
-        base_stat = secure_hr(db.query(EmployeeStatutoryMaster), EmployeeStatutoryMaster)
-        active_status = active_employee_on(EmployeeRegistration, today)
-        inactive_status = func.upper(func.trim(EmployeeRegistration.status)) == "INACTIVE"
+
+        # Headcount, attendance, approvals, compliance and production kg come
+        # from the day rollups (services/hr_kpi_rollups): one read of the last
+        # 30 days, summed over the locations in scope.
+        past_7_days = [today - timedelta(days=i) for i in range(6, -1, -1)]
+        trend_days = [today - timedelta(days=i) for i in range(29, -1, -1)]
+        rollups = load_hr_kpi_rollups(db, comp_code, trend_days)
+        daily_kpis = {day: scoped_kpis(rollups[day], g_loc_clean, user_allowed_locations) for day in trend_days}
+        kpis = daily_kpis[today]
 
         # ---------------------------------------------------------
         # 🌟 1. EXECUTIVE WORKFORCE SUMMARY (12 PREMIUM KPIs)
         # ---------------------------------------------------------
-        total_employees = base_emp.count()
-        active_employees = base_emp.filter(active_status).count()
-        present_today = base_att.filter(DailyAttendance.duty_date == today).with_entities(
-            func.count(func.distinct(DailyAttendance.employee_id))
-        ).scalar() or 0
-        half_day_today = base_att.filter(
-            DailyAttendance.duty_date == today,
-            or_(
-                func.upper(func.trim(DailyAttendance.duty_type)) == "HALF",
-                and_(
-                    func.upper(func.trim(DailyAttendance.status)) == "CLOSED",
-                    DailyAttendance.working_hours >= 4,
-                    DailyAttendance.working_hours < 8,
-                ),
-            ),
-        ).with_entities(func.count(func.distinct(DailyAttendance.employee_id))).scalar() or 0
-        ot_workers_today = base_att.filter(
-            DailyAttendance.duty_date == today,
-            DailyAttendance.calculated_ot_hours > 0,
-        ).with_entities(func.count(func.distinct(DailyAttendance.employee_id))).scalar() or 0
+        total_employees = kpis["total"]
+        active_employees = kpis["active"]
+        present_today = kpis["present"]
+        half_day_today = kpis["half_day"]
+        ot_workers_today = kpis["ot_workers"]
         absent_today = max(0, active_employees - present_today)
         present_pct = (present_today / active_employees * 100) if active_employees > 0 else 0.0
 
-        contract_count = base_emp.filter(and_(
-            active_status,
-            func.upper(func.trim(EmployeeRegistration.employee_type)).in_(["CONTRACT", "CONTRACTOR"]),
-        )).count()
+        contract_count = kpis["contract"]
         perm_count = active_employees - contract_count
         contract_pct = (contract_count / active_employees * 100) if active_employees > 0 else 0.0
         perm_pct = (perm_count / active_employees * 100) if active_employees > 0 else 0.0
 
-        staff_count = base_emp.filter(and_(active_status, func.upper(func.trim(EmployeeRegistration.employee_type)).in_(["STAFF", "REGULAR", "PERMANENT"]))).count()
-        day_basis_count = base_emp.filter(and_(active_status, func.upper(func.trim(EmployeeRegistration.employee_type)).in_(["DAY", "DAILY", "DAY_BASIS"]))).count()
-        kg_basis_count = base_emp.filter(and_(active_status, func.upper(func.trim(EmployeeRegistration.employee_type)).in_(["KG", "KG_BASIS"]))).count()
-        temp_basis_count = base_emp.filter(and_(active_status, func.upper(func.trim(EmployeeRegistration.employee_type)).in_(["TEMP", "TEMPORARY"]))).count()
-        total_monthly_payroll_est = base_emp.filter(active_status).with_entities(func.coalesce(func.sum(EmployeeRegistration.current_salary), 0.0)).scalar() or 0.0
+        staff_count = kpis["staff"]
+        day_basis_count = kpis["day_basis"]
+        kg_basis_count = kpis["kg_basis"]
+        temp_basis_count = kpis["temp_basis"]
+        total_monthly_payroll_est = kpis["payroll"]
 
-        ot_hours_today = base_att.filter(DailyAttendance.duty_date == today).with_entities(func.coalesce(func.sum(DailyAttendance.calculated_ot_hours), 0.0)).scalar()
+        ot_hours_today = kpis["ot_hours"]
 
         # Labor Cost Today & Productivity
-        present_emps = db.query(EmployeeRegistration.employee_id, EmployeeRegistration.current_salary).join(
-            DailyAttendance, DailyAttendance.employee_id == EmployeeRegistration.employee_id
-        ).filter(and_(
-            EmployeeRegistration.company_id == comp_code,
-            DailyAttendance.company_id == comp_code,
-            DailyAttendance.duty_date == today,
-            DailyAttendance.employee_id.in_(allowed_emp_ids),
-        )).group_by(EmployeeRegistration.employee_id, EmployeeRegistration.current_salary).all()
-        
-        labor_cost_today = sum([(emp.current_salary or 0) / 30 for emp in present_emps])
-        avg_salary = base_emp.filter(active_status).with_entities(func.coalesce(func.avg(EmployeeRegistration.current_salary), 0.0)).scalar()
+        labor_cost_today = kpis["labor_cost"]
+        avg_salary = (kpis["payroll"] / kpis["salaried"]) if kpis["salaried"] > 0 else 0.0
 
-        total_working_hours = base_att.filter(DailyAttendance.duty_date == today).with_entities(func.coalesce(func.sum(DailyAttendance.working_hours), 0.0)).scalar()
+        total_working_hours = kpis["working_hours"]
         employee_productivity = (total_working_hours / (present_today * 8) * 100) if present_today > 0 else 0.0
 
-        resigned_this_year = base_emp.filter(and_(EmployeeRegistration.resignation_date >= date(current_year, 1, 1), inactive_status)).count()
-        attrition_rate = (resigned_this_year / total_employees * 100) if total_employees > 0 else 0.0
-
-        # Production KG Fetch for Cost/KG
-        def get_prod_kg(model, field):
-            q = db.query(func.coalesce(func.sum(field), 0.0)).filter(and_(model.company_id == comp_code, model.date == today))
-            location_col = getattr(model, 'production_at', None)
-            if location_col is None:
-                location_col = getattr(model, 'peeling_at', None)
-            if location_col is not None:
-                if g_loc_clean and g_loc_clean != "ALL":
-                    q = q.filter(func.upper(func.trim(location_col)) == g_loc_clean)
-                elif user_allowed_locations:
-                    q = q.filter(func.upper(func.trim(location_col)).in_(user_allowed_locations))
-            return q.scalar()
-
-        total_prod_kg = get_prod_kg(Production, Production.production_qty) + get_prod_kg(Peeling, Peeling.peeled_qty)
+        attrition_rate = (kpis["resigned_year"] / total_employees * 100) if total_employees > 0 else 0.0
+
+        # Production KG for Cost/KG
+        total_prod_kg = sum(kpis["production_kg"].values())
         cost_per_kg = (labor_cost_today / total_prod_kg) if total_prod_kg > 0 else 0.0
 
         # ---------------------------------------------------------
         # 🌟 2. ATTENDANCE HEAT MAP (Last 7 Days by Dept)
         # ---------------------------------------------------------
-        past_7_days = [today - timedelta(days=i) for i in range(6, -1, -1)]
-        heatmap_data = {}
-        depts = base_emp.with_entities(EmployeeRegistration.department).distinct().all()
-        dept_names = [d[0] for d in depts if d[0]]
-
-        for d_name in dept_names:
-            heatmap_data[d_name] = []
-            for day in past_7_days:
-                c = db.query(func.count(func.distinct(DailyAttendance.employee_id))).join(EmployeeRegistration, DailyAttendance.employee_id == EmployeeRegistration.employee_id).filter(
-                    and_(DailyAttendance.company_id == comp_code, DailyAttendance.duty_date == day, EmployeeRegistration.department == d_name, DailyAttendance.employee_id.in_(allowed_emp_ids))
-                ).scalar()
-                heatmap_data[d_name].append(c)
+        dept_names = sorted(name for name, dept in kpis["departments"].items() if name and dept["employees"])
+        heatmap_data = {
+            d_name: [daily_kpis[day]["departments"].get(d_name, {}).get("present", 0) for day in past_7_days]
+            for d_name in dept_names
+        }
 
         # ---------------------------------------------------------
         # 🌟 3. SHIFT PERFORMANCE DASHBOARD
@@ -385,43 +293,27 @@ def hr_command_center(
         # ---------------------------------------------------------
         # 🌟 4. DEPARTMENT COST CENTER
         # ---------------------------------------------------------
-        dept_cost_data = base_emp.filter(active_status).with_entities(
-            EmployeeRegistration.department,
-            func.count(EmployeeRegistration.id).label("emps"),
-            func.sum(EmployeeRegistration.current_salary).label("total_sal"),
-            func.avg(EmployeeRegistration.current_salary).label("avg_sal")
-        ).group_by(EmployeeRegistration.department).all()
-
-        total_comp_sal = sum([d.total_sal or 0 for d in dept_cost_data])
+        active_depts = sorted((name, dept) for name, dept in kpis["departments"].items() if dept["active"])
+        total_comp_sal = sum(dept["salary"] for _, dept in active_depts)
         dept_cost_center = []
-        for d in dept_cost_data:
-            pct = ((d.total_sal or 0) / total_comp_sal * 100) if total_comp_sal > 0 else 0.0
+        for d_name, dept in active_depts:
+            pct = (dept["salary"] / total_comp_sal * 100) if total_comp_sal > 0 else 0.0
+            avg_sal = (dept["salary"] / dept["salaried"]) if dept["salaried"] > 0 else 0
             dept_cost_center.append({
-                "dept": d.department or "N/A", "emps": d.emps, "total_sal": d.total_sal or 0, "avg_sal": d.avg_sal or 0, "cost_pct": round(pct, 1)
+                "dept": d_name or "N/A", "emps": dept["active"], "total_sal": dept["salary"], "avg_sal": avg_sal, "cost_pct": round(pct, 1)
             })
 
         # ---------------------------------------------------------
         # 🌟 5. CONTRACTOR ANALYTICS
         # ---------------------------------------------------------
-        contractor_data = base_emp.filter(and_(
-            active_status,
-            func.upper(func.trim(EmployeeRegistration.employee_type)).in_(["CONTRACT", "CONTRACTOR"]),
-        )).with_entities(
-            EmployeeRegistration.contractor_name,
-            func.count(EmployeeRegistration.id).label("manpower"),
-            func.sum(EmployeeRegistration.current_salary).label("salary")
-        ).group_by(EmployeeRegistration.contractor_name).all()
-
         contractor_analytics = []
-        for c in contractor_data:
-            c_name = c.contractor_name or "DIRECT/UNKNOWN"
-            c_present = db.query(func.count(func.distinct(DailyAttendance.employee_id))).join(EmployeeRegistration, DailyAttendance.employee_id == EmployeeRegistration.employee_id).filter(
-                and_(DailyAttendance.company_id == comp_code, DailyAttendance.duty_date == today, EmployeeRegistration.contractor_name == c.contractor_name, DailyAttendance.employee_id.in_(allowed_emp_ids))
-            ).scalar() or 0
-            
-            prod_score = (c_present / c.manpower * 100) if c.manpower > 0 else 0.0
+        for c_name, contractor in sorted(kpis["contractors"].items()):
+            if not contractor["manpower"]:
+                continue
+            prod_score = contractor["present"] / contractor["manpower"] * 100
             contractor_analytics.append({
-                "name": c_name, "manpower": c.manpower, "present": c_present, "salary": c.salary or 0, "productivity": round(prod_score, 1)
+                "name": c_name or "DIRECT/UNKNOWN", "manpower": contractor["manpower"], "present": contractor["present"],
+                "salary": contractor["salary"], "productivity": round(prod_score, 1)
             })
 
         # ---------------------------------------------------------
@@ -443,62 +335,31 @@ def hr_command_center(
         # ---------------------------------------------------------
         # 🌟 7. STATUTORY COMPLIANCE & RISK CENTER
         # ---------------------------------------------------------
-        def distinct_stat_count(query):
-            return query.with_entities(func.count(func.distinct(EmployeeStatutoryMaster.employee_id))).scalar() or 0
-
-        active_stat = func.upper(func.trim(EmployeeStatutoryMaster.status)) == "ACTIVE"
-        pf_covered = distinct_stat_count(base_stat.filter(EmployeeStatutoryMaster.pf_applicable == True, active_stat))
-        esi_covered = distinct_stat_count(base_stat.filter(EmployeeStatutoryMaster.esi_applicable == True, active_stat))
-        pt_covered = distinct_stat_count(base_stat.filter(EmployeeStatutoryMaster.pt_applicable == True, active_stat))
-        stat_pf_na = distinct_stat_count(base_stat.filter(EmployeeStatutoryMaster.pf_applicable == False, active_stat))
-        stat_missing_uan = distinct_stat_count(base_stat.filter(EmployeeStatutoryMaster.pf_applicable == True, or_(EmployeeStatutoryMaster.uan_number == None, EmployeeStatutoryMaster.uan_number == "")))
-        stat_missing_esi = distinct_stat_count(base_stat.filter(EmployeeStatutoryMaster.esi_applicable == True, or_(EmployeeStatutoryMaster.esi_number == None, EmployeeStatutoryMaster.esi_number == "")))
-        
-        pf_coverage_pct = (pf_covered / active_employees * 100) if active_employees > 0 else 0.0
-        esi_coverage_pct = (esi_covered / active_employees * 100) if active_employees > 0 else 0.0
-        pt_coverage_pct = (pt_covered / active_employees * 100) if active_employees > 0 else 0.0
-
-        risk_no_pan = base_emp.filter(or_(EmployeeRegistration.pan_number == None, EmployeeRegistration.pan_number == "")).count()
-        risk_no_aadhar = base_emp.filter(or_(EmployeeRegistration.aadhar_number == None, EmployeeRegistration.aadhar_number == "")).count()
-        risk_no_bank = base_emp.filter(or_(EmployeeRegistration.account_number == None, EmployeeRegistration.account_number == "")).count()
-        risk_no_photo = base_emp.filter(or_(EmployeeRegistration.photo_path == None, EmployeeRegistration.photo_path == "")).count()
-        risk_no_mobile = base_emp.filter(or_(EmployeeRegistration.mobile == None, EmployeeRegistration.mobile == "")).count()
-        risk_no_email = base_emp.filter(and_(
-            or_(EmployeeRegistration.email == None, EmployeeRegistration.email == ""),
-            or_(EmployeeRegistration.personal_email == None, EmployeeRegistration.personal_email == ""),
-            or_(EmployeeRegistration.official_email == None, EmployeeRegistration.official_email == ""),
-        )).count()
-        
-        stat_emp_ids = secure_hr(db.query(EmployeeStatutoryMaster.employee_id), EmployeeStatutoryMaster)
-        risk_missing_statutory = base_emp.filter(~EmployeeRegistration.employee_id.in_(stat_emp_ids)).count()
+        stat = kpis["statutory"]
+        stat_pf_na, stat_missing_uan, stat_missing_esi = stat["pf_na"], stat["missing_uan"], stat["missing_esi"]
+
+        pf_coverage_pct = (stat["pf"] / active_employees * 100) if active_employees > 0 else 0.0
+        esi_coverage_pct = (stat["esi"] / active_employees * 100) if active_employees > 0 else 0.0
+        pt_coverage_pct = (stat["pt"] / active_employees * 100) if active_employees > 0 else 0.0
+
+        risk = kpis["risk"]
+        risk_no_pan = risk["no_pan"]
+        risk_no_aadhar = risk["no_aadhar"]
+        risk_no_bank = risk["no_bank"]
+        risk_no_photo = risk["no_photo"]
+        risk_no_mobile = risk["no_mobile"]
+        risk_no_email = risk["no_email"]
+        risk_missing_statutory = risk["no_statutory"]
 
         # ---------------------------------------------------------
         # 🌟 8. BIRTHDAY / ANNIVERSARY (Upcoming 7 & 30 Days)
         # ---------------------------------------------------------
-        active_employee_rows = base_emp.filter(active_status).all()
-
-        def next_annual_date(source_date):
-            if not source_date:
-                return None
-            try:
-                candidate = source_date.replace(year=today.year)
-            except ValueError:  # 29-Feb in a non-leap year
-                candidate = date(today.year, 2, 28)
-            if candidate < today:
-                try:
-                    candidate = source_date.replace(year=today.year + 1)
-                except ValueError:
-                    candidate = date(today.year + 1, 2, 28)
-            return candidate
-
         def get_upcoming(attribute_name, days):
-            end_date = today + timedelta(days=days)
-            matches = []
-            for employee in active_employee_rows:
-                candidate = next_annual_date(getattr(employee, attribute_name, None))
-                if candidate and today <= candidate <= end_date:
-                    matches.append(employee)
-            return matches
+            return [
+                {"employee_id": employee_id, "employee_name": employee_name, attribute_name: date.fromisoformat(source_date)}
+                for kind, employee_id, employee_name, source_date, days_until in sorted(kpis["events"], key=lambda event: (event[4], event[1]))
+                if kind == attribute_name and days_until <= days
+            ]
 
         bday_7 = get_upcoming("dob", 7)
         bday_30 = get_upcoming("dob", 30)
@@ -536,37 +397,18 @@ def hr_command_center(
         ).filter(DailyAttendance.duty_date == today), DailyAttendance).first()
         productivity_data = [int(work_hours_ranges.under_4 or 0), int(work_hours_ranges.mid_4_8 or 0), int(work_hours_ranges.high_8_12 or 0), int(work_hours_ranges.over_12 or 0)]
 
-        salary_histogram = secure_hr(db.query(
-            func.count(case((EmployeeRegistration.current_salary < 10000, EmployeeRegistration.id))).label("tier_1"),
-            func.count(case((and_(EmployeeRegistration.current_salary >= 10000, EmployeeRegistration.current_salary < 20000), EmployeeRegistration.id))).label("tier_2"),
-            func.count(case((and_(EmployeeRegistration.current_salary >= 20000, EmployeeRegistration.current_salary < 30000), EmployeeRegistration.id))).label("tier_3"),
-            func.count(case((EmployeeRegistration.current_salary >= 30000, EmployeeRegistration.id))).label("tier_4")
-        ).filter(active_status), EmployeeRegistration).first()
-        salary_tiers = [int(salary_histogram.tier_1 or 0), int(salary_histogram.tier_2 or 0), int(salary_histogram.tier_3 or 0), int(salary_histogram.tier_4 or 0)]
-
-        gender_data = secure_hr(db.query(EmployeeRegistration.gender, func.count(EmployeeRegistration.id)), EmployeeRegistration).group_by(EmployeeRegistration.gender).all()
-        gender_labels = [g[0] if g[0] else "Not Specified" for g in gender_data]
-        gender_values = [g[1] for g in gender_data]
-
-        blood_group_rows = secure_hr(db.query(EmployeeRegistration.blood_group, func.count(EmployeeRegistration.id)).filter(EmployeeRegistration.blood_group != None), EmployeeRegistration).group_by(EmployeeRegistration.blood_group).all()
-        blood_groups = [{"group": b[0], "count": b[1]} for b in blood_group_rows]
-
-        # One grouped query replaces 30 independent daily attendance queries.
-        trend_start = today - timedelta(days=29)
-        trend_rows = base_att.filter(
-            DailyAttendance.duty_date >= trend_start,
-            DailyAttendance.duty_date <= today,
-        ).with_entities(
-            DailyAttendance.duty_date,
-            func.count(func.distinct(DailyAttendance.employee_id)).label("present_count"),
-        ).group_by(DailyAttendance.duty_date).all()
-        trend_counts_by_date = {row.duty_date: int(row.present_count or 0) for row in trend_rows}
+        salary_tiers = kpis["salary_tiers"]
+
+        gender_labels = [label or "Not Specified" for label in sorted(kpis["gender"])]
+        gender_values = [kpis["gender"][label] for label in sorted(kpis["gender"])]
+
+        blood_groups = [{"group": group, "count": count} for group, count in sorted(kpis["blood_groups"].items())]
+
         attendance_trend_labels = []
         attendance_trend_data = []
         attendance_trend_counts = []
-        for i in range(29, -1, -1):
-            loop_date = today - timedelta(days=i)
-            loop_day_present = trend_counts_by_date.get(loop_date, 0)
+        for loop_date in trend_days:
+            loop_day_present = daily_kpis[loop_date]["present"]
             day_pct = (loop_day_present / active_employees * 100) if active_employees > 0 else 0.0
             attendance_trend_labels.append(loop_date.strftime('%d-%b'))
             attendance_trend_data.append(round(day_pct, 1))
@@ -575,14 +417,8 @@ def hr_command_center(
         # ---------------------------------------------------------
         # 🌟 ANALYTICS GROWTH METRICS
         # ---------------------------------------------------------
-        new_joinings_month = base_emp.filter(
-            EmployeeRegistration.joining_date >= start_of_month,
-            EmployeeRegistration.joining_date <= today,
-        ).count()
-        resignations_month = base_emp.filter(
-            EmployeeRegistration.resignation_date >= start_of_month,
-            EmployeeRegistration.resignation_date <= today,
-        ).count()
+        new_joinings_month = kpis["joined_month"]
+        resignations_month = kpis["resigned_month"]
         increments_ytd = secure_hr(db.query(EmployeeIncrement), EmployeeIncrement).filter(
             EmployeeIncrement.effective_from >= date(current_year, 1, 1),
             EmployeeIncrement.effective_from <= today,
@@ -614,7 +450,7 @@ def hr_command_center(
             ),
             DailyAttendance.calculated_ot_hours > 0,
         )
-        pending_ot_count = base_att.filter(pending_ot_filter).count()
+        pending_ot_count = kpis["ot_pending"]
         pending_ot_rows = base_att.filter(pending_ot_filter).order_by(DailyAttendance.duty_date.desc(), DailyAttendance.id.desc()).limit(500).all()
 
         # Safe fallback in case duty_status isn't in DB yet
@@ -631,7 +467,7 @@ def hr_command_center(
                 setattr(duty_row, "suggested_duty_credit", suggested_credit)
                 setattr(duty_row, "extra_hours", max(0.0, round(float(duty_row.working_hours or 0.0) - required_hours, 2)))
                 setattr(duty_row, "is_punch_missing", is_punch_missing)
-            pending_duty_count = len(pending_duty_rows)
+            pending_duty_count = kpis["duty_pending"]
         else:
             pending_duty_count = 0
             pending_duty_rows = []
@@ -710,19 +546,19 @@ def hr_command_center(
                 "date": row["date"].isoformat(),
             } for row in upcoming_festivals],
             "bday_7": [{
-                "employee_id": row.employee_id,
-                "employee_name": row.employee_name,
-                "date": row.dob.isoformat() if row.dob else None,
+                "employee_id": row["employee_id"],
+                "employee_name": row["employee_name"],
+                "date": row["dob"].isoformat(),
             } for row in bday_7],
             "bday_30": [{
-                "employee_id": row.employee_id,
-                "employee_name": row.employee_name,
-                "date": row.dob.isoformat() if row.dob else None,
+                "employee_id": row["employee_id"],
+                "employee_name": row["employee_name"],
+                "date": row["dob"].isoformat(),
             } for row in bday_30],
             "anniv_7": [{
-                "employee_id": row.employee_id,
-                "employee_name": row.employee_name,
-                "date": row.joining_date.isoformat() if row.joining_date else None,
+                "employee_id": row["employee_id"],
+                "employee_name": row["employee_name"],
+                "date": row["joining_date"].isoformat(),
             } for row in anniv_7],
             "top_10_advances": [{
                 "id": row.id,
@@ -887,8 +723,9 @@ async def get_hr_kpi_details(
         elif kpi_type.upper() == "CONTRACT": emp_q = emp_q.filter(and_(func.upper(func.trim(EmployeeRegistration.status)) == "ACTIVE", func.upper(func.trim(EmployeeRegistration.employee_type)).in_(["CONTRACT", "CONTRACTOR"])))
         elif kpi_type.upper() == "PERMANENT": emp_q = emp_q.filter(and_(func.upper(func.trim(EmployeeRegistration.status)) == "ACTIVE", ~func.upper(func.trim(EmployeeRegistration.employee_type)).in_(["CONTRACT", "CONTRACTOR"])))
         elif kpi_type.upper() == "ABSENT":
-            today_punched_in = db.query(DailyAttendance.employee_id).filter(and_(DailyAttendance.company_id == comp_code, DailyAttendance.duty_date == today)).subquery()
-            emp_q = emp_q.filter(and_(EmployeeRegistration.status == "ACTIVE", ~EmployeeRegistration.employee_id.in_(today_punched_in)))
+            # Same active/present definitions as the rollup; both sides seek on (company_id, ...) indexes.
+            today_punched_in = db.query(DailyAttendance.employee_id).filter(and_(DailyAttendance.company_id == comp_code, DailyAttendance.duty_date == today))
+            emp_q = emp_q.filter(and_(active_employee_on(EmployeeRegistration, today), ~EmployeeRegistration.employee_id.in_(today_punched_in)))
 
         rows = emp_q.order_by(EmployeeRegistration.employee_id).limit(500).all()
         for r in rows:
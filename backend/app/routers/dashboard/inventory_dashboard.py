@@ -25,6 +25,7 @@ from app.database.models.criteria import (
 )
 from app.utils.global_filters import get_global_filters
 from app.services.cache import cache_get, cache_set
+from app.services.financial_periods import current_fy_start, financial_years, fy_bounds, fy_label, parse_fy_start
 
 router = APIRouter(
     prefix="/inventory_dashboard",
@@ -84,22 +85,17 @@ async def get_inventory_dashboard(
     global_location = clean_filter_value(location) or clean_filter_value(cookie_loc)
 
     today = ist_now().date()
-    current_year = today.year
-    current_fy_start_year = current_year if today.month >= 4 else current_year - 1
-    current_fy_string = f"{current_fy_start_year}-{str(current_fy_start_year + 1)[2:]}"
+    current_fy_start_year = current_fy_start(today)
+    current_fy_string = fy_label(current_fy_start_year)
 
     use_fy_filter = True  
     if sel_fy == "ALL":
         start_year = current_fy_start_year
         sel_fy = current_fy_string 
     else:
-        try:
-            start_year = int(sel_fy.split("-")[0])
-        except:
-            start_year = current_fy_start_year
+        start_year = parse_fy_start(sel_fy, current_fy_start_year)
 
-    fy_start = date(start_year, 4, 1)
-    fy_end = date(start_year + 1, 3, 31)
+    fy_start, fy_end = fy_bounds(start_year)
 
     session_locations = request.session.get("allowed_locations", [])
     if isinstance(session_locations, str):
@@ -546,19 +542,9 @@ async def get_inventory_dashboard(
 
     stock_table_data.sort(key=lambda x: (x["loc"], x["sp"], x["vr"], x["gr"]))
 
-    all_gate_dates = db.query(GateEntry.date).filter(GateEntry.company_id == comp_code, GateEntry.date != None).all()
-    fy_set = set()
-    for d_tuple in all_gate_dates:
-        d = d_tuple[0]
-        if d:
-            y_val = int(d.year)
-            fy_set.add(y_val if d.month >= 4 else y_val - 1)
-            
-    fy_years_ints = sorted(list(fy_set), reverse=True)
-    if not fy_years_ints:
-        fy_years_ints = [current_fy_start_year]
+    fy_years_ints = financial_years(db, comp_code) or [current_fy_start_year]
 
-    fy_options = [f"{yr}-{str(yr+1)[2:]}" for yr in fy_years_ints]
+    fy_options = [fy_label(yr) for yr in fy_years_ints]
 
     def get_list(model, field):
         return sorted(list(set([getattr(x, field) for x in db.query(model).filter(model.company_id == comp_code).all() if getattr(x, field)])))
@@ -4,9 +4,10 @@ from fastapi.responses import HTMLResponse, FileResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy import text, or_
-from app.database import get_db
+from app.database import get_db, get_reporting_db
 from app.utils.download_security import issue_download_grant, require_download_grant
 from app.utils.data_management_audit import DATA_MANAGEMENT_HISTORY_FILE, log_data_management_action
+from app.services.bulk_import import ERROR_REPORT_PREFIX, bulk_import_spec, run_bulk_import
 
 import os
 import json
@@ -14,10 +15,6 @@ import random
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import pandas as pd
-import numpy as np
-from openpyxl.styles import Alignment, Font, PatternFill
-from openpyxl.utils import get_column_letter
 import math
 from datetime import date, time, datetime, timedelta
 from zoneinfo import ZoneInfo
@@ -193,6 +190,8 @@ def get_comp_code(request: Request):
     return str(comp_code)
 
 def export_sheet(writer, data, sheet_name):
+    import pandas as pd
+
     if data:
         df = pd.DataFrame([{k: v for k, v in vars(row).items() if k != "_sa_instance_state"} for row in data])
         def excel_safe_value(value):
@@ -217,6 +216,9 @@ def export_sheet(writer, data, sheet_name):
     df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
 
 def style_department_register_workbook(writer, company_code: str):
+    from openpyxl.styles import Alignment, Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
     for sheet in writer.book.worksheets:
         sheet.insert_rows(1, amount=3)
         max_column = max(1, sheet.max_column)
@@ -268,6 +270,8 @@ def register_rows(db: Session, model, company_code: str):
     return query.all()
 
 def generate_export_response(comp_code, module_name, export_logic, db):
+    import pandas as pd
+
     export_dir = "exports"
     os.makedirs(export_dir, exist_ok=True)
     filename = f"SVBK_{module_name}_{comp_code}_{ist_now().strftime('%Y%m%d_%H%M%S')}.xlsx"
@@ -381,6 +385,8 @@ async def data_management(request: Request, db: Session = Depends(get_db)):
 @router.get("/data-management/template/blank")
 async def download_blank_template(request: Request, table: str = ""):
     """Download a blank Excel sheet for one table or all tables."""
+    import pandas as pd
+
     require_download_grant(request)
     from fastapi import Query as FastQuery
     template_dir = "templates_excel"
@@ -447,7 +453,7 @@ async def download_master_template(request: Request):
 # =====================================================
 @router.get("/export/processing", operation_id="export_processing_get")
 @router.post("/export/processing", operation_id="export_processing_post")
-async def export_processing(request: Request, db: Session = Depends(get_db)):
+async def export_processing(request: Request, db: Session = Depends(get_reporting_db)):
     require_download_grant(request)
     def logic(writer, db, cc):
         export_sheet(writer, db.query(GateEntry).filter(GateEntry.company_id == cc).all(), "GateEntry")
@@ -463,7 +469,7 @@ async def export_processing(request: Request, db: Session = Depends(get_db)):
 
 @router.get("/export/inventory", operation_id="export_inventory_get")
 @router.post("/export/inventory", operation_id="export_inventory_post")
-async def export_inventory(request: Request, db: Session = Depends(get_db)):
+async def export_inventory(request: Request, db: Session = Depends(get_reporting_db)):
     require_download_grant(request)
     def logic(writer, db, cc):
         export_sheet(writer, db.query(stock_entry).filter(stock_entry.company_id == cc).all(), "StockEntry")
@@ -476,7 +482,7 @@ async def export_inventory(request: Request, db: Session = Depends(get_db)):
 
 @router.get("/export/bills", operation_id="export_bills_get")
 @router.post("/export/bills", operation_id="export_bills_post")
-async def export_bills(request: Request, db: Session = Depends(get_db)):
+async def export_bills(request: Request, db: Session = Depends(get_reporting_db)):
     require_download_grant(request)
     def logic(writer, db, cc):
         export_sheet(writer, db.query(PurchaseInvoice).filter(PurchaseInvoice.company_id == cc).all(), "PurchaseInvoice")
@@ -490,7 +496,7 @@ async def export_bills(request: Request, db: Session = Depends(get_db)):
 
 @router.get("/export/general-stock", operation_id="export_general_stock_get")
 @router.post("/export/general-stock", operation_id="export_general_stock_post")
-async def export_general_stock(request: Request, db: Session = Depends(get_db)):
+async def export_general_stock(request: Request, db: Session = Depends(get_reporting_db)):
     require_download_grant(request)
     def logic(writer, db, cc):
         # 🌟 FIX: Removed extract_company_id, using 'cc' directly
@@ -501,7 +507,7 @@ async def export_general_stock(request: Request, db: Session = Depends(get_db)):
 
 @router.get("/export/payments", operation_id="export_payments_get")
 @router.post("/export/payments", operation_id="export_payments_post")
-async def export_payments(request: Request, db: Session = Depends(get_db)):
+async def export_payments(request: Request, db: Session = Depends(get_reporting_db)):
     require_download_grant(request)
     def logic(writer, db, cc):
         export_sheet(writer, db.query(CustomerReceivable).filter(CustomerReceivable.company_id == cc).all(), "CustomerReceivable")
@@ -517,7 +523,7 @@ async def export_payments(request: Request, db: Session = Depends(get_db)):
 
 @router.get("/export/accounts", operation_id="export_accounts_get")
 @router.post("/export/accounts", operation_id="export_accounts_post")
-async def export_accounts(request: Request, db: Session = Depends(get_db)):
+async def export_accounts(request: Request, db: Session = Depends(get_reporting_db)):
     require_download_grant(request)
     def logic(writer, db, cc):
         for _, model, sheet_name in REGISTER_GROUPS["accounts"].values():
@@ -527,7 +533,7 @@ async def export_accounts(request: Request, db: Session = Depends(get_db)):
 
 @router.get("/export/masters", operation_id="export_masters_get")
 @router.post("/export/masters", operation_id="export_masters_post")
-async def export_masters(request: Request, db: Session = Depends(get_db)):
+async def export_masters(request: Request, db: Session = Depends(get_reporting_db)):
     require_download_grant(request)
     def logic(writer, db, cc):
         export_sheet(writer, db.query(brands).filter(brands.company_id == cc).all(), "Brands")
@@ -546,7 +552,7 @@ async def export_masters(request: Request, db: Session = Depends(get_db)):
 
 @router.get("/export/hrms", operation_id="export_hrms_get")
 @router.post("/export/hrms", operation_id="export_hrms_post")
-async def export_hrms(request: Request, db: Session = Depends(get_db)):
+async def export_hrms(request: Request, db: Session = Depends(get_reporting_db)):
     require_download_grant(request)
     def logic(writer, db, cc):
         export_sheet(writer, db.query(EmployeeRegistration).filter(EmployeeRegistration.company_id == cc).all(), "EmployeeReg")
@@ -562,7 +568,7 @@ async def download_module_register(
     module: str,
     register_key: str,
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_reporting_db),
 ):
     require_download_grant(request)
     company_code = get_comp_code(request)
@@ -603,6 +609,8 @@ async def get_db_schema():
 
 @router.post("/data-management/inspect-file")
 async def inspect_excel_file(excel_file: UploadFile = File(...)):
+    import pandas as pd
+
     try:
         upload_dir = "uploads"
         os.makedirs(upload_dir, exist_ok=True)
@@ -623,6 +631,8 @@ async def inspect_excel_file(excel_file: UploadFile = File(...)):
         return {"success": False, "error": str(e)}
 
 def coerce_cell_value(val, col_obj):
+    import pandas as pd
+
     if val is None or pd.isna(val):
         return None
 
@@ -755,6 +765,8 @@ def coerce_cell_value(val, col_obj):
 
 
 def ensure_date_obj(val):
+    import pandas as pd
+
     if isinstance(val, date) and not isinstance(val, datetime):
         return val
     if isinstance(val, (datetime, pd.Timestamp)):
@@ -908,8 +920,85 @@ def sync_imported_data_to_modules(db: Session, comp_code: str, table_name: str,
             logger.error(f"Error refreshing floor balance for {table_name}: {e}")
 
 
+def refresh_financial_periods(db: Session, comp_code: str, ModelClass) -> None:
+    """Bulk deletes bypass the ORM flush hook that maintains financial_periods."""
+    import logging
+    from app.services.financial_periods import PERIOD_SOURCES, rebuild_financial_periods
+
+    logger = logging.getLogger(__name__)
+    if ModelClass.__tablename__ not in PERIOD_SOURCES:
+        return
+    try:
+        rebuild_financial_periods(db, comp_code, ModelClass.__tablename__)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error rebuilding financial periods for {ModelClass.__tablename__}: {e}")
+
+
+def refresh_stock_balances(db: Session, comp_code: str, ModelClass) -> None:
+    """Bulk deletes of stock movements bypass the flush hooks that maintain the FIFO layers, net stock and inventory summary."""
+    import logging
+    from app.services.inventory_summary_service import InventorySummaryService
+    from app.services.net_stock import rebuild_net_stock
+    from app.services.storage_fifo import rebuild_storage_fifo
+
+    logger = logging.getLogger(__name__)
+    if ModelClass.__tablename__ != "stock_entry":
+        return
+    try:
+        rebuild_storage_fifo(db, comp_code)
+        rebuild_net_stock(db, comp_code)
+        InventorySummaryService.refresh_inventory_summary(db, comp_code)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error rebuilding stock layers and balances: {e}")
+
+
+def execute_bulk_import(payload: ImportMappingPayload, request: Request, db: Session, comp_code: str, filepath: str, ModelClass):
+    """Streamed, set-based import for the masters, employees, ledgers and opening stock."""
+    result = run_bulk_import(
+        db, comp_code, payload.table_name, filepath, payload.sheet_name, payload.mapping,
+        user=request.session.get("email") or "SYSTEM",
+    )
+    db.commit()
+    refresh_financial_periods(db, comp_code, ModelClass)
+    refresh_stock_balances(db, comp_code, ModelClass)
+
+    if os.path.exists(filepath):
+        os.remove(filepath)
+
+    msg = f"Bulk imported {result.inserted} records ({result.updated} updated, {result.rejected} rejected)."
+    log_data_action(comp_code, "IMPORT", payload.table_name, "Success", msg)
+
+    return {
+        "success": True,
+        "rows_imported": result.inserted,
+        "rows_updated": result.updated,
+        "rows_rejected": result.rejected,
+        "error_report": f"/data-management/import-errors/{result.error_report}" if result.error_report else None,
+        "table": payload.table_name,
+    }
+
+
+@router.get("/data-management/import-errors/{filename}")
+async def download_import_errors(filename: str, request: Request):
+    comp_code = get_comp_code(request)
+    if os.path.basename(filename) != filename or not filename.startswith(f"{ERROR_REPORT_PREFIX}{comp_code}_"):
+        raise HTTPException(status_code=404, detail="Report not found")
+    filepath = os.path.join("uploads", filename)
+    if not os.path.exists(filepath):
+        raise HTTPException(status_code=404, detail="Report not found")
+    return FileResponse(
+        filepath, filename=filename,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+
 @router.post("/data-management/execute-import")
 async def execute_dynamic_import(payload: ImportMappingPayload, request: Request, db: Session = Depends(get_db)):
+    import pandas as pd
+
     comp_code = get_comp_code(request)
     filepath = os.path.join("uploads", payload.filename)
 
@@ -921,6 +1010,9 @@ async def execute_dynamic_import(payload: ImportMappingPayload, request: Request
         if not ModelClass:
             return {"success": False, "error": "Invalid database table selected."}
 
+        if bulk_import_spec(payload.table_name, filepath):
+            return execute_bulk_import(payload, request, db, comp_code, filepath, ModelClass)
+
         df = pd.read_excel(filepath, sheet_name=payload.sheet_name)
         df = df.where(pd.notnull(df), None)
 
@@ -1017,6 +1109,8 @@ async def undo_last_import(payload: ClearTablePayload, request: Request, db: Ses
 
         deleted_count = db.query(ModelClass).filter(ModelClass.id.in_(ids_to_delete)).delete(synchronize_session=False)
         db.commit()
+        refresh_financial_periods(db, comp_code, ModelClass)
+        refresh_stock_balances(db, comp_code, ModelClass)
 
         msg = f"Reverted last import. Deleted {deleted_count} records."
         log_data_action(comp_code, "UNDO IMPORT", payload.table_name, "Success", msg)
@@ -1048,6 +1142,8 @@ async def clear_table_data(payload: ClearTablePayload, request: Request, db: Ses
 
         deleted_count = query.delete(synchronize_session=False)
         db.commit()
+        refresh_financial_periods(db, comp_code, ModelClass)
+        refresh_stock_balances(db, comp_code, ModelClass)
 
         msg = f"Permanently deleted all {deleted_count} records from table."
         log_data_action(comp_code, "CLEAR", payload.table_name, "Success", msg)
@@ -5,10 +5,8 @@ from sqlalchemy.orm import Session, joinedload
 from datetime import date, datetime
 import html
 import json
-import openpyxl
 import io
 import re
-import pandas as pd
 from typing import List, Optional
 from pydantic import BaseModel, model_validator
 
@@ -71,14 +69,18 @@ def _pdf_amount(value: str) -> float:
 
 
 def _statement_text(value, limit: int) -> str | None:
+    import pandas as pd
+
     if value is None or pd.isna(value):
         return None
     cleaned = str(value).strip()
     return cleaned[:limit] or None
 
 
-def extract_bank_statement_pdf(content: bytes) -> pd.DataFrame:
+def extract_bank_statement_pdf(content: bytes):
     """Extract standard text-based bank tables with labelled debit/credit columns."""
+    import pandas as pd
+
     try:
         from pypdf import PdfReader
     except ImportError:
@@ -597,6 +599,8 @@ def create_ledger(request: Request, payload: LedgerCreate, db: Session = Depends
 
 @router.post("/ledgers/import")
 async def import_ledgers_excel(request: Request, file: UploadFile = File(...), db: Session = Depends(get_db)):
+    import pandas as pd
+
     comp_code = require_company_code(request)
     email = request.session.get("email", "system@bknr.com")
     
@@ -1330,6 +1334,8 @@ async def import_bank_statement(
     db: Session = Depends(get_db),
 ):
     """Import CSV/XLSX statements using Date, Reference, Debit and Credit columns."""
+    import pandas as pd
+
     comp_code = require_company_code(request)
     email = request.session.get("email", "SYSTEM")
     bank_ledger = db.query(LedgerMaster).filter(
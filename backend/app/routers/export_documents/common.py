@@ -7,9 +7,6 @@ from pathlib import Path
 from typing import Any
 from decimal import Decimal
 from datetime import date, datetime
-import openpyxl
-from openpyxl.styles import Alignment, Font, PatternFill
-from openpyxl.utils import get_column_letter
 
 from pydantic import BaseModel, model_validator
 from fastapi import APIRouter, Request, Depends, HTTPException
@@ -38,6 +35,7 @@ from app.database.models.processing import AuditLog
 from app.services.posting_engine import PostingEngineService
 from app.services.bill_accounting import ensure_bill_accounting_schema
 from app.services.cache import invalidate_company_cache
+from app.services.schema_readiness import ensure_schema_step
 
 templates = Jinja2Templates(directory="app/templates")
 
@@ -69,7 +67,6 @@ templates.env.filters["from_json"] = jinja_from_json
 logger = logging.getLogger(__name__)
 
 EXPORT_PDF_DIR = Path("uploads/export_documents_private")
-_EXPORT_SCHEMA_READY = False
 
 
 def repost_invoice_cogs(db: Session, company_id: str, invoice: CommercialInvoice, email: str) -> float:
@@ -535,18 +532,18 @@ def get_export_company_profile(db: Session, company_id: str) -> dict:
 
 def ensure_export_document_schema(db: Session = Depends(get_db)) -> None:
     """Keep export routes compatible while pending migrations are deployed."""
-    global _EXPORT_SCHEMA_READY
-    if _EXPORT_SCHEMA_READY:
-        return
-    ProformaInvoice.__table__.create(bind=db.get_bind(), checkfirst=True)
+    ensure_schema_step(db, "export_documents", commit=True)
+
+
+def apply_export_document_schema(db: Session) -> None:
+    bind = db.connection()
+    ProformaInvoice.__table__.create(bind=bind, checkfirst=True)
     db.execute(text("ALTER TABLE proforma_invoices ADD COLUMN IF NOT EXISTS approval_status VARCHAR NOT NULL DEFAULT 'PENDING'"))
     db.execute(text("ALTER TABLE proforma_invoices ADD COLUMN IF NOT EXISTS approved_by VARCHAR"))
     db.execute(text("ALTER TABLE proforma_invoices ADD COLUMN IF NOT EXISTS approved_at TIMESTAMP"))
     db.execute(text("ALTER TABLE proforma_invoices ADD COLUMN IF NOT EXISTS approval_remarks TEXT"))
-    ExportRequiredDocument.__table__.create(bind=db.get_bind(), checkfirst=True)
-    ExportDocumentApproval.__table__.create(bind=db.get_bind(), checkfirst=True)
-    db.commit()
-    _EXPORT_SCHEMA_READY = True
+    ExportRequiredDocument.__table__.create(bind=bind, checkfirst=True)
+    ExportDocumentApproval.__table__.create(bind=bind, checkfirst=True)
 
 
 def is_supporting_document_admin(request: Request) -> bool:
@@ -1000,6 +997,8 @@ def make_simple_pdf(title: str, document_no: str, lines: list[str], company_name
 
 
 def document_register_workbook(db: Session, company_id: str, doc_type: str | None = None) -> bytes:
+    import openpyxl
+
     workbook = openpyxl.Workbook()
     sheet = workbook.active
     sheet.title = "Register"
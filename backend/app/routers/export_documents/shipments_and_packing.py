@@ -3,8 +3,6 @@ import logging
 from io import BytesIO
 from zipfile import ZIP_DEFLATED, ZipFile
 from datetime import datetime
-import openpyxl
-from openpyxl.styles import Font, PatternFill
 
 from fastapi import APIRouter, Request, Depends, HTTPException, UploadFile, File, Form
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
@@ -520,6 +518,9 @@ def export_document_register(doc_type: str, request: Request, db: Session = Depe
 
 @router.get("/shipment/{shipment_id}/dossier.zip")
 def export_shipment_dossier(shipment_id: int, request: Request, db: Session = Depends(get_db)):
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill
+
     require_download_grant(request)
     comp_code = request.session.get("company_code")
     if not comp_code:
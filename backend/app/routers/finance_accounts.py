@@ -8,8 +8,6 @@ from datetime import date, datetime, timedelta
 import io
 from pathlib import Path
 import re
-import openpyxl
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 import logging
 
 from app.database import get_db
@@ -33,13 +31,13 @@ from app.database.models.enterprise_finance import (
     SalaryProcessing,
     ProductionCostAllocation,
     BillAllocation,
-    ForexRevaluation,
 )
 from app.database.models.gst_models import GSTRegister, GSTRFilingStatus, ITCUtilization
 from app.database.models.assets import FixedAssetMaster, DepreciationSchedule
 from app.database.models.invoices import ExportDocumentFile
 from app.services.posting_engine import PostingEngineService
 from app.services.bill_accounting import cancel_linked_bill_voucher, ensure_bill_accounting_schema
+from app.services.forex_revaluation import run_forex_revaluation
 from app.services.payroll_statutory import calculate_pf_esi, effective_statutory_record
 from app.services.salary_advance_recovery import preview_monthly_advance_recovery, sync_monthly_advance_recovery
 from app.database.models.processing import AuditLog  # Audit trails
@@ -1006,80 +1004,21 @@ def get_customer_receivables_history(request: Request, db: Session = Depends(get
 
 @router.post("/customer_receivables/forex-revaluation")
 def run_customer_forex_revaluation(request: Request, payload: ForexRevaluationRunSchema, db: Session = Depends(get_db)):
-    """Reverse the prior run and post period-end unrealised FX per open invoice."""
+    """Reverse the prior run and post period-end unrealised FX for all open invoices (consolidated journals)."""
     comp_code = request.session.get("company_code")
     email = request.session.get("email") or "SYSTEM"
     if not comp_code:
         return JSONResponse({"success": False, "message": "Unauthorized"}, status_code=401)
-    rates = {str(code).strip().upper(): float(rate) for code, rate in payload.closing_rates.items() if float(rate) > 0}
-    if not rates:
+    if not any(float(rate) > 0 for rate in payload.closing_rates.values()):
         return JSONResponse({"success": False, "message": "At least one valid closing exchange rate is required"}, status_code=400)
-    duplicate = db.query(ForexRevaluation.id).filter(
-        ForexRevaluation.company_id == comp_code,
-        ForexRevaluation.as_of_date == payload.as_of_date,
-    ).first()
-    if duplicate:
-        return JSONResponse({"success": False, "message": "Forex revaluation already exists for this date"}, status_code=400)
-    receivables = db.query(CustomerReceivable).filter(
-        CustomerReceivable.company_id == comp_code,
-        CustomerReceivable.is_cancelled != True,
-        CustomerReceivable.balance_amount > 0.01,
-        CustomerReceivable.currency != "INR",
-    ).all()
-    posted = skipped = 0
-    net_gain_loss = 0.0
     try:
-        for source in receivables:
-            currency = str(source.currency or "USD").strip().upper()
-            closing_rate = rates.get(currency)
-            booking_rate = float(source.exchange_rate or 0)
-            if not closing_rate or booking_rate <= 0 or float(source.invoice_value_inr or 0) <= 0:
-                skipped += 1
-                continue
-            previous = db.query(ForexRevaluation).filter(
-                ForexRevaluation.company_id == comp_code,
-                ForexRevaluation.receivable_id == source.id,
-                ForexRevaluation.is_reversed == False,
-            ).order_by(ForexRevaluation.as_of_date.desc()).first()
-            if previous:
-                PostingEngineService.reverse_voucher(
-                    db, comp_code, previous.journal_id,
-                    f"Forex revaluation rolled forward to {payload.as_of_date.isoformat()}", email,
-                    reversal_date=payload.as_of_date,
-                )
-                previous.is_reversed = True
-            foreign_balance = round(float(source.invoice_value_foreign or 0) * float(source.balance_amount or 0) / float(source.invoice_value_inr), 4)
-            gain_loss = round(foreign_balance * (closing_rate - booking_rate), 2)
-            if abs(gain_loss) < 0.01:
-                skipped += 1
-                continue
-            customer = f"{source.buyer_name} - Customer A/c" if not str(source.buyer_name).lower().endswith("a/c") else source.buyer_name
-            if gain_loss > 0:
-                details = [
-                    amount_line(db, comp_code, gain_loss, 0.0, source.invoice_no, ledger_name=customer, group_name="Sundry Debtors", group_type="ASSET", parent_group_name="Current Assets"),
-                    amount_line(db, comp_code, 0.0, gain_loss, source.invoice_no, ledger_name="Unrealised Forex Gain A/c", group_name="Indirect Incomes", group_type="INCOME"),
-                ]
-            else:
-                value = abs(gain_loss)
-                details = [
-                    amount_line(db, comp_code, value, 0.0, source.invoice_no, ledger_name="Unrealised Forex Loss A/c", group_name="Indirect Expenses", group_type="EXPENSE"),
-                    amount_line(db, comp_code, 0.0, value, source.invoice_no, ledger_name=customer, group_name="Sundry Debtors", group_type="ASSET", parent_group_name="Current Assets"),
-                ]
-            voucher = PostingEngineService.create_voucher(
-                db, comp_code, "Journal", payload.as_of_date,
-                f"Unrealised forex revaluation for invoice {source.invoice_no}", details,
-                reference_no=f"FX-{source.invoice_no}"[:50], created_by=email,
-            )
-            db.add(ForexRevaluation(
-                company_id=comp_code, receivable_id=source.id, as_of_date=payload.as_of_date,
-                currency_code=currency, foreign_balance=foreign_balance,
-                booking_rate=booking_rate, closing_rate=closing_rate,
-                gain_loss_amount=gain_loss, journal_id=voucher.id, created_by=email,
-            ))
-            posted += 1
-            net_gain_loss += gain_loss
+        result = run_forex_revaluation(db, comp_code, payload.as_of_date, payload.closing_rates, email)
         db.commit()
-        return {"success": True, "message": f"Posted {posted} forex revaluations; skipped {skipped}.", "posted": posted, "skipped": skipped, "net_gain_loss": round(net_gain_loss, 2)}
+        return {
+            "success": True,
+            "message": f"Posted {result['posted']} forex revaluations; skipped {result['skipped']}.",
+            **result,
+        }
     except Exception as exc:
         db.rollback()
         return JSONResponse({"success": False, "message": str(exc)}, status_code=400)
@@ -8,7 +8,8 @@ import logging
 from app.database import get_db
 from app.database.models.helpdesk import SupportTicket, TicketMessage
 from app.database.models.users import User, Company, UserLoginActivity
-from app.routers.auth import professional_email_html, send_email
+from app.routers.auth import professional_email_html
+from app.services.email_queue import enqueue_email
 from app.utils.timezone import ist_now
 
 # Logger Setup
@@ -251,36 +252,37 @@ async def approve_company(company_code: str, request: Request, db: Session = Dep
         return JSONResponse(status_code=404, content={"success": False, "error": "Company not found"})
 
     comp.is_active = True
-    db.commit()
     admin_user = db.query(User).filter(User.company_id == comp.id, User.role == "admin").first()
     recipient = admin_user.email if admin_user and admin_user.email else comp.email
     approved_at = ist_now().strftime("%d-%m-%Y %I:%M %p IST")
 
     if recipient:
-        try:
-            send_email(
-                recipient,
-                "SVBK - Account Approved",
-                professional_email_html(
-                    title="Your SVBK account is approved",
-                    intro=f"{comp.company_name} has been approved and your ERP access is now active.",
-                    content_html=f"""
-                      <table role="presentation" width="100%" cellspacing="0" cellpadding="0" style="border-collapse:collapse;margin-top:14px;">
-                        <tr>
-                          <td style="padding:12px;background:#f8fbff;border:1px solid #dbeafe;border-radius:8px;">
-                            <div style="font-size:12px;color:#64748b;text-transform:uppercase;letter-spacing:.06em;">Company ID</div>
-                            <div style="font-size:24px;font-weight:800;color:#1d4ed8;margin-top:4px;">{comp.company_code}</div>
-                          </td>
-                        </tr>
-                      </table>
-                      <p style="margin:14px 0 0;color:#475569;font-size:14px;line-height:1.6;"><strong>Approved At:</strong> {approved_at}</p>
-                      <p style="margin:16px 0 0;color:#475569;font-size:14px;line-height:1.6;">You can now log in to SVBK using your registered email and password.</p>
-                    """,
-                    note="If you have trouble logging in, please contact SVBK support."
-                )
-            )
-        except Exception as e:
-            logger.error(f"Approval confirmation email failed for {recipient}: {e}")
+        # Queued with the approval, so a slow mail provider never holds the request.
+        enqueue_email(
+            db,
+            [recipient],
+            "SVBK - Account Approved",
+            professional_email_html(
+                title="Your SVBK account is approved",
+                intro=f"{comp.company_name} has been approved and your ERP access is now active.",
+                content_html=f"""
+                  <table role="presentation" width="100%" cellspacing="0" cellpadding="0" style="border-collapse:collapse;margin-top:14px;">
+                    <tr>
+                      <td style="padding:12px;background:#f8fbff;border:1px solid #dbeafe;border-radius:8px;">
+                        <div style="font-size:12px;color:#64748b;text-transform:uppercase;letter-spacing:.06em;">Company ID</div>
+                        <div style="font-size:24px;font-weight:800;color:#1d4ed8;margin-top:4px;">{comp.company_code}</div>
+                      </td>
+                    </tr>
+                  </table>
+                  <p style="margin:14px 0 0;color:#475569;font-size:14px;line-height:1.6;"><strong>Approved At:</strong> {approved_at}</p>
+                  <p style="margin:16px 0 0;color:#475569;font-size:14px;line-height:1.6;">You can now log in to SVBK using your registered email and password.</p>
+                """,
+                note="If you have trouble logging in, please contact SVBK support."
+            ),
+            company_id=comp.company_code,
+            category="company_approval",
+        )
+    db.commit()
 
     return {"success": True, "message": f"Company {comp.company_name} approved successfully!"}
 
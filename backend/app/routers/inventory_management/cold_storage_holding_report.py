@@ -11,7 +11,6 @@ from datetime import datetime, date
 from app.utils.timezone import ist_now
 from datetime import timedelta
 from io import BytesIO
-from openpyxl import Workbook
 import math
 from app.utils.global_filters import get_global_filters
 
@@ -324,6 +323,8 @@ async def delete_entry(request: Request, payload: dict = Body(...), db: Session
 # ------------------------------------------------------------
 @router.get("/export_xlsx")
 def export_xlsx(request: Request, db: Session = Depends(get_db), from_date: str = "", to_date: str = ""):
+    from openpyxl import Workbook
+
     comp_code = request.session.get("company_code")
     if not comp_code: return RedirectResponse("/auth/login")
 
@@ -20,7 +20,6 @@ from app.database.models.criteria import (
     coldstore_locations, species as species_model
 )
 
-from app.services.inventory_summary_service import InventorySummaryService
 from app.services.production_requirements_service import ProductionRequirementService
 from app.utils.global_filters import get_global_filters
 from app.services.cache import invalidate_company_cache
@@ -290,7 +289,6 @@ def save_stock_in(
     db.add(entry)
     db.commit()
     
-    InventorySummaryService.refresh_inventory_summary(db=db, company_id=company_code)
     ProductionRequirementService.refresh_requirements(db=db, company_id=company_code)
     invalidate_company_cache(company_code, "inventory_report")
     invalidate_company_cache(company_code, "inventory_dashboard")
@@ -397,7 +395,6 @@ def stock_out_save(
 
     db.commit()
     
-    InventorySummaryService.refresh_inventory_summary(db=db, company_id=company_code)
     ProductionRequirementService.refresh_requirements(db=db, company_id=company_code)
     invalidate_company_cache(company_code, "inventory_report")
     invalidate_company_cache(company_code, "inventory_dashboard")
@@ -429,7 +426,6 @@ def delete_stock_entry(id: int, request: Request, cancel_reason: str = Form(None
         
         db.commit()
         
-        InventorySummaryService.refresh_inventory_summary(db=db, company_id=company_code)
         ProductionRequirementService.refresh_requirements(db=db, company_id=company_code)
         invalidate_company_cache(company_code, "inventory_report")
         invalidate_company_cache(company_code, "inventory_dashboard")
@@ -13,21 +13,17 @@ from zoneinfo import ZoneInfo
 from app.utils.timezone import ist_now
 from app.utils.global_filters import get_global_filters
 from app.services.cache import cache_get_or_set, invalidate_company_cache
+from app.services.financial_periods import financial_years as company_financial_years, fy_bounds
+from app.services.master_data import get_tenant_masters
 
-import openpyxl
 from io import BytesIO
 from app.services.pdf_renderer import render_pdf_from_html
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
 
 from app.database import get_db
 from app.database.models.inventory_management import stock_entry
 from app.database.models.users import Company
 from app.database.models.processing import AuditLog, GateEntry
-from app.database.models.criteria import (
-    production_for as production_for_model, production_at, freezers, packing_styles, production_types,
-    glazes, varieties, grades, brands, species as species_model
-)
+from app.database.models.criteria import packing_styles
 
 router = APIRouter(prefix="/stock_report", tags=["STOCK REPORT"])
 
@@ -100,41 +96,22 @@ async def stock_report_page(
         return RedirectResponse("/auth/login", status_code=302)
 
     def build_stock_report_masters():
-        all_dates = db.query(GateEntry.date).filter(GateEntry.company_id == comp_code, GateEntry.date != None).all()
-        fy_set = set()
-        for d_tuple in all_dates:
-            d = d_tuple[0]
-            current_year = d.year
-            fy_set.add(f"{current_year}" if d.month >= 4 else f"{current_year - 1}")
-
-        def get_list(model, attr):
-            return [getattr(x, attr) for x in db.query(model).filter(model.company_id == comp_code).all()]
-
-        try:
-            p_types_data = db.query(production_types).filter(production_types.company_id == comp_code).all()
-        except Exception:
-            p_types_data = db.query(production_types).all()
-
-        prod_types_list = []
-        for x in p_types_data:
-            val = getattr(x, "type_name", None) or getattr(x, "production_type", None) or getattr(x, "type_of_production", None)
-            if val:
-                prod_types_list.append(val)
-        prod_types_list = sorted(list(set(prod_types_list))) or ["PROCESSED", "SEMIPROCESSED", "RAW"]
+        masters = get_tenant_masters(db, comp_code)
+        prod_types_list = sorted(set(filter(None, masters.production_types))) or ["PROCESSED", "SEMIPROCESSED", "RAW"]
 
         company_name, company_address = get_company_info(db, comp_code)
         return {
-            "financial_years": sorted(list(fy_set), reverse=True),
-            "species_list": get_list(species_model, "species_name"),
-            "brands_list": get_list(brands, "brand_name"),
-            "production_for_list": sorted({x.production_for for x in db.query(production_for_model).filter(production_for_model.company_id == comp_code).all() if x.production_for}),
+            "financial_years": [str(year) for year in company_financial_years(db, comp_code)],
+            "species_list": list(masters.species),
+            "brands_list": list(masters.brands),
+            "production_for_list": sorted({p.name for p in masters.production_for if p.name}),
             "type_of_production_list": prod_types_list,
-            "production_at_list": get_list(production_at, "production_at"),
-            "freezers_list": get_list(freezers, "freezer_name"),
-            "packing_styles_list": get_list(packing_styles, "packing_style"),
-            "glazes_list": get_list(glazes, "glaze_name"),
-            "varieties_list": get_list(varieties, "variety_name"),
-            "grades_list": get_list(grades, "grade_name"),
+            "production_at_list": list(masters.production_at),
+            "freezers_list": list(masters.freezers),
+            "packing_styles_list": [p.packing_style for p in masters.packing_style_rows],
+            "glazes_list": list(masters.glazes),
+            "varieties_list": list(masters.variety_names),
+            "grades_list": list(masters.grades),
             "company_name": company_name,
             "company_address": company_address,
         }
@@ -163,9 +140,7 @@ async def stock_report_page(
         q = q.filter(func.trim(stock_entry.production_at) == func.trim(global_location))
 
     if selected_fy:
-        start_year = int(selected_fy)
-        fy_start = date(start_year, 4, 1)
-        fy_end = date(start_year + 1, 3, 31)
+        fy_start, fy_end = fy_bounds(int(selected_fy))
 
         #      ,
         q = q.filter(
@@ -270,6 +245,9 @@ def export_xlsx(
     batch: str = "", brand: str = "", species: str = "",
     variety: str = "", location: str = ""
 ):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, PatternFill
+
     comp_code = request.session.get("company_code")
 
     # 🟢 FIX: Extract with unique names to bypass explicit route variable clash
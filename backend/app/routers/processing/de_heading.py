@@ -5,7 +5,7 @@ from fastapi import APIRouter, Request, Form, Depends, HTTPException, Query
 from fastapi.responses import RedirectResponse, JSONResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct, cast, String, text, or_, and_
+from sqlalchemy import func, distinct, cast, String, or_, and_
 import datetime as dt
 from datetime import datetime, date
 
@@ -217,6 +217,8 @@ def show_de_heading(request: Request, db: Session = Depends(get_db)):
             "available_qty": round(available_qty, 2)
         })
 
+    trace_locks = batches_used_downstream(db, company_code, [r.batch_number for r in today_data], "deheading")
+
     if request.query_params.get("format") == "json":
         return JSONResponse({
             "contractors": masters["contractors"],
@@ -246,7 +248,8 @@ def show_de_heading(request: Request, db: Session = Depends(get_db)):
                     "cancel_reason": r.cancel_reason,
                     "cancelled_by": r.cancelled_by,
                     "cancelled_at": r.cancelled_at.isoformat() if r.cancelled_at else None,
-                    "email": r.email
+                    "email": r.email,
+                    "used_in": trace_locks.get(r.batch_number)
                 } for r in today_data
             ],
             "hoso_floor_balance": hoso_floor_balance_list
@@ -259,7 +262,7 @@ def show_de_heading(request: Request, db: Session = Depends(get_db)):
             "species": masters["species"], 
             "peeling_locations": peeling_locs,         # 👈 Injecting Strictly Filtered Data
             "prod_for_list": final_prod_for_list,      # 👈 Injecting Strictly Filtered Data
-            "today_data": today_data, 
+            "today_data": today_data, "trace_locks": trace_locks, 
             "hoso_floor_balance": hoso_floor_balance_list,
             "selected_production_for": global_production_for, 
             "selected_location": global_location              
@@ -556,7 +559,7 @@ def save_de_heading(
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
-from app.utils.trace_lock import is_batch_used_downstream_from_deheading
+from app.utils.trace_lock import batches_used_downstream, is_batch_used_downstream_from_deheading
 
 @router.post("/de_heading/delete/{id}")
 def delete_de_heading(
@@ -621,61 +624,7 @@ def delete_de_heading(
 # =====================================================
 # TABLE REGISTRATION ENDPOINTS (De-Heading)
 # =====================================================
-import threading
-
-_TABLE_REGISTRATIONS_SCHEMA_ENSURED = False
-_TABLE_REGISTRATIONS_SCHEMA_LOCK = threading.Lock()
-
-
-def ensure_table_registrations_schema(db: Session):
-    global _TABLE_REGISTRATIONS_SCHEMA_ENSURED
-    if _TABLE_REGISTRATIONS_SCHEMA_ENSURED:
-        return
-
-    with _TABLE_REGISTRATIONS_SCHEMA_LOCK:
-        if _TABLE_REGISTRATIONS_SCHEMA_ENSURED:
-            return
-
-        statements = [
-            """
-            CREATE TABLE IF NOT EXISTS table_registrations (
-                id SERIAL PRIMARY KEY,
-                company_id VARCHAR(50) NOT NULL,
-                date DATE NOT NULL,
-                department VARCHAR(50) NOT NULL,
-                table_no VARCHAR(50) NOT NULL,
-                worker_type VARCHAR(100) NOT NULL,
-                contractor_name VARCHAR(255),
-                no_of_workers INTEGER DEFAULT 0,
-                worker_ids TEXT,
-                production_at VARCHAR(255),
-                production_for VARCHAR(255),
-                status VARCHAR(50) DEFAULT 'Active',
-                created_by VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS company_id VARCHAR(50)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS date DATE",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS department VARCHAR(50)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS table_no VARCHAR(50)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS worker_type VARCHAR(100)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS contractor_name VARCHAR(255)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS no_of_workers INTEGER DEFAULT 0",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS worker_ids TEXT",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS production_at VARCHAR(255)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS production_for VARCHAR(255)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS status VARCHAR(50) DEFAULT 'Active'",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS created_by VARCHAR(255)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
-        ]
-        try:
-            for stmt in statements:
-                db.execute(text(stmt))
-            db.commit()
-            _TABLE_REGISTRATIONS_SCHEMA_ENSURED = True
-        except Exception as e:
-            db.rollback()
+from app.routers.processing.peeling import ensure_table_registrations_schema
 
 @router.get("/de_heading/table_registrations")
 def get_de_heading_table_registrations(request: Request, date_val: str = Query(None), db: Session = Depends(get_db)):
@@ -1,16 +1,17 @@
 import re
 import json
+import logging
 import uuid
-from fastapi import APIRouter, Request, Depends, Form, BackgroundTasks
+from fastapi import APIRouter, Request, Depends, Form
 from fastapi.responses import RedirectResponse, JSONResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct, or_
+from sqlalchemy import func, distinct, literal_column, or_
 from datetime import datetime, date
 from app.utils.timezone import ist_now
 
-from app.services.brevo_email import send_bulk_email
+from app.services.email_queue import enqueue_email
 from app.utils.company_service import get_gate_entry_report_emails
 
 from app.database import get_db
@@ -23,10 +24,6 @@ from app.database.models.processing import (
 from app.database.models.attendance import EmployeeRegistration
 from app.database.models.criteria import (
     purposes,
-    suppliers,
-    purchasing_locations,
-    vehicle_numbers,
-    production_for,
     production_at,
     peeling_at,
     vendors,
@@ -34,8 +31,10 @@ from app.database.models.criteria import (
 from app.utils.global_filters import get_global_filters
 from app.utils.edit_lock import is_edit_locked, edit_lock_message
 from app.services.cache import invalidate_company_cache
+from app.services.master_data import get_tenant_masters
 
 router = APIRouter(tags=["GATE ENTRY"])
+logger = logging.getLogger(__name__)
 templates = Jinja2Templates(directory="app/templates")
 
 GOODS_GATE_CATEGORIES = [
@@ -225,26 +224,48 @@ def _refresh_return_status(db: Session, parent: GoodsGateMovement) -> None:
 # =========================================================
 # COMMON DROPDOWNS & SEQUENCE LOGIC (STRICT USER PERMISSION & FILTER LOCK)
 # =========================================================
+def latest_gate_sequences(db: Session, comp: str) -> dict:
+    """Newest gate entry per (production_for, RECEIVING CENTER) for a company.
+
+    One grouped MAX(id) query served by the ix_gate_entry_company_center_sequence
+    expression index (company_id, production_for, normalised receiving_center,
+    id); only the sequence columns of the winning rows are loaded. The group
+    key below must stay the indexed expression, with the empty string inlined.
+    """
+    center_key = func.upper(func.trim(func.coalesce(GateEntry.receiving_center, literal_column("''"))))
+    latest_ids = (
+        db.query(func.max(GateEntry.id))
+        .filter(GateEntry.company_id == comp)
+        .group_by(GateEntry.production_for, center_key)
+    )
+    rows = db.query(
+        GateEntry.id,
+        GateEntry.production_for,
+        GateEntry.receiving_center,
+        GateEntry.batch_number,
+        GateEntry.challan_number,
+        GateEntry.gate_pass_number,
+    ).filter(GateEntry.id.in_(latest_ids.scalar_subquery())).all()
+
+    latest = {}
+    for row in rows:
+        key = (row.production_for, str(row.receiving_center or "").strip().upper())
+        if key not in latest or row.id > latest[key].id:
+            latest[key] = row
+    return latest
+
+
 def load_dropdowns(db: Session, comp: str, user_allowed_locations: list = None, global_p_for: str = None, global_loc: str = None):
-    # Fetching master data company-wise
-    supplier_list = [
-        x.supplier_name for x in db.query(suppliers)
-        .filter(suppliers.company_id == comp)
-        .order_by(suppliers.supplier_name).all()
-    ]
+    # Fetching master data company-wise (served from the tenant master cache)
+    masters = get_tenant_masters(db, comp)
+    supplier_list = sorted(masters.suppliers)
 
     # Purchasing Location is a different lookup from the active Plant Location
     # (Peeling At). Applying the plant filter here hides valid purchasing
     # locations whenever a plant is selected globally.
-    loc_q = db.query(purchasing_locations).filter(purchasing_locations.company_id == comp)
-
-    location_list = [x.location_name for x in loc_q.order_by(purchasing_locations.location_name).all()]
+    location_list = sorted(masters.purchasing_locations)
 
-    vehicle_list = [
-        x.vehicle_number for x in db.query(vehicle_numbers)
-        .filter(vehicle_numbers.company_id == comp)
-        .order_by(vehicle_numbers.vehicle_number).all()
-    ]
+    vehicle_list = sorted(masters.vehicles)
 
     driver_rows = db.query(EmployeeRegistration.employee_name).filter(
         EmployeeRegistration.company_id == comp,
@@ -256,53 +277,49 @@ def load_dropdowns(db: Session, comp: str, user_allowed_locations: list = None,
     ]
 
     # Peeling At / Production At Factory dropdown layered with location restrictions
-    pa_q = db.query(production_at.production_at).filter(production_at.company_id == comp)
-    pe_q = db.query(peeling_at.peeling_at).filter(peeling_at.company_id == comp)
-    if user_allowed_locations:
-        allowed_clean = [loc.strip().upper() for loc in user_allowed_locations if loc.strip()]
-        if allowed_clean:
-            pa_q = pa_q.filter(func.upper(func.trim(production_at.production_at)).in_(allowed_clean))
-            pe_q = pe_q.filter(func.upper(func.trim(peeling_at.peeling_at)).in_(allowed_clean))
-    if global_loc:
-        pa_q = pa_q.filter(func.trim(production_at.production_at) == func.trim(global_loc))
-        pe_q = pe_q.filter(func.trim(peeling_at.peeling_at) == func.trim(global_loc))
+    allowed_clean = {loc.strip().upper() for loc in user_allowed_locations or [] if loc.strip()}
+    global_loc_clean = global_loc.strip() if global_loc else None
+
+    def plant_visible(name):
+        if not name:
+            return False
+        if allowed_clean and name.strip().upper() not in allowed_clean:
+            return False
+        return not global_loc_clean or name.strip() == global_loc_clean
 
     raw_peeling_list = (
-        [x[0] for x in pa_q.order_by(production_at.production_at).all() if x[0]] +
-        [x[0] for x in pe_q.order_by(peeling_at.peeling_at).all() if x[0]]
+        sorted(name for name in masters.production_at if plant_visible(name)) +
+        sorted(name for name in masters.peeling_at if plant_visible(name))
     )
     peeling_list = list(dict.fromkeys(raw_peeling_list))
 
-    prod_q = db.query(production_for.production_for).filter(production_for.company_id == comp)
-    if global_p_for:
-        prod_q = prod_q.filter(func.trim(production_for.production_for) == func.trim(global_p_for))
-
-    prod_for_data = prod_q.distinct().all()
-    prod_for_list = [p[0] for p in prod_for_data]
+    prod_for_list = list(dict.fromkeys(
+        p.name for p in masters.production_for
+        if not global_p_for or str(p.name or "").strip() == global_p_for.strip()
+    ))
 
-    # --- AUTO-INCREMENT MATRIX ENGINE (Optimized to Single DB Query) ---
+    # --- AUTO-INCREMENT MATRIX ENGINE ---
+    # Only the newest entry per (production_for, receiving center) is needed,
+    # so the work is O(production_for x locations) instead of O(history).
+    latest = latest_gate_sequences(db, comp)
     last_batch_map = {}
     last_challan_map = {}
     last_gp_combo_map = {}
 
-    # Fetch all gate entries for the company ordered by id desc (latest first)
-    all_gate_entries = db.query(GateEntry).filter(GateEntry.company_id == comp).order_by(GateEntry.id.desc()).all()
-
     for p_name in prod_for_list:
-        last_entry = next((g for g in all_gate_entries if g.production_for == p_name), None)
+        candidates = [row for (p_key, _), row in latest.items() if p_key == p_name]
+        last_entry = max(candidates, key=lambda row: row.id, default=None)
         last_batch_map[p_name] = last_entry.batch_number if last_entry else ""
         last_challan_map[p_name] = last_entry.challan_number if last_entry else ""
 
         last_gp_combo_map[p_name] = {}
         for f_name in peeling_list:
             f_clean = f_name.strip().upper()
-            last_gp_entry = next((g for g in all_gate_entries if g.production_for == p_name and str(g.receiving_center or "").strip().upper() == f_clean), None)
-            if last_gp_entry:
-                last_gp_combo_map[p_name][f_clean] = last_gp_entry.gate_pass_number
-            else:
-                last_gp_combo_map[p_name][f_clean] = ""
+            last_gp_entry = latest.get((p_name, f_clean))
+            last_gp_combo_map[p_name][f_clean] = last_gp_entry.gate_pass_number if last_gp_entry else ""
 
-    last_gp_backup = all_gate_entries[0].gate_pass_number if all_gate_entries else ""
+    newest = max(latest.values(), key=lambda row: row.id, default=None)
+    last_gp_backup = newest.gate_pass_number if newest else ""
 
     return (
         supplier_list,
@@ -446,6 +463,7 @@ def gate_entry_page(request: Request, db: Session = Depends(get_db)):
         + vendor_names
         + history_values(goods_history_q, GoodsGateMovement.party_name)
     ))
+    trace_locks = batches_used_downstream(db, comp, [r.batch_number for r in today_rows], "gate_entry")
 
     if request.query_params.get("format") == "json":
         return JSONResponse({
@@ -486,7 +504,8 @@ def gate_entry_page(request: Request, db: Session = Depends(get_db)):
                     "cancel_reason": r.cancel_reason,
                     "cancelled_by": r.cancelled_by,
                     "cancelled_at": r.cancelled_at.isoformat() if r.cancelled_at else None,
-                    "email": r.email
+                    "email": r.email,
+                    "used_in": trace_locks.get(r.batch_number)
                 } for r in today_rows
             ]
         })
@@ -511,6 +530,7 @@ def gate_entry_page(request: Request, db: Session = Depends(get_db)):
             "last_gp_map_json": lgp_json,
             "last_gp_value": last_gp,
             "today_data": today_rows,
+            "trace_locks": trace_locks,
             "selected_production_for": global_production_for,
             "selected_location": global_location,
             "edit_data": None
@@ -851,36 +871,34 @@ def cancel_goods_gate_movement(
 
 
 # =========================================================
-# EMAIL BACKGROUND TASK (Speed Optimization)
+# EMAIL NOTIFICATION (queued, sent by the email dispatcher)
 # =========================================================
-def send_gate_notification(db: Session, comp: str, row_id: int):
-    try:
-        row = db.query(GateEntry).filter(GateEntry.id == row_id).first()
-        if not row: return
-
-        emails = get_gate_entry_report_emails(db, comp)
-        if emails:
-            html = templates.get_template("emails/gate_entry_notification.html").render(
-                batch_number=row.batch_number, challan_number=row.challan_number,
-                gate_pass_number=row.gate_pass_number, receiving_center=row.receiving_center,
-                supplier_name=row.supplier_name, purchasing_location=row.purchasing_location,
-                vehicle_number=row.vehicle_number, production_for=row.production_for,
-                no_of_material_boxes=row.no_of_material_boxes, no_of_empty_boxes=row.no_of_empty_boxes,
-                no_of_ice_boxes=row.no_of_ice_boxes, species=row.species, date=row.date, time=row.time,
-                email=row.email, company_id=row.company_id
-            )
-            text = (
-                f"SVBK Gate Entry Notification\n"
-                f"Batch: {row.batch_number}\n"
-                f"Vehicle: {row.vehicle_number}\n"
-                f"Receiving Center: {row.receiving_center}\n"
-                f"Supplier: {row.supplier_name}\n"
-                f"Date/Time: {row.date} {row.time}\n"
-                f"Entered By: {row.email}"
-            )
-            send_bulk_email(emails, f"SVBK - Vehicle Arrived: Batch {row.batch_number}", html, text=text)
-    except Exception as e:
-        print(f"Mail error ignored: {e}")
+def queue_gate_notification(db: Session, comp: str, row: GateEntry):
+    emails = get_gate_entry_report_emails(db, comp)
+    if not emails:
+        return None
+    html = templates.get_template("emails/gate_entry_notification.html").render(
+        batch_number=row.batch_number, challan_number=row.challan_number,
+        gate_pass_number=row.gate_pass_number, receiving_center=row.receiving_center,
+        supplier_name=row.supplier_name, purchasing_location=row.purchasing_location,
+        vehicle_number=row.vehicle_number, production_for=row.production_for,
+        no_of_material_boxes=row.no_of_material_boxes, no_of_empty_boxes=row.no_of_empty_boxes,
+        no_of_ice_boxes=row.no_of_ice_boxes, species=row.species, date=row.date, time=row.time,
+        email=row.email, company_id=row.company_id
+    )
+    text = (
+        f"SVBK Gate Entry Notification\n"
+        f"Batch: {row.batch_number}\n"
+        f"Vehicle: {row.vehicle_number}\n"
+        f"Receiving Center: {row.receiving_center}\n"
+        f"Supplier: {row.supplier_name}\n"
+        f"Date/Time: {row.date} {row.time}\n"
+        f"Entered By: {row.email}"
+    )
+    return enqueue_email(
+        db, emails, f"SVBK - Vehicle Arrived: Batch {row.batch_number}", html,
+        text=text, company_id=comp, category="gate_entry",
+    )
 
 
 # =========================================================
@@ -888,7 +906,6 @@ def send_gate_notification(db: Session, comp: str, row_id: int):
 # =========================================================
 @router.post("/gate_entry")
 async def save_entry(
-    background_tasks: BackgroundTasks,
     request: Request,
     batch_number: str = Form(...),
     challan_number: str = Form(...),
@@ -971,11 +988,16 @@ async def save_entry(
     )
 
     db.add(row)
+    db.flush()
+    # Queued in the entry's transaction; a mail problem never blocks the save.
+    try:
+        with db.begin_nested():
+            queue_gate_notification(db, comp, row)
+    except Exception as e:
+        logger.warning("Gate entry mail not queued for %s: %s", comp, e)
     db.commit()
     _invalidate_gate_entry_caches(comp)
-    db.refresh(row)
 
-    background_tasks.add_task(send_gate_notification, db, comp, row.id)
     return JSONResponse({"status": "success", "message": "Gate Entry Saved Successfully!"})
 
 
@@ -1037,7 +1059,7 @@ async def update_entry(
     return JSONResponse({"status": "success", "message": "Gate Entry Updated Successfully!"})
 
 
-from app.utils.trace_lock import is_batch_used_in_rmp
+from app.utils.trace_lock import batches_used_downstream, is_batch_used_in_rmp
 
 @router.post("/gate_entry/delete/{id}")
 def delete_entry(
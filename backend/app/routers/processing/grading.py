@@ -327,6 +327,8 @@ def _render_grading_page(request: Request, db: Session):
 
     deheading_pending = pending_pool_q.order_by(HlsoForGrading.date.asc(), HlsoForGrading.time.asc()).all()
 
+    trace_locks = batches_used_downstream(db, company_code, [r.batch_number for r in today_data], "grading")
+
     if request.query_params.get("format") == "json":
         return JSONResponse({
             "species_list": species_list,
@@ -352,7 +354,8 @@ def _render_grading_page(request: Request, db: Session):
                     "cancel_reason": r.cancel_reason,
                     "cancelled_by": r.cancelled_by,
                     "cancelled_at": r.cancelled_at.isoformat() if r.cancelled_at else None,
-                    "email": r.email
+                    "email": r.email,
+                    "used_in": trace_locks.get(r.batch_number)
                 } for r in today_data
             ],
             "hlso_summary": list(hlso_summary.values()),
@@ -380,7 +383,7 @@ def _render_grading_page(request: Request, db: Session):
         request=request, name="processing/grading.html",
         context={
             "species_list": species_list, "variety_list": variety_list, "peeling_locations": peeling_locations,
-            "prod_for_list": prod_for_list, "today_data": today_data,
+            "prod_for_list": prod_for_list, "today_data": today_data, "trace_locks": trace_locks,
             "hlso_summary": list(hlso_summary.values()), "hoso_summary": list(hoso_summary.values()),
             "deheading_pending": deheading_pending,
             "global_production_for": global_production_for or "", 
@@ -641,7 +644,7 @@ def sync_old_data(request: Request, db: Session = Depends(get_db)):
     db.commit()
     return {"status": "success", "message": "All historical data synced successfully!"}
 
-from app.utils.trace_lock import is_batch_used_downstream_from_grading
+from app.utils.trace_lock import batches_used_downstream, is_batch_used_downstream_from_grading
 
 @router.post("/grading/delete/{id}")
 def delete_grading(
@@ -31,6 +31,7 @@ from app.utils.edit_lock import is_edit_locked, edit_lock_message
 from app.utils.cancel_math import signed_sum
 from app.services.bill_accounting import ensure_bill_accounting_schema, post_contractor_source_charge
 from app.services.operational_vouchers import deactivate_operational_charge
+from app.services.schema_readiness import ensure_schema_step
 
 router = APIRouter(tags=["PEELING"])
 templates = Jinja2Templates(directory="app/templates")
@@ -440,6 +441,8 @@ def show_peeling(request: Request, db: Session = Depends(get_db)):
     ))
     success_msg = request.session.pop("success_msg", None)
 
+    trace_locks = batches_used_downstream(db, company_id, [r.batch_number for r in today_data], "peeling")
+
     if request.query_params.get("format") == "json":
         return JSONResponse({
             "varieties": masters["varieties"],
@@ -470,7 +473,8 @@ def show_peeling(request: Request, db: Session = Depends(get_db)):
                     "cancel_reason": r.cancel_reason,
                     "cancelled_by": r.cancelled_by,
                     "cancelled_at": r.cancelled_at.isoformat() if r.cancelled_at else None,
-                    "email": r.email
+                    "email": r.email,
+                    "used_in": trace_locks.get(r.batch_number)
                 } for r in today_data
             ],
             "hlso_floor_balance": hlso_floor_balance,
@@ -490,7 +494,7 @@ def show_peeling(request: Request, db: Session = Depends(get_db)):
             "species": masters["species"], 
             "peeling_locations": pa_list, 
             "prod_for_list": masters["prod_for_list"],
-            "today_data": today_data,                    
+            "today_data": today_data, "trace_locks": trace_locks,                    
             "contractor_summary": contractor_summary,    
             "variety_summary": variety_summary,          
             "hlso_floor_balance": hlso_floor_balance, 
@@ -779,7 +783,7 @@ def save_peeling(
         return JSONResponse({"error": str(e)}, status_code=500) 
 
 
-from app.utils.trace_lock import is_batch_used_downstream_from_peeling
+from app.utils.trace_lock import batches_used_downstream, is_batch_used_downstream_from_peeling
 
 @router.post("/peeling/delete/{id}")
 def delete_peeling(
@@ -856,61 +860,47 @@ def delete_peeling(
 # =====================================================
 # TABLE REGISTRATION ENDPOINTS (Peeling)
 # =====================================================
-import threading
-
-_TABLE_REGISTRATIONS_SCHEMA_ENSURED = False
-_TABLE_REGISTRATIONS_SCHEMA_LOCK = threading.Lock()
-
-
 def ensure_table_registrations_schema(db: Session):
-    global _TABLE_REGISTRATIONS_SCHEMA_ENSURED
-    if _TABLE_REGISTRATIONS_SCHEMA_ENSURED:
-        return
-
-    with _TABLE_REGISTRATIONS_SCHEMA_LOCK:
-        if _TABLE_REGISTRATIONS_SCHEMA_ENSURED:
-            return
-
-        statements = [
-            """
-            CREATE TABLE IF NOT EXISTS table_registrations (
-                id SERIAL PRIMARY KEY,
-                company_id VARCHAR(50) NOT NULL,
-                date DATE NOT NULL,
-                department VARCHAR(50) NOT NULL,
-                table_no VARCHAR(50) NOT NULL,
-                worker_type VARCHAR(100) NOT NULL,
-                contractor_name VARCHAR(255),
-                no_of_workers INTEGER DEFAULT 0,
-                worker_ids TEXT,
-                production_at VARCHAR(255),
-                production_for VARCHAR(255),
-                status VARCHAR(50) DEFAULT 'Active',
-                created_by VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS company_id VARCHAR(50)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS date DATE",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS department VARCHAR(50)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS table_no VARCHAR(50)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS worker_type VARCHAR(100)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS contractor_name VARCHAR(255)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS no_of_workers INTEGER DEFAULT 0",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS worker_ids TEXT",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS production_at VARCHAR(255)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS production_for VARCHAR(255)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS status VARCHAR(50) DEFAULT 'Active'",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS created_by VARCHAR(255)",
-            "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
-        ]
-        try:
-            for stmt in statements:
-                db.execute(text(stmt))
-            db.commit()
-            _TABLE_REGISTRATIONS_SCHEMA_ENSURED = True
-        except Exception as e:
-            db.rollback()
+    ensure_schema_step(db, "table_registrations", commit=True)
+
+
+def apply_table_registrations_schema(db: Session):
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS table_registrations (
+            id SERIAL PRIMARY KEY,
+            company_id VARCHAR(50) NOT NULL,
+            date DATE NOT NULL,
+            department VARCHAR(50) NOT NULL,
+            table_no VARCHAR(50) NOT NULL,
+            worker_type VARCHAR(100) NOT NULL,
+            contractor_name VARCHAR(255),
+            no_of_workers INTEGER DEFAULT 0,
+            worker_ids TEXT,
+            production_at VARCHAR(255),
+            production_for VARCHAR(255),
+            status VARCHAR(50) DEFAULT 'Active',
+            created_by VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS company_id VARCHAR(50)",
+        "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS date DATE",
+        "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS department VARCHAR(50)",
+        "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS table_no VARCHAR(50)",
+        "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS worker_type VARCHAR(100)",
+        "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS contractor_name VARCHAR(255)",
+        "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS no_of_workers INTEGER DEFAULT 0",
+        "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS worker_ids TEXT",
+        "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS production_at VARCHAR(255)",
+        "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS production_for VARCHAR(255)",
+        "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS status VARCHAR(50) DEFAULT 'Active'",
+        "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS created_by VARCHAR(255)",
+        "ALTER TABLE table_registrations ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+    ]
+    for stmt in statements:
+        db.execute(text(stmt))
+
 
 @router.get("/peeling/table_registrations")
 def get_peeling_table_registrations(request: Request, date_val: str = Query(None), db: Session = Depends(get_db)):
@@ -24,6 +24,8 @@ from app.database.models.criteria import (
 )
 from app.utils.global_filters import get_global_filters
 from app.utils.edit_lock import is_edit_locked, edit_lock_message
+from app.services.master_data import get_tenant_masters
+from app.services.net_stock import PLANNING_FIELDS, net_stock_balances, planning_key
 
 router = APIRouter(tags=["PRODUCTION"]) 
 templates = Jinja2Templates(directory="app/templates")
@@ -55,15 +57,7 @@ def extract_number(value, default=0):
 # HELPER: BUILD STOCK KEY
 # -----------------------------------------------------
 def build_stock_key(prod_for, species, variety, grade, packing_style, glaze, freezer):
-    return "|".join([
-        str(prod_for or "").strip().upper(),
-        str(species or "").strip().lower(),
-        str(variety or "").strip().lower(),
-        str(grade or "").strip().lower(),
-        str(packing_style or "").strip().lower(),
-        str(int(extract_number(glaze, 0))),
-        str(freezer or "N/A").strip().lower()
-    ])
+    return "|".join(planning_key(prod_for, species, variety, grade, packing_style, glaze, freezer))
 
 
 # -----------------------------------------------------
@@ -413,37 +407,41 @@ def safe_strftime(val, fmt="%H:%M"):
 # -----------------------------------------------------
 def get_common_data(db: Session, company_code: str, user_allowed_locations: list):
     """Fetch dropdown master data aligned securely with user permissions"""
-    pl_q = db.query(production_at).filter(production_at.company_id == company_code)
-    if user_allowed_locations:
-        pl_q = pl_q.filter(func.upper(func.trim(production_at.production_at)).in_(user_allowed_locations))
-        
+    masters = get_tenant_masters(db, company_code)
+    prod_at_list = sorted(
+        name for name in masters.production_at
+        if not user_allowed_locations or str(name or "").strip().upper() in user_allowed_locations
+    )
+
     return {
-        "brands": [b.brand_name for b in db.query(brands).filter(brands.company_id == company_code).all()],
-        "varieties": [v.variety_name for v in db.query(varieties).filter(varieties.company_id == company_code).all()],
-        "glazes": [g.glaze_name for g in db.query(glazes).filter(glazes.company_id == company_code).all()],
-        "freezers": [f.freezer_name for f in db.query(freezers).filter(freezers.company_id == company_code).all()],
+        "brands": list(masters.brands),
+        "varieties": list(masters.variety_names),
+        "glazes": list(masters.glazes),
+        "freezers": list(masters.freezers),
         "packing_styles": [
             {
                 "packing_style": p.packing_style,
                 "mc_weight": p.mc_weight,
                 "slab_weight": p.slab_weight,
             }
-            for p in db.query(packing_styles).filter(packing_styles.company_id == company_code).all()
+            for p in masters.packing_style_rows
         ],
-        "grades": [g.grade_name for g in db.query(grades).filter(grades.company_id == company_code).all()],
-        "species": [s.species_name for s in db.query(species).filter(species.company_id == company_code).all()],
-        "prod_at_list": [p.production_at for p in pl_q.order_by(production_at.production_at).all()],
-        "prod_for_list": sorted([pf[0] for pf in db.query(distinct(ProductionForMaster.production_for)).filter(ProductionForMaster.company_id == company_code).all() if pf[0] and pf[0].upper().strip() not in {"MAIN UNIT", "GENERAL STOCK", "N/A", "NONE", "NULL"}]),
-        "prod_types_list": [pt.production_type for pt in db.query(production_types).filter(production_types.company_id == company_code).all()],
+        "grades": list(masters.grades),
+        "species": list(masters.species),
+        "prod_at_list": prod_at_list,
+        "prod_for_list": sorted({p.name for p in masters.production_for if p.name and p.name.upper().strip() not in {"MAIN UNIT", "GENERAL STOCK", "N/A", "NONE", "NULL"}}),
+        "prod_types_list": list(masters.production_types),
     }
 
 
 def get_production_calc_masters(db: Session, company_code: str):
+    """Typed lookup maps keyed by ``master_key`` (yields/grade_map grouped by species)."""
+    masters = get_tenant_masters(db, company_code)
     return {
-        "yields": db.query(HOSO_HLSO_Yields).filter(HOSO_HLSO_Yields.company_id == company_code).all(),
-        "packing": db.query(packing_styles).filter(packing_styles.company_id == company_code).all(),
-        "varieties": db.query(varieties).filter(varieties.company_id == company_code).all(),
-        "grade_map": db.query(grade_to_hoso).filter(grade_to_hoso.company_id == company_code).all(),
+        "yields": masters.yields,
+        "packing": masters.packing_styles,
+        "varieties": masters.varieties,
+        "grade_map": masters.grade_map,
     }
 
 
@@ -478,37 +476,12 @@ def production_page(
         user_allowed_locations = [str(loc).strip().upper() for loc in session_locations if str(loc).strip()]
 
     # ========== 1. LOAD MASTER DATA ==========
-    all_stock = db.query(stock_entry).filter(
-        stock_entry.company_id == company_code,
-        stock_entry.is_cancelled.is_not(True),
-    ).all()
     calc_masters = get_production_calc_masters(db, company_code)
     yield_records = calc_masters["yields"]
     p_styles = calc_masters["packing"]
     v_records = calc_masters["varieties"]
     grade_map_list = calc_masters["grade_map"]
 
-    # ========== 2. BUILD STOCK POOL (User Allowed Locations & Global Lockdown) ==========
-    stock_pool = {}
-    for s in all_stock:
-        # 🟢 FIX: checking production_at instead of location
-        s_loc_clean = str(s.production_at or "").strip().upper()
-        
-        if user_allowed_locations and s_loc_clean != "FLOOR" and s_loc_clean not in user_allowed_locations:
-            continue
-        if g_loc_clean and g_loc_clean != "ALL" and s_loc_clean != g_loc_clean:
-            continue
-        if g_prod_clean and g_prod_clean != "ALL" and str(s.production_for or "").strip().upper() != g_prod_clean:
-            continue
-
-        key = build_stock_key(
-            s.production_for, s.species, s.variety, 
-            s.grade, s.packing_style, s.glaze, s.freezer
-        )
-        qty = float(s.quantity or 0)
-        net_qty = qty if str(s.cargo_movement_type).upper() == "IN" else -qty
-        stock_pool[key] = stock_pool.get(key, 0.0) + net_qty
-
     # ========== 3. PRODUCTION AGGREGATION SUBQUERY ==========
     prod_sub_q = db.query(
         Production.batch_number, Production.brand, Production.variety_name,
@@ -559,6 +532,24 @@ def production_page(
 
     requirements_data = q_req.order_by(pending_orders.sl_no.asc()).all()
 
+    # ========== 4b. BUILD STOCK POOL (User Allowed Locations & Global Lockdown) ==========
+    # Net balances per key, scoped in SQL to the visible locations and the
+    # production_for of the listed orders.
+    stock_balances = net_stock_balances(
+        db, company_code,
+        production_at=g_loc_clean if g_loc_clean and g_loc_clean != "ALL" else None,
+        allowed_locations=user_allowed_locations,
+        production_fors={str(row.pending_orders.company_name or "").strip().upper() for row in requirements_data},
+    )
+    stock_pool = {}
+    ref_pool = {}
+    for s in stock_balances:
+        if not g_prod_clean or g_prod_clean == "ALL" or s["production_for"] == g_prod_clean:
+            key = "|".join(s[name] for name in PLANNING_FIELDS)
+            stock_pool[key] = stock_pool.get(key, 0.0) + s["net_qty"]
+        if s["in_qty"] > 0:
+            ref_pool.setdefault((s["production_for"], s["species"], s["variety"], s["freezer"]), []).append(s)
+
     # ========== 5. PROCESS REQUIREMENTS ==========
     usage_history = {}
     final_pending_list = []
@@ -585,7 +576,7 @@ def production_page(
 
         mc_wt = 1.0
         slab_wt = 0.0
-        p_match = next((ps for ps in p_styles if str(ps.packing_style).strip().lower() == p_pack), None)
+        p_match = p_styles.get(p_pack)
         if p_match:
             mc_wt = float(p_match.mc_weight or 1.0)
             slab_wt = float(p_match.slab_weight or 0.0)
@@ -609,7 +600,7 @@ def production_page(
         except (ZeroDivisionError, TypeError): r.net_count_calc = 0
 
         r.nw_grade = "-"
-        rel_grades = [gm for gm in grade_map_list if str(gm.species).strip().lower() == p_spec]
+        rel_grades = grade_map_list.get(p_spec, ())
         if rel_grades and r.net_count_calc > 0:
             nearest_gm = min(rel_grades, key=lambda x: abs(float(x.hlso_count or 0) - r.net_count_calc))
             r.nw_grade = nearest_gm.nw_grade if nearest_gm.nw_grade else "-"
@@ -619,33 +610,21 @@ def production_page(
         p_gl_full_text = str(r.count_glaze or "").strip().upper()
         is_order_nwnc = "NWNC" in p_gl_full_text or p_c_gl_val == 0
         
-        for s in all_stock:
-            # 🟢 FIX: Ensure ref_opt_stock loop respects filters
-            if str(s.production_for or "").strip().upper() != current_row_comp: continue
-            
-            s_loc_clean = str(s.production_at or "").strip().upper()
-            if user_allowed_locations and s_loc_clean != "FLOOR" and s_loc_clean not in user_allowed_locations: continue
-            if g_loc_clean and g_loc_clean != "ALL" and s_loc_clean != g_loc_clean: continue
-
-            s_gl_num = str(int(extract_number(s.glaze, 0)))
+        for s in ref_pool.get((current_row_comp, p_spec, p_var, p_frz), ()):
             match_ref = False
-            
-            if (str(s.species).strip().lower() == p_spec and str(s.variety).strip().lower() == p_var and str(s.freezer or "N/A").strip().lower() == p_frz):
-                if is_order_nwnc:
-                    if (str(s.grade).strip().lower() == p_grad and s_gl_num == "0" and str(s.packing_style).strip().lower() != p_pack):
-                        match_ref = True
-                else:
-                    if (r.nw_grade != "-" and str(s.grade).strip().lower() == str(r.nw_grade).strip().lower() and s_gl_num == "0"):
-                        match_ref = True
-            
+            if is_order_nwnc:
+                if s["grade"] == p_grad and s["glaze"] == "0" and s["packing_style"] != p_pack:
+                    match_ref = True
+            else:
+                if r.nw_grade != "-" and s["grade"] == str(r.nw_grade).strip().lower() and s["glaze"] == "0":
+                    match_ref = True
+
             if match_ref:
-                s_qty = float(s.quantity or 0) if str(s.cargo_movement_type).upper() == "IN" else -float(s.quantity or 0)
-                if s_qty > 0:
-                    r.ref_opt_stock += s_qty
-                    ref_details.append({
-                        "po_no": f"LOC: {str(s.location or 'N/A').upper()}", "available": round(s_qty, 2), 
-                        "utilized": f"AT: {str(s.production_at or 'N/A').upper()}", "balance": round(s_qty, 2)
-                    })
+                r.ref_opt_stock += s["in_qty"]
+                ref_details.append({
+                    "po_no": f"LOC: {s['location'] or 'N/A'}", "available": round(s["in_qty"], 2),
+                    "utilized": f"AT: {s['production_at'] or 'N/A'}", "balance": round(s["in_qty"], 2)
+                })
 
         r.ref_opt_stock = round(r.ref_opt_stock, 2)
         r.ref_json = json.dumps(ref_details)
@@ -654,7 +633,7 @@ def production_page(
         r.pending_production = round(r.existed_stock_util - r.ordered_qty, 2)
         r.prod_pending_mc = int(abs(r.pending_production) / mc_wt) if mc_wt > 0 and r.pending_production < 0 else 0
         
-        v_data = next((v for v in v_records if str(v.variety_name).strip().lower() == p_var), None)
+        v_data = v_records.get(p_var)
         peeling_y = float(v_data.peeling_yield or 100) / 100 if v_data else 1.0
         soaking_y = float(v_data.soaking_yield or 100) / 100 if v_data else 1.0
         
@@ -669,7 +648,7 @@ def production_page(
             if abs(r.pending_production) > 0:
                 r.req_hoso_qty = round(abs(r.pending_production) * w_gl_factor, 2)
         else:
-            sp_yields = [y for y in yield_records if str(y.species).strip().lower() == p_spec]
+            sp_yields = yield_records.get(p_spec, ())
             if sp_yields and r.hl_count_calc > 0:
                 nearest_y = min(sp_yields, key=lambda x: abs(float(x.hlso_count or 0) - r.hl_count_calc))
                 r.hoso_count_calc = nearest_y.hoso_count
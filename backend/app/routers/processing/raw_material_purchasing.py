@@ -489,6 +489,8 @@ def render_rmp_page(request: Request, db: Session, company_code: str, edit_data=
         logger.exception("Unable to load the active RMP grid for tenant %s", company_code)
         report_data = []
 
+    trace_locks = batches_used_downstream(db, company_code, [r.batch_number for r in report_data], "rmp")
+
     if request.query_params.get("format") == "json":
         hsn_map = master_context.get("hsn_map_json")
         prod_batch_map = master_context.get("prod_batch_map_json")
@@ -523,7 +525,8 @@ def render_rmp_page(request: Request, db: Session, company_code: str, edit_data=
                     "cancel_reason": r.cancel_reason,
                     "cancelled_by": r.cancelled_by,
                     "cancelled_at": r.cancelled_at.isoformat() if r.cancelled_at else None,
-                    "email": r.email
+                    "email": r.email,
+                    "used_in": trace_locks.get(r.batch_number)
                 } for r in report_data
             ],
             "supplier_list": master_context.get("supplier_list", []),
@@ -541,7 +544,7 @@ def render_rmp_page(request: Request, db: Session, company_code: str, edit_data=
 
     context = {
         **master_context,
-        "today_data": report_data, "edit_data": edit_data,
+        "today_data": report_data, "trace_locks": trace_locks, "edit_data": edit_data,
         "hoso_summary": hoso_summary, "drill_down_json": json.dumps(drill_down),
         "message": request.session.pop("message", None)
     }
@@ -675,7 +678,7 @@ def update_rmp(
         request.session["message"] = f"❌ Update failed: {str(exc)}"
     return RedirectResponse("/processing/raw_material_purchasing", status_code=303)
 
-from app.utils.trace_lock import is_batch_used_downstream_from_rmp
+from app.utils.trace_lock import batches_used_downstream, is_batch_used_downstream_from_rmp
 
 @router.post("/raw_material_purchasing/delete/{id}")
 def delete_rmp(
@@ -158,6 +158,8 @@ def show_soaking(request: Request, db: Session = Depends(get_db)):
         allowed_locations=user_allowed_locations,
     )
 
+    trace_locks = batches_used_downstream(db, company_id, [r.batch_number for r in today_data], "soaking")
+
     if request.query_params.get("format") == "json":
         return JSONResponse({
             "prod_for_list": masters["prod_for_list"],
@@ -191,7 +193,8 @@ def show_soaking(request: Request, db: Session = Depends(get_db)):
                     "cancel_reason": r.cancel_reason,
                     "cancelled_by": r.cancelled_by,
                     "cancelled_at": r.cancelled_at.isoformat() if r.cancelled_at else None,
-                    "email": r.email
+                    "email": r.email,
+                    "used_in": trace_locks.get(r.batch_number)
                 } for r in today_data
             ],
             "selected_production_for": global_production_for or "",
@@ -202,7 +205,7 @@ def show_soaking(request: Request, db: Session = Depends(get_db)):
         request=request, name="processing/soaking.html",
         context={
             "varieties": masters["varieties"], "species": masters["species"], "chemicals": masters["chemicals"],
-            "production_locations": prod_locs, "prod_for_list": masters["prod_for_list"], "today_data": today_data,
+            "production_locations": prod_locs, "prod_for_list": masters["prod_for_list"], "today_data": today_data, "trace_locks": trace_locks,
             "rows_batch": rows_batch, "global_production_for": global_production_for or "", "global_location": global_location or ""
         }
     )
@@ -434,7 +437,7 @@ def update_soaking(
     return RedirectResponse("/processing/soaking", status_code=303)
 
 
-from app.utils.trace_lock import is_batch_used_downstream_from_soaking
+from app.utils.trace_lock import batches_used_downstream, is_batch_used_downstream_from_soaking
 
 @router.post("/soaking/delete/{id}")
 def delete_soaking(
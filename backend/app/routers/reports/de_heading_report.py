@@ -15,7 +15,6 @@ from app.services.floor_balance_sync import refresh_floor_balance
 from app.utils.global_filters import get_global_filters
 from app.utils.cancel_math import signed_number
 
-from openpyxl import Workbook
 from app.services.pdf_renderer import render_pdf_from_html
 
 from app.database import get_db
@@ -462,6 +461,8 @@ def de_heading_export_pdf(request: Request, ids: str = Query(None), db: Session
 
 @router.get("/export_excel")
 def de_heading_export_excel(request: Request, ids: str = Query(None), db: Session = Depends(get_db)):
+    from openpyxl import Workbook
+
     from app.utils.report_permissions import enforce_report_permission
     enforce_report_permission(request, "report_export")
     company_id = request.session.get("company_code")
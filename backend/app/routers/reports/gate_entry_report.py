@@ -12,9 +12,6 @@ from app.utils.timezone import ist_now
 import datetime as dt
 from io import BytesIO
 
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
 from app.services.pdf_renderer import render_pdf_from_html
 from app.utils.global_filters import get_global_filters
 from app.utils.cancel_math import signed_number
@@ -323,6 +320,10 @@ async def gate_export_excel(
     factory: str = Query(None),
     db: Session = Depends(get_db)
 ):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
+
     from app.utils.report_permissions import enforce_report_permission
     enforce_report_permission(request, "report_export")
     company_id = request.session.get("company_code")
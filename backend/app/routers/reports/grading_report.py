@@ -21,8 +21,6 @@ from app.utils.timezone import ist_now
 from app.utils.global_filters import get_global_filters
 from app.utils.cancel_math import signed_number
 
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
 
 from app.database import get_db
 from app.database.models.processing import Grading, DeHeading, AuditLog
@@ -388,6 +386,9 @@ def export_excel(
     hoso_count: str | None = Query(None),
     db: Session = Depends(get_db),
 ):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment
+
     from app.utils.report_permissions import enforce_report_permission
     enforce_report_permission(request, "report_export")
     company_id = request.session.get("company_code")
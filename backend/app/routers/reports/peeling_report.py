@@ -11,8 +11,6 @@ from sqlalchemy import func
 import datetime as dt
 from datetime import date, datetime
 from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from app.services.floor_balance_sync import refresh_floor_balance
 from app.utils.global_filters import get_global_filters
 from app.utils.cancel_math import signed_number
@@ -424,6 +422,9 @@ def peeling_export_excel(
     ids: str = Query(None), 
     db: Session = Depends(get_db)
 ):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+
     comp_code = request.session.get("company_code")
     q = db.query(Peeling).filter(
         Peeling.company_id == comp_code
@@ -12,8 +12,6 @@ import datetime as dt
 from app.utils.timezone import ist_now
 
 from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Font
 from app.services.pdf_renderer import render_pdf_from_html
 from app.utils.global_filters import get_global_filters
 from app.utils.cancel_math import signed_number, signed_sum
@@ -430,6 +428,9 @@ async def get_all_production_audit(request: Request, db: Session = Depends(get_d
 # ------------------------------------------------------------
 @router.get("/export_xlsx")
 def export_production_xlsx(request: Request, db: Session = Depends(get_db), ids: str = Query(None), from_date: str = "", to_date: str = ""):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+
     comp_code = str(request.session.get("company_code"))
     from app.utils.report_permissions import enforce_report_permission
     enforce_report_permission(request, "report_export")
@@ -12,8 +12,6 @@ from app.utils.timezone import ist_now
 import datetime as dt
 import json
 from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Font
 from app.services.pdf_renderer import render_pdf_from_html
 from app.services.floor_balance_sync import refresh_floor_balance
 from app.utils.global_filters import get_global_filters
@@ -311,6 +309,9 @@ def export_rmp_excel(
     production_for: str = Query(None),
     db: Session = Depends(get_db)
 ):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+
     from app.utils.report_permissions import enforce_report_permission
     enforce_report_permission(request, "report_export")
     comp_code = request.session.get("company_code")
@@ -14,8 +14,6 @@ from app.services.floor_balance_sync import refresh_floor_balance
 from app.utils.global_filters import get_global_filters
 
 from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Font
 
 from app.database import get_db
 from app.database.models.processing import Soaking, AuditLog 
@@ -233,6 +231,9 @@ async def get_all_soaking_audit(request: Request, db: Session = Depends(get_db))
 # ------------------------------------------------------------
 @router.get("/export_excel")
 def soaking_export_excel(request: Request, ids: str = Query(None), db: Session = Depends(get_db)):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+
     company_id = request.session.get("company_code")
     from app.utils.report_permissions import enforce_report_permission
     enforce_report_permission(request, "report_export")
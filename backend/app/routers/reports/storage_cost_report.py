@@ -10,6 +10,7 @@ from app.database import get_db
 from app.database.models.inventory_management import stock_entry as Inventory
 from app.database.models.criteria import production_for as ProductionFor
 from app.database.models.users import Company
+from app.services.storage_fifo import COMBO_FIELDS, billing_state, combo_values
 from app.utils.global_filters import get_global_filters
 
 router = APIRouter()
@@ -47,76 +48,43 @@ def storage_cost_report(
         billing_start_date = date(today.year, today.month, 1)
         billing_end_date = today
 
-    # 🔍 FETCH ALL DATA (FIFO  Billing End Date   )
-    q = db.query(Inventory).filter(Inventory.company_id == company_code)
-    
     # 🟢 FIX 2: Manual screen selection OR Global header selection fallback mechanism
     effective_production_for = global_production_for or production_for
     effective_location = global_location or production_at
 
-    if effective_production_for: 
+    # 📂 COMBO-WISE FIFO STATE (previous closing + this month's movements)
+    combos = billing_state(
+        db, company_code, billing_start_date, billing_end_date,
+        production_for=effective_production_for, production_at=effective_location, freezer=freezer,
+    )
+    first_rows = {}
+    first_ids = [combo["first_entry_id"] for combo in combos if combo.get("first_entry_id")]
+    if first_ids:
+        first_rows = {row.id: row for row in db.query(Inventory).filter(Inventory.id.in_(first_ids)).all()}
+
+    # Movements billed this month ("Original" tab)
+    q = db.query(Inventory).filter(
+        Inventory.company_id == company_code,
+        Inventory.date >= billing_start_date,
+        Inventory.date <= billing_end_date,
+    )
+    if effective_production_for:
         q = q.filter(Inventory.production_for == effective_production_for)
-    if effective_location: 
+    if effective_location:
         q = q.filter(Inventory.production_at == effective_location)
-    if freezer: 
+    if freezer:
         q = q.filter(Inventory.freezer == freezer)
-    
-    all_rows = q.filter(Inventory.date <= billing_end_date).order_by(Inventory.date.asc()).all()
-
-    # 📂 COMBO-WISE GROUPING
-    grouped_dict = {}
+    month_rows = q.order_by(Inventory.date.asc(), Inventory.id.asc()).all()
+    month_ledgers = {}
+    for r in month_rows:
+        month_ledgers.setdefault(combo_values(r), []).append(r)
 
-    for r in all_rows:
-        combo_key = (r.batch_number, r.freezer, r.glaze, r.grade, r.variety, r.packing_style)
-        
-        if combo_key not in grouped_dict:
-            grouped_dict[combo_key] = {
-                "details": r,  
-                "batch_number": r.batch_number,
-                "freezer": r.freezer,
-                "glaze": r.glaze,
-                "grade": r.grade,
-                "variety": r.variety,
-                "packing_style": r.packing_style,
-                "species": r.species,
-                "brand": r.brand,
-                "production_for": r.production_for,
-                "production_at": r.production_at,
-                "opening_mc": 0.0,
-                "monthly_in_mc": 0.0,
-                "monthly_out_mc": 0.0,
-                "monthly_in_qty": 0.0,
-                "in_movements": [], 
-                "this_month_ledger": [], 
-                "earliest_in_date": r.date
-            }
-        
-        data = grouped_dict[combo_key]
-        qty_mc = int(r.no_of_mc or 0)
-        qty_kg = float(r.quantity or 0)
-
-        if r.cargo_movement_type == "IN":
-            data["in_movements"].append({"date": r.date, "qty": qty_mc, "rem": qty_mc})
-            
-            if r.date < billing_start_date:
-                data["opening_mc"] += qty_mc
-            else:
-                data["monthly_in_mc"] += qty_mc
-                data["monthly_in_qty"] += qty_kg
-                data["this_month_ledger"].append(r)
-        else:
-            temp_out = qty_mc
-            for inv in data["in_movements"]:
-                if temp_out <= 0: break
-                take = min(inv["rem"], temp_out)
-                inv["rem"] -= take
-                temp_out -= take
-
-            if r.date < billing_start_date:
-                data["opening_mc"] -= qty_mc
-            else:
-                data["monthly_out_mc"] += qty_mc
-                data["this_month_ledger"].append(r)
+    # Active storage rates, matched per combo below
+    rates = db.query(ProductionFor).filter(
+        ProductionFor.company_id == company_code,
+        ProductionFor.status == "Active",
+        ProductionFor.apply_from <= billing_end_date
+    ).order_by(ProductionFor.apply_from.desc(), ProductionFor.id.asc()).all()
 
     # 💰 FINAL CALCULATIONS
     report_data = []
@@ -125,98 +93,76 @@ def storage_cost_report(
     total_qty_sum = 0.0
     total_holding_sum = 0.0
     total_payable_sum = 0.0
-    
-    for key, item in grouped_dict.items():
-        item["closing_mc"] = item["opening_mc"] + item["monthly_in_mc"] - item["monthly_out_mc"]
-        
-        if item["opening_mc"] == 0 and item["monthly_in_mc"] == 0 and item["monthly_out_mc"] == 0:
-            continue
 
-        costing = db.query(ProductionFor).filter(
-            ProductionFor.company_id == company_code,
-            ProductionFor.production_for == item["production_for"],
-            ProductionFor.freezer_name == item["freezer"],
-            ProductionFor.glaze_percent == item["glaze"],
-            ProductionFor.status == "Active",
-            ProductionFor.apply_from <= billing_end_date
-        ).order_by(ProductionFor.apply_from.desc()).first()
+    for combo in combos:
+        item = {
+            "details": first_rows.get(combo.get("first_entry_id")),
+            "batch_number": combo["batch_number"],
+            "freezer": combo["freezer"],
+            "glaze": combo["glaze"],
+            "grade": combo["grade"],
+            "variety": combo["variety"],
+            "packing_style": combo["packing_style"],
+            "species": combo["species"],
+            "brand": combo["brand"],
+            "production_for": combo["production_for"],
+            "production_at": combo["production_at"],
+            "opening_mc": float(combo["opening_mc"]),
+            "monthly_in_mc": float(combo["monthly_in_mc"]),
+            "monthly_out_mc": float(combo["monthly_out_mc"]),
+            "monthly_in_qty": float(combo["monthly_in_qty"]),
+            "this_month_ledger": month_ledgers.get(tuple(combo[name] for name in COMBO_FIELDS), []),
+            "earliest_in_date": combo["earliest_in_date"],
+        }
+        item["closing_mc"] = item["opening_mc"] + item["monthly_in_mc"] - item["monthly_out_mc"]
 
-        if not costing:
-            costing = db.query(ProductionFor).filter(
-                ProductionFor.company_id == company_code,
-                ProductionFor.production_for == item["production_for"],
-                ProductionFor.freezer_name == item["freezer"],
-                ProductionFor.status == "Active",
-                ProductionFor.apply_from <= billing_end_date
-            ).order_by(ProductionFor.apply_from.desc()).first()
+        costing = next((
+            r for r in rates
+            if r.production_for == item["production_for"] and r.freezer_name == item["freezer"] and r.glaze_percent == item["glaze"]
+        ), None) or next((
+            r for r in rates
+            if r.production_for == item["production_for"] and r.freezer_name == item["freezer"]
+        ), None)
 
         rate = float(costing.rate_per_mc_day) if costing else 0.0
         free_days = int(costing.free_days) if costing else 0
         p_cost_kg = float(costing.production_cost_per_kg) if costing else 0.0
 
-        # We will reconstruct in_movements and track dispatches
-        in_blocks = []
         batch_dispatches = []
-        
-        combo_rows = db.query(Inventory).filter(
-            Inventory.company_id == company_code,
-            Inventory.batch_number == item["batch_number"],
-            Inventory.freezer == item["freezer"],
-            Inventory.glaze == item["glaze"],
-            Inventory.grade == item["grade"],
-            Inventory.variety == item["variety"],
-            Inventory.packing_style == item["packing_style"]
-        ).order_by(Inventory.date.asc(), Inventory.id.asc()).all()
-        
-        for r in combo_rows:
-            qty_mc = int(r.no_of_mc or 0)
-            qty_kg = float(r.quantity or 0)
-            if r.cargo_movement_type == "IN":
-                in_blocks.append({
-                    "date": r.date,
-                    "qty_received": qty_mc,
-                    "current_qty": qty_mc,
-                    "quantity_kg": qty_kg
-                })
+        for dispatch in combo["dispatches"]:
+            inv = dispatch["layer"]
+            take = dispatch["mc_taken"]
+            out_date = dispatch["out_date"]
+            rent_start = inv["date"] + timedelta(days=free_days)
+            calc_start = max(rent_start, billing_start_date)
+            tot_days = (out_date - max(inv["date"], billing_start_date)).days + 1
+            if out_date >= calc_start:
+                pay_days = (out_date - calc_start).days + 1
+                holding_cost_disp = round(pay_days * rate * take, 2)
             else:
-                temp_out = qty_mc
-                for inv in in_blocks:
-                    if temp_out <= 0: break
-                    take = min(inv["current_qty"], temp_out)
-                    if take > 0:
-                        inv["current_qty"] -= take
-                        temp_out -= take
-                        if r.date >= billing_start_date and r.date <= billing_end_date:
-                            rent_start = inv["date"] + timedelta(days=free_days)
-                            calc_start = max(rent_start, billing_start_date)
-                            tot_days = (r.date - max(inv["date"], billing_start_date)).days + 1
-                            if r.date >= calc_start:
-                                pay_days = (r.date - calc_start).days + 1
-                                holding_cost_disp = round(pay_days * rate * take, 2)
-                            else:
-                                pay_days = 0
-                                holding_cost_disp = 0.0
-                            free_days_tm = tot_days - pay_days
-                                
-                            batch_dispatches.append({
-                                "batch_number": item["batch_number"],
-                                "in_date": inv["date"],
-                                "out_date": r.date,
-                                "variety": item["variety"],
-                                "grade": item["grade"],
-                                "freezer": item["freezer"],
-                                "packing_style": item["packing_style"],
-                                "mc_dispatched": take,
-                                "qty_kg": round((take / inv["qty_received"]) * inv["quantity_kg"], 2) if inv["qty_received"] > 0 else 0.0,
-                                "total_days": tot_days,
-                                "free_days_tm": free_days_tm,
-                                "payable_days": pay_days,
-                                "holding_cost_per_mc_day": rate,
-                                "holding_cost": holding_cost_disp
-                            })
+                pay_days = 0
+                holding_cost_disp = 0.0
+            free_days_tm = tot_days - pay_days
+
+            batch_dispatches.append({
+                "batch_number": item["batch_number"],
+                "in_date": inv["date"],
+                "out_date": out_date,
+                "variety": item["variety"],
+                "grade": item["grade"],
+                "freezer": item["freezer"],
+                "packing_style": item["packing_style"],
+                "mc_dispatched": take,
+                "qty_kg": round((take / inv["qty_received"]) * inv["quantity_kg"], 2) if inv["qty_received"] > 0 else 0.0,
+                "total_days": tot_days,
+                "free_days_tm": free_days_tm,
+                "payable_days": pay_days,
+                "holding_cost_per_mc_day": rate,
+                "holding_cost": holding_cost_disp
+            })
 
         batch_holding_cost = 0.0
-        for inv in in_blocks:
+        for inv in combo["layers"]:
             if inv["current_qty"] > 0:
                 rent_start = inv["date"] + timedelta(days=free_days)
                 calc_start = max(rent_start, billing_start_date)
@@ -297,13 +243,14 @@ def storage_cost_report(
         serialized_report_data = []
         for item in report_data:
             ser_item = dict(item)
-            if "details" in ser_item:
+            if ser_item.get("details") is not None:
                 ser_item["details"] = serialize_inventory(ser_item["details"])
+            ser_item["this_month_ledger"] = [serialize_inventory(row) for row in ser_item["this_month_ledger"]]
             serialized_report_data.append(ser_item)
             
         json_context = {
             "report_data": serialized_report_data,
-            "detailed_entries": [serialize_inventory(row) for row in all_rows],
+            "detailed_entries": [serialize_inventory(row) for row in month_rows],
             "available_stock_items": available_stock_items,
             "dispatches_this_month": dispatches_this_month,
             "production_for_list": p_for_list,
@@ -325,7 +272,7 @@ def storage_cost_report(
         name="reports/storage_report.html",
         context={
             "report_data": report_data,
-            "detailed_entries": all_rows,
+            "detailed_entries": month_rows,
             "available_stock_items": available_stock_items,
             "dispatches_this_month": dispatches_this_month,
             "production_for_list": p_for_list,
@@ -21,6 +21,13 @@ from app.database.models.criteria import varieties as VarietyTable, HOSO_HLSO_Yi
 from app.database.models.floor_balance import FloorBalance, FloorBalanceSnapshot 
 from app.database.models.users import Company, User, OTPTable, UserLoginActivity
 from app.utils.cancel_math import active_number, active_sum, signed_number, signed_sum
+from app.services.financial_periods import (
+    current_fy_start,
+    financial_years as company_financial_years,
+    fy_bounds,
+    fy_label,
+    parse_fy_start,
+)
 
 router = APIRouter(prefix="/summary", tags=["SUMMARY"])
 templates = Jinja2Templates(directory="app/templates")
@@ -89,21 +96,6 @@ def _multi_flow_chart_payload(title, unit, series_buckets):
     }
 
 
-def _current_fy_string(today_value=None):
-    today_value = today_value or date.today()
-    if today_value.month >= 4:
-        return f"{today_value.year}-{str(today_value.year + 1)[2:]}"
-    return f"{today_value.year - 1}-{str(today_value.year)[2:]}"
-
-
-def _fy_date_bounds(fy_value):
-    try:
-        start_year = int(str(fy_value).split("-")[0])
-    except (TypeError, ValueError):
-        start_year = date.today().year if date.today().month >= 4 else date.today().year - 1
-    return date(start_year, 4, 1), date(start_year + 1, 3, 31)
-
-
 def _summary_items_from_bucket(bucket, unit="KG", limit=6):
     items = sorted(bucket.items(), key=lambda item: float(item[1].get("qty", 0)), reverse=True)
     summary = []
@@ -315,22 +307,17 @@ async def get_periodic_summary_report(
     production_ats = sorted(set(production_at_values))
 
     # Financial Years Generation
-    all_dates = []
-    for model in [GateEntry, RawMaterialPurchasing, Reprocess, DeHeading, Peeling, Soaking, Production, Grading, stock_entry]:
-        all_dates.extend(db.query(model.date).filter(model.company_id == company_code, model.date != None).all())
-    fy_set = set()
-    for d_tuple in all_dates:
-        d = d_tuple[0]
-        current_year = d.year
-        if d.month >= 4: fy_str = f"{current_year}-{str(current_year + 1)[2:]}"
-        else: fy_str = f"{current_year - 1}-{str(current_year)[2:]}"
-        fy_set.add(fy_str)
-    financial_years = sorted(list(fy_set), reverse=True)
+    financial_years = [
+        fy_label(year) for year in company_financial_years(
+            db, company_code,
+            sources=[model.__tablename__ for model in (GateEntry, RawMaterialPurchasing, Reprocess, DeHeading, Peeling, Soaking, Production, Grading, stock_entry)],
+        )
+    ]
     fy_was_selected = bool(fy)
-    selected_fy = fy or _current_fy_string(today_dt)
+    selected_fy = fy or fy_label(current_fy_start(today_dt))
     if selected_fy not in financial_years:
         financial_years.insert(0, selected_fy)
-    fy_start_dt, fy_end_dt = _fy_date_bounds(selected_fy)
+    fy_start_dt, fy_end_dt = fy_bounds(parse_fy_start(selected_fy))
     fy_start_date = fy_start_dt.strftime("%Y-%m-%d")
     fy_end_date = fy_end_dt.strftime("%Y-%m-%d")
     if fy_was_selected and date_filter_type == "today" and not selected_month and not start_date and not end_date:
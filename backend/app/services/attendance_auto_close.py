@@ -0,0 +1,175 @@
+"""Auto-close of attendance duties left open for 24 hours.
+
+A duty whose ``first_in`` is 24 hours old is closed at ``first_in + 24h`` as
+a DOUBLE duty with pending OT and duty approval, gets an ``AUTO OUT``
+movement and one ``AUTO_OUT_24H`` audit row. ``close_stale_attendance`` does
+that set-wise: one ``UPDATE ... RETURNING`` over every stale duty in scope,
+one executemany for the per-row exit time and movement, one bulk audit
+insert, and one delete of the HR KPI rollups it makes stale.
+
+``run_attendance_auto_close`` is the scheduled job that keeps every company
+current, so pages read already-closed duties; it runs under the
+``attendance_auto_close`` job lease. Punching an employee closes only that
+employee's stale duty, in the punch request.
+"""
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select, update
+
+from app.services.hr_kpi_rollups import invalidate_hr_kpi_rollups
+from app.services.job_leases import acquire_job_lease, release_job_lease
+from app.services.metrics import inc
+from app.utils.timezone import ist_now
+
+logger = logging.getLogger(__name__)
+
+AUTO_CLOSE_AFTER = timedelta(hours=24)
+ATTENDANCE_AUTO_CLOSE_MINUTES = int(os.getenv("ATTENDANCE_AUTO_CLOSE_MINUTES", "10"))
+ATTENDANCE_AUTO_CLOSE_BATCH_SIZE = int(os.getenv("ATTENDANCE_AUTO_CLOSE_BATCH_SIZE", "500"))
+ATTENDANCE_AUTO_CLOSE_LEASE_SECONDS = float(os.getenv("ATTENDANCE_AUTO_CLOSE_LEASE_SECONDS", "300"))
+LEASE_NAME = "attendance_auto_close"
+
+
+def close_stale_attendance(
+    db,
+    company_id: str | None = None,
+    employee_id: str | None = None,
+    location: str | None = None,
+    allowed_locations: list[str] | None = None,
+    closed_by: str = "SYSTEM",
+    now: datetime | None = None,
+    limit: int | None = None,
+) -> list[dict]:
+    """Close stale duties in scope (every company when ``company_id`` is None).
+
+    Flushes through the session but does not commit; returns one dict per
+    closed duty.
+    """
+    from app.database.models.attendance import DailyAttendance
+    from app.database.models.processing import AuditLog
+    from app.routers.attendance.daily_attendance import calculate_duty_type_and_ot
+
+    now = now or ist_now()
+    cutoff = now.replace(tzinfo=None) - AUTO_CLOSE_AFTER
+    stale = [
+        DailyAttendance.status != "CLOSED",
+        DailyAttendance.first_in.isnot(None),
+        DailyAttendance.first_in <= cutoff,
+    ]
+    if company_id:
+        stale.append(DailyAttendance.company_id == company_id)
+    if employee_id:
+        stale.append(DailyAttendance.employee_id == employee_id)
+    if location and location != "ALL":
+        stale.append(func.upper(func.trim(DailyAttendance.production_at)) == location)
+    elif allowed_locations:
+        stale.append(func.upper(func.trim(DailyAttendance.production_at)).in_(allowed_locations))
+    if limit:
+        stale.append(DailyAttendance.id.in_(
+            select(DailyAttendance.id).where(*stale).order_by(DailyAttendance.id).limit(limit).scalar_subquery()
+        ))
+
+    # A full 24 hours is always a DOUBLE duty with 8 OT hours.
+    working_hours = AUTO_CLOSE_AFTER.total_seconds() / 3600
+    duty_type, ot_hours = calculate_duty_type_and_ot(working_hours)
+    closed = db.execute(
+        update(DailyAttendance)
+        .where(*stale)
+        .values(
+            status="CLOSED",
+            working_hours=working_hours,
+            duty_type=duty_type,
+            calculated_ot_hours=ot_hours,
+            ot_status="PENDING",
+            approved_ot_hours=0.0,
+            duty_status="PENDING",
+            duty_approved_by=None,
+        )
+        .returning(
+            DailyAttendance.id,
+            DailyAttendance.company_id,
+            DailyAttendance.employee_id,
+            DailyAttendance.employee_name,
+            DailyAttendance.duty_date,
+            DailyAttendance.first_in,
+            DailyAttendance.movements,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not closed:
+        return []
+
+    rows, exits, audits = [], [], []
+    stale_days = {}
+    edited_at = datetime.now(timezone.utc)
+    for duty in closed:
+        close_time = duty.first_in + AUTO_CLOSE_AFTER
+        movements = list(duty.movements or [])
+        movements.append({"type": "AUTO OUT", "time": close_time.strftime("%H:%M"), "date": close_time.strftime("%Y-%m-%d")})
+        exits.append({"id": duty.id, "exit_time": close_time, "movements": movements})
+        audits.append({
+            "table_name": "daily_attendance",
+            "record_id": duty.id,
+            "company_id": duty.company_id,
+            "field_name": "AUTO_OUT_24H",
+            "old_value": "OPEN",
+            "new_value": f"Emp: {duty.employee_name} ({duty.employee_id}) | Auto closed after 24 hours | {working_hours} Hrs | Duty approval pending",
+            "edited_by": closed_by or "SYSTEM",
+            "edited_at": edited_at,
+        })
+        stale_days[duty.company_id] = min(duty.duty_date or date.min, stale_days.get(duty.company_id, date.max))
+        rows.append({
+            "id": duty.id,
+            "company_id": duty.company_id,
+            "employee_id": duty.employee_id,
+            "employee_name": duty.employee_name,
+            "exit_time": close_time,
+        })
+    db.execute(update(DailyAttendance), exits)
+    db.execute(insert(AuditLog), audits)
+    # The bulk update skips the flush hook; closing moves duties into the approval queue.
+    invalidate_hr_kpi_rollups(db, stale=stale_days)
+    # Instances this session already holds were updated behind the ORM's back.
+    for duty in closed:
+        instance = db.identity_map.get(db.identity_key(DailyAttendance, duty.id))
+        if instance is not None:
+            db.expire(instance)
+    return rows
+
+
+def run_attendance_auto_close(session_factory=None):
+    """Scheduled close of every company's stale duties, in committed batches under the job lease."""
+    if session_factory is None:
+        from app.database import BackgroundSessionLocal as session_factory
+
+    db = session_factory()
+    token = None
+    try:
+        token = acquire_job_lease(db, LEASE_NAME, ATTENDANCE_AUTO_CLOSE_LEASE_SECONDS)
+        if token is None:
+            return "skipped"
+        total = 0
+        while True:
+            closed = close_stale_attendance(db, limit=ATTENDANCE_AUTO_CLOSE_BATCH_SIZE)
+            db.commit()
+            total += len(closed)
+            if len(closed) < ATTENDANCE_AUTO_CLOSE_BATCH_SIZE:
+                break
+        if total:
+            inc("bknr_attendance_auto_closed_total", total)
+            logger.info("Auto-closed %s stale attendance duties", total)
+        return "closed" if total else "clean"
+    except Exception as e:
+        db.rollback()
+        logger.error("Attendance auto-close failed: %s", e)
+        return "failed"
+    finally:
+        if token:
+            try:
+                release_job_lease(db, LEASE_NAME, token)
+            except Exception as e:
+                db.rollback()
+                logger.warning("Attendance auto-close lease release failed: %s", e)
+        db.close()
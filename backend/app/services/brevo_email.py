@@ -1,4 +1,7 @@
-import os, requests
+import logging
+import os
+
+import requests
 
 BREVO_API_KEY = os.getenv("BREVO_API_KEY")
 BREVO_URL = "https://api.brevo.com/v3/smtp/email"
@@ -8,9 +11,62 @@ SENDER_NAME = os.getenv("BREVO_SENDER_NAME", "SVBK")
 if not SENDER_NAME or "bknr" in SENDER_NAME.lower():
     SENDER_NAME = "SVBK"
 REPLY_TO_EMAIL = os.getenv("SUPPORT_EMAIL", SENDER_EMAIL)
+logger = logging.getLogger("BKNR_ERP.email")
+
+
+class BrevoTransport:
+    """Brevo HTTP API over one keep-alive session (email_queue transport)."""
+
+    name = "brevo"
+
+    def __init__(self, api_key=BREVO_API_KEY, sender_email=SENDER_EMAIL, sender_name=SENDER_NAME,
+                 reply_to=REPLY_TO_EMAIL, url=BREVO_URL, timeout=10.0):
+        self.api_key = api_key
+        self.sender_email = sender_email
+        self.sender_name = sender_name
+        self.reply_to = reply_to
+        self.url = url
+        self.timeout = timeout
+        self._session = None
+
+    def send(self, recipients, subject, html, text=None, reply_to=None):
+        from app.services.email_queue import PermanentDeliveryError, TransportUnavailable
+
+        payload = {
+            "sender": {"email": self.sender_email, "name": self.sender_name},
+            "to": [{"email": e} for e in recipients],
+            "replyTo": {"email": reply_to or self.reply_to, "name": self.sender_name},
+            "subject": subject,
+            "htmlContent": html,
+        }
+        if text:
+            payload["textContent"] = text
+
+        if self._session is None:
+            self._session = requests.Session()
+        try:
+            res = self._session.post(
+                self.url,
+                json=payload,
+                headers={"api-key": self.api_key, "content-type": "application/json"},
+                timeout=self.timeout,
+            )
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            raise TransportUnavailable(f"Brevo unreachable: {exc}") from exc
+
+        if res.status_code in (400, 401, 403):
+            raise PermanentDeliveryError(f"Brevo rejected email ({res.status_code}): {res.text[:500]}")
+        if res.status_code >= 300:
+            raise RuntimeError(f"Brevo returned {res.status_code}: {res.text[:500]}")
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
 
 
 def send_bulk_email(to_emails: list, subject: str, html: str, text: str = ""):
+    """Send immediately, outside the queue (prefer email_queue.enqueue_email)."""
     if not BREVO_API_KEY or not to_emails:
         return
 
@@ -18,24 +74,11 @@ def send_bulk_email(to_emails: list, subject: str, html: str, text: str = ""):
     if not clean_emails:
         return
 
-    payload = {
-        "sender": {"email": SENDER_EMAIL, "name": SENDER_NAME},
-        "to": [{"email": e} for e in clean_emails],
-        "replyTo": {"email": REPLY_TO_EMAIL, "name": SENDER_NAME},
-        "subject": subject,
-        "htmlContent": html
-    }
-    if text:
-        payload["textContent"] = text
-
-    headers = {
-        "api-key": BREVO_API_KEY,
-        "content-type": "application/json"
-    }
-
-    res = requests.post(BREVO_URL, json=payload, headers=headers)
-
-    if res.status_code >= 400:
-        print("Gate Entry mail failed", res.text)
-    else:
-        print("Gate Entry mail sent to:", clean_emails)
+    transport = BrevoTransport()
+    try:
+        transport.send(clean_emails, subject, html, text=text)
+        logger.info("Bulk email sent to %s recipients", len(clean_emails))
+    except Exception as exc:
+        logger.warning("Bulk email failed: %s", exc)
+    finally:
+        transport.close()
@@ -0,0 +1,505 @@
+"""Set-based workbook import for masters, employees, ledger opening balances and opening stock.
+
+The generic data-management import builds and flushes one ORM object per
+sheet row. For the tables in ``BULK_IMPORT_SPECS`` ``run_bulk_import``
+instead:
+
+* streams the sheet with openpyxl in read-only mode,
+  ``BULK_IMPORT_CHUNK_ROWS`` rows at a time;
+* validates each chunk column by column: type coercion, required columns,
+  string lengths, the company's cached criteria masters
+  (``get_tenant_masters``), company-scoped references and duplicate keys
+  within the file;
+* stages the accepted rows in a temporary table (PostgreSQL ``COPY``, an
+  executemany insert on other databases) and merges them with one
+  ``INSERT ... SELECT ... ON CONFLICT DO UPDATE`` per table;
+* writes every rejected row, with its reasons and original cells, to an
+  ``.xlsx`` error report.
+
+The merge bypasses the ORM flush hooks, so the search index, HR KPI rollups,
+cost pools and lineage edges of the import are refreshed here in the same
+transaction. The caller commits, then rebuilds financial periods and stock
+balances as it does after any bulk write.
+"""
+import csv
+import io
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field
+from importlib import import_module
+from types import SimpleNamespace
+
+from sqlalchemy import Column, Integer, MetaData, Table, and_, func, or_, select, true, tuple_
+from sqlalchemy.types import Boolean, Date, DateTime, Float, Numeric, String, Time, TypeDecorator
+
+from app.services.master_data import get_tenant_masters, master_key
+from app.utils.timezone import ist_now
+
+logger = logging.getLogger(__name__)
+
+BULK_IMPORT_CHUNK_ROWS = int(os.environ.get("BULK_IMPORT_CHUNK_ROWS", "5000"))
+BULK_IMPORT_EXTENSIONS = (".xlsx", ".xlsm")
+ERROR_REPORT_PREFIX = "import_errors_"
+
+
+@dataclass(frozen=True)
+class Reference:
+    column: str
+    model: str                   # "module:Class", filtered by company_id
+    key_field: str = "id"
+    label_field: str | None = None  # cells may name the row instead of giving its key
+
+
+@dataclass(frozen=True)
+class BulkImportSpec:
+    model: str                                   # "module:Class"
+    conflict_columns: tuple[str, ...] = ()       # (): insert only
+    masters: tuple[tuple[str, str], ...] = ()    # (column, TenantMasters attribute)
+    references: tuple[Reference, ...] = ()
+    defaults: tuple[tuple[str, object], ...] = ()
+    user_columns: tuple[str, ...] = ()           # filled with the importing user when empty
+
+
+BULK_IMPORT_SPECS = {
+    "Suppliers": BulkImportSpec(
+        "app.database.models.criteria:suppliers",
+        conflict_columns=("company_id", "supplier_name"),
+    ),
+    "EmployeeRegistration": BulkImportSpec(
+        "app.database.models.attendance:EmployeeRegistration",
+        conflict_columns=("employee_id",),
+        masters=(("production_at", "production_at"),),
+    ),
+    "LedgerMaster": BulkImportSpec(
+        "app.database.models.enterprise_finance:LedgerMaster",
+        conflict_columns=("company_id", "ledger_name"),
+        references=(Reference("group_id", "app.database.models.enterprise_finance:AccountGroup", "id", "group_name"),),
+        user_columns=("created_by",),
+    ),
+    "StockEntry": BulkImportSpec(
+        "app.database.models.inventory_management:stock_entry",
+        masters=(
+            ("production_at", "production_at"),
+            ("species", "species"),
+            ("variety", "variety_names"),
+            ("grade", "grades"),
+        ),
+        defaults=(("cargo_movement_type", "IN"),),
+    ),
+}
+
+
+@dataclass
+class BulkImportResult:
+    inserted: int = 0
+    updated: int = 0
+    rejected: int = 0
+    error_report: str | None = None   # file name in the report directory
+    months: set = field(default_factory=set)
+
+
+def bulk_import_spec(table_name: str, filename: str = "") -> BulkImportSpec | None:
+    """The spec for ``table_name`` when ``filename`` can be streamed, else None."""
+    if filename and not str(filename).lower().endswith(BULK_IMPORT_EXTENSIONS):
+        return None
+    return BULK_IMPORT_SPECS.get(table_name)
+
+
+def _import(path: str):
+    module_name, name = path.split(":")
+    return getattr(import_module(module_name), name)
+
+
+def _header_labels(header) -> list[str]:
+    """Column labels as ``pd.read_excel`` names them, which is what the mapping refers to."""
+    labels, seen = [], {}
+    for index, value in enumerate(header):
+        label = f"Unnamed: {index}" if value is None else str(value)
+        if label in seen:
+            seen[label] += 1
+            label = f"{label}.{seen[label]}"
+        else:
+            seen[label] = 0
+        labels.append(label)
+    return labels
+
+
+def _chunks(rows, size: int):
+    chunk = []
+    for number, values in enumerate(rows, start=2):
+        if all(value is None or (isinstance(value, str) and not value.strip()) for value in values):
+            continue
+        chunk.append((number, values))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _plain_column(column):
+    """Coerce decorated types (e.g. ``ISODate``) as their underlying type."""
+    if isinstance(column.type, TypeDecorator):
+        return SimpleNamespace(type=column.type.impl_instance)
+    return column
+
+
+def _kind(column) -> str:
+    column_type = _plain_column(column).type
+    if isinstance(column_type, DateTime):
+        return "date-time"
+    if isinstance(column_type, Date):
+        return "date"
+    if isinstance(column_type, Time):
+        return "time"
+    if isinstance(column_type, Boolean):
+        return "yes/no value"
+    if isinstance(column_type, Integer):
+        return "whole number"
+    if isinstance(column_type, (Float, Numeric)):
+        return "number"
+    return "value"
+
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _default_value(column):
+    default = column.default
+    if default is None or column.primary_key:
+        return None
+    if default.is_scalar:
+        return default.arg
+    if default.is_callable:
+        return default.arg(None)
+    return None
+
+
+def _load_references(connection, spec: BulkImportSpec, company_id: str, mapped) -> dict:
+    """``{column: (keys, {label_key: key})}`` for every mapped reference, one query each."""
+    loaded = {}
+    for reference in spec.references:
+        if reference.column not in mapped:
+            continue
+        model = _import(reference.model)
+        key_column = getattr(model, reference.key_field)
+        label_column = getattr(model, reference.label_field) if reference.label_field else None
+        stmt = select(key_column, *([label_column] if label_column is not None else [])).where(
+            model.company_id == company_id
+        )
+        keys, labels = set(), {}
+        for row in connection.execute(stmt):
+            keys.add(row[0])
+            if label_column is not None:
+                labels.setdefault(master_key(row[1]), row[0])
+        loaded[reference.column] = (keys, labels)
+    return loaded
+
+
+class _Validator:
+    """Checks one chunk at a time, column by column; remembers keys across chunks."""
+
+    def __init__(self, connection, table, spec: BulkImportSpec, mapping: dict, positions: dict, masters, references,
+                 company_id: str, user: str):
+        from app.routers.data_management import coerce_cell_value
+
+        self.coerce = coerce_cell_value
+        self.connection = connection
+        self.table = table
+        self.spec = spec
+        self.mapping = mapping
+        self.positions = positions
+        self.masters = masters
+        self.references = references
+        self.company_id = company_id
+        self.user = user
+        self.seen_keys: dict[tuple, int] = {}
+        defaults = dict(spec.defaults)
+        self.fills = {}
+        for column in table.columns:
+            if column.name in mapping or column.name == "company_id" or column.primary_key:
+                continue
+            value = defaults.get(column.name, _default_value(column))
+            if column.name in spec.user_columns:
+                value = user
+            if value is not None:
+                self.fills[column.name] = value
+        self.required = [
+            column.name for column in table.columns
+            if column.name in mapping and column.name not in defaults and column.name not in spec.user_columns
+            and (not column.nullable or column.name in spec.conflict_columns)
+            and column.default is None and column.server_default is None
+        ]
+
+    @property
+    def columns(self) -> list[str]:
+        company = ["company_id"] if "company_id" in self.table.c else []
+        return [*self.mapping, *company, *self.fills]
+
+    def _column_values(self, db_col: str, chunk, errors: dict) -> list:
+        column = self.table.c[db_col]
+        position = self.positions[db_col]
+        raws = [values[position] if position < len(values) else None for _number, values in chunk]
+        plain = _plain_column(column)
+        reference = self.references.get(db_col)
+        master_names = self.masters.get(db_col)
+        length = getattr(plain.type, "length", None) if isinstance(plain.type, String) else None
+        fallback = dict(self.spec.defaults).get(db_col)
+        if fallback is None and db_col in self.spec.user_columns:
+            fallback = self.user
+
+        coerced = []
+        for (number, _values), raw in zip(chunk, raws):
+            value = None
+            if reference is not None and not _blank(raw):
+                keys, labels = reference
+                value = labels.get(master_key(raw))
+            if value is None:
+                value = self.coerce(raw, plain)
+            if value is None and not _blank(raw):
+                errors.setdefault(number, []).append(f"{db_col}: '{raw}' is not a valid {_kind(column)}")
+            elif isinstance(value, str) and not value:
+                value = None
+            if value is None:
+                value = fallback
+            if value is None:
+                if db_col in self.required:
+                    errors.setdefault(number, []).append(f"{db_col}: required")
+            elif length and isinstance(value, str) and len(value) > length:
+                errors.setdefault(number, []).append(f"{db_col}: longer than {length} characters")
+            elif master_names is not None:
+                name = master_names.get(master_key(value))
+                if name is None:
+                    errors.setdefault(number, []).append(f"{db_col}: '{value}' is not in the masters")
+                value = name
+            elif reference is not None and value not in reference[0]:
+                errors.setdefault(number, []).append(f"{db_col}: '{raw}' does not exist")
+            coerced.append(value)
+        return coerced
+
+    def _foreign_keys(self, keys) -> set:
+        """Keys of the chunk already owned by another company (globally unique keys only)."""
+        names = self.spec.conflict_columns
+        if not keys or "company_id" in names or "company_id" not in self.table.c:
+            return set()
+        key_columns = [self.table.c[name] for name in names]
+        company = self.table.c.company_id
+        in_keys = key_columns[0].in_([key[0] for key in keys]) if len(names) == 1 else tuple_(*key_columns).in_(keys)
+        rows = self.connection.execute(
+            select(*key_columns).where(in_keys, or_(company.is_(None), company != self.company_id))
+        )
+        return {tuple(row) for row in rows}
+
+    def validate(self, chunk) -> tuple[list[dict], dict]:
+        """``(staged rows, {excel row: [reasons]})`` for one chunk."""
+        errors: dict[int, list[str]] = {}
+        columns = {db_col: self._column_values(db_col, chunk, errors) for db_col in self.mapping}
+        rows, keys = [], {}
+        for index, (number, _values) in enumerate(chunk):
+            row = {db_col: values[index] for db_col, values in columns.items()}
+            if "company_id" in self.table.c:
+                row["company_id"] = self.company_id
+            if self.spec.conflict_columns and number not in errors:
+                key = tuple(row.get(name) for name in self.spec.conflict_columns)
+                first = self.seen_keys.setdefault(key, number)
+                if first != number:
+                    errors.setdefault(number, []).append(f"duplicate of row {first} in this file")
+                keys[number] = key
+            rows.append((number, row))
+
+        foreign = self._foreign_keys(sorted({key for number, key in keys.items() if number not in errors}))
+        staged = []
+        for number, row in rows:
+            if keys.get(number) in foreign:
+                errors.setdefault(number, []).append(
+                    f"{', '.join(self.spec.conflict_columns)} already belongs to another company"
+                )
+            if number in errors:
+                continue
+            row.update(self.fills)
+            row["row_no"] = number
+            staged.append(row)
+        return staged, errors
+
+
+def _stage_table(table, columns: list[str]) -> Table:
+    return Table(
+        f"bulk_import_stage_{uuid.uuid4().hex[:12]}",
+        MetaData(),
+        Column("row_no", Integer, nullable=False),
+        *(Column(name, table.c[name].type) for name in columns),
+        prefixes=["TEMPORARY"],
+    )
+
+
+def _copy_rows(connection, stage: Table, rows: list[dict]) -> None:
+    """COPY on PostgreSQL (one round trip per chunk); executemany elsewhere."""
+    if connection.dialect.name != "postgresql":
+        connection.execute(stage.insert(), rows)
+        return
+    names = [column.name for column in stage.columns]
+    buffer = io.StringIO()
+    # Quoted strings keep "" apart from the unquoted empty field COPY reads as NULL.
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for row in rows:
+        writer.writerow([_copy_value(row.get(name)) for name in names])
+    buffer.seek(0)
+    column_list = ", ".join(f'"{name}"' for name in names)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY "{stage.name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+
+
+def _copy_value(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def _merge(connection, table, stage: Table, spec: BulkImportSpec, mapped, staged: int) -> tuple[int, int]:
+    """Upsert the stage into ``table`` with one statement; returns ``(inserted, updated)``."""
+    keys = spec.conflict_columns
+    names = [column.name for column in stage.columns if column.name != "row_no"]
+    if not staged:
+        return 0, 0
+    matched = 0
+    if keys:
+        join = stage.join(table, and_(*(stage.c[name] == table.c[name] for name in keys)))
+        matched = connection.execute(select(func.count()).select_from(join)).scalar() or 0
+
+    source = select(*(stage.c[name] for name in names)).where(true()).order_by(stage.c.row_no)
+    dialect = connection.dialect.name
+    if keys and dialect in ("postgresql", "sqlite"):
+        insert = import_module(f"sqlalchemy.dialects.{dialect}").insert
+        stmt = insert(table).from_select(names, source)
+        updates = {name: stmt.excluded[name] for name in mapped if name not in keys}
+        if updates:
+            guard = table.c.company_id == stmt.excluded.company_id if "company_id" in table.c else None
+            stmt = stmt.on_conflict_do_update(index_elements=list(keys), set_=updates, where=guard)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(keys))
+    else:
+        stmt = table.insert().from_select(names, source)
+    connection.execute(stmt)
+    return staged - matched, matched
+
+
+def _write_error_report(report_dir: str, company_id: str, table_name: str, labels, rejected: dict, originals: dict) -> str:
+    from openpyxl import Workbook
+
+    os.makedirs(report_dir, exist_ok=True)
+    filename = f"{ERROR_REPORT_PREFIX}{company_id}_{table_name}_{ist_now().strftime('%Y%m%d%H%M%S')}.xlsx"
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Rejected Rows")
+    sheet.append(["Excel Row", "Errors", *labels])
+    for number in sorted(rejected):
+        sheet.append([number, "; ".join(rejected[number]), *originals.get(number, ())])
+    workbook.save(os.path.join(report_dir, filename))
+    return filename
+
+
+def _refresh_derived(db, table_name: str, company_id: str, months: set) -> None:
+    """Redo in-transaction what the ORM flush hooks would have maintained."""
+    if table_name in ("suppliers", "employee_registration"):
+        from app.services.search_index import rebuild_search_index
+
+        rebuild_search_index(db, company_id)
+    if table_name == "employee_registration":
+        from app.services.hr_kpi_rollups import invalidate_hr_kpi_rollups
+
+        invalidate_hr_kpi_rollups(db, company_id)
+    if table_name == "stock_entry":
+        from app.services.lineage import refresh_source_edges
+        from app.services.production_cost_pools import invalidate_cost_pools
+
+        invalidate_cost_pools(db, company_id, months)
+        refresh_source_edges(db, company_id, table_name)
+
+
+def run_bulk_import(db, company_id: str, table_name: str, filepath: str, sheet_name: str, mapping: dict,
+                    user: str = "SYSTEM", report_dir: str = "uploads") -> BulkImportResult:
+    """Import one sheet into a ``BULK_IMPORT_SPECS`` table in the caller's
+    transaction (commit afterwards). Rejected rows are skipped and listed in
+    the error report; the accepted rows are merged all at once."""
+    from openpyxl import load_workbook
+
+    from app.services.production_cost_pools import month_key
+
+    spec = BULK_IMPORT_SPECS[table_name]
+    table = _import(spec.model).__table__
+    mapping = {db_col: str(excel_col) for db_col, excel_col in mapping.items()
+               if excel_col and db_col in table.c and not table.c[db_col].primary_key and db_col != "company_id"}
+    missing = [name for name in spec.conflict_columns if name != "company_id" and name not in mapping]
+    missing += [
+        column.name for column in table.columns
+        if not column.nullable and not column.primary_key and column.default is None
+        and column.server_default is None and column.name not in mapping and column.name != "company_id"
+        and column.name not in dict(spec.defaults) and column.name not in spec.user_columns
+    ]
+    if missing:
+        raise ValueError(f"Map the required column(s): {', '.join(sorted(set(missing)))}")
+
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        if sheet_name not in workbook.sheetnames:
+            raise ValueError(f"Sheet '{sheet_name}' not found in the workbook.")
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        labels = _header_labels(next(rows, ()))
+        positions = {label: index for index, label in enumerate(labels)}
+        unknown = [excel_col for excel_col in mapping.values() if excel_col not in positions]
+        if unknown:
+            raise ValueError(f"Column(s) not in the sheet: {', '.join(unknown)}")
+
+        connection = db.connection()
+        masters = {}
+        needed = [(column, attribute) for column, attribute in spec.masters if column in mapping]
+        if needed:
+            tenant = get_tenant_masters(db, company_id)
+            for column, attribute in needed:
+                names = {}
+                for name in getattr(tenant, attribute):
+                    names.setdefault(master_key(name), name)
+                masters[column] = names
+        validator = _Validator(
+            connection, table, spec, mapping, {db_col: positions[excel_col] for db_col, excel_col in mapping.items()},
+            masters, _load_references(connection, spec, company_id, mapping), company_id, user,
+        )
+        stage = _stage_table(table, validator.columns)
+        stage.create(connection)
+
+        result = BulkImportResult()
+        rejected: dict[int, list[str]] = {}
+        originals: dict[int, tuple] = {}
+        staged_count = 0
+        for chunk in _chunks(rows, BULK_IMPORT_CHUNK_ROWS):
+            staged, errors = validator.validate(chunk)
+            if staged:
+                _copy_rows(connection, stage, staged)
+                staged_count += len(staged)
+            if "date" in stage.c:
+                result.months.update(month_key(row.get("date")) for row in staged)
+            for number, values in chunk:
+                if number in errors:
+                    originals[number] = values
+            rejected.update(errors)
+    finally:
+        workbook.close()
+
+    result.inserted, result.updated = _merge(connection, table, stage, spec, mapping, staged_count)
+    stage.drop(connection)
+    result.months.discard(None)
+    if result.inserted or result.updated:
+        _refresh_derived(db, table.name, company_id, result.months)
+
+    result.rejected = len(rejected)
+    if rejected:
+        result.error_report = _write_error_report(report_dir, company_id, table_name, labels, rejected, originals)
+    logger.info(
+        "Bulk import %s/%s: %s inserted, %s updated, %s rejected",
+        company_id, table_name, result.inserted, result.updated, result.rejected,
+    )
+    return result
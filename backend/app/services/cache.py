@@ -8,6 +8,7 @@ from typing import Any, Callable
 from uuid import UUID
 
 from app.config import IS_PRODUCTION
+from app.services.metrics import record_cache_lookup
 
 try:
     import redis
@@ -74,7 +75,18 @@ def _client():
         return None
 
 
+def cache_available() -> bool:
+    """True when values written with ``cache_set`` can be read back."""
+    return _client() is not None or not IS_PRODUCTION
+
+
 def cache_get(key: str) -> Any | None:
+    value = _cache_lookup(key)
+    record_cache_lookup(key, value is not None)
+    return value
+
+
+def _cache_lookup(key: str) -> Any | None:
     client = _client()
     if client:
         try:
@@ -0,0 +1,112 @@
+"""Log database connections that stay checked out for too long.
+
+A session holds its pooled connection from the first statement until
+commit, rollback or close, so a connection that is out for minutes is a
+session somebody forgot to close, or a request or job keeping a
+transaction open across slow non-database work. Either way it is a pool
+slot nobody else can use.
+
+``install_leak_detector(engine, purpose, threshold)`` records when each
+connection was checked out, by which thread and from which call stack
+(as plain ``(file, line, function)`` tuples - formatting only happens for
+the rare connection that gets reported). Checkouts scan the few
+connections currently out at most every ``LEAK_SCAN_SECONDS``, and so
+does the metrics scrape; each offender is logged once with its stack.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+from sqlalchemy import event
+
+from app.services.metrics import inc, register_gauge_collector
+
+logger = logging.getLogger("BKNR_ERP.db")
+
+LEAK_SCAN_SECONDS = float(os.getenv("DB_LEAK_SCAN_SECONDS", "5"))
+STACK_DEPTH = int(os.getenv("DB_LEAK_STACK_DEPTH", "20"))
+
+_THIS_FILE = os.path.abspath(__file__)
+_SQLALCHEMY_DIR = os.sep + "sqlalchemy" + os.sep
+_detectors: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _caller_stack() -> list[tuple]:
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < STACK_DEPTH:
+        filename = frame.f_code.co_filename
+        if filename != _THIS_FILE and _SQLALCHEMY_DIR not in filename and not filename.startswith("<"):
+            frames.append((filename, frame.f_lineno, frame.f_code.co_name, None))
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+class LeakDetector:
+    def __init__(self, purpose: str, threshold: float):
+        self.purpose = purpose
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._checked_out: dict[int, list] = {}
+        self._next_scan = 0.0
+
+    def checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        now = time.monotonic()
+        entry = [now, threading.current_thread().name, _caller_stack(), False]
+        with self._lock:
+            self._checked_out[id(connection_record)] = entry
+            due = now >= self._next_scan
+            if due:
+                self._next_scan = now + LEAK_SCAN_SECONDS
+        if due:
+            self.scan(now)
+
+    def checkin(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self._checked_out.pop(id(connection_record), None)
+
+    def scan(self, now: float | None = None) -> int:
+        """Log every connection held past the threshold that was not reported yet."""
+        now = time.monotonic() if now is None else now
+        leaked = []
+        with self._lock:
+            for entry in self._checked_out.values():
+                if not entry[3] and now - entry[0] > self.threshold:
+                    entry[3] = True
+                    leaked.append(entry)
+        for started, thread_name, stack, _ in leaked:
+            inc("bknr_db_connection_leaks_total", pool=self.purpose)
+            logger.warning(
+                "DB connection from the %s pool held for %.0fs (limit %.0fs) by thread %s, checked out at:\n%s",
+                self.purpose, now - started, self.threshold, thread_name,
+                "".join(traceback.StackSummary.from_list(stack).format()).rstrip(),
+            )
+        return len(leaked)
+
+    def oldest_checkout_seconds(self) -> float:
+        now = time.monotonic()
+        with self._lock:
+            return max((now - entry[0] for entry in self._checked_out.values()), default=0.0)
+
+    def gauges(self) -> list:
+        self.scan()
+        return [("bknr_db_oldest_checkout_seconds", {"pool": self.purpose}, round(self.oldest_checkout_seconds(), 3))]
+
+
+def install_leak_detector(engine, purpose: str, threshold: float) -> LeakDetector | None:
+    """Track checkouts on ``engine`` and report connections held longer than ``threshold`` seconds."""
+    if threshold <= 0:
+        return None
+    detector = _detectors.get(engine)
+    if detector is not None:
+        return detector
+    detector = _detectors[engine] = LeakDetector(purpose, threshold)
+    event.listen(engine, "checkout", detector.checkout)
+    event.listen(engine, "checkin", detector.checkin)
+    register_gauge_collector(detector.gauges)
+    return detector
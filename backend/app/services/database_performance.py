@@ -14,6 +14,9 @@ PERFORMANCE_INDEXES = (
     "CREATE INDEX IF NOT EXISTS ix_audit_log_company_record_time ON audit_log (company_id, table_name, record_id, edited_at DESC)",
     "CREATE INDEX IF NOT EXISTS ix_finance_audit_company_record_time ON finance_audit_trails (company_id, table_name, record_id, timestamp DESC)",
     "CREATE INDEX IF NOT EXISTS ix_cold_storage_company_status_date ON cold_storage_holding (company_id, status, in_date)",
+    # Serves latest_gate_sequences, which groups by the normalised receiving centre.
+    "CREATE INDEX IF NOT EXISTS ix_gate_entry_company_center_sequence ON gate_entry "
+    "(company_id, production_for, upper(trim(coalesce(receiving_center, ''))), id)",
 )
 
 ANALYZE_TABLES = (
@@ -6,6 +6,7 @@ Existing data  skip  (idempotent).
 """
 from sqlalchemy import func
 from sqlalchemy.orm import Session
+from app.services.master_data import bump_master_data_version
 from app.database.models.criteria import (
     species as SpeciesModel,
     glazes as GlazesModel,
@@ -277,6 +278,7 @@ def seed_default_masters(db: Session, company_code: str, email: str = "system@bk
         except Exception:
             db.rollback()
             raise
+        bump_master_data_version(company_code)
         print(f"✅ Default masters seeded for company: {company_code}")
     else:
         print(f"ℹ️  Default masters already exist for: {company_code} — skipped.")
@@ -0,0 +1,286 @@
+"""Shared plumbing for tables maintained from ORM writes.
+
+Several services keep a small table in step with the rows it is derived
+from (financial periods, FIFO layers, net stock, search documents, ...).
+They share what lives here:
+
+* ``register_derived_table`` describes one such table: the source tables it
+  watches, a ``collect(session)`` that turns a flush into a pending change
+  and an ``apply(connection, change)`` that writes it.
+* ``install_derived_table_tracking(session_factory, name)`` enables a
+  registered table on a session factory. Each factory gets a single
+  ``after_flush`` dispatcher: it works out once which tables the flush
+  touched and only calls the handlers watching them, each in its own
+  savepoint, so a failed derived update is logged and never fails the
+  business write. Every derived table has a rebuild or reconcile path that
+  catches up afterwards.
+* ``tables_ready`` skips all of that on databases that predate the derived
+  tables (cached per engine).
+* ``write_outside_request`` stores a lazily built result in its own
+  transaction, so the build survives a read-only request.
+* ``upsert_increments`` adds signed deltas with the dialect's
+  ``INSERT ... ON CONFLICT DO UPDATE``.
+* Tables built per company (``build_company``) record each built company in
+  ``derived_table_builds``, even when it had nothing to build, and reads
+  fall back to the source tables until ``company_built`` says so. The
+  ``derived_table_backfill`` job (``run_derived_table_backfill``) builds the
+  companies that are not built yet, one company per transaction, so no
+  request ever pays for a first build.
+"""
+import logging
+import os
+import weakref
+from dataclasses import dataclass
+from datetime import datetime
+from importlib import import_module
+from typing import Any, Callable
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_WRITTEN = "derived_tables_written"
+_BUILDS = "derived_table_builds"
+BACKFILL_LEASE_NAME = "derived_table_backfill"
+DERIVED_TABLE_BACKFILL_MINUTES = int(os.getenv("DERIVED_TABLE_BACKFILL_MINUTES", "60"))
+BACKFILL_LEASE_SECONDS = int(os.getenv("DERIVED_TABLE_BACKFILL_LEASE_SECONDS", str(2 * 60 * 60)))
+
+_registry: dict[str, "DerivedTable"] = {}
+_source_names: dict[str, frozenset] = {}
+_ready_binds: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_enabled: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+@dataclass(frozen=True)
+class DerivedTable:
+    name: str
+    label: str                                  # "Net stock balance update", for the skip warning
+    sources: Callable[[], Any]                  # -> source table names the handler reads
+    tables: Callable[[], tuple]                 # -> the derived Table objects
+    collect: Callable[[Any], Any]               # session -> pending change (falsy: nothing to do)
+    apply: Callable[[Any, Any], None]           # (connection, change) -> None
+    companies: Callable[[Any], Any] | None = None       # connection -> companies with source rows
+    build_company: Callable[[Any, str], int] | None = None  # (connection, company_id) -> rows built
+
+
+def register_derived_table(spec: DerivedTable) -> DerivedTable:
+    _registry[spec.name] = spec
+    _source_names.pop(spec.name, None)
+    return spec
+
+
+def _sources(name: str) -> frozenset:
+    sources = _source_names.get(name)
+    if sources is None:
+        sources = _source_names[name] = frozenset(_registry[name].sources())
+    return sources
+
+
+def _has_tables(connection, key: str, tables) -> bool:
+    ready = _ready_binds.setdefault(connection.engine, {})
+    if key not in ready:
+        checker = inspect(connection)
+        ready[key] = all(checker.has_table(table.name) for table in tables())
+    return ready[key]
+
+
+def tables_ready(connection, name: str) -> bool:
+    """Whether every table of derived table ``name`` exists on this connection's engine."""
+    return _has_tables(connection, name, _registry[name].tables)
+
+
+def _builds_table():
+    from app.database.models.derived_tables import DerivedTableBuild
+
+    return DerivedTableBuild.__table__
+
+
+def company_built(connection, name: str, company_id: str) -> bool:
+    """Whether ``company_id``'s rows of ``name`` have been built (False before the builds table exists)."""
+    if not _has_tables(connection, _BUILDS, lambda: (_builds_table(),)):
+        return False
+    table = _builds_table()
+    return connection.execute(
+        select(table.c.id).where(table.c.name == name, table.c.company_id == company_id).limit(1)
+    ).first() is not None
+
+
+def build_company(connection, name: str, company_id: str) -> int:
+    """Rebuild ``company_id``'s rows of ``name`` and record it as built, in the connection's transaction."""
+    built = _registry[name].build_company(connection, company_id)
+    if _has_tables(connection, _BUILDS, lambda: (_builds_table(),)):
+        now = datetime.utcnow()
+        upsert_increments(
+            connection, _builds_table(), ("name", "company_id"),
+            [{"name": name, "company_id": company_id, "built_at": now}], increments=(), touched={"built_at": now},
+        )
+    return built
+
+
+def reset_ready_cache(name: str | None = None) -> None:
+    for ready in list(_ready_binds.values()):
+        if name is None:
+            ready.clear()
+        else:
+            ready.pop(name, None)
+
+
+def written_in_transaction(session, name: str) -> bool:
+    """Whether ``session`` changed a source of ``name`` in its current transaction."""
+    return name in session.info.get(_WRITTEN, ())
+
+
+def write_outside_request(db, write: Callable[[Any], Any], name: str | None = None):
+    """Run ``write(connection)`` in its own transaction, so a lazily built
+    result survives a read-only request.
+
+    Falls back to the caller's transaction when ``db`` is bound to a
+    connection, or when the session already changed a source of ``name`` in
+    this transaction: the result then includes uncommitted writes and has
+    to commit or roll back with them.
+    """
+    bind = db.get_bind()
+    if isinstance(bind, Engine) and not (name and written_in_transaction(db, name)):
+        with bind.begin() as connection:
+            return write(connection)
+    return write(db.connection())
+
+
+def dialect_insert(connection):
+    """The dialect ``insert`` with ``ON CONFLICT`` support, or ``None``."""
+    if connection.dialect.name in ("postgresql", "sqlite"):
+        return import_module(f"sqlalchemy.dialects.{connection.dialect.name}").insert
+    return None
+
+
+def upsert_increments(connection, table, key_columns, rows: list[dict], increments, touched: dict | None = None) -> None:
+    """Insert ``rows``, or add their ``increments`` columns to the stored row with the same key."""
+    if not rows:
+        return
+    touched = touched or {}
+    insert = dialect_insert(connection)
+    if insert is not None:
+        stmt = insert(table)
+        connection.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[table.c[name] for name in key_columns],
+                set_={**{name: table.c[name] + stmt.excluded[name] for name in increments}, **touched},
+            ),
+            rows,
+        )
+        return
+    for values in rows:
+        updated = connection.execute(
+            table.update()
+            .where(*(table.c[name] == values[name] for name in key_columns))
+            .values(**{name: table.c[name] + values[name] for name in increments}, **touched)
+        )
+        if not updated.rowcount:
+            connection.execute(table.insert().values(**values))
+
+
+def run_derived_table_backfill(session_factory=None):
+    """Scheduled build of every company not built yet, one committed company at a time under the job lease."""
+    from app.services.job_leases import acquire_job_lease, release_job_lease
+
+    if session_factory is None:
+        from app.database import BackgroundSessionLocal as session_factory
+
+    db = session_factory()
+    token = None
+    failed = built = 0
+    try:
+        connection = db.connection()
+        if not _has_tables(connection, _BUILDS, lambda: (_builds_table(),)):
+            return "skipped"
+        token = acquire_job_lease(db, BACKFILL_LEASE_NAME, BACKFILL_LEASE_SECONDS)
+        if token is None:
+            return "skipped"
+        connection = db.connection()
+        builds = _builds_table()
+        pending = []
+        for name, spec in _registry.items():
+            if spec.build_company is None or not tables_ready(connection, name):
+                continue
+            done = set(connection.execute(select(builds.c.company_id).where(builds.c.name == name)).scalars())
+            companies = {str(company) for company in spec.companies(connection) if company not in (None, "")}
+            pending += [(name, company) for company in sorted(companies - done)]
+        db.commit()
+        for name, company_id in pending:
+            try:
+                build_company(db.connection(), name, company_id)
+                db.commit()
+                built += 1
+            except Exception as e:
+                db.rollback()
+                failed += 1
+                logger.error("%s build for %s failed: %s", _registry[name].label, company_id, e)
+        if built:
+            logger.info("Derived table backfill built %s companies", built)
+        return "failed" if failed else "clean"
+    except Exception as e:
+        db.rollback()
+        logger.error("Derived table backfill failed: %s", e)
+        return "failed"
+    finally:
+        if token:
+            try:
+                release_job_lease(db, BACKFILL_LEASE_NAME, token)
+            except Exception as e:
+                db.rollback()
+                logger.warning("Derived table backfill lease release failed: %s", e)
+        db.close()
+
+
+def _touched_tables(session) -> set:
+    return {
+        getattr(obj, "__tablename__", None)
+        for pending in (session.new, session.dirty, session.deleted)
+        for obj in pending
+    }
+
+
+def _dispatcher(names: dict):
+    def after_flush(session, flush_context) -> None:
+        touched = _touched_tables(session)
+        touched.discard(None)
+        if not touched:
+            return
+        connection = None
+        for name in names:
+            if touched.isdisjoint(_sources(name)):
+                continue
+            spec = _registry[name]
+            change = spec.collect(session)
+            if not change:
+                continue
+            connection = connection or session.connection()
+            if not tables_ready(connection, name):
+                continue
+            try:
+                with connection.begin_nested():
+                    spec.apply(connection, change)
+                session.info.setdefault(_WRITTEN, set()).add(name)
+            except Exception as exc:
+                # The table's rebuild/reconcile path catches up; never fail the business write.
+                logger.warning("%s skipped: %s", spec.label, exc)
+
+    return after_flush
+
+
+def _transaction_finished(session) -> None:
+    session.info.pop(_WRITTEN, None)
+
+
+def install_derived_table_tracking(session_factory, name: str) -> None:
+    """Maintain derived table ``name`` from ORM writes made through ``session_factory``."""
+    if name not in _registry:
+        raise KeyError(f"Unknown derived table: {name}")
+    names = _enabled.get(session_factory)
+    if names is None:
+        names = _enabled[session_factory] = {}
+        event.listen(session_factory, "after_flush", _dispatcher(names))
+        event.listen(session_factory, "after_commit", _transaction_finished)
+        event.listen(session_factory, "after_rollback", _transaction_finished)
+    names[name] = True
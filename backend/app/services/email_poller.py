@@ -1,9 +1,24 @@
+"""Incremental IMAP poller for CRM quotation replies.
+
+The poller remembers the mailbox UIDVALIDITY and the last UID it has scanned
+(stored in ``system_settings``) so each run only looks at messages that arrived
+since the previous run. Headers are fetched in batched ``UID FETCH`` ranges and
+full bodies are downloaded only for messages whose subject carries a known
+QT/PI/SO/INV reference. The logged-in IMAP connection is kept open between
+polls and supports IDLE so a watcher thread can wake up as soon as new mail
+lands.
+"""
 import imaplib
 import email
 from email.header import decode_header
 from email.utils import parsedate_to_datetime
+import base64
+import json
 import re
 import logging
+import select
+import threading
+import time
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import os
@@ -15,6 +30,19 @@ logger = logging.getLogger("BKNR_ERP.email_poller")
 
 _IST = ZoneInfo("Asia/Kolkata")
 
+IMAP_HOST = os.getenv("IMAP_HOST", "imap.gmail.com")
+IMAP_PORT = int(os.getenv("IMAP_PORT", "993"))
+IMAP_MAILBOX = os.getenv("IMAP_MAILBOX", "INBOX")
+IMAP_FETCH_BATCH_SIZE = int(os.getenv("IMAP_FETCH_BATCH_SIZE", "100"))
+IMAP_IDLE_TIMEOUT_SECONDS = int(os.getenv("IMAP_IDLE_TIMEOUT_SECONDS", str(25 * 60)))
+IMAP_POLL_INTERVAL_SECONDS = int(os.getenv("IMAP_POLL_INTERVAL_SECONDS", "300"))
+
+CHECKPOINT_SETTING_PREFIX = "crm_imap_checkpoint"
+QUOTATION_REFERENCE_PATTERN = re.compile(r"(QT|PI|SO|INV)-\d{4}-\d{4}", re.IGNORECASE)
+HEADER_FIELDS = "(SUBJECT FROM DATE MESSAGE-ID)"
+_UID_PATTERN = re.compile(rb"UID (\d+)")
+
+
 def _parse_email_date_ist(date_str: str) -> datetime:
     """Parse email Date header and return a naive IST datetime."""
     try:
@@ -23,176 +51,511 @@ def _parse_email_date_ist(date_str: str) -> datetime:
     except Exception:
         return datetime.now(_IST).replace(tzinfo=None)
 
-def poll_inbound_emails(db: Session):
+
+def _decode_header_value(raw_value) -> str:
+    value, encoding = decode_header(raw_value or "")[0]
+    if isinstance(value, bytes):
+        return value.decode(encoding or "utf-8", errors="ignore")
+    return str(value)
+
+
+def _sender_address(from_header: str) -> str:
+    if "<" in from_header and ">" in from_header:
+        return from_header.split("<")[1].split(">")[0]
+    return from_header
+
+
+def _compress_uids(uids: list[int]) -> str:
+    """Render sorted UIDs as an IMAP sequence set, e.g. ``3:5,9``."""
+    ranges = []
+    start = previous = None
+    for uid in sorted(set(uids)):
+        if start is None:
+            start = previous = uid
+        elif uid == previous + 1:
+            previous = uid
+        else:
+            ranges.append(f"{start}:{previous}" if start != previous else str(start))
+            start = previous = uid
+    if start is not None:
+        ranges.append(f"{start}:{previous}" if start != previous else str(start))
+    return ",".join(ranges)
+
+
+def _parse_fetch_response(data) -> dict[int, bytes]:
+    """Map UID to literal payload from an ``imaplib`` UID FETCH response."""
+    payloads = {}
+    items = list(data or [])
+    for index, item in enumerate(items):
+        if not isinstance(item, tuple) or len(item) < 2:
+            continue
+        match = _UID_PATTERN.search(item[0] or b"")
+        if not match and index + 1 < len(items) and isinstance(items[index + 1], bytes):
+            # Some servers report the UID after the literal: ``b' UID 42)'``.
+            match = _UID_PATTERN.search(items[index + 1])
+        if match:
+            payloads[int(match.group(1))] = item[1]
+    return payloads
+
+
+def _extract_message_content(msg, subject_text: str):
+    """Return ``(body_text, attachments)`` for a parsed email message."""
+    body_text = ""
+    html_text = ""
+    attachments = []
+
+    if msg.is_multipart():
+        for part in msg.walk():
+            c_type = part.get_content_type()
+            c_disp = str(part.get('Content-Disposition') or '')
+            filename = part.get_filename()
+
+            # Extract Plain Body
+            if c_type == "text/plain" and "attachment" not in c_disp and not filename:
+                payload = part.get_payload(decode=True)
+                if payload:
+                    body_text = payload.decode(errors="ignore")
+
+            # Extract HTML Body fallback
+            if c_type == "text/html" and "attachment" not in c_disp and not filename:
+                payload = part.get_payload(decode=True)
+                if payload:
+                    html_text = payload.decode(errors="ignore")
+
+            # Extract Attachments (Photos, Images, PDFs, Documents)
+            is_image = c_type.startswith("image/")
+            is_pdf = c_type == "application/pdf"
+            is_attachment = filename or "attachment" in c_disp or "inline" in c_disp or is_image or is_pdf
+
+            if is_attachment and c_type not in ["text/plain", "text/html"]:
+                file_payload = part.get_payload(decode=True)
+                if file_payload:
+                    ext = "png"
+                    if "jpeg" in c_type or "jpg" in c_type:
+                        ext = "jpg"
+                    elif "gif" in c_type:
+                        ext = "gif"
+                    elif "pdf" in c_type:
+                        ext = "pdf"
+
+                    fname = filename or f"photo_{len(attachments)+1}.{ext}"
+                    # Decode header if filename is encoded
+                    try:
+                        fname = _decode_header_value(fname)
+                    except Exception:
+                        pass
+
+                    b64_data = base64.b64encode(file_payload).decode("utf-8")
+                    mime = c_type or "application/octet-stream"
+                    attachments.append({
+                        "filename": fname,
+                        "mime_type": mime,
+                        "data_url": f"data:{mime};base64,{b64_data}"
+                    })
+    else:
+        payload = msg.get_payload(decode=True)
+        if payload:
+            body_text = payload.decode(errors="ignore")
+
+    if not body_text:
+        if html_text:
+            body_text = re.sub(r'<[^>]+>', ' ', html_text)
+        else:
+            body_text = subject_text
+    return body_text, attachments
+
+
+# =====================================================
+# CHECKPOINT (system_settings)
+# =====================================================
+def _checkpoint_key(account: str, mailbox: str) -> str:
+    return f"{CHECKPOINT_SETTING_PREFIX}:{account.strip().lower()}:{mailbox}"[:100]
+
+
+def load_checkpoint(db: Session, account: str, mailbox: str = IMAP_MAILBOX) -> dict | None:
+    from app.database.models.system_settings import SystemSetting
+    row = db.query(SystemSetting).filter(SystemSetting.key == _checkpoint_key(account, mailbox)).first()
+    if not row or not row.value:
+        return None
+    try:
+        data = json.loads(row.value)
+        return {"uidvalidity": int(data["uidvalidity"]), "last_uid": int(data["last_uid"])}
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def save_checkpoint(db: Session, account: str, uidvalidity: int, last_uid: int, mailbox: str = IMAP_MAILBOX) -> None:
+    from app.database.models.system_settings import SystemSetting
+    key = _checkpoint_key(account, mailbox)
+    value = json.dumps({"uidvalidity": int(uidvalidity), "last_uid": int(last_uid)})
+    row = db.query(SystemSetting).filter(SystemSetting.key == key).first()
+    if row:
+        row.value = value
+        row.updated_by = "email_poller"
+    else:
+        db.add(SystemSetting(key=key, value=value, updated_by="email_poller"))
+
+
+# =====================================================
+# LONG-LIVED IMAP CONNECTION
+# =====================================================
+def _wait_readable(connection, timeout: float) -> bool:
+    """Whether the IMAP server sent more data within ``timeout`` seconds."""
+    if timeout <= 0:
+        return False
+    sock = connection.socket()
+    pending = getattr(sock, "pending", None)
+    if pending is not None and pending():
+        return True  # already decrypted by TLS, select() would not see it
+    readable, _, _ = select.select([sock], [], [], timeout)
+    return bool(readable)
+
+
+class InboundMailbox:
+    """Logged-in IMAP session that is reused across polls.
+
+    ``connection_factory(host, port)`` must return an ``imaplib.IMAP4``
+    compatible object; tests pass a local stand-in instead of ``IMAP4_SSL``.
+    """
+
+    def __init__(self, account: str, password: str, host: str = IMAP_HOST, port: int = IMAP_PORT,
+                 mailbox: str = IMAP_MAILBOX, connection_factory=imaplib.IMAP4_SSL):
+        self.account = account
+        self.password = password
+        self.host = host
+        self.port = port
+        self.mailbox = mailbox
+        self.connection_factory = connection_factory
+        self.connection = None
+        self.uidvalidity = None
+        self.lock = threading.RLock()
+
+    def _connect(self):
+        connection = self.connection_factory(self.host, self.port)
+        connection.login(self.account, self.password)
+        self.connection = connection
+
+    def select(self) -> int:
+        status, _ = self.connection.select(self.mailbox)
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"Unable to select mailbox {self.mailbox}")
+        _, data = self.connection.response("UIDVALIDITY")
+        self.uidvalidity = int(data[0]) if data and data[0] else 0
+        return self.uidvalidity
+
+    def ensure_connected(self):
+        """Return a live connection, re-logging in when the old one went stale."""
+        if self.connection is not None:
+            try:
+                status, _ = self.connection.noop()
+                if status == "OK":
+                    return self.connection
+            except Exception:
+                pass
+            self.close()
+        self._connect()
+        return self.connection
+
+    @property
+    def supports_idle(self) -> bool:
+        capabilities = getattr(self.connection, "capabilities", ()) or ()
+        return "IDLE" in {str(cap).upper() for cap in capabilities}
+
+    def idle(self, timeout: int = IMAP_IDLE_TIMEOUT_SECONDS) -> bool:
+        """Block in IMAP IDLE until the server reports new mail or ``timeout``.
+
+        Returns True when an ``EXISTS``/``RECENT`` notification arrived. Servers
+        without IDLE return True immediately so callers simply poll again.
+        The wait is a ``select()`` on the socket: a socket timeout would leave
+        imaplib's buffered file object unusable for the commands that follow.
+        """
+        with self.lock:
+            connection = self.ensure_connected()
+            if not self.supports_idle:
+                return True
+            if getattr(connection, "state", "SELECTED") != "SELECTED":
+                self.select()
+            tag = connection._new_tag()
+            connection.send(tag + b" IDLE\r\n")
+            if not connection.readline().startswith(b"+"):
+                return True
+            deadline = time.monotonic() + timeout
+            has_mail = False
+            while _wait_readable(connection, deadline - time.monotonic()):
+                line = connection.readline()
+                if not line:
+                    break
+                if b"EXISTS" in line or b"RECENT" in line:
+                    has_mail = True
+                    break
+            connection.send(b"DONE\r\n")
+            while True:
+                line = connection.readline()
+                if not line or line.startswith(tag):
+                    break
+            return has_mail
+
+    def close(self):
+        connection, self.connection = self.connection, None
+        if connection is None:
+            return
+        try:
+            connection.logout()
+        except Exception:
+            pass
+
+
+_mailboxes: dict[tuple[str, str], InboundMailbox] = {}
+_mailboxes_lock = threading.Lock()
+
+
+def get_inbound_mailbox(account: str, password: str, connection_factory=None) -> InboundMailbox:
+    """Return the shared mailbox for this account, creating it on first use."""
+    key = (IMAP_HOST, account.strip().lower())
+    with _mailboxes_lock:
+        mailbox = _mailboxes.get(key)
+        if mailbox is None or mailbox.password != password:
+            if mailbox is not None:
+                mailbox.close()
+            mailbox = InboundMailbox(
+                account,
+                password,
+                connection_factory=connection_factory or imaplib.IMAP4_SSL,
+            )
+            _mailboxes[key] = mailbox
+        return mailbox
+
+
+def close_inbound_mailboxes() -> None:
+    with _mailboxes_lock:
+        for mailbox in _mailboxes.values():
+            mailbox.close()
+        _mailboxes.clear()
+
+
+# =====================================================
+# POLLING
+# =====================================================
+def _new_uids(connection, checkpoint: dict | None, uidvalidity: int) -> tuple[list[int], bool]:
+    """Return ``(uids, incremental)`` to scan for this poll."""
+    if checkpoint and checkpoint["uidvalidity"] == uidvalidity:
+        last_uid = checkpoint["last_uid"]
+        status, response = connection.uid("SEARCH", None, f"UID {last_uid + 1}:*")
+        incremental = True
+    else:
+        # First run (or the mailbox was recreated): fall back to unread mail
+        # and start checkpointing from there.
+        last_uid = 0
+        status, response = connection.uid("SEARCH", None, "UNSEEN")
+        incremental = False
+    if status != "OK" or not response or not response[0]:
+        return [], incremental
+    # ``n:*`` always matches the newest message, even when its UID is below n.
+    return sorted(uid for uid in map(int, response[0].split()) if uid > last_uid), incremental
+
+
+def _resolve_quotations(db: Session, headers: dict[int, dict]) -> dict[int, CRMQuotation]:
+    """Match header-only messages to quotations with a single lookup query."""
+    quotation_numbers = {item["quotation_no"] for item in headers.values() if item["quotation_no"]}
+    if not quotation_numbers:
+        return {}
+    by_number = {}
+    for quotation in db.query(CRMQuotation).filter(CRMQuotation.quotation_no.in_(quotation_numbers)).all():
+        by_number.setdefault(quotation.quotation_no, quotation)
+    return {
+        uid: by_number[item["quotation_no"]]
+        for uid, item in headers.items()
+        if item["quotation_no"] in by_number
+    }
+
+
+def _fetch_headers(connection, uids: list[int]) -> dict[int, dict]:
+    headers = {}
+    status, data = connection.uid("FETCH", _compress_uids(uids), f"(UID BODY.PEEK[HEADER.FIELDS {HEADER_FIELDS}])")
+    if status != "OK":
+        return headers
+    for uid, raw in _parse_fetch_response(data).items():
+        try:
+            msg = email.message_from_bytes(raw)
+            subject_text = _decode_header_value(msg["Subject"])
+            match = QUOTATION_REFERENCE_PATTERN.search(subject_text)
+            headers[uid] = {
+                "subject": subject_text,
+                "sender_email": _sender_address(msg["From"] or ""),
+                "date": msg.get("Date", ""),
+                "message_id": msg.get("Message-ID"),
+                "quotation_no": match.group(0).upper() if match else None,
+            }
+        except Exception as ex:
+            # Unparseable headers never match a quotation; keep the UID so the checkpoint can pass it.
+            logger.warning("Error parsing email headers for UID %s: %s", uid, ex)
+            headers[uid] = {"subject": "", "sender_email": "", "date": "", "message_id": None, "quotation_no": None}
+    return headers
+
+
+def _last_handled(batch: list[int], handled: set[int]) -> int | None:
+    """Highest UID of ``batch`` with every UID up to it handled, or None."""
+    last = None
+    for uid in batch:
+        if uid not in handled:
+            break
+        last = uid
+    return last
+
+
+def _sync_batch(db: Session, connection, uids: list[int], recipient_email: str) -> tuple[int, set[int]]:
+    """Store the replies in ``uids``; returns ``(stored, handled_uids)``.
+
+    A UID is handled once its headers came back and, for a quotation reply,
+    its body was fetched and stored (or the reply was stored before). UIDs a
+    FETCH failed on or left out stay unhandled so the checkpoint never moves
+    past them; a body that does not parse is logged and counts as handled.
+    """
+    headers = _fetch_headers(connection, uids)
+    matched = _resolve_quotations(db, headers)
+    handled = set(headers) - set(matched)
+    if not matched:
+        return 0, handled
+
+    message_ids = {headers[uid]["message_id"] for uid in matched if headers[uid]["message_id"]}
+    existing_ids = set()
+    if message_ids:
+        existing_ids = {
+            row[0]
+            for row in db.query(CRMQuotationReply.message_id)
+            .filter(CRMQuotationReply.message_id.in_(message_ids))
+            .all()
+        }
+    body_uids = [uid for uid in matched if headers[uid]["message_id"] not in existing_ids]
+    handled.update(uid for uid in matched if uid not in body_uids)
+    if not body_uids:
+        return 0, handled
+
+    status, data = connection.uid("FETCH", _compress_uids(body_uids), "(UID RFC822)")
+    if status != "OK":
+        return 0, handled
+
+    fetched_count = 0
+    for uid, raw in _parse_fetch_response(data).items():
+        if uid not in matched:
+            continue
+        try:
+            msg = email.message_from_bytes(raw)
+            header = headers[uid]
+            quotation = matched[uid]
+            body_text, attachments = _extract_message_content(msg, header["subject"])
+            msg_id = header["message_id"] or f"{quotation.quotation_no}_{datetime.utcnow().timestamp()}"
+            if msg_id in existing_ids:
+                handled.add(uid)
+                continue
+            existing_ids.add(msg_id)
+
+            db.add(CRMQuotationReply(
+                quotation_id=quotation.id,
+                quotation_no=quotation.quotation_no,
+                sender_email=header["sender_email"],
+                recipient_email=recipient_email,
+                subject=header["subject"],
+                message_body=body_text.strip(),
+                direction="INBOUND",
+                message_id=msg_id,
+                attachments_json=json.dumps(attachments) if attachments else None,
+                received_at=_parse_email_date_ist(header["date"]),
+            ))
+            quotation.status = "CUSTOMER REPLIED"
+            fetched_count += 1
+            handled.add(uid)
+        except Exception as ex:
+            logger.warning(f"Error parsing email UID {uid}: {ex}")
+            handled.add(uid)
+    return fetched_count, handled
+
+
+def _imap_credentials():
+    smtp_email = os.getenv("SMTP_EMAIL") or os.getenv("BREVO_SENDER_EMAIL") or os.getenv("SUPPORT_EMAIL", "bknr.solutions@gmail.com")
+    return smtp_email, os.getenv("SMTP_PASSWORD")
+
+
+def poll_inbound_emails(db: Session, mailbox: InboundMailbox | None = None):
+    """
+    Sync new customer replies for quotations (QT-2026-XXXX) from the IMAP inbox.
+    Zero external cost, built into standard Python imaplib.
+    """
     try:
         from app.routers.crm_quotation_router import ensure_crm_quotation_schema
         ensure_crm_quotation_schema(db)
     except Exception:
         pass
-    """
-    Connects to Gmail/SMTP via IMAP to check for unread replies matching Quotations (QT-2026-XXXX).
-    Zero external cost, built into standard Python imaplib.
-    """
-    smtp_email = os.getenv("SMTP_EMAIL") or os.getenv("BREVO_SENDER_EMAIL") or os.getenv("SUPPORT_EMAIL", "bknr.solutions@gmail.com")
-    smtp_password = os.getenv("SMTP_PASSWORD")
 
-    if not smtp_email or not smtp_password:
-        return {"success": False, "count": 0, "message": "SMTP Email credentials not configured for IMAP."}
+    if mailbox is None:
+        smtp_email, smtp_password = _imap_credentials()
+        if not smtp_email or not smtp_password:
+            return {"success": False, "count": 0, "message": "SMTP Email credentials not configured for IMAP."}
+        mailbox = get_inbound_mailbox(smtp_email, smtp_password)
 
     fetched_count = 0
     try:
-        # Connect to Gmail IMAP
-        mail = imaplib.IMAP4_SSL("imap.gmail.com", 993)
-        mail.login(smtp_email, smtp_password)
-        mail.select("inbox")
-
-        # Search for UNSEEN emails
-        status, response = mail.search(None, 'UNSEEN')
-        if status != "OK" or not response[0]:
-            mail.logout()
-            return {"success": True, "count": 0, "message": "No new unread email replies found."}
-
-        email_ids = response[0].split()
-        for e_id in email_ids:
-            try:
-                res, msg_data = mail.fetch(e_id, "(RFC822)")
-                if res != "OK":
-                    continue
-
-                for response_part in msg_data:
-                    if isinstance(response_part, tuple):
-                        msg = email.message_from_bytes(response_part[1])
-                        
-                        # Extract Subject
-                        raw_subj = msg["Subject"] or ""
-                        subj_bytes, encoding = decode_header(raw_subj)[0]
-                        if isinstance(subj_bytes, bytes):
-                            subject_text = subj_bytes.decode(encoding or "utf-8", errors="ignore")
-                        else:
-                            subject_text = str(subj_bytes)
-
-                        # Extract From
-                        from_header = msg["From"] or ""
-                        sender_email = from_header
-                        if "<" in from_header and ">" in from_header:
-                            sender_email = from_header.split("<")[1].split(">")[0]
-
-                        # Check if subject contains QT-XXXX-XXXX or PI-XXXX-XXXX pattern
-                        match = re.search(r"(QT|PI|SO|INV)-\d{4}-\d{4}", subject_text, re.IGNORECASE)
-                        quotation = None
-                        if match:
-                            q_no = match.group(0).upper()
-                            quotation = db.query(CRMQuotation).filter(CRMQuotation.quotation_no == q_no).first()
-
-                        if not quotation and sender_email:
-                            # Match by sender_email if subject doesn't contain explicit QT/PI number
-                            quotation = db.query(CRMQuotation).filter(
-                                (CRMQuotation.customer_email == sender_email) | (CRMQuotation.customer_name == sender_email)
-                            ).order_by(CRMQuotation.id.desc()).first()
-
-                        if not quotation:
-                            continue
-
-                        q_no = quotation.quotation_no
-
-                        # Extract Message Body & Attachments
-                        body_text = ""
-                        html_text = ""
-                        attachments = []
-
-                        if msg.is_multipart():
-                            for part in msg.walk():
-                                c_type = part.get_content_type()
-                                c_disp = str(part.get('Content-Disposition') or '')
-                                filename = part.get_filename()
-
-                                # Extract Plain Body
-                                if c_type == "text/plain" and "attachment" not in c_disp and not filename:
-                                    payload = part.get_payload(decode=True)
-                                    if payload:
-                                        body_text = payload.decode(errors="ignore")
-
-                                # Extract HTML Body fallback
-                                if c_type == "text/html" and "attachment" not in c_disp and not filename:
-                                    payload = part.get_payload(decode=True)
-                                    if payload:
-                                        html_text = payload.decode(errors="ignore")
-
-                                # Extract Attachments (Photos, Images, PDFs, Documents)
-                                is_image = c_type.startswith("image/")
-                                is_pdf = c_type == "application/pdf"
-                                is_attachment = filename or "attachment" in c_disp or "inline" in c_disp or is_image or is_pdf
-
-                                if is_attachment and c_type not in ["text/plain", "text/html"]:
-                                    file_payload = part.get_payload(decode=True)
-                                    if file_payload:
-                                        import base64
-                                        ext = "png"
-                                        if "jpeg" in c_type or "jpg" in c_type:
-                                            ext = "jpg"
-                                        elif "gif" in c_type:
-                                            ext = "gif"
-                                        elif "pdf" in c_type:
-                                            ext = "pdf"
-
-                                        fname = filename or f"photo_{len(attachments)+1}.{ext}"
-                                        # Decode header if filename is encoded
-                                        try:
-                                            fn_bytes, fn_enc = decode_header(fname)[0]
-                                            if isinstance(fn_bytes, bytes):
-                                                fname = fn_bytes.decode(fn_enc or "utf-8", errors="ignore")
-                                        except Exception:
-                                            pass
-
-                                        b64_data = base64.b64encode(file_payload).decode("utf-8")
-                                        mime = c_type or "application/octet-stream"
-                                        attachments.append({
-                                            "filename": fname,
-                                            "mime_type": mime,
-                                            "data_url": f"data:{mime};base64,{b64_data}"
-                                        })
-                        else:
-                            payload = msg.get_payload(decode=True)
-                            if payload:
-                                body_text = payload.decode(errors="ignore")
-
-                        if not body_text:
-                            if html_text:
-                                body_text = re.sub(r'<[^>]+>', ' ', html_text)
-                            else:
-                                body_text = subject_text
-
-                        import json
-                        attachments_json_str = json.dumps(attachments) if attachments else None
-
-                        # Avoid Duplicate Message Log
-                        msg_id = msg.get("Message-ID") or f"{q_no}_{datetime.utcnow().timestamp()}"
-                        existing = db.query(CRMQuotationReply).filter(CRMQuotationReply.message_id == msg_id).first()
-                        if existing:
-                            continue
-
-                        reply_entry = CRMQuotationReply(
-                            quotation_id=quotation.id,
-                            quotation_no=quotation.quotation_no,
-                            sender_email=sender_email,
-                            recipient_email=smtp_email,
-                            subject=subject_text,
-                            message_body=body_text.strip(),
-                            direction="INBOUND",
-                            message_id=msg_id,
-                            attachments_json=attachments_json_str,
-                            received_at=_parse_email_date_ist(msg.get("Date", ""))
-                        )
-                        db.add(reply_entry)
-                        quotation.status = "CUSTOMER REPLIED"
-                        fetched_count += 1
-            except Exception as ex:
-                logger.warning(f"Error parsing email ID {e_id}: {ex}")
-
-        db.commit()
-        mail.logout()
+        with mailbox.lock:
+            connection = mailbox.ensure_connected()
+            uidvalidity = mailbox.select()
+            checkpoint = load_checkpoint(db, mailbox.account, mailbox.mailbox)
+            uids, incremental = _new_uids(connection, checkpoint, uidvalidity)
+            if not uids:
+                if not incremental:
+                    # Seed the checkpoint so the next poll is incremental.
+                    status, response = connection.uid("SEARCH", None, "ALL")
+                    all_uids = [int(uid) for uid in (response[0] or b"").split()] if status == "OK" and response else []
+                    save_checkpoint(db, mailbox.account, uidvalidity, max(all_uids, default=0), mailbox.mailbox)
+                    db.commit()
+                return {"success": True, "count": 0, "message": "No new unread email replies found."}
+
+            for start in range(0, len(uids), IMAP_FETCH_BATCH_SIZE):
+                batch = uids[start:start + IMAP_FETCH_BATCH_SIZE]
+                stored, handled = _sync_batch(db, connection, batch, mailbox.account)
+                fetched_count += stored
+                last_uid = _last_handled(batch, handled)
+                if last_uid is not None:
+                    save_checkpoint(db, mailbox.account, uidvalidity, last_uid, mailbox.mailbox)
+                db.commit()
+                if last_uid != batch[-1]:
+                    # A FETCH failed or skipped UIDs: retry from there on the next poll.
+                    break
+
         return {"success": True, "count": fetched_count, "message": f"Successfully synced {fetched_count} email replies from Gmail!"}
 
     except Exception as e:
+        db.rollback()
+        mailbox.close()
         logger.error(f"IMAP Poller Error: {e}")
         return {"success": False, "count": 0, "message": f"IMAP Sync Notice: {str(e)}"}
+
+
+def watch_inbound_emails(session_factory, stop_event: threading.Event, mailbox: InboundMailbox | None = None):
+    """Poll, then wait in IMAP IDLE for new mail, until ``stop_event`` is set.
+
+    The watcher owns its mailbox connection so a long IDLE never blocks the
+    on-demand sync endpoint, which uses the shared connection.
+    """
+    if mailbox is None:
+        smtp_email, smtp_password = _imap_credentials()
+        if not smtp_email or not smtp_password:
+            logger.info("IMAP watcher disabled: SMTP Email credentials not configured.")
+            return
+        mailbox = InboundMailbox(smtp_email, smtp_password)
+
+    while not stop_event.is_set():
+        with session_factory() as db:
+            result = poll_inbound_emails(db, mailbox)
+        if not result["success"]:
+            stop_event.wait(60)
+            continue
+        try:
+            if not mailbox.supports_idle:
+                stop_event.wait(IMAP_POLL_INTERVAL_SECONDS)
+                continue
+            mailbox.idle()
+        except Exception as exc:
+            logger.warning("IMAP IDLE interrupted: %s", exc)
+            mailbox.close()
+            stop_event.wait(30)
+    mailbox.close()
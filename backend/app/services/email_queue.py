@@ -0,0 +1,347 @@
+"""Durable outbound email queue and its dispatcher.
+
+Request handlers call ``enqueue_email`` in their own transaction, so a
+notification is stored together with the record that triggered it instead
+of living in a worker's ``BackgroundTasks``. The dispatcher
+(``run_email_dispatcher``, run in a web worker thread or by
+``scripts/run_email_dispatcher.py``) then:
+
+* claims due rows under a lease (``claim_token`` / ``locked_until``), so
+  concurrent dispatchers never pick the same row and rows held by a crashed
+  run are claimed again once the lease expires;
+* merges claimed rows of one company with identical content into one send
+  per ``EMAIL_QUEUE_MAX_RECIPIENTS`` recipients (every recipient of a send
+  sees the others, so companies are never merged);
+* sends a whole run over one SMTP connection (or one Brevo HTTP session);
+* retries failures with exponential backoff up to
+  ``EMAIL_QUEUE_MAX_ATTEMPTS`` and fails permanent rejections at once;
+* records the ``bknr_email_*`` metrics.
+
+Delivery is at-least-once: a run that dies after the transport accepted a
+message sends it again when its lease expires.
+"""
+import json
+import logging
+import os
+import smtplib
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from sqlalchemy import and_, or_, select, update
+
+from app.services.metrics import inc, observe
+
+logger = logging.getLogger("BKNR_ERP.email_queue")
+
+EMAIL_QUEUE_BATCH_SIZE = int(os.getenv("EMAIL_QUEUE_BATCH_SIZE", "100"))
+EMAIL_QUEUE_MAX_RECIPIENTS = int(os.getenv("EMAIL_QUEUE_MAX_RECIPIENTS", "50"))
+EMAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv("EMAIL_QUEUE_MAX_ATTEMPTS", "6"))
+EMAIL_QUEUE_BACKOFF_SECONDS = float(os.getenv("EMAIL_QUEUE_BACKOFF_SECONDS", "30"))
+EMAIL_QUEUE_MAX_BACKOFF_SECONDS = float(os.getenv("EMAIL_QUEUE_MAX_BACKOFF_SECONDS", "3600"))
+EMAIL_QUEUE_LEASE_SECONDS = float(os.getenv("EMAIL_QUEUE_LEASE_SECONDS", "300"))
+EMAIL_QUEUE_POLL_SECONDS = float(os.getenv("EMAIL_QUEUE_POLL_SECONDS", "5"))
+
+PENDING, SENDING, SENT, FAILED = "PENDING", "SENDING", "SENT", "FAILED"
+
+
+class PermanentDeliveryError(Exception):
+    """The transport rejected the message; retrying will not help."""
+
+
+class TransportUnavailable(Exception):
+    """The transport could not be reached; the rest of the run is deferred."""
+
+
+def _model():
+    from app.database.models.outbound_email import OutboundEmail
+
+    return OutboundEmail
+
+
+def clean_recipients(recipients) -> list[str]:
+    if isinstance(recipients, str):
+        recipients = recipients.replace(";", ",").split(",")
+    return sorted({str(r).strip().lower() for r in recipients or () if str(r).strip()})
+
+
+def enqueue_email(db, recipients, subject: str, html: str, text: str = "", company_id: str | None = None,
+                  category: str = "general", reply_to: str | None = None):
+    """Queue one email in the caller's transaction (commit afterwards).
+
+    Returns the ``OutboundEmail`` row, or ``None`` when no recipient is left
+    after cleaning.
+    """
+    clean = clean_recipients(recipients)
+    if not clean:
+        return None
+    now = datetime.utcnow()
+    row = _model()(
+        company_id=company_id,
+        category=category,
+        recipients=json.dumps(clean),
+        subject=subject,
+        html=html,
+        text=text or None,
+        reply_to=reply_to,
+        status=PENDING,
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+    )
+    db.add(row)
+    inc("bknr_email_messages_total", category=category, outcome="queued")
+    return row
+
+
+# ---------------------------------------------------------------------------
+# Transports
+# ---------------------------------------------------------------------------
+
+def build_message(sender: str, recipients: list[str], subject: str, html: str, text: str | None = None,
+                  reply_to: str | None = None) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = sender
+    message["To"] = ", ".join(recipients)
+    if reply_to:
+        message["Reply-To"] = reply_to
+    message.set_content(text or "This email is best viewed in an HTML-capable mail client.")
+    message.add_alternative(html, subtype="html")
+    return message
+
+
+class SmtpTransport:
+    """Sends every message of a dispatch run over one SMTP connection."""
+
+    name = "smtp"
+
+    def __init__(self, host: str, port: int, username: str | None = None, password: str | None = None,
+                 use_ssl: bool = False, starttls: bool = False, sender: str | None = None, timeout: float = 20.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.sender = sender or username or "noreply@localhost"
+        self.timeout = timeout
+        self.connections = 0
+        self._server = None
+
+    def _connect(self):
+        try:
+            if self.use_ssl:
+                server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+            else:
+                server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+                if self.starttls:
+                    server.starttls()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except OSError as exc:
+            raise TransportUnavailable(f"SMTP {self.host}:{self.port} unavailable: {exc}") from exc
+        self.connections += 1
+        return server
+
+    def send(self, recipients, subject, html, text=None, reply_to=None):
+        message = build_message(self.sender, recipients, subject, html, text, reply_to)
+        for attempt in (1, 2):
+            if self._server is None:
+                self._server = self._connect()
+            try:
+                refused = self._server.send_message(message, to_addrs=recipients)
+            except smtplib.SMTPServerDisconnected:
+                # The pooled connection was dropped between messages; reconnect once.
+                self._server = None
+                if attempt == 2:
+                    raise
+                continue
+            except smtplib.SMTPRecipientsRefused as exc:
+                raise PermanentDeliveryError(f"All recipients refused: {sorted(exc.recipients)}") from exc
+            except smtplib.SMTPResponseException as exc:
+                if exc.smtp_code >= 500:
+                    raise PermanentDeliveryError(f"SMTP {exc.smtp_code}: {exc.smtp_error!r}") from exc
+                raise
+            if refused:
+                logger.warning("SMTP refused %s of %s recipients: %s", len(refused), len(recipients), sorted(refused))
+            return
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+def default_transport():
+    """SMTP when ``SMTP_SERVER`` or ``SMTP_PASSWORD`` is set, else Brevo, else ``None``.
+
+    ``SMTP_SECURITY`` is ``ssl``, ``starttls`` or ``none`` (a local relay).
+    """
+    from app.services.brevo_email import BREVO_API_KEY, BrevoTransport
+    from app.utils.email_service import SENDER_NAME, SMTP_EMAIL
+
+    host = os.getenv("SMTP_SERVER", "").strip()
+    password = os.getenv("SMTP_PASSWORD", "").replace(" ", "").strip()
+    if host or password:
+        # An explicit server follows the auth mailer (587/STARTTLS); otherwise Gmail SSL.
+        port = int(os.getenv("SMTP_PORT", "587" if host else "465"))
+        security = os.getenv("SMTP_SECURITY", "ssl" if port == 465 else "starttls").strip().lower()
+        return SmtpTransport(
+            host or "smtp.gmail.com",
+            port,
+            username=SMTP_EMAIL,
+            password=password or None,
+            use_ssl=security == "ssl",
+            starttls=security == "starttls",
+            sender=f"{SENDER_NAME} <{SMTP_EMAIL}>",
+        )
+    if BREVO_API_KEY:
+        return BrevoTransport()
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Dispatch
+# ---------------------------------------------------------------------------
+
+def retry_delay(attempts: int) -> float:
+    return min(EMAIL_QUEUE_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0), EMAIL_QUEUE_MAX_BACKOFF_SECONDS)
+
+
+def claim_due(db, limit: int | None = None, now: datetime | None = None) -> list:
+    """Lease up to ``limit`` due rows to this run and commit the claim."""
+    OutboundEmail = _model()
+    now = now or datetime.utcnow()
+    token = str(uuid.uuid4())
+    due = or_(
+        and_(OutboundEmail.status == PENDING, OutboundEmail.next_attempt_at <= now),
+        and_(OutboundEmail.status == SENDING, OutboundEmail.locked_until < now),
+    )
+    query = (
+        select(OutboundEmail.id)
+        .where(due)
+        .order_by(OutboundEmail.next_attempt_at, OutboundEmail.id)
+        .limit(limit or EMAIL_QUEUE_BATCH_SIZE)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+    ids = db.scalars(query).all()
+    if not ids:
+        db.rollback()
+        return []
+
+    # ``due`` is re-checked so a row another dispatcher claimed meanwhile is skipped.
+    db.execute(
+        update(OutboundEmail)
+        .where(OutboundEmail.id.in_(ids), due)
+        .values(
+            status=SENDING,
+            claim_token=token,
+            locked_until=now + timedelta(seconds=EMAIL_QUEUE_LEASE_SECONDS),
+            attempts=OutboundEmail.attempts + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return db.scalars(
+        select(OutboundEmail).where(OutboundEmail.claim_token == token).order_by(OutboundEmail.id)
+    ).all()
+
+
+def _settle(row, error: Exception | None, permanent: bool, now: datetime) -> str:
+    row.claim_token = None
+    row.locked_until = None
+    if error is None:
+        row.status, row.sent_at, row.last_error = SENT, now, None
+        if row.created_at:
+            observe("bknr_email_queue_delay_seconds", max((now - row.created_at).total_seconds(), 0.0),
+                    category=row.category)
+        return "sent"
+
+    row.last_error = str(error)[:2000]
+    if permanent or row.attempts >= EMAIL_QUEUE_MAX_ATTEMPTS:
+        row.status = FAILED
+        logger.error("Email %s (%s) failed after %s attempts: %s", row.id, row.category, row.attempts, error)
+        return "failed"
+    row.status = PENDING
+    row.next_attempt_at = now + timedelta(seconds=retry_delay(row.attempts))
+    return "retried"
+
+
+def dispatch_pending(db, transport, limit: int | None = None) -> dict:
+    """Deliver one batch of due messages through ``transport``.
+
+    Returns ``{"sent", "retried", "failed"}`` row counts. The transport is
+    closed afterwards.
+    """
+    counts = {"sent": 0, "retried": 0, "failed": 0}
+    rows = claim_due(db, limit)
+    if not rows:
+        return counts
+
+    groups: dict[tuple, list] = {}
+    for row in rows:
+        key = (row.company_id or "", row.subject, row.html, row.text or "", row.reply_to or "")
+        groups.setdefault(key, []).append(row)
+
+    unavailable = None
+    try:
+        for (_, subject, html, text, reply_to), members in groups.items():
+            error, permanent = unavailable, False
+            if unavailable is None:
+                recipients = sorted({email for row in members for email in json.loads(row.recipients)})
+                started = time.perf_counter()
+                try:
+                    for start in range(0, len(recipients), EMAIL_QUEUE_MAX_RECIPIENTS):
+                        transport.send(recipients[start:start + EMAIL_QUEUE_MAX_RECIPIENTS], subject, html,
+                                       text=text or None, reply_to=reply_to or None)
+                except PermanentDeliveryError as exc:
+                    error, permanent = exc, True
+                except TransportUnavailable as exc:
+                    error = unavailable = exc
+                    logger.warning("Email transport unavailable, deferring the run: %s", exc)
+                except Exception as exc:
+                    error = exc
+                    logger.warning("Email send failed (%s rows): %s", len(members), exc)
+                observe("bknr_email_send_seconds", time.perf_counter() - started, transport=transport.name)
+
+            now = datetime.utcnow()
+            for row in members:
+                outcome = _settle(row, error, permanent, now)
+                counts[outcome] += 1
+                inc("bknr_email_messages_total", category=row.category, outcome=outcome)
+            db.commit()
+    finally:
+        transport.close()
+    return counts
+
+
+def run_email_dispatcher(session_factory, stop_event, transport_factory=default_transport):
+    """Deliver queued email until ``stop_event`` is set."""
+    warned = False
+    while not stop_event.is_set():
+        transport = transport_factory()
+        if transport is None:
+            if not warned:
+                logger.warning("No email transport configured; queued email is held until one is")
+                warned = True
+            stop_event.wait(60)
+            continue
+
+        counts = {}
+        db = session_factory()
+        try:
+            counts = dispatch_pending(db, transport)
+        except Exception:
+            db.rollback()
+            logger.exception("Email dispatch run failed")
+        finally:
+            db.close()
+        # A full batch means more is probably due; otherwise wait for the next poll.
+        if sum(counts.values()) < EMAIL_QUEUE_BATCH_SIZE:
+            stop_event.wait(EMAIL_QUEUE_POLL_SECONDS)
@@ -0,0 +1,310 @@
+"""Financial-year (April-March) helpers backed by the ``financial_periods`` index.
+
+Reports used to derive their FY dropdown by selecting every ``GateEntry.date``
+for the company, and each dashboard parsed ``fy`` parameters its own way. This
+module is the shared home for both:
+
+* ``current_fy_start``, ``parse_fy_start``, ``fy_label`` and ``fy_bounds`` turn
+  ``fy`` parameters ("2025" or "2025-26") into start years, labels and dates.
+* ``financial_years`` / ``period_months`` read the small per-company table of
+  active months. It is maintained by an ``after_flush`` hook on the app's
+  sessions (``install_period_tracking``) for every tracked source table, and
+  rebuilt on demand with ``rebuild_financial_periods`` after bulk deletes that
+  bypass the ORM. Until the table exists the readers fall back to a grouped
+  scan of the source table.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import func, inspect, select
+
+from app.services.derived_tables import (
+    DerivedTable,
+    install_derived_table_tracking,
+    register_derived_table,
+    reset_ready_cache,
+    tables_ready,
+    upsert_increments,
+    write_outside_request,
+)
+
+logger = logging.getLogger(__name__)
+
+# Source table -> date column counted per month. Keep in step with the
+# backfill in alembic revision o9c0d1e2f3a4.
+PERIOD_SOURCES = {
+    "gate_entry": "date",
+    "raw_material_purchasing": "date",
+    "reprocess_entries": "date",
+    "de_heading": "date",
+    "peeling": "date",
+    "soaking": "date",
+    "production": "date",
+    "grading": "date",
+    "stock_entry": "date",
+}
+DEFAULT_SOURCE = "gate_entry"
+DERIVED_TABLE = "financial_periods"
+
+
+def current_fy_start(today: date | None = None) -> int:
+    today = today or date.today()
+    return today.year if today.month >= 4 else today.year - 1
+
+
+def fy_start_for(value: date) -> int:
+    return value.year if value.month >= 4 else value.year - 1
+
+
+def parse_fy_start(value, fallback: int | None = None) -> int:
+    """Start year of an ``fy`` parameter such as "2025" or "2025-26"."""
+    try:
+        return int(str(value).strip().split("-")[0])
+    except (TypeError, ValueError):
+        return current_fy_start() if fallback is None else fallback
+
+
+def fy_label(start_year: int) -> str:
+    return f"{start_year}-{str(start_year + 1)[2:]}"
+
+
+def fy_bounds(start_year: int) -> tuple[date, date]:
+    return date(start_year, 4, 1), date(start_year + 1, 3, 31)
+
+
+def _as_date(value) -> date | None:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if value:
+        try:
+            return date.fromisoformat(str(value)[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def _period_table():
+    from app.database.models.financial_periods import FinancialPeriod
+
+    return FinancialPeriod.__table__
+
+
+def _table_ready(connection) -> bool:
+    return tables_ready(connection, DERIVED_TABLE)
+
+
+def _upsert_counts(connection, deltas: dict) -> None:
+    """Add ``{(company_id, source, month): delta}`` to the stored row counts."""
+    upsert_increments(
+        connection, _period_table(), ("company_id", "source", "period_month"),
+        [
+            {"company_id": company_id, "source": source, "period_month": month,
+             "fy_start_year": fy_start_for(month), "row_count": delta}
+            for (company_id, source, month), delta in deltas.items() if delta
+        ],
+        increments=("row_count",),
+        touched={"updated_at": func.now()},
+    )
+
+
+def _scan_source(connection, company_id: str, source: str) -> dict[date, int]:
+    """Rows per month straight from the source table (grouped by day)."""
+    from app.database import Base
+
+    table = Base.metadata.tables[source]
+    column = table.c[PERIOD_SOURCES[source]]
+    months: dict[date, int] = defaultdict(int)
+    rows = connection.execute(
+        select(column, func.count())
+        .where(table.c.company_id == company_id, column.is_not(None))
+        .group_by(column)
+    ).all()
+    for value, count in rows:
+        day = _as_date(value)
+        if day:
+            months[day.replace(day=1)] += int(count or 0)
+    return dict(months)
+
+
+def _store_months(connection, company_id: str, source: str, months: dict[date, int]) -> None:
+    table = _period_table()
+    connection.execute(table.delete().where(table.c.company_id == company_id, table.c.source == source))
+    _upsert_counts(connection, {(company_id, source, month): count for month, count in months.items()})
+
+
+def rebuild_financial_periods(db, company_id: str, source: str = DEFAULT_SOURCE) -> int:
+    """Recount one company's months from the source table in the caller's
+    transaction (commit afterwards); returns the number of active months."""
+    connection = db.connection()
+    months = _scan_source(connection, company_id, source)
+    if _table_ready(connection):
+        _store_months(connection, company_id, source, months)
+    return len(months)
+
+
+def reconcile_financial_periods(db, company_id: str | None = None) -> int:
+    """Recount every source (one grouped scan each) and correct the months
+    that drifted, for one company or all of them, in the caller's transaction
+    (commit afterwards); returns the number of corrected months."""
+    from app.database import Base
+
+    connection = db.connection()
+    if not _table_ready(connection):
+        return 0
+    table = _period_table()
+    corrections: dict = {}
+    for source, field in PERIOD_SOURCES.items():
+        if source not in Base.metadata.tables or not inspect(connection).has_table(source):
+            continue
+        source_table = Base.metadata.tables[source]
+        column = source_table.c[field]
+        actual: dict = defaultdict(int)
+        query = select(source_table.c.company_id, column, func.count()).where(
+            source_table.c.company_id.is_not(None), column.is_not(None),
+        ).group_by(source_table.c.company_id, column)
+        stored_query = select(table.c.company_id, table.c.period_month, table.c.row_count).where(table.c.source == source)
+        if company_id is not None:
+            query = query.where(source_table.c.company_id == company_id)
+            stored_query = stored_query.where(table.c.company_id == company_id)
+        for company, value, count in connection.execute(query):
+            day = _as_date(value)
+            if day:
+                actual[(str(company), source, day.replace(day=1))] += int(count or 0)
+        stored = {
+            (company, source, _as_date(month)): int(count or 0)
+            for company, month, count in connection.execute(stored_query)
+        }
+        for key in actual.keys() | stored.keys():
+            delta = actual.get(key, 0) - stored.get(key, 0)
+            if delta:
+                corrections[key] = delta
+    _upsert_counts(connection, corrections)
+    return len(corrections)
+
+
+def run_financial_period_reconcile():
+    """Nightly recount that repairs months changed by Core or SQL writes."""
+    from app.database import BackgroundSessionLocal
+
+    db = BackgroundSessionLocal()
+    try:
+        if not _table_ready(db.connection()):
+            return "skipped"
+        corrected = reconcile_financial_periods(db)
+        db.commit()
+        if corrected:
+            logger.info("Financial period reconcile corrected %s months", corrected)
+        return "clean"
+    except Exception as e:
+        db.rollback()
+        logger.error("Financial period reconcile failed: %s", e)
+        return "failed"
+    finally:
+        db.close()
+
+
+def period_months(db, company_id: str, fy_start_year: int | None = None, source: str = DEFAULT_SOURCE) -> list[tuple[date, int]]:
+    """Active ``(month, row_count)`` pairs, oldest first, optionally for one FY."""
+    connection = db.connection()
+    if not _table_ready(connection):
+        months = _scan_source(connection, company_id, source)
+        return sorted(
+            (month, count) for month, count in months.items()
+            if fy_start_year is None or fy_start_for(month) == fy_start_year
+        )
+
+    table = _period_table()
+    query = select(table.c.period_month, table.c.row_count).where(
+        table.c.company_id == company_id, table.c.source == source, table.c.row_count > 0,
+    )
+    if fy_start_year is not None:
+        query = query.where(table.c.fy_start_year == fy_start_year)
+    rows = [(_as_date(month), int(count)) for month, count in connection.execute(query.order_by(table.c.period_month))]
+    if rows or fy_start_year is not None:
+        return rows
+
+    # Nothing indexed for this company yet (rows written by a bulk path).
+    months = _scan_source(connection, company_id, source)
+    if months:
+        write_outside_request(db, lambda own: _store_months(own, company_id, source, months))
+    return sorted(months.items())
+
+
+def financial_years(db, company_id: str, sources=(DEFAULT_SOURCE,)) -> list[int]:
+    """FY start years with at least one row in any of ``sources``, newest first."""
+    sources = (sources,) if isinstance(sources, str) else tuple(sources)
+    years: set[int] = set()
+    pending = set(sources)
+    connection = db.connection()
+    if _table_ready(connection):
+        table = _period_table()
+        rows = connection.execute(
+            select(table.c.source, table.c.fy_start_year).where(
+                table.c.company_id == company_id, table.c.source.in_(sources), table.c.row_count > 0,
+            ).distinct()
+        ).all()
+        years.update(int(year) for _, year in rows)
+        pending.difference_update(source for source, _ in rows)
+    for source in sorted(pending):
+        years.update(fy_start_for(month) for month, _ in period_months(db, company_id, source=source))
+    return sorted(years, reverse=True)
+
+
+def _tracked_value(obj, attr: str):
+    state = inspect(obj)
+    history = state.attrs[attr].history
+    current = getattr(obj, attr, None)
+    old = history.deleted[0] if history.deleted else current
+    return old, current, history.has_changes()
+
+
+def _collect_deltas(session) -> dict:
+    deltas: dict = defaultdict(int)
+
+    def add(obj, sign, company_id=None, value=None):
+        table = getattr(obj, "__tablename__", None)
+        company_id = company_id if company_id is not None else getattr(obj, "company_id", None)
+        if value is None:
+            value = getattr(obj, PERIOD_SOURCES[table], None)
+        day = _as_date(value)
+        if company_id and day:
+            deltas[(str(company_id), table, day.replace(day=1))] += sign
+
+    for obj in session.new:
+        if getattr(obj, "__tablename__", None) in PERIOD_SOURCES:
+            add(obj, 1)
+    for obj in session.deleted:
+        if getattr(obj, "__tablename__", None) in PERIOD_SOURCES:
+            add(obj, -1)
+    for obj in session.dirty:
+        table = getattr(obj, "__tablename__", None)
+        if table not in PERIOD_SOURCES:
+            continue
+        old_day, new_day, day_changed = _tracked_value(obj, PERIOD_SOURCES[table])
+        old_company, new_company, company_changed = _tracked_value(obj, "company_id")
+        if day_changed or company_changed:
+            add(obj, -1, old_company, old_day)
+            add(obj, 1, new_company, new_day)
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def install_period_tracking(session_factory) -> None:
+    """Keep ``financial_periods`` in step with ORM writes made through ``session_factory``."""
+    install_derived_table_tracking(session_factory, DERIVED_TABLE)
+
+
+def reset_period_tracking_cache() -> None:
+    reset_ready_cache(DERIVED_TABLE)
+
+
+register_derived_table(DerivedTable(
+    name=DERIVED_TABLE,
+    label="Financial period index update",
+    sources=lambda: PERIOD_SOURCES,
+    tables=lambda: (_period_table(),),
+    collect=_collect_deltas,
+    apply=_upsert_counts,
+))
@@ -1,14 +1,18 @@
-from app.database import SessionLocal
+import logging
+
+from app.database import BackgroundSessionLocal
 from app.database.models.floor_balance import (
     FloorBalance,
     FloorBalanceSnapshot
 )
 from app.utils.timezone import ist_now
 
+logger = logging.getLogger(__name__)
+
 
 def create_floor_balance_snapshot():
 
-    db = SessionLocal()
+    db = BackgroundSessionLocal()
 
     try:
 
@@ -20,8 +24,8 @@ def create_floor_balance_snapshot():
         ).first()
 
         if exists:
-            print(f"⚠️ Floor Balance Snapshot already exists for {today}")
-            return
+            logger.info("Floor Balance Snapshot already exists for %s", today)
+            return "skipped"
 
         rows = db.query(FloorBalance).all()
 
@@ -55,14 +59,14 @@ def create_floor_balance_snapshot():
 
         db.commit()
 
-        print(
-            f"✅ Floor Balance Snapshot Created : {count} rows"
-        )
+        logger.info("Floor Balance Snapshot Created : %s rows", count)
+        return "created"
 
     except Exception as e:
 
         db.rollback()
-        print(f"❌ Floor Balance Snapshot Error: {e}")
+        logger.error("Floor Balance Snapshot Error: %s", e)
+        return "failed"
 
     finally:
         db.close()
@@ -0,0 +1,238 @@
+"""
+Forex Revaluation Service
+=========================
+Period-end unrealised FX on open foreign-currency customer receivables.
+
+A run costs a fixed number of queries whatever the number of invoices:
+  * the latest unreversed revaluation of every open receivable comes from
+    one window query;
+  * the prior revaluations are reversed by ONE consolidated contra journal;
+  * the new gain/loss is posted as ONE consolidated journal.
+Both journals carry one customer line per invoice (remarks = invoice no, the
+bill reference) and summed Unrealised Forex Gain / Loss lines.
+"""
+import json
+import logging
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.database.models.enterprise_finance import FinanceAuditTrail, ForexRevaluation, VoucherHeader
+from app.database.models.payments import CustomerReceivable
+from app.services.bill_accounting import amount_line
+from app.services.posting_engine import PostingEngineService
+
+logger = logging.getLogger(__name__)
+
+GAIN_LEDGER = ("Unrealised Forex Gain A/c", "Indirect Incomes", "INCOME")
+LOSS_LEDGER = ("Unrealised Forex Loss A/c", "Indirect Expenses", "EXPENSE")
+
+
+def customer_ledger_name(buyer_name: str) -> str:
+    return buyer_name if str(buyer_name).lower().endswith("a/c") else f"{buyer_name} - Customer A/c"
+
+
+def latest_revaluations(db: Session, company_id: str, receivable_ids) -> dict[int, ForexRevaluation]:
+    """Latest unreversed revaluation per receivable, from one ROW_NUMBER() query."""
+    receivable_ids = sorted(set(receivable_ids))
+    if not receivable_ids:
+        return {}
+    ranked = (
+        db.query(
+            ForexRevaluation.id.label("id"),
+            func.row_number().over(
+                partition_by=ForexRevaluation.receivable_id,
+                order_by=(ForexRevaluation.as_of_date.desc(), ForexRevaluation.id.desc()),
+            ).label("position"),
+        )
+        .filter(
+            ForexRevaluation.company_id == company_id,
+            ForexRevaluation.receivable_id.in_(receivable_ids),
+            ForexRevaluation.is_reversed == False,
+        )
+        .subquery()
+    )
+    rows = (
+        db.query(ForexRevaluation)
+        .join(ranked, ranked.c.id == ForexRevaluation.id)
+        .filter(ranked.c.position == 1)
+        .all()
+    )
+    return {row.receivable_id: row for row in rows}
+
+
+def revaluation_lines(entries, reverse: bool = False) -> list:
+    """Journal lines for ``(invoice_no, customer_ledger, gain_loss)`` entries.
+
+    A gain debits the customer and credits Unrealised Forex Gain; a loss
+    debits Unrealised Forex Loss and credits the customer. ``reverse`` swaps
+    every side (contra of an earlier revaluation).
+    """
+    lines = []
+    totals = {GAIN_LEDGER: 0.0, LOSS_LEDGER: 0.0}
+    for invoice_no, customer, gain_loss in entries:
+        value = round(abs(float(gain_loss)), 2)
+        customer_debit = (gain_loss > 0) != reverse
+        lines.append(amount_line(
+            customer, "Sundry Debtors", "ASSET",
+            debit=value if customer_debit else 0.0,
+            credit=0.0 if customer_debit else value,
+            remarks=invoice_no, parent_group_name="Current Assets",
+        ))
+        totals[GAIN_LEDGER if gain_loss > 0 else LOSS_LEDGER] += value
+    count = len(entries)
+    gain = round(totals[GAIN_LEDGER], 2)
+    loss = round(totals[LOSS_LEDGER], 2)
+    if gain:
+        lines.append(amount_line(*GAIN_LEDGER, debit=gain if reverse else 0.0, credit=0.0 if reverse else gain, remarks=f"{count} invoice(s)"))
+    if loss:
+        lines.append(amount_line(*LOSS_LEDGER, debit=0.0 if reverse else loss, credit=loss if reverse else 0.0, remarks=f"{count} invoice(s)"))
+    return lines
+
+
+def _reversible_journals(db: Session, company_id: str, journal_ids) -> set[int]:
+    """Prior revaluation journals that still need a contra.
+
+    Mirrors ``PostingEngineService.reverse_voucher``: journals that are not
+    POSTED are not contra'd (an unposted one is cancelled), and journals
+    reversed before keep their existing reversal.
+    """
+    if not journal_ids:
+        return set()
+    posted = set()
+    for voucher in db.query(VoucherHeader).filter(
+        VoucherHeader.company_id == company_id, VoucherHeader.id.in_(sorted(journal_ids)),
+    ):
+        if voucher.status == "POSTED":
+            posted.add(voucher.id)
+        elif voucher.status not in {"CANCELLED", "REJECTED"}:
+            voucher.status = "CANCELLED"
+    reversed_already = set()
+    for audit in db.query(FinanceAuditTrail).filter(
+        FinanceAuditTrail.company_id == company_id,
+        FinanceAuditTrail.table_name == "voucher_headers",
+        FinanceAuditTrail.record_id.in_(sorted(posted)),
+        FinanceAuditTrail.action == "REVERSE",
+    ):
+        try:
+            int(json.loads(audit.new_value or "{}").get("reversal_voucher_id"))
+        except (TypeError, ValueError, json.JSONDecodeError):
+            continue
+        reversed_already.add(audit.record_id)
+    return posted - reversed_already
+
+
+def _fully_covered_journals(db: Session, company_id: str, reversed_rows: list) -> list[int]:
+    """Prior journals whose every unreversed revaluation is being reversed now."""
+    covering = defaultdict(int)
+    for row in reversed_rows:
+        covering[row.journal_id] += 1
+    if not covering:
+        return []
+    open_counts = dict(
+        db.query(ForexRevaluation.journal_id, func.count(ForexRevaluation.id))
+        .filter(
+            ForexRevaluation.company_id == company_id,
+            ForexRevaluation.journal_id.in_(sorted(covering)),
+            ForexRevaluation.is_reversed == False,
+        )
+        .group_by(ForexRevaluation.journal_id)
+        .all()
+    )
+    return [journal_id for journal_id, count in covering.items() if open_counts.get(journal_id) == count]
+
+
+def run_forex_revaluation(db: Session, company_id: str, as_of_date: date, closing_rates: dict, created_by: str = "SYSTEM") -> dict:
+    """Reverse the prior run and post unrealised FX for every open invoice.
+
+    Flushes but does not commit; raises ``ValueError`` when the date was
+    already revalued or the posting engine rejects a journal.
+    """
+    rates = {str(code).strip().upper(): float(rate) for code, rate in closing_rates.items() if float(rate) > 0}
+    duplicate = db.query(ForexRevaluation.id).filter(
+        ForexRevaluation.company_id == company_id,
+        ForexRevaluation.as_of_date == as_of_date,
+    ).first()
+    if duplicate:
+        raise ValueError("Forex revaluation already exists for this date")
+
+    receivables = db.query(CustomerReceivable).filter(
+        CustomerReceivable.company_id == company_id,
+        CustomerReceivable.is_cancelled != True,
+        CustomerReceivable.balance_amount > 0.01,
+        CustomerReceivable.currency != "INR",
+    ).order_by(CustomerReceivable.id).all()
+
+    skipped = 0
+    candidates = []
+    for source in receivables:
+        currency = str(source.currency or "USD").strip().upper()
+        closing_rate = rates.get(currency)
+        booking_rate = float(source.exchange_rate or 0)
+        if not closing_rate or booking_rate <= 0 or float(source.invoice_value_inr or 0) <= 0:
+            skipped += 1
+            continue
+        candidates.append((source, currency, closing_rate, booking_rate))
+
+    previous = latest_revaluations(db, company_id, [source.id for source, *_ in candidates])
+    reversible = _reversible_journals(db, company_id, {row.journal_id for row in previous.values()})
+
+    reversals, revaluations, new_rows = [], [], []
+    for source, currency, closing_rate, booking_rate in candidates:
+        customer = customer_ledger_name(source.buyer_name)
+        prior = previous.get(source.id)
+        if prior and prior.journal_id in reversible:
+            reversals.append((prior, (source.invoice_no, customer, float(prior.gain_loss_amount))))
+        foreign_balance = round(float(source.invoice_value_foreign or 0) * float(source.balance_amount or 0) / float(source.invoice_value_inr), 4)
+        gain_loss = round(foreign_balance * (closing_rate - booking_rate), 2)
+        if abs(gain_loss) < 0.01:
+            skipped += 1
+            continue
+        revaluations.append((source.invoice_no, customer, gain_loss))
+        new_rows.append(dict(
+            company_id=company_id, receivable_id=source.id, as_of_date=as_of_date,
+            currency_code=currency, foreign_balance=foreign_balance,
+            booking_rate=booking_rate, closing_rate=closing_rate,
+            gain_loss_amount=gain_loss, created_by=created_by,
+        ))
+
+    reversal = None
+    if reversals:
+        covered = _fully_covered_journals(db, company_id, [row for row, _ in reversals])
+        reversal = PostingEngineService.create_voucher(
+            db, company_id, "Journal", as_of_date,
+            f"Reversal of forex revaluations rolled forward to {as_of_date.isoformat()}",
+            revaluation_lines([entry for _, entry in reversals], reverse=True),
+            reference_no=f"REV-FX-{as_of_date.isoformat()}"[:50], created_by=created_by,
+        )
+        for journal_id in covered:
+            PostingEngineService.write_finance_audit(
+                db, company_id, "voucher_headers", journal_id, "REVERSE",
+                {"status": "POSTED"},
+                {"reversal_voucher_id": reversal.id, "reason": f"Forex revaluation rolled forward to {as_of_date.isoformat()}"},
+                created_by,
+            )
+    # Unposted / already-reversed prior journals are settled without a new contra, as before.
+    for prior in previous.values():
+        prior.is_reversed = True
+
+    journal = None
+    if revaluations:
+        journal = PostingEngineService.create_voucher(
+            db, company_id, "Journal", as_of_date,
+            f"Unrealised forex revaluation of {len(revaluations)} invoice(s) as of {as_of_date.isoformat()}",
+            revaluation_lines(revaluations),
+            reference_no=f"FX-{as_of_date.isoformat()}"[:50], created_by=created_by,
+        )
+        db.execute(insert(ForexRevaluation), [{**row, "journal_id": journal.id} for row in new_rows])
+    db.flush()
+    return {
+        "posted": len(revaluations),
+        "skipped": skipped,
+        "reversed": len(reversals),
+        "net_gain_loss": round(sum(gain_loss for _, _, gain_loss in revaluations), 2),
+        "journal_id": journal.id if journal else None,
+        "reversal_journal_id": reversal.id if reversal else None,
+    }
@@ -0,0 +1,579 @@
+"""HR command center KPIs, rolled up per company × location × day.
+
+The HR command center used to count headcount, attendance, approvals,
+statutory coverage and production kg with dozens of scoped queries per load
+and scan every employee for upcoming birthdays. ``hr_kpi_rollups`` keeps
+those totals per company, location and day, so a dashboard load is one
+range read summed over the locations in scope:
+
+* ``load_hr_kpi_rollups`` returns the rollups of a set of days; days not
+  stored yet are built together with one query per source table.
+* ``install_hr_kpi_tracking`` drops the affected days whenever an
+  attendance, production or peeling row is written through the ORM; an
+  attendance write drops its duty day and every later day, whose pending
+  approval counts include it. An employee or statutory write changes every
+  day, but only at the employee's old and new location: it marks those
+  rows stale (``kpis`` set to ``STALE``, added for stored days that lack
+  the location) and the next load rebuilds just those locations.
+* ``invalidate_hr_kpi_rollups`` does the same for set-based writes, and
+  ``run_hr_kpi_reconcile`` drops yesterday's and today's rows hourly for
+  writes that bypass the ORM.
+"""
+import json
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from importlib import import_module
+
+from sqlalchemy import and_, case, func, inspect, literal, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from app.services.derived_tables import (
+    DerivedTable,
+    dialect_insert,
+    install_derived_table_tracking,
+    register_derived_table,
+    reset_ready_cache,
+    tables_ready,
+    write_outside_request,
+)
+
+logger = logging.getLogger(__name__)
+
+HR_KPI_RECONCILE_MINUTES = int(os.getenv("HR_KPI_RECONCILE_MINUTES", "60"))
+CONTRACT_TYPES = ("CONTRACT", "CONTRACTOR")
+STAFF_TYPES = ("STAFF", "REGULAR", "PERMANENT")
+DAY_TYPES = ("DAY", "DAILY", "DAY_BASIS")
+KG_TYPES = ("KG", "KG_BASIS")
+TEMP_TYPES = ("TEMP", "TEMPORARY")
+SALARY_TIERS = (10000, 20000, 30000)
+DERIVED_TABLE = "hr_kpi_rollups"
+STALE = ""  # kpis of a row waiting for a location rebuild
+
+
+@dataclass(frozen=True)
+class RollupSource:
+    model: str                    # "module:Class"
+    day_field: str | None         # None: a write touches every day of the company
+    carries_forward: bool = False  # also every later day (cumulative counts)
+    location_field: str | None = None  # every day, but only this location ("employee_id": the employee's)
+
+
+ROLLUP_SOURCES = (
+    RollupSource("app.database.models.attendance:EmployeeRegistration", None, location_field="production_at"),
+    RollupSource("app.database.models.attendance:EmployeeStatutoryMaster", None, location_field="employee_id"),
+    RollupSource("app.database.models.attendance:DailyAttendance", "duty_date", carries_forward=True),
+    RollupSource("app.database.models.processing:Production", "date"),
+    RollupSource("app.database.models.processing:Peeling", "date"),
+)
+
+def _model(source: RollupSource):
+    module_name, class_name = source.model.split(":")
+    return getattr(import_module(module_name), class_name)
+
+
+def _rollup_table():
+    from app.database.models.hr_kpi_rollups import HrKpiRollup
+
+    return HrKpiRollup.__table__
+
+
+def _table_ready(connection) -> bool:
+    return tables_ready(connection, DERIVED_TABLE)
+
+
+def _key(value) -> str:
+    return str(value or "").strip().upper()
+
+
+def _blank() -> dict:
+    return {
+        "total": 0, "active": 0, "contract": 0, "staff": 0, "day_basis": 0, "kg_basis": 0, "temp_basis": 0,
+        "payroll": 0.0, "salaried": 0, "resigned_year": 0, "joined_month": 0, "resigned_month": 0,
+        "present": 0, "half_day": 0, "ot_workers": 0, "ot_hours": 0.0, "working_hours": 0.0, "labor_cost": 0.0,
+        "ot_pending": 0, "duty_pending": 0,
+        "production_kg": {}, "departments": {}, "contractors": {},
+        "risk": {"no_pan": 0, "no_aadhar": 0, "no_bank": 0, "no_photo": 0, "no_mobile": 0, "no_email": 0, "no_statutory": 0},
+        "statutory": {"pf": 0, "esi": 0, "pt": 0, "pf_na": 0, "missing_uan": 0, "missing_esi": 0},
+        "salary_tiers": [0, 0, 0, 0], "gender": {}, "blood_groups": {},
+        "events": [],
+    }
+
+
+def merge_kpis(into: dict, kpis: dict) -> dict:
+    """Add one rollup's ``kpis`` into ``into``: numbers sum, dicts merge, event lists concatenate."""
+    for name, value in kpis.items():
+        if isinstance(value, dict):
+            merge_kpis(into.setdefault(name, {}), value)
+        elif isinstance(value, list):
+            current = into.setdefault(name, [])
+            if value and isinstance(value[0], list):
+                current.extend(value)
+            else:
+                current.extend([0] * (len(value) - len(current)))
+                for index, number in enumerate(value):
+                    current[index] += number
+        else:
+            into[name] = into.get(name, 0) + (value or 0)
+    return into
+
+
+def scoped_kpis(rollups: dict, location: str | None = None, allowed_locations=None) -> dict:
+    """Sum one day's ``{location: kpis}`` over the locations in scope."""
+    total = _blank()
+    for row_location, kpis in rollups.items():
+        if location and location != "ALL":
+            if row_location != location:
+                continue
+        elif allowed_locations and row_location not in allowed_locations:
+            continue
+        merge_kpis(total, kpis)
+    return total
+
+
+def next_annual_date(source_date, today: date):
+    """Next birthday / joining anniversary of ``source_date`` on or after ``today``."""
+    if not source_date:
+        return None
+    try:
+        candidate = source_date.replace(year=today.year)
+    except ValueError:  # 29-Feb in a non-leap year
+        candidate = date(today.year, 2, 28)
+    if candidate < today:
+        try:
+            candidate = source_date.replace(year=today.year + 1)
+        except ValueError:
+            candidate = date(today.year + 1, 2, 28)
+    return candidate
+
+
+def _active_on(employee, day: date) -> bool:
+    # Python twin of app.utils.hr_workforce.active_employee_on
+    return (
+        _key(employee.status) == "ACTIVE"
+        and (employee.joining_date is None or employee.joining_date <= day)
+        and (employee.resignation_date is None or employee.resignation_date >= day)
+    )
+
+
+def _empty(value) -> bool:
+    return value is None or value == ""
+
+
+def _build(connection, company_id: str, days, locations=None) -> dict:
+    """``{day: {location: kpis}}`` straight from the source tables, one query per table.
+
+    With ``locations`` only those locations are built, each day getting a
+    row for every one of them.
+    """
+    from app.database.models.attendance import DailyAttendance, EmployeeRegistration, EmployeeStatutoryMaster
+    from app.database.models.processing import Peeling, Production
+
+    days = sorted(set(days))
+    if not days:
+        return {}
+    first, last = days[0], days[-1]
+    wanted = set(days)
+    built = {day: defaultdict(_blank) for day in days}
+
+    employee = EmployeeRegistration
+    employees = {
+        row.employee_id: row
+        for row in connection.execute(
+            select(
+                employee.employee_id, employee.employee_name, employee.production_at, employee.department,
+                employee.employee_type, employee.contractor_name, employee.status, employee.joining_date,
+                employee.resignation_date, employee.current_salary, employee.dob, employee.gender,
+                employee.blood_group, employee.pan_number, employee.aadhar_number, employee.account_number,
+                employee.photo_path, employee.mobile, employee.email, employee.personal_email, employee.official_email,
+            ).where(employee.company_id == company_id)
+        )
+        if locations is None or _key(row.production_at) in locations
+    }
+
+    statutory = defaultdict(set)
+    for row in connection.execute(
+        select(
+            EmployeeStatutoryMaster.employee_id, EmployeeStatutoryMaster.status,
+            EmployeeStatutoryMaster.pf_applicable, EmployeeStatutoryMaster.esi_applicable,
+            EmployeeStatutoryMaster.pt_applicable, EmployeeStatutoryMaster.uan_number, EmployeeStatutoryMaster.esi_number,
+        ).where(EmployeeStatutoryMaster.company_id == company_id)
+    ):
+        flags = statutory[row.employee_id]
+        flags.add("registered")
+        active = _key(row.status) == "ACTIVE"
+        if row.pf_applicable and active:
+            flags.add("pf")
+        if row.pf_applicable is not None and not row.pf_applicable and active:
+            flags.add("pf_na")
+        if row.pf_applicable and _empty(row.uan_number):
+            flags.add("missing_uan")
+        if row.esi_applicable and active:
+            flags.add("esi")
+        if row.esi_applicable and _empty(row.esi_number):
+            flags.add("missing_esi")
+        if row.pt_applicable and active:
+            flags.add("pt")
+
+    # Employee master: the same for every day except what depends on the day itself.
+    for row in employees.values():
+        location = _key(row.production_at)
+        department = str(row.department or "")
+        employee_type = _key(row.employee_type)
+        flags = statutory.get(row.employee_id, set())
+        for day in days:
+            kpis = built[day][location]
+            kpis["total"] += 1
+            dept = kpis["departments"].setdefault(department, {"employees": 0, "active": 0, "salary": 0.0, "salaried": 0, "present": 0})
+            dept["employees"] += 1
+            kpis["gender"][str(row.gender or "")] = kpis["gender"].get(str(row.gender or ""), 0) + 1
+            if row.blood_group is not None:
+                kpis["blood_groups"][row.blood_group] = kpis["blood_groups"].get(row.blood_group, 0) + 1
+            risk = kpis["risk"]
+            risk["no_pan"] += _empty(row.pan_number)
+            risk["no_aadhar"] += _empty(row.aadhar_number)
+            risk["no_bank"] += _empty(row.account_number)
+            risk["no_photo"] += _empty(row.photo_path)
+            risk["no_mobile"] += _empty(row.mobile)
+            risk["no_email"] += _empty(row.email) and _empty(row.personal_email) and _empty(row.official_email)
+            risk["no_statutory"] += "registered" not in flags
+            for name in kpis["statutory"]:
+                kpis["statutory"][name] += name in flags
+
+            if row.resignation_date and row.resignation_date >= date(day.year, 1, 1) and _key(row.status) == "INACTIVE":
+                kpis["resigned_year"] += 1
+            month_start = day.replace(day=1)
+            if row.joining_date and month_start <= row.joining_date <= day:
+                kpis["joined_month"] += 1
+            if row.resignation_date and month_start <= row.resignation_date <= day:
+                kpis["resigned_month"] += 1
+
+            if not _active_on(row, day):
+                continue
+            kpis["active"] += 1
+            kpis["contract"] += employee_type in CONTRACT_TYPES
+            kpis["staff"] += employee_type in STAFF_TYPES
+            kpis["day_basis"] += employee_type in DAY_TYPES
+            kpis["kg_basis"] += employee_type in KG_TYPES
+            kpis["temp_basis"] += employee_type in TEMP_TYPES
+            dept["active"] += 1
+            if row.current_salary is not None:
+                salary = float(row.current_salary)
+                kpis["payroll"] += salary
+                kpis["salaried"] += 1
+                dept["salary"] += salary
+                dept["salaried"] += 1
+                kpis["salary_tiers"][sum(salary >= tier for tier in SALARY_TIERS)] += 1
+            if employee_type in CONTRACT_TYPES:
+                contractor = kpis["contractors"].setdefault(str(row.contractor_name or ""), {"manpower": 0, "salary": 0.0, "present": 0})
+                contractor["manpower"] += 1
+                contractor["salary"] += float(row.current_salary or 0.0)
+            for kind, source_date, window in (("dob", row.dob, 30), ("joining_date", row.joining_date, 7)):
+                upcoming = next_annual_date(source_date, day)
+                if upcoming and (upcoming - day).days <= window:
+                    kpis["events"].append([kind, row.employee_id, row.employee_name, source_date.isoformat(), (upcoming - day).days])
+
+    attendance = DailyAttendance
+    hours = func.coalesce(attendance.working_hours, 0.0)
+    half_day = or_(
+        func.upper(func.trim(attendance.duty_type)) == "HALF",
+        and_(func.upper(func.trim(attendance.status)) == "CLOSED", hours >= 4, hours < 8),
+    )
+    for duty_date, employee_id, worked, ot_hours, halves in connection.execute(
+        select(
+            attendance.duty_date, attendance.employee_id, func.sum(hours),
+            func.sum(func.coalesce(attendance.calculated_ot_hours, 0.0)), func.sum(case((half_day, 1), else_=0)),
+        )
+        .where(attendance.company_id == company_id, attendance.duty_date >= first, attendance.duty_date <= last)
+        .group_by(attendance.duty_date, attendance.employee_id)
+    ):
+        row = employees.get(employee_id)
+        if row is None or duty_date not in wanted:
+            continue
+        kpis = built[duty_date][_key(row.production_at)]
+        kpis["present"] += 1
+        kpis["half_day"] += bool(halves)
+        kpis["ot_workers"] += (ot_hours or 0) > 0
+        kpis["ot_hours"] += float(ot_hours or 0.0)
+        kpis["working_hours"] += float(worked or 0.0)
+        kpis["labor_cost"] += float(row.current_salary or 0.0) / 30
+        department = str(row.department or "")
+        kpis["departments"].setdefault(department, {"employees": 0, "active": 0, "salary": 0.0, "salaried": 0, "present": 0})["present"] += 1
+        kpis["contractors"].setdefault(str(row.contractor_name or ""), {"manpower": 0, "salary": 0.0, "present": 0})["present"] += 1
+
+    # Approval queues are outstanding totals: a day counts every pending duty up to it.
+    pending_ot = and_(
+        or_(
+            attendance.ot_status.is_(None),
+            attendance.ot_status == "",
+            func.upper(func.trim(attendance.ot_status)).in_(["PENDING", "OPEN"]),
+        ),
+        attendance.calculated_ot_hours > 0,
+    )
+    pending_duty = and_(attendance.status == "CLOSED", attendance.duty_status == "PENDING")
+    for duty_date, employee_id, ot_count, duty_count in connection.execute(
+        select(
+            attendance.duty_date, attendance.employee_id,
+            func.sum(case((pending_ot, 1), else_=0)), func.sum(case((pending_duty, 1), else_=0)),
+        )
+        .where(
+            attendance.company_id == company_id,
+            or_(attendance.duty_date.is_(None), attendance.duty_date <= last),
+            or_(pending_ot, pending_duty),
+        )
+        .group_by(attendance.duty_date, attendance.employee_id)
+    ):
+        row = employees.get(employee_id)
+        if row is None:
+            continue
+        location = _key(row.production_at)
+        for day in days:
+            if duty_date is None or duty_date <= day:
+                kpis = built[day][location]
+                kpis["ot_pending"] += int(ot_count or 0)
+                kpis["duty_pending"] += int(duty_count or 0)
+
+    for stage, model, quantity, location_column in (
+        ("PRODUCTION", Production, Production.production_qty, Production.production_at),
+        ("PEELING", Peeling, Peeling.peeled_qty, Peeling.peeling_at),
+    ):
+        for day, location, kg in connection.execute(
+            select(model.date, location_column, func.sum(quantity))
+            .where(model.company_id == company_id, model.date >= first, model.date <= last)
+            .group_by(model.date, location_column)
+        ):
+            if day in wanted and (locations is None or _key(location) in locations):
+                production_kg = built[day][_key(location)]["production_kg"]
+                production_kg[stage] = production_kg.get(stage, 0.0) + float(kg or 0.0)
+
+    if locations is not None:
+        return {day: {location: built[day].get(location) or _blank() for location in locations} for day in days}
+    # Every day keeps at least one row, so an empty day is not rebuilt on each load.
+    return {day: dict(rows) or {"": _blank()} for day, rows in built.items()}
+
+
+def _store(connection, company_id: str, built: dict, replace: bool = False) -> None:
+    table = _rollup_table()
+    now = datetime.utcnow()
+    for day, locations in built.items():
+        try:
+            with connection.begin_nested():
+                if replace:
+                    connection.execute(table.delete().where(
+                        table.c.company_id == company_id, table.c.day == day, table.c.location.in_(sorted(locations)),
+                    ))
+                connection.execute(table.insert(), [
+                    {
+                        "company_id": company_id,
+                        "day": day,
+                        "location": location,
+                        "kpis": json.dumps(kpis, separators=(",", ":")),
+                        "built_at": now,
+                    }
+                    for location, kpis in locations.items()
+                ])
+        except IntegrityError:
+            pass  # a concurrent request stored the same day first
+
+
+def load_hr_kpi_rollups(db, company_id: str, days) -> dict:
+    """``{day: {location: kpis}}`` for ``days``, building and storing the ones not kept yet."""
+    days = sorted({day for day in days if day})
+    if not days:
+        return {}
+    connection = db.connection()
+    if not _table_ready(connection):
+        return _build(connection, company_id, days)
+    table = _rollup_table()
+    rollups = defaultdict(dict)
+    stale = defaultdict(set)
+    for day, location, payload in connection.execute(
+        select(table.c.day, table.c.location, table.c.kpis)
+        .where(table.c.company_id == company_id, table.c.day >= days[0], table.c.day <= days[-1])
+    ):
+        if payload == STALE:
+            stale[day].add(location)
+        else:
+            rollups[day][location] = json.loads(payload)
+    wanted = set(days)
+    missing = [day for day in days if day not in rollups and day not in stale]
+    stale = {day: locations for day, locations in stale.items() if day in wanted}
+    built = _build(connection, company_id, missing) if missing else {}
+    rebuilt = _build(connection, company_id, sorted(stale), set().union(*stale.values())) if stale else {}
+    if built or rebuilt:
+        def store(own) -> None:
+            _store(own, company_id, built)
+            _store(own, company_id, rebuilt, replace=True)
+
+        write_outside_request(db, store, name=DERIVED_TABLE)
+        rollups.update(built)
+        for day, locations in rebuilt.items():
+            rollups[day].update(locations)
+    return {day: rollups[day] for day in days}
+
+
+def _stale_clause(table, company_id: str, days) -> object:
+    """Rows of ``company_id`` a write on ``days`` makes stale; None in ``days`` means every day."""
+    if None in days:
+        return table.c.company_id == company_id
+    return and_(table.c.company_id == company_id, table.c.day.in_(sorted(days)))
+
+
+def invalidate_hr_kpi_rollups(db, company_id: str | None = None, since: date | None = None, stale=None) -> int:
+    """Drop stored rollups in the caller's transaction.
+
+    Either one company (from ``since`` on when given), or ``stale`` as
+    ``{company_id: earliest_day}`` for a set-based write across companies.
+    """
+    connection = db.connection()
+    if not _table_ready(connection):
+        return 0
+    stale = dict(stale or {})
+    if company_id:
+        stale[company_id] = since
+    if not stale:
+        return 0
+    table = _rollup_table()
+    clauses = [
+        table.c.company_id == company if day is None else and_(table.c.company_id == company, table.c.day >= day)
+        for company, day in stale.items()
+    ]
+    return connection.execute(table.delete().where(or_(*clauses))).rowcount or 0
+
+
+def _sources_by_table() -> dict:
+    return {_model(source).__tablename__: source for source in ROLLUP_SOURCES}
+
+
+def _field_values(obj, field: str) -> set:
+    values = {getattr(obj, field, None)}
+    values.update(inspect(obj).attrs[field].history.deleted or ())
+    return values - {""}
+
+
+def _locations(obj, field: str) -> set:
+    """Old and new rollup location of ``obj`` ("" for none)."""
+    values = {getattr(obj, field, None), *(inspect(obj).attrs[field].history.deleted or ())}
+    return {_key(value) for value in values}
+
+
+def _collect_stale(session):
+    sources = _sources_by_table()
+    stale = defaultdict(set)      # company -> exact days (None: every day)
+    forward = {}                  # company -> earliest day of a carried-forward write
+    located = defaultdict(set)    # company -> locations stale on every day
+    employees = defaultdict(set)  # company -> employees whose location is stale on every day
+    for obj in [*session.new, *session.dirty, *session.deleted]:
+        source = sources.get(getattr(obj, "__tablename__", None))
+        if not source or (obj in session.dirty and not session.is_modified(obj)):
+            continue
+        days = {None} if source.day_field is None else _field_values(obj, source.day_field)
+        for company_id in _field_values(obj, "company_id") - {None}:
+            if source.location_field == "employee_id":
+                employees[company_id].update(_field_values(obj, "employee_id") - {None})
+            elif source.location_field:
+                located[company_id].update(_locations(obj, source.location_field))
+            elif source.carries_forward and None not in days:
+                earliest = min(days)
+                forward[company_id] = min(earliest, forward.get(company_id, earliest))
+            else:
+                stale[company_id].update(days)
+    if not (stale or forward or located or employees):
+        return None
+    return stale, forward, located, employees
+
+
+def _mark_stale(connection, company_id: str, locations) -> None:
+    """Mark ``company_id``'s rows at ``locations`` stale on every stored day."""
+    table = _rollup_table()
+    now = datetime.utcnow()
+    locations = sorted(locations)
+    connection.execute(
+        table.update()
+        .where(table.c.company_id == company_id, table.c.location.in_(locations))
+        .values(kpis=STALE, built_at=now)
+    )
+    stored, present = table.alias("stored"), table.alias("present")
+    insert = dialect_insert(connection)
+    for location in locations:
+        # Stored days without the location get a stale row too, or they would never show it.
+        stmt = (insert(table) if insert is not None else table.insert()).from_select(
+            ["company_id", "day", "location", "kpis", "built_at"],
+            select(stored.c.company_id, stored.c.day, literal(location), literal(STALE), literal(now))
+            .where(
+                stored.c.company_id == company_id,
+                ~select(present.c.id).where(
+                    present.c.company_id == stored.c.company_id,
+                    present.c.day == stored.c.day,
+                    present.c.location == location,
+                ).exists(),
+            )
+            .distinct(),
+        )
+        if insert is not None:
+            stmt = stmt.on_conflict_do_nothing()
+        connection.execute(stmt)
+
+
+def _drop_stale(connection, change) -> None:
+    stale, forward, located, employees = change
+    table = _rollup_table()
+    clauses = [_stale_clause(table, company_id, days) for company_id, days in stale.items()]
+    clauses += [and_(table.c.company_id == company_id, table.c.day >= day) for company_id, day in forward.items()]
+    if clauses:
+        connection.execute(table.delete().where(or_(*clauses)))
+    if employees:
+        from app.database.models.attendance import EmployeeRegistration as employee
+
+        for company_id, employee_ids in employees.items():
+            located[company_id].update(
+                _key(location) for location in connection.execute(
+                    select(employee.production_at)
+                    .where(employee.company_id == company_id, employee.employee_id.in_(sorted(employee_ids)))
+                ).scalars()
+            )
+    for company_id, locations in located.items():
+        if locations:
+            _mark_stale(connection, company_id, locations)
+
+
+register_derived_table(DerivedTable(
+    name=DERIVED_TABLE,
+    label="HR KPI rollup invalidation",
+    sources=lambda: _sources_by_table().keys(),
+    tables=lambda: (_rollup_table(),),
+    collect=_collect_stale,
+    apply=_drop_stale,
+))
+
+
+def install_hr_kpi_tracking(session_factory) -> None:
+    """Drop stored rollups on writes made through ``session_factory``."""
+    install_derived_table_tracking(session_factory, DERIVED_TABLE)
+
+
+def reset_hr_kpi_cache() -> None:
+    reset_ready_cache(DERIVED_TABLE)
+
+
+def run_hr_kpi_reconcile():
+    """Hourly drop of every company's rows from yesterday on; they are rebuilt on the next dashboard load."""
+    from app.database import BackgroundSessionLocal
+    from app.utils.timezone import ist_now
+
+    db = BackgroundSessionLocal()
+    try:
+        if not _table_ready(db.connection()):
+            return "skipped"
+        table = _rollup_table()
+        db.execute(table.delete().where(table.c.day >= ist_now().date() - timedelta(days=1)))
+        db.commit()
+        return "clean"
+    except Exception as e:
+        db.rollback()
+        logger.error("HR KPI rollup reconcile failed: %s", e)
+        return "failed"
+    finally:
+        db.close()
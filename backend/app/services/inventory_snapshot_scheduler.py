@@ -1,15 +1,19 @@
+import logging
+
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from app.database import BackgroundSessionLocal
 from app.database.models.inventory_management import (
     InventorySummary,
     InventoryDailySnapshot
 )
 from app.utils.timezone import ist_now
 
+logger = logging.getLogger(__name__)
+
 
 def create_inventory_snapshot():
 
-    db: Session = SessionLocal()
+    db: Session = BackgroundSessionLocal()
 
     try:
         snapshot_date = ist_now().date()
@@ -21,8 +25,8 @@ def create_inventory_snapshot():
         ).first()
 
         if already_exists:
-            print(f"Snapshot already exists for {snapshot_date}")
-            return
+            logger.info("Snapshot already exists for %s", snapshot_date)
+            return "skipped"
 
         rows = db.query(InventorySummary).all()
 
@@ -49,14 +53,13 @@ def create_inventory_snapshot():
 
         db.commit()
 
-        print(
-            f"Inventory Snapshot Created : "
-            f"{snapshot_date} ({len(rows)} rows)"
-        )
+        logger.info("Inventory Snapshot Created : %s (%s rows)", snapshot_date, len(rows))
+        return "created"
 
     except Exception as e:
         db.rollback()
-        print("Snapshot Error:", str(e))
+        logger.error("Snapshot Error: %s", e)
+        return "failed"
 
     finally:
         db.close()
\ No newline at end of file
@@ -1,10 +1,101 @@
-from datetime import datetime
-from sqlalchemy import func
+"""Inventory summary per product key, maintained by signed deltas.
 
-from app.database.models.inventory_management import (
-    stock_entry,
-    InventorySummary
+``inventory_summary`` holds, per company and
+species/variety/grade/packing_style/glaze/production_for/production_at/
+freezer key, the totals of the non-cancelled ``stock_entry`` rows. Each ORM
+flush that inserts, edits, cancels or deletes stock rows applies the change
+to the affected keys (``install_inventory_summary_tracking``, see
+``derived_tables``), so readers
+never see the table emptied and rebuilt.
+
+``InventorySummaryService.refresh_inventory_summary`` is the bulk rebuild
+(one ``INSERT ... SELECT``), and ``verify_inventory_summary`` diffs the
+stored rows against a full recompute; the scheduled
+``run_inventory_summary_verifier`` rebuilds companies that drifted.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import case, func, inspect, literal, literal_column, or_, select
+
+from app.services.derived_tables import (
+    DerivedTable,
+    dialect_insert,
+    install_derived_table_tracking,
+    register_derived_table,
+    reset_ready_cache,
+    tables_ready,
+)
+
+logger = logging.getLogger(__name__)
+
+KEY_FIELDS = (
+    "species", "variety", "grade", "packing_style", "glaze",
+    "production_for", "production_at", "freezer",
 )
+# stock_entry attributes a summary row is derived from.
+TRACKED_FIELDS = KEY_FIELDS + (
+    "company_id", "quantity", "no_of_mc", "loose", "product_kg_value", "date", "is_cancelled",
+)
+# Running totals the delta upsert adds to the stored row.
+SUMMED_FIELDS = ("available_qty", "available_mc", "available_loose", "rate_total", "rate_count", "row_count")
+VERIFY_TOLERANCE = 0.01
+DERIVED_TABLE = "inventory_summary"
+
+
+def _tables():
+    from app.database.models.inventory_management import InventorySummary, stock_entry
+
+    return InventorySummary.__table__, stock_entry.__table__
+
+
+def _table_ready(connection) -> bool:
+    return tables_ready(connection, DERIVED_TABLE)
+
+
+def _as_date(value) -> date | None:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if value:
+        try:
+            return date.fromisoformat(str(value)[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def _key_columns(table) -> list:
+    """``KEY_FIELDS`` as ``uix_inventory_summary_grain`` indexes them (NULL keys match "")."""
+    return [func.coalesce(table.c[name], literal_column("''")) for name in KEY_FIELDS]
+
+
+def _aggregate_query(company_id: str):
+    """Summary columns per grain key from ``stock_entry``, as the rebuild inserts them."""
+    summary, stock = _tables()
+    keys = _key_columns(stock)
+    qty = func.coalesce(func.sum(stock.c.quantity), 0.0)
+    rate = func.coalesce(func.avg(stock.c.product_kg_value), 0.0)
+    return select(
+        stock.c.company_id,
+        *(key.label(name) for key, name in zip(keys, KEY_FIELDS)),
+        qty.label("available_qty"),
+        func.coalesce(func.sum(stock.c.no_of_mc), 0.0).label("available_mc"),
+        func.coalesce(func.sum(stock.c.loose), 0.0).label("available_loose"),
+        rate.label("avg_rate"),
+        (qty * rate).label("inventory_value"),
+        literal(0.0).label("reserved_qty"),
+        literal(0.0).label("pending_prod_qty"),
+        func.max(stock.c.date).label("last_transaction_date"),
+        func.coalesce(func.sum(stock.c.product_kg_value), 0.0).label("rate_total"),
+        func.count(stock.c.product_kg_value).label("rate_count"),
+        func.count().label("row_count"),
+    ).where(
+        stock.c.company_id == company_id,
+        stock.c.is_cancelled == False,  # noqa: E712
+    ).group_by(stock.c.company_id, *keys)
 
 
 class InventorySummaryService:
@@ -14,106 +105,231 @@ class InventorySummaryService:
         db,
         company_id
     ):
+        """Rebuild one company's summary with a single ``INSERT ... SELECT``
+        (bulk mode; ORM writes are applied as deltas) and commit."""
+        summary, _ = _tables()
+        aggregate = _aggregate_query(company_id).add_columns(literal(datetime.utcnow()).label("updated_at"))
+        columns = [column.name for column in aggregate.selected_columns]
+
+        db.execute(summary.delete().where(summary.c.company_id == company_id))
+        result = db.execute(summary.insert().from_select(columns, aggregate))
+        db.commit()
+
+        return result.rowcount
+
+    @staticmethod
+    def verify_inventory_summary(
+        db,
+        company_id
+    ):
+        """Differences between the stored summary and a full recompute, as
+        ``{"key", "field", "stored", "expected"}`` dicts (empty when in step)."""
+        summary, _ = _tables()
+        fields = ("available_qty", "available_mc", "available_loose", "avg_rate", "inventory_value", "last_transaction_date")
 
-        # ==========================================
-        # CLEAR OLD SUMMARY
-        # ==========================================
+        expected = {
+            tuple(row[name] for name in KEY_FIELDS): row
+            for row in (r._mapping for r in db.execute(_aggregate_query(company_id)))
+        }
+        stored = {
+            tuple("" if row[name] is None else row[name] for name in KEY_FIELDS): row
+            for row in (r._mapping for r in db.execute(select(summary).where(summary.c.company_id == company_id)))
+        }
 
-        db.query(InventorySummary).filter(
-            InventorySummary.company_id == company_id
-        ).delete()
+        drift = []
+        for key in sorted(set(expected) | set(stored), key=lambda k: tuple(str(v) for v in k)):
+            want, have = expected.get(key), stored.get(key)
+            for field in fields:
+                expected_value = want[field] if want is not None else None
+                stored_value = have[field] if have is not None else None
+                if field == "last_transaction_date":
+                    same = _as_date(expected_value) == _as_date(stored_value)
+                else:
+                    same = (
+                        expected_value is not None and stored_value is not None
+                        and abs(float(expected_value) - float(stored_value)) <= VERIFY_TOLERANCE
+                    )
+                if not same:
+                    drift.append({"key": dict(zip(KEY_FIELDS, key)), "field": field,
+                                  "stored": stored_value, "expected": expected_value})
+        return drift
 
-        # ==========================================
-        # GROUP STOCK DATA
-        # ==========================================
 
-        rows = db.query(
-            stock_entry.company_id,
-            stock_entry.species,
-            stock_entry.variety,
-            stock_entry.grade,
-            stock_entry.packing_style,
-            stock_entry.glaze,
-            stock_entry.production_for,
-            stock_entry.production_at,
-            stock_entry.freezer,
+def run_inventory_summary_verifier():
+    """Scheduled check: rebuild the summary of every company that drifted."""
+    from app.database import BackgroundSessionLocal
 
-            func.sum(
-                stock_entry.quantity
-            ).label("available_qty"),
+    db = BackgroundSessionLocal()
+    try:
+        _, stock = _tables()
+        companies = [row[0] for row in db.execute(select(stock.c.company_id).where(stock.c.company_id.is_not(None)).distinct())]
+        repaired = 0
+        for company_id in companies:
+            drift = InventorySummaryService.verify_inventory_summary(db, company_id)
+            db.rollback()
+            if drift:
+                logger.warning("Inventory summary drift for %s (%s fields), rebuilding", company_id, len(drift))
+                InventorySummaryService.refresh_inventory_summary(db, company_id)
+                repaired += 1
+        return "repaired" if repaired else "clean"
+    except Exception as e:
+        db.rollback()
+        logger.error("Inventory summary verification failed: %s", e)
+        return "failed"
+    finally:
+        db.close()
 
-            func.sum(
-                stock_entry.no_of_mc
-            ).label("available_mc"),
 
-            func.sum(
-                stock_entry.loose
-            ).label("available_loose"),
+# ---------------------------------------------------------------------------
+# Delta maintenance
+# ---------------------------------------------------------------------------
 
-            func.avg(
-                stock_entry.product_kg_value
-            ).label("avg_rate"),
+def _key_filter(table, key: tuple):
+    return [column == value for column, value in zip(_key_columns(table), key)]
 
-            func.max(
-                stock_entry.date
-            ).label("last_transaction_date")
 
-        ).filter(
-            stock_entry.company_id == company_id,
-            stock_entry.is_cancelled == False
-        ).group_by(
-            stock_entry.company_id,
-            stock_entry.species,
-            stock_entry.variety,
-            stock_entry.grade,
-            stock_entry.packing_style,
-            stock_entry.glaze,
-            stock_entry.production_for,
-            stock_entry.production_at,
-            stock_entry.freezer
-        ).all()
+def _grain(summary) -> list:
+    return [summary.c.company_id, *_key_columns(summary)]
 
-        # ==========================================
-        # INSERT SUMMARY
-        # ==========================================
 
-        for row in rows:
+def _merged(summary, incoming) -> dict:
+    """SET values adding ``incoming`` (``excluded`` or bound values) to the stored row."""
+    merged = {name: summary.c[name] + incoming[name] for name in SUMMED_FIELDS}
+    avg_rate = case((merged["rate_count"] > 0, merged["rate_total"] / merged["rate_count"]), else_=0.0)
+    stored_date, added_date = summary.c.last_transaction_date, incoming["last_transaction_date"]
+    return {
+        **merged,
+        "avg_rate": avg_rate,
+        "inventory_value": merged["available_qty"] * avg_rate,
+        "last_transaction_date": case(
+            (stored_date.is_(None), added_date), (added_date > stored_date, added_date), else_=stored_date,
+        ),
+        "updated_at": incoming["updated_at"],
+    }
 
-            qty = float(row.available_qty or 0)
-            rate = float(row.avg_rate or 0)
 
-            summary = InventorySummary(
+def _apply_deltas(connection, deltas: dict) -> None:
+    """Add ``{(company_id, key): delta}`` to the stored rows with one
+    ``INSERT ... ON CONFLICT DO UPDATE`` on the summary grain, then drop the
+    keys no stock rows remain for and re-read the latest date of keys that
+    lost their newest row."""
+    summary, stock = _tables()
+    now = datetime.utcnow()
+    rows = []
+    for (company_id, key), delta in deltas.items():
+        avg_rate = delta["rate_total"] / delta["rate_count"] if delta["rate_count"] > 0 else 0.0
+        rows.append({
+            "company_id": company_id, **dict(zip(KEY_FIELDS, key)),
+            "available_qty": delta["qty"], "available_mc": delta["mc"], "available_loose": delta["loose"],
+            "rate_total": delta["rate_total"], "rate_count": delta["rate_count"], "row_count": delta["row_count"],
+            "avg_rate": avg_rate, "inventory_value": delta["qty"] * avg_rate,
+            "reserved_qty": 0.0, "pending_prod_qty": 0.0,
+            "last_transaction_date": delta["added_date"], "updated_at": now,
+        })
+    if not rows:
+        return
 
-                company_id=row.company_id,
+    insert = dialect_insert(connection)
+    if insert is not None:
+        stmt = insert(summary)
+        connection.execute(
+            stmt.on_conflict_do_update(index_elements=_grain(summary), set_=_merged(summary, stmt.excluded)),
+            rows,
+        )
+    else:
+        for values in rows:
+            incoming = {name: literal(values[name], summary.c[name].type) for name in values}
+            matches = [grain == value for grain, value in zip(
+                _grain(summary), [values["company_id"], *(values[name] for name in KEY_FIELDS)],
+            )]
+            if not connection.execute(summary.update().where(*matches).values(**_merged(summary, incoming))).rowcount:
+                connection.execute(summary.insert().values(**values))
 
-                species=row.species,
-                variety=row.variety,
-                grade=row.grade,
+    connection.execute(summary.delete().where(
+        summary.c.company_id.in_(sorted({company_id for company_id, _ in deltas})), summary.c.row_count <= 0,
+    ))
+    for (company_id, key), delta in deltas.items():
+        if not delta["removed_date"]:
+            continue
+        latest = select(func.max(stock.c.date)).where(
+            stock.c.company_id == company_id,
+            stock.c.is_cancelled == False,  # noqa: E712
+            *_key_filter(stock, key),
+        ).scalar_subquery()
+        connection.execute(summary.update().where(
+            summary.c.company_id == company_id,
+            *_key_filter(summary, key),
+            or_(summary.c.last_transaction_date.is_(None), summary.c.last_transaction_date <= delta["removed_date"]),
+        ).values(last_transaction_date=latest))
 
-                packing_style=row.packing_style,
-                glaze=row.glaze,
 
-                production_for=row.production_for,
-                production_at=row.production_at,
+def _tracked_values(obj) -> tuple[dict, dict, bool]:
+    state = inspect(obj)
+    old, new, changed = {}, {}, False
+    for name in TRACKED_FIELDS:
+        history = state.attrs[name].history
+        current = getattr(obj, name, None)
+        old[name] = history.deleted[0] if history.deleted else current
+        new[name] = current
+        changed = changed or history.has_changes()
+    return old, new, changed
 
-                freezer=row.freezer,
 
-                available_qty=qty,
-                available_mc=float(row.available_mc or 0),
-                available_loose=float(row.available_loose or 0),
+def _collect_deltas(session) -> dict:
+    deltas: dict = defaultdict(lambda: {
+        "qty": 0.0, "mc": 0.0, "loose": 0.0, "rate_total": 0.0, "rate_count": 0, "row_count": 0,
+        "added_date": None, "removed_date": None,
+    })
 
-                avg_rate=rate,
-                inventory_value=qty * rate,
+    def add(values: dict, sign: int):
+        # Same rows the rebuild counts: is_cancelled exactly False.
+        if not values.get("company_id") or values.get("is_cancelled") is not False:
+            return
+        key = tuple("" if values.get(name) is None else values[name] for name in KEY_FIELDS)
+        delta = deltas[(str(values["company_id"]), key)]
+        delta["qty"] += sign * float(values.get("quantity") or 0)
+        delta["mc"] += sign * float(values.get("no_of_mc") or 0)
+        delta["loose"] += sign * float(values.get("loose") or 0)
+        if values.get("product_kg_value") is not None:
+            delta["rate_total"] += sign * float(values["product_kg_value"])
+            delta["rate_count"] += sign
+        delta["row_count"] += sign
+        day = _as_date(values.get("date"))
+        slot = "added_date" if sign > 0 else "removed_date"
+        if day and (delta[slot] is None or day > delta[slot]):
+            delta[slot] = day
 
-                reserved_qty=0,
-                pending_prod_qty=0,
+    for obj in session.new:
+        if getattr(obj, "__tablename__", None) == "stock_entry":
+            add({name: getattr(obj, name, None) for name in TRACKED_FIELDS}, 1)
+    for obj in session.deleted:
+        if getattr(obj, "__tablename__", None) == "stock_entry":
+            add(_tracked_values(obj)[0], -1)
+    for obj in session.dirty:
+        if getattr(obj, "__tablename__", None) != "stock_entry":
+            continue
+        old, new, changed = _tracked_values(obj)
+        if changed:
+            add(old, -1)
+            add(new, 1)
+    return dict(deltas)
 
-                last_transaction_date=row.last_transaction_date,
-                updated_at=datetime.utcnow()
-            )
 
-            db.add(summary)
+def install_inventory_summary_tracking(session_factory) -> None:
+    """Keep ``inventory_summary`` in step with ``stock_entry`` writes made through ``session_factory``."""
+    install_derived_table_tracking(session_factory, DERIVED_TABLE)
+
+
+def reset_inventory_summary_cache() -> None:
+    reset_ready_cache(DERIVED_TABLE)
 
-        db.commit()
 
-        return len(rows)
\ No newline at end of file
+# The verifier rebuilds companies whose summary drifted after a skipped delta.
+register_derived_table(DerivedTable(
+    name=DERIVED_TABLE,
+    label="Inventory summary delta",
+    sources=lambda: ("stock_entry",),
+    tables=lambda: (_tables()[0],),
+    collect=_collect_deltas,
+    apply=_apply_deltas,
+))
@@ -0,0 +1,57 @@
+"""Leases for scheduled jobs that must not run in two workers at once.
+
+Every web worker starts the same APScheduler jobs. A job that changes shared
+rows takes the ``job_leases`` row for its name first: ``acquire_job_lease``
+claims it with a conditional UPDATE (inserting the row on first use) and
+commits, so exactly one worker gets a token while the lease is live. The
+holder releases it when done; a lease held by a crashed run expires after
+``seconds``.
+"""
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+
+
+def _model():
+    from app.database.models.job_leases import JobLease
+
+    return JobLease
+
+
+def acquire_job_lease(db, name: str, seconds: float, now: datetime | None = None) -> str | None:
+    """Claim ``name`` for ``seconds`` and commit; the holder token, or None while it is held elsewhere."""
+    JobLease = _model()
+    now = now or datetime.utcnow()
+    token = str(uuid.uuid4())
+    values = {"holder": token, "locked_until": now + timedelta(seconds=seconds), "acquired_at": now}
+    claimed = db.execute(
+        update(JobLease)
+        .where(JobLease.name == name, or_(JobLease.locked_until.is_(None), JobLease.locked_until <= now))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        if db.get(JobLease, name) is not None:
+            db.rollback()
+            return None
+        try:
+            db.execute(insert(JobLease).values(name=name, **values))
+        except IntegrityError:
+            db.rollback()  # another worker created it first and holds it
+            return None
+    db.commit()
+    return token
+
+
+def release_job_lease(db, name: str, token: str) -> None:
+    """Free ``name`` if ``token`` still holds it, and commit."""
+    JobLease = _model()
+    db.execute(
+        update(JobLease)
+        .where(JobLease.name == name, JobLease.holder == token)
+        .values(holder=None, locked_until=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
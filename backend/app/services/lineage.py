@@ -0,0 +1,286 @@
+"""Traceability lineage edges, maintained on writes and walked set-wise.
+
+Lots, purchases, production batches and stock share the batch number and
+dispatch lines point at it through ``po_number``; ``lineage_edges`` stores
+those hops explicitly (``lot -> harvest / rmp / production / stock /
+dispatch`` and ``dispatch -> container``):
+
+* ``install_lineage_tracking`` rewrites a source row's edges on every ORM
+  flush that adds, edits or deletes it.
+* ``rebuild_lineage_edges`` rederives one company's edges, for writes that
+  bypass the ORM; ``refresh_source_edges`` only those of one source table. The ``derived_table_backfill`` job builds each company
+  once; until then its walks read the source tables.
+* ``descendants`` / ``ancestors`` resolve a whole set of start nodes of one
+  company with one recursive CTE, whatever the number of lots or
+  containers. Batch numbers and containers are only unique per company, so
+  every hop stays inside it.
+"""
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from importlib import import_module
+
+from sqlalchemy import and_, inspect, select
+
+from app.services.derived_tables import (
+    DerivedTable,
+    build_company,
+    company_built,
+    install_derived_table_tracking,
+    register_derived_table,
+    reset_ready_cache,
+    tables_ready,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class EdgeSource:
+    model: str          # "module:Class"
+    parent_type: str
+    parent_field: str
+    child_type: str
+    child_field: str
+
+
+EDGE_SOURCES = (
+    EdgeSource("app.database.models.advanced_seafood_erp:HarvestLot", "lot", "lot_number", "harvest", "id"),
+    EdgeSource("app.database.models.processing:RawMaterialPurchasing", "lot", "batch_number", "rmp", "id"),
+    EdgeSource("app.database.models.advanced_seafood_erp:ProductionBatch", "lot", "batch_number", "production", "id"),
+    EdgeSource("app.database.models.inventory_management:stock_entry", "lot", "batch_number", "stock", "id"),
+    EdgeSource("app.database.models.inventory_management:sales_dispatch", "lot", "po_number", "dispatch", "id"),
+    EdgeSource("app.database.models.inventory_management:sales_dispatch", "dispatch", "id", "container", "container_no"),
+)
+
+DERIVED_TABLE = "lineage"
+
+
+def _model(source: EdgeSource):
+    module_name, class_name = source.model.split(":")
+    return getattr(import_module(module_name), class_name)
+
+
+def _edge_table():
+    from app.database.models.lineage import LineageEdge
+
+    return LineageEdge.__table__
+
+
+def _table_ready(connection) -> bool:
+    return tables_ready(connection, DERIVED_TABLE)
+
+
+def _key(value) -> str | None:
+    return None if value is None or value == "" else str(value)
+
+
+def _edge(source: EdgeSource, row) -> dict | None:
+    parent = _key(getattr(row, source.parent_field, None))
+    child = _key(getattr(row, source.child_field, None))
+    if parent is None or child is None:
+        return None
+    return {
+        "company_id": getattr(row, "company_id", None),
+        "parent_type": source.parent_type,
+        "parent_key": parent,
+        "child_type": source.child_type,
+        "child_key": child,
+        "source_table": _model(source).__tablename__,
+        "source_id": row.id,
+    }
+
+
+def _scan_edges(connection, source: EdgeSource, company_id: str, match_field: str | None = None, keys=()) -> list[dict]:
+    """Edges of ``source`` straight from one company's rows, optionally only rows whose ``match_field`` is in ``keys``."""
+    table = _model(source).__table__
+    fields = {"id", "company_id", source.parent_field, source.child_field}
+    stmt = select(*(table.c[name] for name in sorted(fields))).where(table.c.company_id == company_id)
+    if match_field:
+        column = table.c[match_field]
+        if column.type.python_type is int:
+            keys = [int(key) for key in keys if str(key).isdigit()]
+        stmt = stmt.where(column.in_(sorted(keys)))
+    return [edge for edge in (_edge(source, row) for row in connection.execute(stmt)) if edge]
+
+
+def _source_tables(connection) -> list:
+    checker = inspect(connection)
+    return [source for source in EDGE_SOURCES if checker.has_table(_model(source).__tablename__)]
+
+
+def rebuild_lineage_edges(db, company_id: str) -> int:
+    """Rederive one company's edges in the caller's transaction (commit afterwards); returns the edge count."""
+    connection = db.connection()
+    if not _table_ready(connection):
+        return 0
+    return build_company(connection, DERIVED_TABLE, company_id)
+
+
+def refresh_source_edges(db, company_id: str, source_table: str) -> int:
+    """Rederive one company's edges from one source table, e.g. after a bulk
+    import into it, in the caller's transaction; returns the edge count."""
+    connection = db.connection()
+    if not _table_ready(connection):
+        return 0
+    return _store_company(connection, company_id, source_table)
+
+
+def _store_company(connection, company_id: str, source_table: str | None = None) -> int:
+    table = _edge_table()
+    stale = table.delete().where(table.c.company_id == company_id)
+    if source_table is not None:
+        stale = stale.where(table.c.source_table == source_table)
+    connection.execute(stale)
+    total = 0
+    for source in _source_tables(connection):
+        if source_table is not None and _model(source).__tablename__ != source_table:
+            continue
+        edges = _scan_edges(connection, source, company_id)
+        if edges:
+            connection.execute(table.insert(), edges)
+        total += len(edges)
+    return total
+
+
+def _companies(connection) -> set:
+    companies = set()
+    for model in {_model(source) for source in _source_tables(connection)}:
+        companies.update(connection.execute(select(model.__table__.c.company_id).distinct()).scalars())
+    return companies
+
+
+def _walk(db, company_id: str, node_type: str, keys, forward: bool) -> dict:
+    """``{start_key: {(node_type, node_key), ...}}`` reachable from ``company_id``'s ``(node_type, key)`` nodes."""
+    keys = sorted({str(key) for key in keys if key not in (None, "")})
+    reached = {key: set() for key in keys}
+    if not keys:
+        return reached
+    connection = db.connection()
+    if not _table_ready(connection) or not company_built(connection, DERIVED_TABLE, company_id):
+        return _walk_sources(db, company_id, node_type, keys, forward, reached)
+
+    edges = _edge_table()
+    src, dst = ("parent", "child") if forward else ("child", "parent")
+    first = edges.alias("first_hop")
+    walk = select(
+        first.c[f"{src}_key"].label("start"),
+        first.c[f"{dst}_type"].label("node_type"),
+        first.c[f"{dst}_key"].label("node_key"),
+    ).where(
+        first.c.company_id == company_id, first.c[f"{src}_type"] == node_type, first.c[f"{src}_key"].in_(keys),
+    ).cte("lineage_walk", recursive=True)
+    hop = edges.alias("next_hop")
+    walk = walk.union(
+        select(walk.c.start, hop.c[f"{dst}_type"], hop.c[f"{dst}_key"]).join(
+            hop, and_(
+                hop.c.company_id == company_id,
+                hop.c[f"{src}_type"] == walk.c.node_type,
+                hop.c[f"{src}_key"] == walk.c.node_key,
+            )
+        )
+    )
+    for start, reached_type, reached_key in connection.execute(select(walk.c.start, walk.c.node_type, walk.c.node_key)):
+        reached[start].add((reached_type, reached_key))
+    return reached
+
+
+def _walk_sources(db, company_id: str, node_type: str, keys, forward: bool, reached: dict) -> dict:
+    """No edge table: one query per source per hop."""
+    connection = db.connection()
+    frontier = {(node_type, key): {key} for key in keys}
+    seen = set(frontier)
+    while frontier:
+        by_type = defaultdict(set)
+        for reached_type, reached_key in frontier:
+            by_type[reached_type].add(reached_key)
+        following = defaultdict(set)
+        for source in EDGE_SOURCES:
+            from_type, from_field = (source.parent_type, source.parent_field) if forward else (source.child_type, source.child_field)
+            if from_type not in by_type:
+                continue
+            for edge in _scan_edges(connection, source, company_id, from_field, by_type[from_type]):
+                node_from = (edge["parent_type"], edge["parent_key"]) if forward else (edge["child_type"], edge["child_key"])
+                node_to = (edge["child_type"], edge["child_key"]) if forward else (edge["parent_type"], edge["parent_key"])
+                for start in frontier.get(node_from, ()):
+                    reached[start].add(node_to)
+                    following[node_to].add(start)
+        frontier = {node: starts for node, starts in following.items() if node not in seen}
+        seen.update(frontier)
+    return reached
+
+
+def descendants(db, company_id: str, node_type: str, keys) -> dict:
+    """Every node of ``company_id`` downstream of each ``(node_type, key)``."""
+    return _walk(db, company_id, node_type, keys, forward=True)
+
+
+def ancestors(db, company_id: str, node_type: str, keys) -> dict:
+    """Every node of ``company_id`` upstream of each ``(node_type, key)``."""
+    return _walk(db, company_id, node_type, keys, forward=False)
+
+
+def _sources_by_table() -> dict:
+    tables = defaultdict(list)
+    for source in EDGE_SOURCES:
+        tables[_model(source).__tablename__].append(source)
+    return tables
+
+
+def _collect_changes(session):
+    tables = _sources_by_table()
+    stale, rows = defaultdict(set), []
+    for obj in session.new:
+        if getattr(obj, "__tablename__", None) in tables:
+            rows.append(obj)
+    for obj in session.dirty:
+        sources = tables.get(getattr(obj, "__tablename__", None))
+        if not sources:
+            continue
+        state = inspect(obj)
+        fields = {name for source in sources for name in (source.parent_field, source.child_field, "company_id")}
+        if any(state.attrs[name].history.has_changes() for name in fields):
+            stale[obj.__tablename__].add(obj.id)
+            rows.append(obj)
+    for obj in session.deleted:
+        if getattr(obj, "__tablename__", None) in tables:
+            stale[obj.__tablename__].add(obj.id)
+    if not stale and not rows:
+        return None
+    edges = [
+        edge for obj in rows for source in tables[obj.__tablename__]
+        for edge in [_edge(source, obj)] if edge
+    ]
+    return stale, edges
+
+
+def _apply_changes(connection, changes) -> None:
+    stale, edges = changes
+    table = _edge_table()
+    for source_table, ids in stale.items():
+        connection.execute(table.delete().where(
+            table.c.source_table == source_table, table.c.source_id.in_(sorted(ids)),
+        ))
+    if edges:
+        connection.execute(table.insert(), edges)
+
+
+register_derived_table(DerivedTable(
+    name=DERIVED_TABLE,
+    label="Lineage edge update",
+    sources=lambda: _sources_by_table().keys(),
+    tables=lambda: (_edge_table(),),
+    collect=_collect_changes,
+    apply=_apply_changes,
+    companies=_companies,
+    build_company=_store_company,
+))
+
+
+def install_lineage_tracking(session_factory) -> None:
+    """Keep ``lineage_edges`` in step with writes made through ``session_factory``."""
+    install_derived_table_tracking(session_factory, DERIVED_TABLE)
+
+
+def reset_lineage_cache() -> None:
+    reset_ready_cache(DERIVED_TABLE)
@@ -0,0 +1,309 @@
+"""Per-tenant criteria master data served from cache with versioned invalidation.
+
+Page handlers used to rebuild the same dropdown lists from the criteria
+masters on every request. ``get_tenant_masters`` loads every list once per
+company, stores the payload in the shared cache under the company's current
+master version and keeps a decoded copy in process memory.
+``bump_master_data_version`` issues a new version token so every worker
+rebuilds on its next read. ``install_master_data_tracking`` bumps it after
+every commit that flushed a row of a ``MASTER_MODELS`` table, whichever
+router wrote it; the auth middleware also bumps it after every successful
+``/criteria`` and ``/data-management`` write, for writes that bypass the ORM.
+
+Without a shared cache (production without Redis) the masters are loaded from
+the database on each call, exactly as before.
+"""
+import os
+import threading
+import uuid
+import weakref
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.services.cache import cache_available, cache_get, cache_get_or_set, cache_set
+
+MASTER_DATA_CACHE_TTL_SECONDS = int(os.environ.get("MASTER_DATA_CACHE_TTL_SECONDS", "3600"))
+MASTER_VERSION_TTL_SECONDS = 30 * 24 * 3600
+
+# criteria models read by _load_payload.
+MASTER_MODELS = (
+    "species", "grades", "glazes", "freezers", "brands", "production_types", "production_at", "peeling_at",
+    "production_for", "purchasing_locations", "suppliers", "vehicle_numbers", "varieties", "packing_styles",
+    "HOSO_HLSO_Yields", "grade_to_hoso",
+)
+_CHANGED = "master_data_changed"
+
+_local: dict[str, tuple[str, "TenantMasters"]] = {}
+_lock = threading.Lock()
+_master_table_names: frozenset | None = None
+_tracked: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def master_key(value) -> str:
+    """Normalised lookup key used by every typed map (trimmed, lower case)."""
+    return str(value or "").strip().lower()
+
+
+@dataclass(frozen=True)
+class VarietyMaster:
+    name: str
+    peeling_yield: str | None
+    soaking_yield: str | None
+    hoso_to_finished_yield: str | None
+
+
+@dataclass(frozen=True)
+class PackingStyleMaster:
+    packing_style: str
+    mc_weight: float | None
+    slab_weight: float | None
+
+
+@dataclass(frozen=True)
+class YieldMaster:
+    species: str
+    hoso_count: int | None
+    hlso_yield_pct: float | None
+    hlso_count: int | None
+
+
+@dataclass(frozen=True)
+class GradeMapMaster:
+    species: str
+    grade_name: str
+    variety_name: str
+    glaze_name: str
+    hlso_count: int | None
+    hoso_count: int | None
+    nw_grade: str | None
+
+
+@dataclass(frozen=True)
+class ProductionForMaster:
+    name: str
+    status: str | None
+
+
+@dataclass(frozen=True)
+class TenantMasters:
+    """Immutable snapshot of one company's criteria masters.
+
+    Name tuples keep the masters' id order; the typed maps are keyed by
+    ``master_key`` and keep the first row for a duplicated name.
+    """
+
+    species: tuple[str, ...]
+    grades: tuple[str, ...]
+    glazes: tuple[str, ...]
+    freezers: tuple[str, ...]
+    brands: tuple[str, ...]
+    production_types: tuple[str, ...]
+    production_at: tuple[str, ...]
+    peeling_at: tuple[str, ...]
+    production_for: tuple[ProductionForMaster, ...]
+    purchasing_locations: tuple[str, ...]
+    suppliers: tuple[str, ...]
+    vehicles: tuple[str, ...]
+    variety_names: tuple[str, ...]
+    packing_style_rows: tuple[PackingStyleMaster, ...]
+    varieties: dict[str, VarietyMaster]
+    packing_styles: dict[str, PackingStyleMaster]
+    yields: dict[str, tuple[YieldMaster, ...]]
+    grade_map: dict[str, tuple[GradeMapMaster, ...]]
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "TenantMasters":
+        variety_rows = [VarietyMaster(**row) for row in payload["varieties"]]
+        packing_rows = tuple(PackingStyleMaster(**row) for row in payload["packing_styles"])
+        varieties: dict[str, VarietyMaster] = {}
+        for row in variety_rows:
+            varieties.setdefault(master_key(row.name), row)
+        packing: dict[str, PackingStyleMaster] = {}
+        for row in packing_rows:
+            packing.setdefault(master_key(row.packing_style), row)
+        yields: dict[str, list[YieldMaster]] = {}
+        for row in payload["yields"]:
+            yields.setdefault(master_key(row["species"]), []).append(YieldMaster(**row))
+        grade_map: dict[str, list[GradeMapMaster]] = {}
+        for row in payload["grade_map"]:
+            grade_map.setdefault(master_key(row["species"]), []).append(GradeMapMaster(**row))
+
+        return cls(
+            species=tuple(payload["species"]),
+            grades=tuple(payload["grades"]),
+            glazes=tuple(payload["glazes"]),
+            freezers=tuple(payload["freezers"]),
+            brands=tuple(payload["brands"]),
+            production_types=tuple(payload["production_types"]),
+            production_at=tuple(payload["production_at"]),
+            peeling_at=tuple(payload["peeling_at"]),
+            production_for=tuple(ProductionForMaster(**row) for row in payload["production_for"]),
+            purchasing_locations=tuple(payload["purchasing_locations"]),
+            suppliers=tuple(payload["suppliers"]),
+            vehicles=tuple(payload["vehicles"]),
+            variety_names=tuple(row.name for row in variety_rows),
+            packing_style_rows=packing_rows,
+            varieties=varieties,
+            packing_styles=packing,
+            yields={key: tuple(rows) for key, rows in yields.items()},
+            grade_map={key: tuple(rows) for key, rows in grade_map.items()},
+        )
+
+    def variety(self, name) -> VarietyMaster | None:
+        return self.varieties.get(master_key(name))
+
+    def packing_style(self, name) -> PackingStyleMaster | None:
+        return self.packing_styles.get(master_key(name))
+
+    def species_yields(self, species) -> tuple[YieldMaster, ...]:
+        return self.yields.get(master_key(species), ())
+
+    def species_grade_map(self, species) -> tuple[GradeMapMaster, ...]:
+        return self.grade_map.get(master_key(species), ())
+
+
+def _load_payload(db: Session, company_code: str) -> dict:
+    from app.database.models import criteria
+
+    def names(model, column):
+        return [
+            value for (value,) in db.query(getattr(model, column))
+            .filter(model.company_id == company_code)
+            .order_by(model.id).all()
+        ]
+
+    def rows(model, *columns):
+        query = db.query(*(getattr(model, column) for column in columns))
+        return [row._asdict() for row in query.filter(model.company_id == company_code).order_by(model.id).all()]
+
+    pf = criteria.production_for
+    yields = criteria.HOSO_HLSO_Yields
+    return {
+        "species": names(criteria.species, "species_name"),
+        "grades": names(criteria.grades, "grade_name"),
+        "glazes": names(criteria.glazes, "glaze_name"),
+        "freezers": names(criteria.freezers, "freezer_name"),
+        "brands": names(criteria.brands, "brand_name"),
+        "production_types": names(criteria.production_types, "production_type"),
+        "production_at": names(criteria.production_at, "production_at"),
+        "peeling_at": names(criteria.peeling_at, "peeling_at"),
+        "production_for": [
+            {"name": name, "status": status}
+            for name, status in db.query(pf.production_for, pf.status)
+            .filter(pf.company_id == company_code).order_by(pf.id).all()
+        ],
+        "purchasing_locations": names(criteria.purchasing_locations, "location_name"),
+        "suppliers": names(criteria.suppliers, "supplier_name"),
+        "vehicles": names(criteria.vehicle_numbers, "vehicle_number"),
+        "varieties": [
+            {
+                "name": row["variety_name"],
+                "peeling_yield": row["peeling_yield"],
+                "soaking_yield": row["soaking_yield"],
+                "hoso_to_finished_yield": row["hoso_to_finished_yield"],
+            }
+            for row in rows(criteria.varieties, "variety_name", "peeling_yield", "soaking_yield", "hoso_to_finished_yield")
+        ],
+        "packing_styles": rows(criteria.packing_styles, "packing_style", "mc_weight", "slab_weight"),
+        "yields": rows(yields, "species", "hoso_count", "hlso_yield_pct", "hlso_count"),
+        "grade_map": rows(
+            criteria.grade_to_hoso,
+            "species", "grade_name", "variety_name", "glaze_name", "hlso_count", "hoso_count", "nw_grade",
+        ),
+    }
+
+
+def _version_key(company_code: str) -> str:
+    return f"bknr:master_version:{company_code}"
+
+
+def _current_version(company_code: str) -> str:
+    version = cache_get(_version_key(company_code))
+    if version is None:
+        version = uuid.uuid4().hex
+        cache_set(_version_key(company_code), version, ttl=MASTER_VERSION_TTL_SECONDS)
+    return version
+
+
+def get_tenant_masters(db: Session, company_code: str) -> TenantMasters:
+    """Return the company's criteria masters, loading them at most once per version."""
+    company_code = str(company_code or "").strip()
+    if not cache_available():
+        return TenantMasters.from_payload(_load_payload(db, company_code))
+
+    version = _current_version(company_code)
+    local = _local.get(company_code)
+    if local and local[0] == version:
+        return local[1]
+
+    payload = cache_get_or_set(
+        f"bknr:master_data:{company_code}:{version}",
+        lambda: _load_payload(db, company_code),
+        ttl=MASTER_DATA_CACHE_TTL_SECONDS,
+    )
+    masters = TenantMasters.from_payload(payload)
+    with _lock:
+        _local[company_code] = (version, masters)
+    return masters
+
+
+def bump_master_data_version(company_code: str) -> None:
+    """Invalidate the company's cached masters in every worker.
+
+    Call after the write is committed so a concurrent rebuild cannot cache
+    the old rows under the new version.
+    """
+    company_code = str(company_code or "").strip()
+    if not company_code:
+        return
+    cache_set(_version_key(company_code), uuid.uuid4().hex, ttl=MASTER_VERSION_TTL_SECONDS)
+    with _lock:
+        _local.pop(company_code, None)
+
+
+def _master_tables() -> frozenset:
+    global _master_table_names
+    if _master_table_names is None:
+        from app.database.models import criteria
+
+        _master_table_names = frozenset(getattr(criteria, name).__tablename__ for name in MASTER_MODELS)
+    return _master_table_names
+
+
+def _collect_companies(session, flush_context) -> None:
+    tables = _master_tables()
+    companies = {
+        str(obj.company_id).strip()
+        for pending in (session.new, session.dirty, session.deleted)
+        for obj in pending
+        if getattr(obj, "__tablename__", None) in tables and getattr(obj, "company_id", None)
+    }
+    if companies:
+        session.info.setdefault(_CHANGED, set()).update(companies)
+
+
+def _bump_committed(session) -> None:
+    for company_code in sorted(session.info.pop(_CHANGED, ())):
+        bump_master_data_version(company_code)
+
+
+def _discard_changed(session) -> None:
+    session.info.pop(_CHANGED, None)
+
+
+def install_master_data_tracking(session_factory) -> None:
+    """Bump a company's master version after each commit through ``session_factory`` that wrote its masters."""
+    if session_factory in _tracked:
+        return
+    _tracked.add(session_factory)
+    event.listen(session_factory, "after_flush", _collect_companies)
+    event.listen(session_factory, "after_commit", _bump_committed)
+    event.listen(session_factory, "after_rollback", _discard_changed)
+
+
+def reset_master_data_cache() -> None:
+    """Drop the process-local copies (tests and admin maintenance)."""
+    with _lock:
+        _local.clear()
@@ -0,0 +1,328 @@
+"""Low-overhead runtime metrics served in Prometheus text format.
+
+Counters and histograms live in process memory behind one lock. With more
+than one worker, each worker periodically publishes a snapshot either to
+``METRICS_DIR`` (one JSON file per worker, for a shared volume) or to Redis
+(``REDIS_URL``), and ``/metrics`` merges every worker's snapshot: counters
+and histograms are summed, gauges are reported per worker.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+logger = logging.getLogger("BKNR_ERP.metrics")
+
+METRICS_DIR = os.getenv("METRICS_DIR", "").strip()
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "10"))
+METRICS_STALE_SECONDS = float(os.getenv("METRICS_STALE_SECONDS", "300"))
+METRICS_REDIS_KEY = "bknr:metrics:workers"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0)
+
+# name -> (type, help, buckets)
+METRICS = {
+    "bknr_http_request_duration_seconds": ("histogram", "HTTP request latency by route template.", LATENCY_BUCKETS),
+    "bknr_db_pool_checkout_seconds": ("histogram", "Time spent waiting for a pooled DB connection.", LATENCY_BUCKETS),
+    "bknr_db_pool_size": ("gauge", "Configured DB pool size.", None),
+    "bknr_db_pool_checked_out": ("gauge", "DB connections currently checked out.", None),
+    "bknr_db_pool_overflow": ("gauge", "DB connections open beyond pool_size.", None),
+    "bknr_db_oldest_checkout_seconds": ("gauge", "Age of the longest-held DB connection per pool.", None),
+    "bknr_db_connection_leaks_total": ("counter", "DB connections held past the pool's leak threshold.", None),
+    "bknr_cache_requests_total": ("counter", "Cache lookups by area and result.", None),
+    "bknr_scheduler_job_duration_seconds": ("histogram", "Scheduler job run time by outcome.", JOB_BUCKETS),
+    "bknr_email_messages_total": ("counter", "Outbound email messages by category and outcome.", None),
+    "bknr_email_send_seconds": ("histogram", "Time to hand one message to the mail transport.", LATENCY_BUCKETS),
+    "bknr_email_queue_delay_seconds": ("histogram", "Time from enqueue to delivery.", JOB_BUCKETS),
+    "bknr_search_seconds": ("histogram", "Global search latency by backend.", LATENCY_BUCKETS),
+    "bknr_search_timeouts_total": ("counter", "Global searches cut off by SEARCH_BUDGET_MS.", None),
+    "bknr_attendance_auto_closed_total": ("counter", "Attendance duties auto-closed after 24 hours by the scheduled job.", None),
+}
+
+_lock = threading.Lock()
+_counters: dict[tuple, float] = {}
+_histograms: dict[tuple, list] = {}
+_gauge_collectors: list = []
+_last_publish = 0.0
+_redis_client = None
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted(labels.items())))
+
+
+def inc(name: str, amount: float = 1.0, **labels) -> None:
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + amount
+    _maybe_publish()
+
+
+def observe(name: str, value: float, **labels) -> None:
+    buckets = METRICS[name][2]
+    key = _key(name, labels)
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [[0] * len(buckets), 0.0, 0]
+        index = bisect_left(buckets, value)
+        if index < len(buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+    _maybe_publish()
+
+
+def register_gauge_collector(collector) -> None:
+    """``collector()`` returns ``[(name, labels, value), ...]`` at scrape time."""
+    _gauge_collectors.append(collector)
+
+
+def _collect_gauges() -> list:
+    samples = []
+    for collector in _gauge_collectors:
+        try:
+            samples.extend(collector())
+        except Exception as exc:
+            logger.debug("Gauge collector failed: %s", exc)
+    return [[name, sorted(labels.items()), value] for name, labels, value in samples]
+
+
+def _snapshot() -> dict:
+    with _lock:
+        counters = [[name, list(labels), value] for (name, labels), value in _counters.items()]
+        histograms = [
+            [name, list(labels), list(series[0]), series[1], series[2]]
+            for (name, labels), series in _histograms.items()
+        ]
+    return {
+        "worker": str(os.getpid()),
+        "at": time.time(),
+        "counters": counters,
+        "histograms": histograms,
+        "gauges": _collect_gauges(),
+    }
+
+
+def _redis():
+    global _redis_client
+    if _redis_client is None:
+        from app.services.cache import _client
+        _redis_client = _client()
+    return _redis_client
+
+
+def _shared_backend() -> str | None:
+    if METRICS_DIR:
+        return "dir"
+    if os.getenv("REDIS_URL") and _redis() is not None:
+        return "redis"
+    return None
+
+
+def publish_snapshot() -> None:
+    """Write this worker's snapshot to the shared backend (no-op when local only)."""
+    global _last_publish
+    _last_publish = time.monotonic()
+    backend = _shared_backend()
+    if backend is None:
+        return
+    snapshot = _snapshot()
+    payload = json.dumps(snapshot, separators=(",", ":"))
+    try:
+        if backend == "dir":
+            directory = Path(METRICS_DIR)
+            directory.mkdir(parents=True, exist_ok=True)
+            target = directory / f"worker-{snapshot['worker']}.json"
+            temp = target.with_suffix(".tmp")
+            temp.write_text(payload)
+            os.replace(temp, target)
+        else:
+            _redis().hset(METRICS_REDIS_KEY, snapshot["worker"], payload)
+    except Exception as exc:
+        logger.warning("Could not publish metrics snapshot: %s", exc)
+
+
+def _maybe_publish() -> None:
+    if METRICS_FLUSH_SECONDS and time.monotonic() - _last_publish >= METRICS_FLUSH_SECONDS:
+        publish_snapshot()
+
+
+def _load_snapshots() -> list[dict]:
+    backend = _shared_backend()
+    if backend is None:
+        return [_snapshot()]
+    publish_snapshot()
+    raw = []
+    try:
+        if backend == "dir":
+            raw = [path.read_text() for path in Path(METRICS_DIR).glob("worker-*.json")]
+        else:
+            raw = list(_redis().hgetall(METRICS_REDIS_KEY).values())
+    except Exception as exc:
+        logger.warning("Could not read metrics snapshots: %s", exc)
+        return [_snapshot()]
+    snapshots = []
+    for item in raw:
+        try:
+            snapshots.append(json.loads(item))
+        except ValueError:
+            continue
+    return snapshots
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_metrics() -> str:
+    """Merge worker snapshots and return Prometheus text exposition."""
+    counters: dict[tuple, float] = {}
+    histograms: dict[tuple, list] = {}
+    gauges: dict[tuple, float] = {}
+    now = time.time()
+
+    for snapshot in _load_snapshots():
+        for name, labels, value in snapshot.get("counters", []):
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0.0) + value
+        for name, labels, buckets, total, count in snapshot.get("histograms", []):
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+        if now - snapshot.get("at", now) > METRICS_STALE_SECONDS:
+            continue
+        for name, labels, value in snapshot.get("gauges", []):
+            key = (name, tuple(map(tuple, labels)) + (("worker", snapshot.get("worker", "")),))
+            gauges[key] = value
+
+    lines = []
+    for name, (kind, help_text, bucket_bounds) in METRICS.items():
+        if kind == "counter":
+            series = [(labels, value) for (metric, labels), value in counters.items() if metric == name]
+        elif kind == "gauge":
+            series = [(labels, value) for (metric, labels), value in gauges.items() if metric == name]
+        else:
+            series = [(labels, value) for (metric, labels), value in histograms.items() if metric == name]
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(series):
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(bucket_bounds, value[0]):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {value[2]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value[2]}")
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+# -----------------------------------------------------
+# Instrumentation hooks
+# -----------------------------------------------------
+def record_cache_lookup(key: str, hit: bool) -> None:
+    parts = str(key).split(":")
+    area = parts[1] if len(parts) > 2 and parts[0] == "bknr" else "other"
+    inc("bknr_cache_requests_total", area=area, result="hit" if hit else "miss")
+
+
+def install_pool_metrics(engine, pool: str = "web") -> None:
+    """Export pool gauges and time connection checkouts for ``engine``, labelled ``pool``."""
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return raw_connection(*args, **kwargs)
+        finally:
+            observe("bknr_db_pool_checkout_seconds", time.perf_counter() - started, pool=pool)
+
+    engine.raw_connection = timed_raw_connection
+
+    def pool_gauges():
+        current = engine.pool
+        samples = []
+        for name, reader in (
+            ("bknr_db_pool_size", "size"),
+            ("bknr_db_pool_checked_out", "checkedout"),
+            ("bknr_db_pool_overflow", "overflow"),
+        ):
+            if hasattr(current, reader):
+                samples.append((name, {"pool": pool}, getattr(current, reader)()))
+        return samples
+
+    register_gauge_collector(pool_gauges)
+
+
+def timed_job(job_id: str, func):
+    """Wrap a scheduler job so its duration and outcome are recorded.
+
+    A job may return a short outcome string ("created", "skipped", "failed");
+    anything else counts as "success" and an exception as "error".
+    """
+    def run(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = func(*args, **kwargs)
+            outcome = result if isinstance(result, str) else "success"
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            observe("bknr_scheduler_job_duration_seconds", elapsed, job=job_id, outcome=outcome)
+            logger.info("Scheduler job %s finished: %s in %.2fs", job_id, outcome, elapsed)
+
+    run.__name__ = getattr(func, "__name__", job_id)
+    return run
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path.startswith("/static/"):
+            return await call_next(request)
+        started = time.perf_counter()
+        status = "500"
+        try:
+            response = await call_next(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            # Label by route template, never the raw path, to bound cardinality.
+            route = request.scope.get("route")
+            observe(
+                "bknr_http_request_duration_seconds",
+                time.perf_counter() - started,
+                method=request.method,
+                route=getattr(route, "path", None) or "unmatched",
+                status=status[0] + "xx",
+            )
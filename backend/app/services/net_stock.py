@@ -0,0 +1,268 @@
+"""Net stock per production-planning key, maintained on ``stock_entry`` writes.
+
+The production planning page used to load every non-cancelled
+``stock_entry`` row of the company and net IN/OUT quantities in Python on
+each view. ``net_stock_balances`` keeps that sum per normalised
+(production_for, species, variety, grade, packing_style, glaze, freezer,
+production_at, location) key:
+
+* ``install_net_stock_tracking`` applies deltas from every ORM flush that
+  adds, edits, cancels or deletes stock movements (stock entry, dispatch and
+  reprocess screens all write through ``stock_entry``; see ``derived_tables``).
+* ``rebuild_net_stock`` recounts a company after writes that bypass the ORM.
+  The ``derived_table_backfill`` job builds each company once; until then
+  its reads net ``stock_entry`` directly, since the flush deltas alone miss
+  the stock written before the table existed.
+* ``net_stock_balances`` reads the rows for a location/production_for scope.
+"""
+import logging
+import re
+from collections import defaultdict
+
+from sqlalchemy import func, inspect, or_, select
+
+from app.services.derived_tables import (
+    DerivedTable,
+    build_company,
+    company_built,
+    install_derived_table_tracking,
+    register_derived_table,
+    reset_ready_cache,
+    tables_ready,
+    upsert_increments,
+)
+
+logger = logging.getLogger(__name__)
+
+PLANNING_FIELDS = ("production_for", "species", "variety", "grade", "packing_style", "glaze", "freezer")
+KEY_FIELDS = PLANNING_FIELDS + ("production_at", "location")
+# stock_entry attributes a balance row is derived from.
+TRACKED_FIELDS = KEY_FIELDS + ("company_id", "quantity", "cargo_movement_type", "is_cancelled")
+FLOOR_LOCATION = "FLOOR"
+DERIVED_TABLE = "net_stock"
+
+
+def _number(value, default=0):
+    if not value:
+        return default
+    match = re.search(r'(\d+\.?\d*)', str(value))
+    return float(match.group(1)) if match else default
+
+
+def planning_key(production_for, species, variety, grade, packing_style, glaze, freezer) -> tuple[str, ...]:
+    """Normalised key pending orders and stock are matched on."""
+    return (
+        str(production_for or "").strip().upper(),
+        str(species or "").strip().lower(),
+        str(variety or "").strip().lower(),
+        str(grade or "").strip().lower(),
+        str(packing_style or "").strip().lower(),
+        str(int(_number(glaze, 0))),
+        str(freezer or "N/A").strip().lower(),
+    )
+
+
+def movement_key(row) -> tuple[str, ...]:
+    return planning_key(*(getattr(row, name, None) for name in PLANNING_FIELDS)) + (
+        str(getattr(row, "production_at", None) or "").strip().upper(),
+        str(getattr(row, "location", None) or "").strip().upper(),
+    )
+
+
+def movement_quantities(cargo_movement_type, quantity) -> tuple[float, float]:
+    """``(net, positive)`` contribution of one movement."""
+    qty = float(quantity or 0)
+    net = qty if str(cargo_movement_type).upper() == "IN" else -qty
+    return net, net if net > 0 else 0.0
+
+
+def _balance_table():
+    from app.database.models.net_stock import NetStockBalance
+
+    return NetStockBalance.__table__
+
+
+def _table_ready(connection) -> bool:
+    return tables_ready(connection, DERIVED_TABLE)
+
+
+def _upsert_deltas(connection, deltas: dict) -> None:
+    """Add ``{(company_id, key): [net, positive, rows]}`` to the stored balances."""
+    upsert_increments(
+        connection, _balance_table(), ("company_id", *KEY_FIELDS),
+        [
+            {"company_id": company_id, **dict(zip(KEY_FIELDS, key)), "net_qty": net, "in_qty": positive, "row_count": rows}
+            for (company_id, key), (net, positive, rows) in deltas.items() if rows or net or positive
+        ],
+        increments=("net_qty", "in_qty", "row_count"),
+        touched={"updated_at": func.now()},
+    )
+
+
+def _scan_stock(connection, company_id: str) -> dict:
+    """Balances straight from ``stock_entry`` (grouped on the raw columns)."""
+    from app.database.models.inventory_management import stock_entry
+
+    stock = stock_entry.__table__
+    raw = [stock.c[name] for name in KEY_FIELDS]
+    rows = connection.execute(
+        select(*raw, stock.c.cargo_movement_type, stock.c.quantity, func.count())
+        .where(stock.c.company_id == company_id, stock.c.is_cancelled.is_not(True))
+        .group_by(*raw, stock.c.cargo_movement_type, stock.c.quantity)
+    ).all()
+    balances: dict = defaultdict(lambda: [0.0, 0.0, 0])
+    for row in rows:
+        net, positive = movement_quantities(row.cargo_movement_type, row.quantity)
+        count = int(row[-1] or 0)
+        balance = balances[(company_id, movement_key(row))]
+        balance[0] += net * count
+        balance[1] += positive * count
+        balance[2] += count
+    return dict(balances)
+
+
+def _store_company(connection, company_id: str) -> int:
+    balances = _scan_stock(connection, company_id)
+    table = _balance_table()
+    connection.execute(table.delete().where(table.c.company_id == company_id))
+    _upsert_deltas(connection, balances)
+    return len(balances)
+
+
+def _companies(connection) -> set:
+    from app.database.models.inventory_management import stock_entry
+
+    stock = stock_entry.__table__
+    return set(connection.execute(select(stock.c.company_id).distinct()).scalars())
+
+
+def rebuild_net_stock(db, company_id: str) -> int:
+    """Recount one company's balances from ``stock_entry`` in the caller's
+    transaction (commit afterwards); returns the number of keys."""
+    connection = db.connection()
+    if not _table_ready(connection):
+        return len(_scan_stock(connection, company_id))
+    return build_company(connection, DERIVED_TABLE, company_id)
+
+
+def _in_scope(key: dict, production_for, production_at, allowed_locations, production_fors) -> bool:
+    location = key["production_at"]
+    if allowed_locations and location != FLOOR_LOCATION and location not in allowed_locations:
+        return False
+    if production_at and location != production_at:
+        return False
+    if production_for and key["production_for"] != production_for:
+        return False
+    if production_fors is not None and key["production_for"] not in production_fors:
+        return False
+    return True
+
+
+def net_stock_balances(
+    db,
+    company_id: str,
+    production_for: str | None = None,
+    production_at: str | None = None,
+    allowed_locations=None,
+    production_fors=None,
+) -> list[dict]:
+    """Balance rows (``KEY_FIELDS`` plus ``net_qty`` and ``in_qty``) in scope.
+
+    ``production_at`` / ``production_for`` are exact (upper-cased) filters;
+    ``allowed_locations`` limits production_at to those locations and the
+    floor; ``production_fors`` limits production_for to a set.
+    """
+    allowed = [str(loc).strip().upper() for loc in allowed_locations or () if str(loc).strip()]
+    production_for = str(production_for or "").strip().upper() or None
+    production_at = str(production_at or "").strip().upper() or None
+    if production_fors is not None:
+        production_fors = {str(value or "").strip().upper() for value in production_fors}
+        if not production_fors:
+            return []
+
+    connection = db.connection()
+    if not _table_ready(connection) or not company_built(connection, DERIVED_TABLE, company_id):
+        return [
+            {**dict(zip(KEY_FIELDS, key)), "net_qty": net, "in_qty": positive}
+            for (_, key), (net, positive, rows) in sorted(_scan_stock(connection, company_id).items())
+            if rows and _in_scope(dict(zip(KEY_FIELDS, key)), production_for, production_at, allowed, production_fors)
+        ]
+
+    table = _balance_table()
+    query = select(*(table.c[name] for name in KEY_FIELDS), table.c.net_qty, table.c.in_qty).where(
+        table.c.company_id == company_id, table.c.row_count > 0,
+    )
+    if production_at:
+        query = query.where(table.c.production_at == production_at)
+    if allowed:
+        query = query.where(or_(table.c.production_at == FLOOR_LOCATION, table.c.production_at.in_(allowed)))
+    if production_for:
+        query = query.where(table.c.production_for == production_for)
+    if production_fors is not None:
+        query = query.where(table.c.production_for.in_(sorted(production_fors)))
+    query = query.order_by(*(table.c[name] for name in KEY_FIELDS))
+    return [dict(row._mapping) for row in connection.execute(query)]
+
+
+def _tracked_values(obj) -> tuple[dict, dict, bool]:
+    state = inspect(obj)
+    old, new, changed = {}, {}, False
+    for name in TRACKED_FIELDS:
+        history = state.attrs[name].history
+        current = getattr(obj, name, None)
+        old[name] = history.deleted[0] if history.deleted else current
+        new[name] = current
+        changed = changed or history.has_changes()
+    return old, new, changed
+
+
+def _collect_deltas(session) -> dict:
+    from types import SimpleNamespace
+
+    deltas: dict = defaultdict(lambda: [0.0, 0.0, 0])
+
+    def add(values: dict, sign: int):
+        if not values.get("company_id") or values.get("is_cancelled") is True:
+            return
+        net, positive = movement_quantities(values.get("cargo_movement_type"), values.get("quantity"))
+        delta = deltas[(str(values["company_id"]), movement_key(SimpleNamespace(**values)))]
+        delta[0] += sign * net
+        delta[1] += sign * positive
+        delta[2] += sign
+
+    for obj in session.new:
+        if getattr(obj, "__tablename__", None) == "stock_entry":
+            add({name: getattr(obj, name, None) for name in TRACKED_FIELDS}, 1)
+    for obj in session.deleted:
+        if getattr(obj, "__tablename__", None) == "stock_entry":
+            add(_tracked_values(obj)[0], -1)
+    for obj in session.dirty:
+        if getattr(obj, "__tablename__", None) != "stock_entry":
+            continue
+        old, new, changed = _tracked_values(obj)
+        if changed:
+            add(old, -1)
+            add(new, 1)
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+
+def install_net_stock_tracking(session_factory) -> None:
+    """Keep ``net_stock_balances`` in step with ``stock_entry`` writes made through ``session_factory``."""
+    install_derived_table_tracking(session_factory, DERIVED_TABLE)
+
+
+def reset_net_stock_cache() -> None:
+    reset_ready_cache(DERIVED_TABLE)
+
+
+# rebuild_net_stock recounts the balances after a skipped update.
+register_derived_table(DerivedTable(
+    name=DERIVED_TABLE,
+    label="Net stock balance update",
+    sources=lambda: ("stock_entry",),
+    tables=lambda: (_balance_table(),),
+    collect=_collect_deltas,
+    apply=_upsert_deltas,
+    companies=_companies,
+    build_company=_store_company,
+))
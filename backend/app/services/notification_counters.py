@@ -0,0 +1,541 @@
+"""Header-bell notification counters, maintained on writes and pushed to tabs.
+
+``/menu/notifications`` used to run five COUNT queries (gate entries and
+attendance today, open tickets, pending orders, cold-storage holdings) plus
+an announcements query on every 30 s poll from every open tab.
+``notification_counters`` now keeps those counts per company; the shared
+``"*"`` scope holds the counts every company sees:
+
+* ``install_notification_tracking`` applies +1/-1 deltas from every ORM
+  flush that adds, edits or deletes a counted row (see ``derived_tables``).
+* ``rebuild_notification_counters`` recounts a scope; a scope is counted the
+  first time it is read and ``run_notification_counter_reconcile`` recounts
+  every counted scope nightly (writes that bypass the ORM).
+* ``notification_feed`` builds the bell list from one indexed read; the
+  announcement list is re-queried only when its counter changes.
+* ``NotificationHub`` serves ``/menu/notifications/stream`` (SSE): one query
+  per ``NOTIFICATION_POLL_SECONDS`` per worker covers every subscribed
+  company, and only companies whose counters changed get a new feed.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+from importlib import import_module
+from typing import Callable
+
+from sqlalchemy import func, inspect, or_, select
+
+from app.services.derived_tables import (
+    DerivedTable,
+    dialect_insert,
+    install_derived_table_tracking,
+    register_derived_table,
+    reset_ready_cache,
+    tables_ready,
+    upsert_increments,
+    write_outside_request,
+)
+
+logger = logging.getLogger(__name__)
+
+SHARED_SCOPE = "*"
+SUPER_ADMIN_EMAIL = "bknr.solutions@gmail.com"
+NOTIFICATION_POLL_SECONDS = float(os.getenv("NOTIFICATION_POLL_SECONDS", "2"))
+NOTIFICATION_HEARTBEAT_SECONDS = float(os.getenv("NOTIFICATION_HEARTBEAT_SECONDS", "15"))
+
+DERIVED_TABLE = "notification_counters"
+
+_announcements: dict[str, tuple[tuple, list[dict]]] = {}
+_announcements_lock = threading.Lock()
+
+
+def _day(value) -> str | None:
+    return str(value.isoformat() if hasattr(value, "isoformat") else value)[:10] if value else None
+
+
+@dataclass(frozen=True)
+class CounterSpec:
+    model: str                  # "module:Class"
+    fields: tuple[str, ...]     # attributes the key is derived from
+    key: Callable               # {field: value} -> (scope, bucket) or None when not counted
+    scopes: tuple[str, ...] = ("company",)
+    date_field: str | None = None   # daily counters are bucketed by this date
+
+
+COUNTERS = {
+    "gate_entries": CounterSpec(
+        "app.database.models.processing:GateEntry", ("company_id", "date"),
+        lambda v: (v["company_id"], _day(v["date"])) if v["company_id"] and v["date"] else None,
+        date_field="date",
+    ),
+    "attendance": CounterSpec(
+        "app.database.models.attendance:DailyAttendance", ("company_id", "duty_date"),
+        lambda v: (v["company_id"], _day(v["duty_date"])) if v["company_id"] and v["duty_date"] else None,
+        date_field="duty_date",
+    ),
+    # Open tickets were never filtered by company; every company sees the total.
+    "open_tickets": CounterSpec(
+        "app.database.models.helpdesk:SupportTicket", ("status",),
+        lambda v: (SHARED_SCOPE, "") if v["status"] == "OPEN" else None,
+        scopes=("shared",),
+    ),
+    "pending_orders": CounterSpec(
+        "app.database.models.inventory_management:pending_orders", ("company_id",),
+        lambda v: (v["company_id"], "") if v["company_id"] else None,
+    ),
+    "cold_storage": CounterSpec(
+        "app.database.models.inventory_management:cold_storage_holding", ("company_id", "status"),
+        lambda v: (v["company_id"], "") if v["company_id"] and v["status"] == "HOLDING" else None,
+    ),
+    # Change marker for the announcement list; super-admin broadcasts reach every company.
+    "announcements": CounterSpec(
+        "app.database.models.helpdesk:CompanyAnnouncement", ("company_id", "created_by"),
+        lambda v: (SHARED_SCOPE, "") if v["created_by"] == SUPER_ADMIN_EMAIL
+        else ((v["company_id"], "") if v["company_id"] else None),
+        scopes=("company", "shared"),
+    ),
+}
+
+
+def _model(spec: CounterSpec):
+    module_name, class_name = spec.model.split(":")
+    return getattr(import_module(module_name), class_name)
+
+
+def _counter_table():
+    from app.database.models.notification_counters import NotificationCounter
+
+    return NotificationCounter.__table__
+
+
+def _table_ready(connection) -> bool:
+    return tables_ready(connection, DERIVED_TABLE)
+
+
+def _scope_kind(scope: str) -> str:
+    return "shared" if scope == SHARED_SCOPE else "company"
+
+
+def _count(connection, name: str, scope: str, day: str) -> int:
+    spec = COUNTERS[name]
+    table = _model(spec).__table__
+    columns = [table.c[field] for field in spec.fields]
+    stmt = select(*columns, func.count()).group_by(*columns)
+    if scope != SHARED_SCOPE and "company_id" in spec.fields:
+        stmt = stmt.where(table.c.company_id == scope)
+    if spec.date_field:
+        stmt = stmt.where(table.c[spec.date_field] == date.fromisoformat(day))
+    total = 0
+    for row in connection.execute(stmt):
+        key = spec.key(dict(zip(spec.fields, row[:-1])))
+        if key and key[0] == scope and key[1] == (day if spec.date_field else ""):
+            total += int(row[-1] or 0)
+    return total
+
+
+def _store_scope(connection, scope: str, day: str, replace: bool = True) -> dict:
+    """Recount ``scope`` (daily counters for ``day``) and replace its rows.
+
+    With ``replace=False`` (the first-read seed) rows another transaction
+    stored in the meantime win: ``ON CONFLICT DO NOTHING`` keeps them.
+    """
+    table = _counter_table()
+    values = {}
+    for name, spec in COUNTERS.items():
+        if _scope_kind(scope) not in spec.scopes:
+            continue
+        bucket = day if spec.date_field else ""
+        values[(name, bucket)] = _count(connection, name, scope, day)
+        if replace:
+            connection.execute(table.delete().where(
+                table.c.company_id == scope, table.c.name == name, table.c.bucket == bucket,
+            ))
+    now = datetime.utcnow()
+    rows = [
+        {"company_id": scope, "name": name, "bucket": bucket, "value": value, "updated_at": now}
+        for (name, bucket), value in values.items()
+    ]
+    insert = dialect_insert(connection)
+    if replace or insert is None:
+        connection.execute(table.insert(), rows)
+    else:
+        connection.execute(
+            insert(table).on_conflict_do_nothing(index_elements=[table.c.company_id, table.c.name, table.c.bucket]),
+            rows,
+        )
+    return values
+
+
+def rebuild_notification_counters(db, scope: str, day: date | None = None) -> dict:
+    """Recount one company (or ``SHARED_SCOPE``) in the caller's transaction
+    (commit afterwards); returns ``{(name, bucket): value}``."""
+    connection = db.connection()
+    if not _table_ready(connection):
+        return {}
+    return _store_scope(connection, scope, (day or date.today()).isoformat())
+
+
+def _read_rows(connection, scopes, day: str):
+    table = _counter_table()
+    return connection.execute(
+        select(table.c.company_id, table.c.name, table.c.bucket, table.c.value, table.c.updated_at)
+        .where(table.c.company_id.in_(sorted(scopes)), table.c.bucket.in_(("", day)))
+    ).all()
+
+
+def _counted_rows(db, company_id: str, day: str) -> list:
+    """Counter rows for ``company_id`` and the shared scope, counting any scope seen for the first time."""
+    connection = db.connection()
+    scopes = {company_id, SHARED_SCOPE}
+    rows = _read_rows(connection, scopes, day)
+    missing = scopes - {row.company_id for row in rows}
+    if not missing:
+        return rows
+
+    def store(own) -> None:
+        for scope in sorted(missing):
+            _store_scope(own, scope, day, replace=False)
+
+    write_outside_request(db, store)
+    return _read_rows(db.connection(), scopes, day)
+
+
+def _scan_counts(db, company_id: str, day: str) -> dict:
+    """No counter table: count the sources directly."""
+    connection = db.connection()
+    values = {}
+    for name, spec in COUNTERS.items():
+        values[name] = sum(
+            _count(connection, name, scope, day)
+            for scope in (company_id, SHARED_SCOPE) if _scope_kind(scope) in spec.scopes
+        )
+    return values
+
+
+def _announcement_list(db, company_id: str, signature: tuple) -> list[dict]:
+    with _announcements_lock:
+        cached = _announcements.get(company_id)
+        if cached and cached[0] == signature:
+            return cached[1]
+    from app.database.models.helpdesk import CompanyAnnouncement
+
+    rows = db.query(CompanyAnnouncement).filter(
+        or_(
+            CompanyAnnouncement.company_id == company_id,
+            CompanyAnnouncement.created_by == SUPER_ADMIN_EMAIL,
+        )
+    ).order_by(CompanyAnnouncement.created_at.desc()).limit(10).all()
+    items = []
+    for ca in rows:
+        is_super_admin = ca.created_by == SUPER_ADMIN_EMAIL
+        items.append({
+            "title": "System Broadcast" if is_super_admin else ca.created_by,
+            "desc": ca.message,
+            "time": ca.created_at.strftime("%I:%M %p") if ca.created_at else "Today",
+            "icon": "fa-bullhorn" if is_super_admin else "fa-megaphone",
+            "bg": "#8b5cf6" if is_super_admin else "#3b82f6",
+            "media_path": ca.media_path,
+        })
+    with _announcements_lock:
+        _announcements[company_id] = (signature, items)
+    return items
+
+
+def _feed(db, company_id: str, values: dict, announcement_signature: tuple) -> list[dict]:
+    notifications = []
+    try:
+        notifications.extend(_announcement_list(db, company_id, announcement_signature))
+    except Exception as exc:
+        logger.warning("Announcements unavailable for %s: %s", company_id, exc)
+
+    if values.get("gate_entries"):
+        notifications.append({
+            "title": "Material Gate Entry Completed",
+            "desc": f"{values['gate_entries']} material transport vehicle(s) arrived at dock today.",
+            "time": "Today", "icon": "fa-truck-ramp-box", "bg": "#3b82f6",
+        })
+    if values.get("attendance"):
+        notifications.append({
+            "title": "Shift Attendance Logged",
+            "desc": f"{values['attendance']} employee check-in(s) recorded today.",
+            "time": "Today", "icon": "fa-fingerprint", "bg": "#10b981",
+        })
+    if values.get("open_tickets"):
+        notifications.append({
+            "title": "Open Support Tickets",
+            "desc": f"{values['open_tickets']} unresolved customer tickets pending helpdesk.",
+            "time": "Active", "icon": "fa-ticket", "bg": "#ef4444",
+        })
+    if values.get("pending_orders"):
+        notifications.append({
+            "title": "Pending Export Orders",
+            "desc": f"{values['pending_orders']} active export purchase orders pending shipment.",
+            "time": "Active", "icon": "fa-ship", "bg": "#f59e0b",
+        })
+    if values.get("cold_storage"):
+        notifications.append({
+            "title": "Cold Storage Stock",
+            "desc": f"{values['cold_storage']} batches currently held in cold room storage.",
+            "time": "Live", "icon": "fa-snowflake", "bg": "#0ea5e9",
+        })
+
+    if not notifications:
+        notifications.append({
+            "title": "System Secure & Sync'd",
+            "desc": "All systems operating normally. Database is synchronized.",
+            "time": "Just now", "icon": "fa-circle-check", "bg": "#10b981",
+        })
+    return notifications
+
+
+def _feed_from_rows(db, company_id: str, rows) -> list[dict]:
+    values = defaultdict(int)
+    signature = []
+    for row in rows:
+        if row.company_id in (company_id, SHARED_SCOPE):
+            values[row.name] += int(row.value or 0)
+            if row.name == "announcements":
+                signature.append((row.company_id, row.value, str(row.updated_at)))
+    return _feed(db, company_id, values, tuple(sorted(signature)))
+
+
+def notification_feed(db, company_id: str) -> list[dict]:
+    """The bell list for ``company_id`` (same shape the polling endpoint always returned)."""
+    day = date.today().isoformat()
+    if not _table_ready(db.connection()):
+        return _feed(db, company_id, _scan_counts(db, company_id, day), ())
+    return _feed_from_rows(db, company_id, _counted_rows(db, company_id, day))
+
+
+def _feed_signatures(rows, companies) -> dict:
+    shared = tuple(sorted((r.name, r.bucket, r.value, str(r.updated_at)) for r in rows if r.company_id == SHARED_SCOPE))
+    return {
+        company_id: (shared, tuple(sorted(
+            (r.name, r.bucket, r.value, str(r.updated_at)) for r in rows if r.company_id == company_id
+        )))
+        for company_id in companies
+    }
+
+
+def _tracked_tables() -> dict:
+    tables = defaultdict(list)
+    for name, spec in COUNTERS.items():
+        tables[_model(spec).__tablename__].append((name, spec))
+    return tables
+
+
+def _history_values(obj, fields) -> tuple[dict, dict, bool]:
+    state = inspect(obj)
+    old, new, changed = {}, {}, False
+    for field in fields:
+        history = state.attrs[field].history
+        current = getattr(obj, field, None)
+        old[field] = history.deleted[0] if history.deleted else current
+        new[field] = current
+        changed = changed or history.has_changes()
+    return old, new, changed
+
+
+def _collect_deltas(session) -> dict:
+    tables = _tracked_tables()
+    deltas: dict = defaultdict(int)
+
+    def add(name, spec, values, sign):
+        key = spec.key(values)
+        if key:
+            deltas[(str(key[0]), name, key[1])] += sign
+
+    for obj in session.new:
+        for name, spec in tables.get(getattr(obj, "__tablename__", None), ()):
+            add(name, spec, {field: getattr(obj, field, None) for field in spec.fields}, 1)
+    for obj in session.deleted:
+        for name, spec in tables.get(getattr(obj, "__tablename__", None), ()):
+            add(name, spec, _history_values(obj, spec.fields)[0], -1)
+    for obj in session.dirty:
+        for name, spec in tables.get(getattr(obj, "__tablename__", None), ()):
+            old, new, changed = _history_values(obj, spec.fields)
+            if changed:
+                add(name, spec, old, -1)
+                add(name, spec, new, 1)
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def _upsert_deltas(connection, deltas: dict) -> None:
+    now = datetime.utcnow()
+    upsert_increments(
+        connection, _counter_table(), ("company_id", "name", "bucket"),
+        [
+            {"company_id": scope, "name": name, "bucket": bucket, "value": delta, "updated_at": now}
+            for (scope, name, bucket), delta in deltas.items()
+        ],
+        increments=("value",),
+        touched={"updated_at": now},
+    )
+
+
+def _apply_deltas(connection, deltas: dict) -> None:
+    # Scopes not counted yet are counted in full on their first read.
+    table = _counter_table()
+    scopes = sorted({scope for scope, _, _ in deltas})
+    counted = {
+        scope for (scope,) in connection.execute(
+            select(table.c.company_id).where(table.c.company_id.in_(scopes)).distinct()
+        )
+    }
+    _upsert_deltas(connection, {key: delta for key, delta in deltas.items() if key[0] in counted})
+
+
+def install_notification_tracking(session_factory) -> None:
+    """Keep ``notification_counters`` in step with writes made through ``session_factory``."""
+    install_derived_table_tracking(session_factory, DERIVED_TABLE)
+
+
+def reset_notification_cache() -> None:
+    reset_ready_cache(DERIVED_TABLE)
+    with _announcements_lock:
+        _announcements.clear()
+
+
+# run_notification_counter_reconcile recounts every scope after a skipped update.
+register_derived_table(DerivedTable(
+    name=DERIVED_TABLE,
+    label="Notification counter update",
+    sources=_tracked_tables,
+    tables=lambda: (_counter_table(),),
+    collect=_collect_deltas,
+    apply=_apply_deltas,
+))
+
+
+def run_notification_counter_reconcile():
+    """Scheduled recount of every counted scope (today's daily buckets)."""
+    from app.database import BackgroundSessionLocal
+
+    db = BackgroundSessionLocal()
+    try:
+        if not _table_ready(db.connection()):
+            return "skipped"
+        table = _counter_table()
+        scopes = [scope for (scope,) in db.execute(select(table.c.company_id).distinct())]
+        for scope in scopes:
+            rebuild_notification_counters(db, scope)
+        db.commit()
+        return "clean"
+    except Exception as e:
+        db.rollback()
+        logger.error("Notification counter reconcile failed: %s", e)
+        return "failed"
+    finally:
+        db.close()
+
+
+class NotificationHub:
+    """Fans counter changes out to the SSE streams open in this worker."""
+
+    def __init__(self, session_factory=None, interval: float = NOTIFICATION_POLL_SECONDS):
+        self._session_factory = session_factory
+        self.interval = interval
+        self._subscribers: dict[str, set] = defaultdict(set)
+        self._signatures: dict[str, tuple] = {}
+        self._task = None
+
+    def _session(self):
+        if self._session_factory is None:
+            from app.database import BackgroundSessionLocal
+
+            self._session_factory = BackgroundSessionLocal
+        return self._session_factory()
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def _initial_feed(self, company_id: str) -> list[dict]:
+        db = self._session()
+        try:
+            return notification_feed(db, company_id)
+        finally:
+            db.close()
+
+    async def subscribe(self, company_id: str) -> asyncio.Queue:
+        from starlette.concurrency import run_in_threadpool
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        queue.put_nowait(await run_in_threadpool(self._initial_feed, company_id))
+        self._subscribers[company_id].add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return queue
+
+    def unsubscribe(self, company_id: str, queue) -> None:
+        queues = self._subscribers.get(company_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                self._subscribers.pop(company_id, None)
+                self._signatures.pop(company_id, None)
+
+    def _changed_feeds(self, companies) -> dict:
+        db = self._session()
+        try:
+            if not _table_ready(db.connection()):
+                return {}
+            day = date.today().isoformat()
+            rows = _read_rows(db.connection(), set(companies) | {SHARED_SCOPE}, day)
+            changed = {}
+            for company_id, signature in _feed_signatures(rows, companies).items():
+                previous = self._signatures.get(company_id)
+                self._signatures[company_id] = signature
+                if previous is not None and previous != signature:
+                    changed[company_id] = _feed_from_rows(db, company_id, rows)
+            return changed
+        finally:
+            db.close()
+
+    async def poll(self) -> int:
+        """One check for every subscribed company; returns the number of streams notified."""
+        from starlette.concurrency import run_in_threadpool
+
+        companies = sorted(self._subscribers)
+        if not companies:
+            return 0
+        changed = await run_in_threadpool(self._changed_feeds, companies)
+        notified = 0
+        for company_id, feed in changed.items():
+            for queue in list(self._subscribers.get(company_id, ())):
+                if queue.full():
+                    queue.get_nowait()  # a slow tab only needs the latest feed
+                queue.put_nowait(feed)
+                notified += 1
+        return notified
+
+    async def _run(self) -> None:
+        while self._subscribers:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception as exc:
+                logger.warning("Notification poll failed: %s", exc)
+
+    async def stream(self, request, company_id: str):
+        """``text/event-stream`` body: a feed on connect and on every change, heartbeats between."""
+        queue = await self.subscribe(company_id)
+        try:
+            while True:
+                try:
+                    feed = await asyncio.wait_for(queue.get(), timeout=NOTIFICATION_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: notifications\ndata: {json.dumps(feed, default=str)}\n\n"
+        finally:
+            self.unsubscribe(company_id, queue)
+
+
+notification_hub = NotificationHub()
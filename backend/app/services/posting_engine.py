@@ -3,7 +3,7 @@ import calendar
 from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from sqlalchemy import func, insert
 import json
 
 from app.database.models.enterprise_finance import (
@@ -106,6 +106,28 @@ class PostingEngineService:
             logger.info(f"Created Ledger Master: {ledger_name} under group {group_name}")
         return ledger
 
+    @staticmethod
+    def resolve_ledgers(db: Session, company_id: str, details: list) -> list[LedgerMaster]:
+        """Ledger per voucher line: one lookup for every name, creating only the missing ones."""
+        names = sorted({detail["ledger_name"] for detail in details})
+        found = {}
+        for ledger in db.query(LedgerMaster).filter(
+            LedgerMaster.company_id == company_id,
+            LedgerMaster.ledger_name.in_(names),
+        ).order_by(LedgerMaster.id):
+            found.setdefault(ledger.ledger_name, ledger)
+        for detail in details:
+            if detail["ledger_name"] not in found:
+                found[detail["ledger_name"]] = PostingEngineService.get_or_create_ledger(
+                    db,
+                    company_id,
+                    detail["ledger_name"],
+                    detail["group_name"],
+                    detail["group_type"],
+                    detail.get("parent_group_name"),
+                )
+        return [found[detail["ledger_name"]] for detail in details]
+
     @staticmethod
     def get_or_create_voucher_type(db: Session, company_id: str, type_name: str, prefix: str) -> VoucherType:
         """Finds or creates a voucher type configuration."""
@@ -188,21 +210,12 @@ class PostingEngineService:
             if valid_count != len(cost_center_ids):
                 raise ValueError("One or more cost centers are invalid for this company")
 
-        resolved_ledgers = []
-        for detail in details:
-            ledger = PostingEngineService.get_or_create_ledger(
-                db,
-                company_id,
-                detail["ledger_name"],
-                detail["group_name"],
-                detail["group_type"],
-                detail.get("parent_group_name"),
-            )
+        resolved_ledgers = PostingEngineService.resolve_ledgers(db, company_id, details)
+        for ledger, detail in zip(resolved_ledgers, details):
             if str(ledger.status or "ACTIVE").upper() != "ACTIVE":
                 raise ValueError(f"Ledger {ledger.ledger_name} is inactive")
             if ledger.cost_center_required and not detail.get("cost_center_id"):
                 raise ValueError(f"Cost center is required for ledger {ledger.ledger_name}")
-            resolved_ledgers.append(ledger)
 
         v_type = PostingEngineService.get_or_create_voucher_type(
             db, company_id, voucher_type_name, voucher_type_name[:3].upper()
@@ -224,16 +237,18 @@ class PostingEngineService:
         db.add(header)
         db.flush()
 
-        for d, ledger in zip(details, resolved_ledgers):
-            detail = VoucherDetail(
-                voucher_id=header.id,
-                ledger_id=ledger.id,
-                cost_center_id=d.get('cost_center_id'),
-                debit_amount=Decimal(str(d.get('debit_amount', 0) or 0)).quantize(Decimal("0.01")),
-                credit_amount=Decimal(str(d.get('credit_amount', 0) or 0)).quantize(Decimal("0.01")),
-                remarks=d.get('remarks')
-            )
-            db.add(detail)
+        # One executemany for all lines (no per-row RETURNING), however long the voucher.
+        db.execute(insert(VoucherDetail), [
+            {
+                "voucher_id": header.id,
+                "ledger_id": ledger.id,
+                "cost_center_id": d.get('cost_center_id'),
+                "debit_amount": Decimal(str(d.get('debit_amount', 0) or 0)).quantize(Decimal("0.01")),
+                "credit_amount": Decimal(str(d.get('credit_amount', 0) or 0)).quantize(Decimal("0.01")),
+                "remarks": d.get('remarks'),
+            }
+            for d, ledger in zip(details, resolved_ledgers)
+        ])
 
         PostingEngineService.write_finance_audit(
             db, company_id, 'voucher_headers', header.id, 'INSERT', None, 
@@ -3,6 +3,7 @@
 This module deliberately does not update inventory valuation.  It only reads
 posted operational records and produces an auditable monthly allocation
 preview.  Inventory costing can consume the approved result in a later step.
+Period totals come from the monthly pools kept by ``production_cost_pools``.
 """
 
 from __future__ import annotations
@@ -20,6 +21,7 @@ from app.database.models.criteria import production_at
 from app.database.models.enterprise_finance import SalaryProcessing
 from app.database.models.general_stock import GeneralStock
 from app.database.models.inventory_management import stock_entry
+from app.services.production_cost_pools import load_cost_pools, months_between
 
 
 CHEMICAL_WORDS = ("CHEMICAL", "CHEM", "SALT", "STPP", "SODA", "POWDER", "DRY", "WET")
@@ -37,6 +39,7 @@ DUPLICATE_POOL_WORDS = (
     "SALARY", "PAYROLL", "WAGES", "ELECTRIC", "POWER", "DIESEL",
     "CARTON", "PACKING", "PACKAGING", "CHEMICAL", "SALT", "STPP",
 )
+SOURCE_DETAIL_KEYS = ("production", "salary", "electricity", "diesel", "other_expenses", "consumables")
 
 
 def normalize_po(value: Any) -> str:
@@ -185,25 +188,77 @@ def allocate_cost_pools(
     }
 
 
-def build_monthly_production_cost_preview(
-    db: Session,
-    company_id: str,
-    month: str,
-    location: str | None = None,
-    period_start: date | None = None,
-    period_end: date | None = None,
-    temporary_carton_cost_per_kg: float | None = None,
-    period_label: str | None = None,
-) -> dict[str, Any]:
-    month_start, month_end = month_bounds(month)
-    start_date = period_start or month_start
-    end_date = period_end or (min(month_end, date.today()) if month_start <= date.today() else month_end)
-    if end_date < start_date:
-        raise ValueError("Period end cannot be before period start")
-    company_id = str(company_id or "").strip()
-    location = str(location or "").strip()
-    warnings: list[str] = []
+def _period_pools(cost_pools: dict[str, Any], start_date: date, end_date: date, location: str) -> dict[str, Any]:
+    """Cut one period and location out of monthly cost pools."""
+    location = location.upper()
+    first_day, last_day = start_date.isoformat(), end_date.isoformat()
+    outputs: dict[tuple, float] = defaultdict(float)
+    totals: dict[str, float] = defaultdict(float)
+    expenses: dict[str, float] = defaultdict(float)
+    consumables: dict[tuple, float] = defaultdict(float)
+    salary_rows = 0
+
+    def wanted(unit: str, day: str | None = None) -> bool:
+        return (not location or unit == location) and (day is None or first_day <= day <= last_day)
+
+    for month, pools in sorted(cost_pools.items()):
+        month_start, month_end = month_bounds(month)
+        overlap_days = (min(end_date, month_end) - max(start_date, month_start)).days + 1
+        if overlap_days <= 0:
+            continue
+        for day, unit, po_number, variety, weight, _ in pools["output"]:
+            if wanted(unit, day):
+                outputs[(normalize_po(po_number), variety, unit)] += weight
+        for unit, amount, count in pools["salary"]:
+            if wanted(unit):
+                totals["salary"] += amount * overlap_days / month_end.day
+                salary_rows += count
+        for name in ("electricity", "diesel"):
+            for day, unit, amount, _ in pools[name]:
+                if wanted(unit, day):
+                    totals[name] += amount
+        for day, unit, category, amount, _ in pools["other_expense"]:
+            if wanted(unit, day):
+                expenses[category.upper()] += amount
+        for day, unit, po_number, item_name, amount, _ in pools["consumable"]:
+            if wanted(unit, day):
+                consumables[(normalize_po(po_number), classify_consumable(item_name))] += amount
+
+    return {
+        "outputs": [{
+            "source_id": None,
+            "production_date": None,
+            "batch_number": None,
+            "po_number": po_number,
+            "variety": variety or None,
+            "grade": None,
+            "production_at": unit or None,
+            "weight_kg": weight,
+        } for (po_number, variety, unit), weight in sorted(outputs.items())],
+        "salary_cost": totals["salary"],
+        "salary_rows": salary_rows,
+        "electricity_cost": totals["electricity"],
+        "diesel_cost": totals["diesel"],
+        "expenses": dict(expenses),
+        "consumables": dict(consumables),
+    }
 
+
+def _salary_amount(row, start_date: date, end_date: date) -> float:
+    salary_month_start, salary_month_end = month_bounds(row.month_year)
+    overlap_days = max((min(end_date, salary_month_end) - max(start_date, salary_month_start)).days + 1, 0)
+    monthly_expense = (
+        float(row.gross_salary or 0.0)
+        + float(row.pf_employer or 0.0)
+        + float(getattr(row, "edli_employer", 0.0) or 0.0)
+        + float(row.esi_employer or 0.0)
+        + float(row.lwf_employer or 0.0)
+    )
+    return monthly_expense * overlap_days / salary_month_end.day
+
+
+def _source_details(db: Session, company_id: str, start_date: date, end_date: date, location: str) -> dict[str, list]:
+    """The source rows behind a period's pools, for drill-down."""
     output_query = db.query(stock_entry).filter(
         stock_entry.company_id == company_id,
         stock_entry.date >= start_date,
@@ -213,7 +268,6 @@ def build_monthly_production_cost_preview(
     )
     if location:
         output_query = output_query.filter(func.upper(func.trim(stock_entry.production_at)) == location.upper())
-    output_rows = output_query.all()
     outputs = [{
         "source_id": row.id,
         "production_date": row.date.isoformat() if row.date else None,
@@ -223,40 +277,14 @@ def build_monthly_production_cost_preview(
         "grade": row.grade,
         "production_at": row.production_at,
         "weight_kg": max(float(row.quantity or 0.0), 0.0),
-    } for row in output_rows if float(row.quantity or 0.0) > 0]
-
-    salary_months = []
-    cursor = date(start_date.year, start_date.month, 1)
-    final_month = date(end_date.year, end_date.month, 1)
-    while cursor <= final_month:
-        salary_months.append(cursor.strftime("%Y-%m"))
-        cursor = date(cursor.year + (1 if cursor.month == 12 else 0), 1 if cursor.month == 12 else cursor.month + 1, 1)
+    } for row in output_query.all() if float(row.quantity or 0.0) > 0]
 
     salary_query = db.query(SalaryProcessing).filter(
         SalaryProcessing.company_id == company_id,
-        SalaryProcessing.month_year.in_(salary_months),
+        SalaryProcessing.month_year.in_(months_between(start_date, end_date)),
         SalaryProcessing.status.in_(["APPROVED", "PAID"]),
         func.coalesce(SalaryProcessing.is_cancelled, False).is_(False),
     )
-    if location:
-        salary_query = salary_query.filter(func.upper(func.trim(SalaryProcessing.production_at)) == location.upper())
-    salary_rows = salary_query.all()
-    salary_cost = 0.0
-    for row in salary_rows:
-        salary_month_start, salary_month_end = month_bounds(row.month_year)
-        overlap_start = max(start_date, salary_month_start)
-        overlap_end = min(end_date, salary_month_end)
-        overlap_days = max((overlap_end - overlap_start).days + 1, 0)
-        month_days = salary_month_end.day
-        monthly_expense = (
-            float(row.gross_salary or 0.0)
-            + float(row.pf_employer or 0.0)
-            + float(getattr(row, "edli_employer", 0.0) or 0.0)
-            + float(row.esi_employer or 0.0)
-            + float(row.lwf_employer or 0.0)
-        )
-        salary_cost += monthly_expense * overlap_days / month_days
-
     electricity_query = db.query(ElectricityLog).join(
         production_at, ElectricityLog.unit_id == production_at.id
     ).filter(
@@ -286,42 +314,78 @@ def build_monthly_production_cost_preview(
     stock_query = db.query(GeneralStock).filter(
         GeneralStock.company_id == company_id,
         GeneralStock.date >= start_date,
+        GeneralStock.date <= end_date,
         func.upper(func.trim(GeneralStock.movement_type)) == "OUT",
         func.coalesce(GeneralStock.is_cancelled, False).is_(False),
     )
     if location:
         location_filter = location.upper()
+        salary_query = salary_query.filter(func.upper(func.trim(SalaryProcessing.production_at)) == location_filter)
         electricity_query = electricity_query.filter(func.upper(func.trim(production_at.production_at)) == location_filter)
         diesel_query = diesel_query.filter(func.upper(func.trim(production_at.production_at)) == location_filter)
         expense_query = expense_query.filter(func.upper(func.trim(production_at.production_at)) == location_filter)
         stock_query = stock_query.filter(func.upper(func.trim(GeneralStock.production_at)) == location_filter)
 
-    electricity_rows = electricity_query.all()
-    diesel_rows = diesel_query.all()
-    expense_rows = expense_query.all()
-    consumable_rows = stock_query.all()
-    electricity_cost = sum(float(row.total_cost or 0.0) for row in electricity_rows)
-    diesel_cost = sum(float(row.net_val or 0.0) for row in diesel_rows)
+    return {
+        "production": outputs,
+        "salary": [{"id": row.id, "employee": row.employee_name, "month": row.month_year, "amount": _money(_salary_amount(row, start_date, end_date))} for row in salary_query.all()],
+        "electricity": [{"id": row.id, "date": row.reading_date.isoformat() if row.reading_date else None, "amount": _money(row.total_cost)} for row in electricity_query.all()],
+        "diesel": [{"id": row.id, "date": row.log_date.isoformat() if row.log_date else None, "quantity": float(row.consumption or 0.0), "amount": _money(row.net_val)} for row in diesel_query.all()],
+        "other_expenses": [{"id": row.id, "date": row.date.isoformat() if row.date else None, "category": row.category, "amount": _money(row.amount)} for row in expense_query.all()],
+        "consumables": [{"id": row.id, "date": row.date.isoformat() if row.date else None, "po_number": normalize_po(row.po_number), "item": row.item_name, "quantity": float(row.quantity or 0.0), "amount": _money(row.amount), "category": classify_consumable(row.item_name)} for row in stock_query.all()],
+    }
+
+
+def build_monthly_production_cost_preview(
+    db: Session,
+    company_id: str,
+    month: str,
+    location: str | None = None,
+    period_start: date | None = None,
+    period_end: date | None = None,
+    temporary_carton_cost_per_kg: float | None = None,
+    period_label: str | None = None,
+    include_details: bool = True,
+    cost_pools: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Allocate one period's cost pools over its finished output.
+
+    Totals come from the stored monthly pools; pass ``cost_pools`` when they
+    are already loaded.  ``include_details`` adds the source rows for
+    drill-down and allocates per stock entry; without it the
+    ``source_details`` lists are empty and allocations are per PO/variety.
+    """
+    month_start, month_end = month_bounds(month)
+    start_date = period_start or month_start
+    end_date = period_end or (min(month_end, date.today()) if month_start <= date.today() else month_end)
+    if end_date < start_date:
+        raise ValueError("Period end cannot be before period start")
+    company_id = str(company_id or "").strip()
+    location = str(location or "").strip()
+    warnings: list[str] = []
+
+    if cost_pools is None:
+        cost_pools = load_cost_pools(db, company_id, months_between(start_date, end_date))
+    period = _period_pools(cost_pools, start_date, end_date, location)
+    if include_details:
+        source_details = _source_details(db, company_id, start_date, end_date, location)
+        outputs = source_details["production"]
+    else:
+        source_details = {key: [] for key in SOURCE_DETAIL_KEYS}
+        outputs = period["outputs"]
 
     other_expense_cost = 0.0
     excluded_expenses = []
-    for row in expense_rows:
-        category = str(row.category or "").strip().upper()
-        if any(word in category for word in NON_PRODUCTION_EXPENSE_WORDS):
-            excluded_expenses.append(category or f"Expense #{row.id}")
+    for category, amount in period["expenses"].items():
+        if any(word in category for word in NON_PRODUCTION_EXPENSE_WORDS + DUPLICATE_POOL_WORDS):
+            excluded_expenses.append(category)
             continue
-        if any(word in category for word in DUPLICATE_POOL_WORDS):
-            excluded_expenses.append(category or f"Expense #{row.id}")
-            continue
-        other_expense_cost += float(row.amount or 0.0)
+        other_expense_cost += amount
 
     carton_costs: dict[str, float] = defaultdict(float)
     chemical_costs: dict[str, float] = defaultdict(float)
     other_consumables_cost = 0.0
-    for row in consumable_rows:
-        amount = float(row.amount or 0.0)
-        pool = normalize_po(row.po_number)
-        category = classify_consumable(row.item_name)
+    for (pool, category), amount in period["consumables"].items():
         if category == "CARTON":
             carton_costs[pool] += amount
         elif category == "CHEMICAL":
@@ -329,9 +393,10 @@ def build_monthly_production_cost_preview(
         else:
             other_consumables_cost += amount
 
+    diesel_cost = period["diesel_cost"]
     common_costs = {
-        "salary_cost": _money(salary_cost),
-        "electricity_cost": _money(electricity_cost),
+        "salary_cost": _money(period["salary_cost"]),
+        "electricity_cost": _money(period["electricity_cost"]),
         "diesel_cost": _money(diesel_cost),
         "other_expense_cost": _money(other_expense_cost),
         "other_consumables_cost": _money(other_consumables_cost),
@@ -346,7 +411,7 @@ def build_monthly_production_cost_preview(
 
     if not outputs:
         warnings.append("No stock-entry IN quantity is available for this period and location.")
-    if not salary_rows:
+    if not period["salary_rows"]:
         warnings.append("No approved or paid salary-processing records are available for this period.")
     if allocation["total_output_weight_kg"] <= 0:
         warnings.append("Production cost per kg cannot be calculated until output weight is available.")
@@ -377,29 +442,6 @@ def build_monthly_production_cost_preview(
         warnings.append(
             f"Period KPI includes {abs(unallocated_period_cost):.2f} of expense not matched to product/PO rows; product breakdown and period average may differ."
         )
-    source_details = {
-        "production": outputs,
-        "salary": [{
-            "id": row.id,
-            "employee": row.employee_name,
-            "month": row.month_year,
-            "amount": _money(
-                (
-                    float(row.gross_salary or 0.0)
-                    + float(row.pf_employer or 0.0)
-                    + float(getattr(row, "edli_employer", 0.0) or 0.0)
-                    + float(row.esi_employer or 0.0)
-                    + float(row.lwf_employer or 0.0)
-                )
-                * max((min(end_date, month_bounds(row.month_year)[1]) - max(start_date, month_bounds(row.month_year)[0])).days + 1, 0)
-                / month_bounds(row.month_year)[1].day
-            ),
-        } for row in salary_rows],
-        "electricity": [{"id": row.id, "date": row.reading_date.isoformat() if row.reading_date else None, "amount": _money(row.total_cost)} for row in electricity_rows],
-        "diesel": [{"id": row.id, "date": row.log_date.isoformat() if row.log_date else None, "quantity": float(row.consumption or 0.0), "amount": _money(row.net_val)} for row in diesel_rows],
-        "other_expenses": [{"id": row.id, "date": row.date.isoformat() if row.date else None, "category": row.category, "amount": _money(row.amount)} for row in expense_rows],
-        "consumables": [{"id": row.id, "date": row.date.isoformat() if row.date else None, "po_number": normalize_po(row.po_number), "item": row.item_name, "quantity": float(row.quantity or 0.0), "amount": _money(row.amount), "category": classify_consumable(row.item_name)} for row in consumable_rows],
-    }
     return {
         "month": month,
         "period_label": period_label or month,
@@ -427,32 +469,41 @@ def build_production_cost_comparison(
     location: str | None = None,
     as_of_date: date | None = None,
 ) -> dict[str, Any]:
+    """Today, last month, this month and year to date from one load of the monthly pools.
+
+    Only today carries source rows; the longer periods feed the KPI cards.
+    """
     as_of = as_of_date or date.today()
     this_month_start = date(as_of.year, as_of.month, 1)
     last_month_end = this_month_start - timedelta(days=1)
     last_month_start = date(last_month_end.year, last_month_end.month, 1)
     year_start = date(as_of.year, 1, 1)
+    cost_pools = load_cost_pools(db, str(company_id or "").strip(), months_between(min(year_start, last_month_start), as_of))
 
     today_preview = build_monthly_production_cost_preview(
         db, company_id, as_of.strftime("%Y-%m"), location,
         period_start=as_of, period_end=as_of,
         temporary_carton_cost_per_kg=TEMPORARY_CARTON_COST_PER_KG,
         period_label="TODAY",
+        cost_pools=cost_pools,
     )
     last_month_preview = build_monthly_production_cost_preview(
         db, company_id, last_month_start.strftime("%Y-%m"), location,
         period_start=last_month_start, period_end=last_month_end,
         period_label="LAST MONTH",
+        include_details=False, cost_pools=cost_pools,
     )
     this_month_preview = build_monthly_production_cost_preview(
         db, company_id, as_of.strftime("%Y-%m"), location,
         period_start=this_month_start, period_end=as_of,
         period_label="THIS MONTH",
+        include_details=False, cost_pools=cost_pools,
     )
     year_preview = build_monthly_production_cost_preview(
         db, company_id, as_of.strftime("%Y-%m"), location,
         period_start=year_start, period_end=as_of,
         period_label="YEAR TO DATE",
+        include_details=False, cost_pools=cost_pools,
     )
     return {
         "as_of_date": as_of.isoformat(),
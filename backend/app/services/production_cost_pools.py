@@ -0,0 +1,376 @@
+"""Production cost pools, aggregated in SQL and kept per company-month.
+
+A production-cost preview needs the period's finished output weight and its
+salary, electricity, diesel, other-expense and consumable totals.
+``production_cost_pools`` stores those totals per company-month at day and
+location grain, so any sub-period or location filter is cut from them
+without reading the source rows again:
+
+* ``load_cost_pools`` returns the pools of a set of months; months not
+  stored yet are aggregated together with one GROUP BY query per source.
+* ``install_cost_pool_tracking`` drops a company-month whenever a source row
+  of that month is added, edited or deleted through the ORM; renaming a
+  production unit drops every month of its company.
+* ``run_cost_pool_reconcile`` drops the current and previous month nightly
+  for writes that bypass the ORM; ``invalidate_cost_pools`` does it on demand.
+
+Every drop bumps the company's row in ``production_cost_pool_generations``
+before deleting, and a read stores what it aggregated only while that
+generation is still the one it saw before aggregating. A write committed
+during the aggregate therefore never leaves a stale month behind: storing
+locks the generation row, so either the store sees the bump and gives up, or
+the bump waits and the drop after it deletes the stored month.
+"""
+import json
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from importlib import import_module
+
+from sqlalchemy import func, inspect, select
+from sqlalchemy.exc import IntegrityError
+
+from app.services.derived_tables import (
+    DerivedTable,
+    install_derived_table_tracking,
+    register_derived_table,
+    reset_ready_cache,
+    tables_ready,
+    upsert_increments,
+    write_outside_request,
+)
+
+logger = logging.getLogger(__name__)
+
+POOL_NAMES = ("output", "salary", "electricity", "diesel", "other_expense", "consumable")
+DERIVED_TABLE = "production_cost_pools"
+
+
+@dataclass(frozen=True)
+class PoolSource:
+    model: str                # "module:Class"
+    company_field: str        # "unit_id": company comes from the production unit
+    month_field: str | None   # None: a write touches every month of the company
+
+
+POOL_SOURCES = (
+    PoolSource("app.database.models.inventory_management:stock_entry", "company_id", "date"),
+    PoolSource("app.database.models.enterprise_finance:SalaryProcessing", "company_id", "month_year"),
+    PoolSource("app.database.models.bills:ElectricityLog", "unit_id", "reading_date"),
+    PoolSource("app.database.models.bills:DieselLog", "unit_id", "log_date"),
+    PoolSource("app.database.models.bills:OtherExpense", "unit_id", "date"),
+    PoolSource("app.database.models.general_stock:GeneralStock", "company_id", "date"),
+    PoolSource("app.database.models.criteria:production_at", "company_id", None),
+)
+
+def _model(source: PoolSource):
+    module_name, class_name = source.model.split(":")
+    return getattr(import_module(module_name), class_name)
+
+
+def _pool_table():
+    from app.database.models.production_cost_pools import ProductionCostPool
+
+    return ProductionCostPool.__table__
+
+
+def _generation_table():
+    from app.database.models.production_cost_pools import ProductionCostPoolGeneration
+
+    return ProductionCostPoolGeneration.__table__
+
+
+def _generation(connection, company_id: str) -> int:
+    table = _generation_table()
+    return connection.execute(select(table.c.generation).where(table.c.company_id == company_id)).scalar() or 0
+
+
+def _bump_generations(connection, companies, step: int = 1) -> None:
+    """Add ``step`` to each company's generation; ``step=0`` only locks (and creates) the rows."""
+    now = datetime.utcnow()
+    upsert_increments(
+        connection, _generation_table(), ("company_id",),
+        [{"company_id": company_id, "generation": step, "updated_at": now} for company_id in sorted(companies)],
+        increments=("generation",),
+        touched={"updated_at": now},
+    )
+
+
+def _table_ready(connection) -> bool:
+    return tables_ready(connection, DERIVED_TABLE)
+
+
+def month_key(value) -> str | None:
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m")
+    text = str(value or "").strip()[:7]
+    return text if len(text) == 7 and text[4] == "-" else None
+
+
+def months_between(start: date, end: date) -> list[str]:
+    months = []
+    cursor = date(start.year, start.month, 1)
+    while cursor <= end:
+        months.append(cursor.strftime("%Y-%m"))
+        cursor = (cursor + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def _location(value) -> str:
+    return str(value or "").strip().upper()
+
+
+def _text(value) -> str:
+    return str(value or "").strip()
+
+
+def _not_cancelled(column):
+    return func.coalesce(column, False).is_(False)
+
+
+def _aggregate(connection, company_id: str, months) -> dict:
+    """Pools of ``months`` straight from the source tables, one GROUP BY query per source."""
+    from app.database.models.bills import DieselLog, ElectricityLog, OtherExpense
+    from app.database.models.criteria import production_at
+    from app.database.models.enterprise_finance import SalaryProcessing
+    from app.database.models.general_stock import GeneralStock
+    from app.database.models.inventory_management import stock_entry
+
+    months = sorted(set(months))
+    totals = {month: {name: defaultdict(lambda: [0.0, 0]) for name in POOL_NAMES} for month in months}
+    if not months:
+        return {}
+    start = date.fromisoformat(f"{months[0]}-01")
+    end = (date.fromisoformat(f"{months[-1]}-01") + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    def add(name, day, key, amount, count):
+        month = month_key(day)
+        if month in totals:
+            entry = totals[month][name][key]
+            entry[0] += float(amount or 0.0)
+            entry[1] += int(count or 0)
+
+    # Group by the raw columns and normalise here: PostgreSQL does not match a
+    # GROUP BY expression carrying bound parameters against the SELECT list.
+    for day, unit, po_number, variety, weight, count in connection.execute(
+        select(stock_entry.date, stock_entry.production_at, stock_entry.po_number, stock_entry.variety,
+               func.sum(stock_entry.quantity), func.count())
+        .where(
+            stock_entry.company_id == company_id,
+            stock_entry.date >= start,
+            stock_entry.date <= end,
+            func.upper(func.trim(stock_entry.cargo_movement_type)) == "IN",
+            _not_cancelled(stock_entry.is_cancelled),
+            stock_entry.quantity > 0,
+        )
+        .group_by(stock_entry.date, stock_entry.production_at, stock_entry.po_number, stock_entry.variety)
+    ):
+        add("output", day, (day.isoformat(), _location(unit), _text(po_number), _text(variety)), weight, count)
+
+    employer_cost = sum(
+        func.coalesce(column, 0.0) for column in (
+            SalaryProcessing.gross_salary, SalaryProcessing.pf_employer, SalaryProcessing.edli_employer,
+            SalaryProcessing.esi_employer, SalaryProcessing.lwf_employer,
+        )
+    )
+    for month_year, unit, amount, count in connection.execute(
+        select(SalaryProcessing.month_year, SalaryProcessing.production_at, func.sum(employer_cost), func.count())
+        .where(
+            SalaryProcessing.company_id == company_id,
+            SalaryProcessing.month_year.in_(months),
+            SalaryProcessing.status.in_(["APPROVED", "PAID"]),
+            _not_cancelled(SalaryProcessing.is_cancelled),
+        )
+        .group_by(SalaryProcessing.month_year, SalaryProcessing.production_at)
+    ):
+        add("salary", month_year, (_location(unit),), amount, count)
+
+    unit_sources = (
+        ("electricity", ElectricityLog, ElectricityLog.reading_date, ElectricityLog.total_cost, ()),
+        ("diesel", DieselLog, DieselLog.log_date, DieselLog.net_val, (func.upper(func.trim(DieselLog.type)) == "OUT",)),
+        ("other_expense", OtherExpense, OtherExpense.date, OtherExpense.amount, (func.upper(func.trim(OtherExpense.status)) == "POSTED",)),
+    )
+    for name, model, day_column, amount_column, conditions in unit_sources:
+        extra = (model.category,) if model is OtherExpense else ()
+        for day, unit, *rest in connection.execute(
+            select(day_column, production_at.production_at, *extra, func.sum(amount_column), func.count())
+            .join(production_at, model.unit_id == production_at.id)
+            .where(
+                production_at.company_id == company_id,
+                day_column >= start,
+                day_column <= end,
+                _not_cancelled(model.is_cancelled),
+                *conditions,
+            )
+            .group_by(day_column, production_at.production_at, *extra)
+        ):
+            *labels, amount, count = rest
+            add(name, day, (day.isoformat(), _location(unit), *(_text(label) for label in labels)), amount, count)
+
+    for day, unit, po_number, item_name, amount, count in connection.execute(
+        select(GeneralStock.date, GeneralStock.production_at, GeneralStock.po_number, GeneralStock.item_name,
+               func.sum(GeneralStock.amount), func.count())
+        .where(
+            GeneralStock.company_id == company_id,
+            GeneralStock.date >= start,
+            GeneralStock.date <= end,
+            func.upper(func.trim(GeneralStock.movement_type)) == "OUT",
+            _not_cancelled(GeneralStock.is_cancelled),
+        )
+        .group_by(GeneralStock.date, GeneralStock.production_at, GeneralStock.po_number, GeneralStock.item_name)
+    ):
+        add("consumable", day, (day.isoformat(), _location(unit), _text(po_number), _text(item_name)), amount, count)
+
+    return {
+        month: {
+            name: [[*key, round(amount, 4), count] for key, (amount, count) in sorted(entries.items())]
+            for name, entries in pools.items()
+        }
+        for month, pools in totals.items()
+    }
+
+
+def _store(connection, company_id: str, built: dict, generation: int) -> None:
+    _bump_generations(connection, [company_id], step=0)
+    if _generation(connection, company_id) != generation:
+        return  # pools were dropped while these were aggregated
+    table = _pool_table()
+    now = datetime.utcnow()
+    for month, pools in built.items():
+        try:
+            with connection.begin_nested():
+                connection.execute(table.insert().values(
+                    company_id=company_id,
+                    month=month,
+                    pools=json.dumps(pools, separators=(",", ":")),
+                    source_rows=sum(entry[-1] for entries in pools.values() for entry in entries),
+                    built_at=now,
+                ))
+        except IntegrityError:
+            pass  # a concurrent request stored the same month first
+
+
+def load_cost_pools(db, company_id: str, months) -> dict:
+    """``{month: pools}`` for ``months``, aggregating and storing the ones not kept yet."""
+    months = sorted({month for month in months if month})
+    if not months:
+        return {}
+    connection = db.connection()
+    if not _table_ready(connection):
+        return _aggregate(connection, company_id, months)
+    table = _pool_table()
+    pools = {
+        month: json.loads(payload)
+        for month, payload in connection.execute(
+            select(table.c.month, table.c.pools).where(table.c.company_id == company_id, table.c.month.in_(months))
+        )
+    }
+    missing = [month for month in months if month not in pools]
+    if missing:
+        generation = _generation(connection, company_id)
+        built = _aggregate(connection, company_id, missing)
+        write_outside_request(db, lambda own: _store(own, company_id, built, generation), name=DERIVED_TABLE)
+        pools.update(built)
+    return pools
+
+
+def invalidate_cost_pools(db, company_id: str, months=None) -> int:
+    """Drop the stored pools of a company (only ``months`` when given) in the caller's transaction."""
+    connection = db.connection()
+    if not _table_ready(connection):
+        return 0
+    _bump_generations(connection, [company_id])
+    table = _pool_table()
+    stmt = table.delete().where(table.c.company_id == company_id)
+    if months is not None:
+        stmt = stmt.where(table.c.month.in_(sorted(set(months))))
+    return connection.execute(stmt).rowcount or 0
+
+
+def _sources_by_table() -> dict:
+    return {_model(source).__tablename__: source for source in POOL_SOURCES}
+
+
+def _field_values(obj, field: str) -> set:
+    values = {getattr(obj, field, None)}
+    values.update(inspect(obj).attrs[field].history.deleted or ())
+    return values - {None, ""}
+
+
+def _collect_touched(session):
+    sources = _sources_by_table()
+    touched = []
+    for obj in [*session.new, *session.dirty, *session.deleted]:
+        source = sources.get(getattr(obj, "__tablename__", None))
+        if source and (obj not in session.dirty or session.is_modified(obj)):
+            months = None if source.month_field is None else {month_key(value) for value in _field_values(obj, source.month_field)}
+            touched.append((source.company_field, _field_values(obj, source.company_field), months))
+    return touched
+
+
+def _drop_touched(connection, touched) -> None:
+    unit_ids = sorted({value for field, values, _ in touched if field == "unit_id" for value in values})
+    unit_company = {}
+    if unit_ids:
+        from app.database.models.criteria import production_at
+
+        unit_company = dict(connection.execute(
+            select(production_at.id, production_at.company_id).where(production_at.id.in_(unit_ids))
+        ).all())
+    stale = defaultdict(set)
+    for field, values, months in touched:
+        companies = {unit_company.get(value) for value in values} if field == "unit_id" else values
+        for company_id in companies - {None}:
+            stale[company_id].update({None} if months is None else months - {None})
+    if stale:
+        _bump_generations(connection, stale)
+    table = _pool_table()
+    for company_id, months in stale.items():
+        stmt = table.delete().where(table.c.company_id == company_id)
+        if None not in months:
+            stmt = stmt.where(table.c.month.in_(sorted(months)))
+        connection.execute(stmt)
+
+
+register_derived_table(DerivedTable(
+    name=DERIVED_TABLE,
+    label="Production cost pool invalidation",
+    sources=lambda: _sources_by_table().keys(),
+    tables=lambda: (_pool_table(), _generation_table()),
+    collect=_collect_touched,
+    apply=_drop_touched,
+))
+
+
+def install_cost_pool_tracking(session_factory) -> None:
+    """Drop stored pools on writes made through ``session_factory``."""
+    install_derived_table_tracking(session_factory, DERIVED_TABLE)
+
+
+def reset_cost_pool_cache() -> None:
+    reset_ready_cache(DERIVED_TABLE)
+
+
+def run_cost_pool_reconcile():
+    """Scheduled drop of every company's current and previous month; they are re-aggregated on the next read."""
+    from app.database import BackgroundSessionLocal
+
+    db = BackgroundSessionLocal()
+    try:
+        if not _table_ready(db.connection()):
+            return "skipped"
+        today = date.today()
+        months = [month_key(today.replace(day=1) - timedelta(days=1)), month_key(today)]
+        generations = _generation_table()
+        db.execute(generations.update().values(generation=generations.c.generation + 1, updated_at=datetime.utcnow()))
+        table = _pool_table()
+        db.execute(table.delete().where(table.c.month.in_(months)))
+        db.commit()
+        return "clean"
+    except Exception as e:
+        db.rollback()
+        logger.error("Production cost pool reconcile failed: %s", e)
+        return "failed"
+    finally:
+        db.close()
@@ -0,0 +1,192 @@
+"""Opt-in per-request SQL instrumentation and N+1 detection.
+
+Enable with ``SQL_DIAGNOSTICS=1``. Engine events (installed from
+``app/database/__init__.py``) attribute every statement to the
+``QueryStats`` of the current request or job. The middleware adds a
+``Server-Timing`` header, keeps the most expensive recent requests for
+``/admin/diagnostics`` and logs a warning when one statement fingerprint
+repeats ``SQL_DIAGNOSTICS_DUPLICATE_THRESHOLD`` times in a single request,
+which is almost always a query inside a Python loop.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+logger = logging.getLogger("BKNR_ERP.sql")
+
+SQL_DIAGNOSTICS_ENABLED = os.getenv("SQL_DIAGNOSTICS", "").strip().lower() in {"1", "true", "yes"}
+DUPLICATE_THRESHOLD = int(os.getenv("SQL_DIAGNOSTICS_DUPLICATE_THRESHOLD", "10"))
+HISTORY_SIZE = int(os.getenv("SQL_DIAGNOSTICS_HISTORY", "50"))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_BIND_PARAM = re.compile(r"%\(\w+\)s|:\w+|\$\d+|\?")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+_current: ContextVar["QueryStats | None"] = ContextVar("sql_query_stats", default=None)
+_history: deque = deque(maxlen=HISTORY_SIZE)
+_history_lock = threading.Lock()
+_installed_engines: set[int] = set()
+
+
+def fingerprint(statement: str) -> str:
+    """Normalise a SQL statement so repeated executions compare equal."""
+    text = _STRING_LITERAL.sub("?", statement)
+    text = _BIND_PARAM.sub("?", text)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _IN_LIST.sub("IN (?)", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class QueryStats:
+    """Statement counters for one request or background job."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.checkouts = 0
+        self.fingerprints: Counter = Counter()
+
+    def record_query(self, statement: str, seconds: float) -> None:
+        self.query_count += 1
+        self.db_seconds += seconds
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def record_checkout(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.pool_wait_seconds += seconds
+
+    def duplicates(self, threshold: int = 2) -> list[tuple[str, int]]:
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.query_count} queries", '
+            f'pool;dur={self.pool_wait_seconds * 1000:.1f};desc="{self.checkouts} checkouts"'
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "label": self.label,
+            "query_count": self.query_count,
+            "db_ms": round(self.db_seconds * 1000, 2),
+            "pool_wait_ms": round(self.pool_wait_seconds * 1000, 2),
+            "checkouts": self.checkouts,
+            "duplicates": [{"sql": sql[:300], "count": count} for sql, count in self.duplicates()[:5]],
+        }
+
+
+def current_query_stats() -> "QueryStats | None":
+    return _current.get()
+
+
+@contextmanager
+def collect_queries(label: str = ""):
+    """Attribute every statement executed inside the block to a fresh ``QueryStats``.
+
+    Usable for scheduler jobs, scripts and tests as well as requests. Nested
+    blocks count into the innermost collector only.
+    """
+    stats = QueryStats(label)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    if starts:
+        stats.record_query(statement, time.perf_counter() - starts.pop())
+
+
+def install_query_instrumentation(engine) -> None:
+    """Attach statement and pool-checkout timers to ``engine`` (idempotent)."""
+    if id(engine) in _installed_engines:
+        return
+    _installed_engines.add(id(engine))
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    # QueuePool has no "before checkout" event, so time the checkout itself.
+    # Wrapping raw_connection survives engine.dispose() recreating the pool.
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection(*args, **kwargs):
+        stats = _current.get()
+        if stats is None:
+            return raw_connection(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return raw_connection(*args, **kwargs)
+        finally:
+            stats.record_checkout(time.perf_counter() - started)
+
+    engine.raw_connection = timed_raw_connection
+
+
+def _remember(entry: dict) -> None:
+    with _history_lock:
+        _history.append(entry)
+
+
+def recent_requests(order_by: str = "query_count") -> list[dict]:
+    """Requests seen by this worker, most expensive first."""
+    with _history_lock:
+        entries = list(_history)
+    return sorted(entries, key=lambda item: item.get(order_by) or 0, reverse=True)
+
+
+def clear_recent_requests() -> None:
+    with _history_lock:
+        _history.clear()
+
+
+class QueryDiagnosticsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path.startswith("/static/"):
+            return await call_next(request)
+
+        with collect_queries(f"{request.method} {request.url.path}") as stats:
+            started = time.perf_counter()
+            response = await call_next(request)
+            elapsed = time.perf_counter() - started
+
+        response.headers["Server-Timing"] = f"{stats.server_timing()}, app;dur={elapsed * 1000:.1f}"
+        if not stats.query_count:
+            return response
+
+        entry = stats.as_dict()
+        entry.update({"status": response.status_code, "total_ms": round(elapsed * 1000, 2), "at": time.time()})
+        _remember(entry)
+
+        worst = stats.duplicates(DUPLICATE_THRESHOLD)
+        if worst:
+            sql, count = worst[0]
+            logger.warning(
+                "Possible N+1 in %s: %s identical statements (%s queries, %.1f ms DB): %s",
+                stats.label, count, stats.query_count, stats.db_seconds * 1000, sql[:300],
+            )
+        return response
@@ -0,0 +1,155 @@
+"""Schema readiness registry for the legacy runtime "ensure schema" steps.
+
+Several modules used to run ``CREATE TABLE ... checkfirst`` and long lists of
+``ALTER TABLE ... IF NOT EXISTS`` from request handlers, once per worker. The
+steps are now applied at deploy time by ``alembic upgrade head`` (see
+``alembic/env.py``) and recorded with their version in ``schema_ensure_steps``.
+At runtime a worker reads that table once and every later check is an
+in-memory set lookup. A step that is missing or recorded at an older version
+falls back to the old behaviour: it is applied from the request and recorded.
+"""
+import importlib
+import logging
+import threading
+import time
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_STEP_TABLE = "schema_ensure_steps"
+
+# name -> (version, "module:function"). Bump the version whenever a step's DDL
+# changes so the next deploy re-applies it. Order matters: later steps may
+# depend on tables or columns created by earlier ones.
+SCHEMA_STEPS = {
+    "bill_accounting": (1, "app.services.bill_accounting:apply_bill_accounting_schema"),
+    "operational_vouchers": (1, "app.services.operational_vouchers:apply_operational_voucher_schema"),
+    "contractor_payments": (1, "app.routers.bills.contractor_bills:apply_contractor_payment_schema"),
+    "salary_payment_logs": (1, "app.routers.bills.salaries:apply_salary_payment_log_schema"),
+    "general_stock_accounting": (1, "app.routers.general_stock.general_stock_entry:apply_general_stock_accounting_schema"),
+    "table_registrations": (1, "app.routers.processing.peeling:apply_table_registrations_schema"),
+    "kg_basis_workers": (1, "app.routers.attendance.labour_management:apply_kg_worker_schema"),
+    "crm_quotation": (1, "app.routers.crm_quotation_router:apply_crm_quotation_schema"),
+    "export_documents": (1, "app.routers.export_documents.common:apply_export_document_schema"),
+}
+
+_ready: set[str] = set()
+_recorded_versions: dict[str, int] | None = None
+_lock = threading.RLock()
+
+
+def _step_function(name: str):
+    module_name, function_name = SCHEMA_STEPS[name][1].split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _load_recorded_versions(db: Session) -> dict[str, int]:
+    from app.database.models.system_settings import SchemaEnsureStep
+    try:
+        with db.begin_nested():
+            rows = db.query(SchemaEnsureStep.name, SchemaEnsureStep.version).all()
+        return {name: int(version or 0) for name, version in rows}
+    except Exception as exc:
+        logger.info("Schema readiness table unavailable, using runtime ensure steps: %s", exc)
+        return {}
+
+
+def _record_step(db: Session, name: str) -> None:
+    from app.database.models.system_settings import SchemaEnsureStep
+    try:
+        with db.begin_nested():
+            db.merge(SchemaEnsureStep(name=name, version=SCHEMA_STEPS[name][0]))
+    except Exception as exc:
+        logger.info("Could not record schema step %s: %s", name, exc)
+
+
+def load_schema_readiness(db: Session) -> set[str]:
+    """Mark every step recorded at its current version as ready (one query)."""
+    global _recorded_versions
+    with _lock:
+        if _recorded_versions is None:
+            _recorded_versions = _load_recorded_versions(db)
+        for name, (version, _) in SCHEMA_STEPS.items():
+            if _recorded_versions.get(name, 0) >= version:
+                _ready.add(name)
+        return set(_ready)
+
+
+def is_schema_step_ready(name: str) -> bool:
+    return name in _ready
+
+
+def ensure_schema_step(db: Session, name: str, commit: bool = False) -> bool:
+    """Return True once ``name`` is applied; hot path is a set lookup.
+
+    The fallback runs the step inside a savepoint of the caller's session, so a
+    failing step does not poison the request transaction. ``commit`` keeps the
+    behaviour of the legacy helpers that committed their DDL immediately.
+    """
+    if name in _ready:
+        return True
+
+    with _lock:
+        if name in _ready:
+            return True
+        load_schema_readiness(db)
+        if name in _ready:
+            return True
+
+        try:
+            with db.begin_nested():
+                _step_function(name)(db)
+        except Exception as exc:
+            logger.warning("Schema step %s failed: %s", name, exc)
+            return False
+        _record_step(db, name)
+        if commit:
+            db.commit()
+        _ready.add(name)
+        return True
+
+
+def apply_schema_steps(connection) -> dict[str, str]:
+    """Apply pending ensure steps on a migration connection and record them.
+
+    Each step runs in its own savepoint so one failing step leaves the others
+    (and the surrounding Alembic transaction) intact; it will then be retried
+    lazily by the first request that needs it.
+    """
+    from app.database.models.system_settings import SchemaEnsureStep
+
+    if SCHEMA_STEP_TABLE not in inspect(connection).get_table_names():
+        return {}
+
+    results = {}
+    db = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        recorded = {row.name: int(row.version or 0) for row in db.query(SchemaEnsureStep).all()}
+        for name, (version, _) in SCHEMA_STEPS.items():
+            if recorded.get(name, 0) >= version:
+                results[name] = "current"
+                continue
+            started = time.perf_counter()
+            try:
+                with db.begin_nested():
+                    _step_function(name)(db)
+                    db.merge(SchemaEnsureStep(name=name, version=version))
+                db.commit()
+                results[name] = f"applied in {time.perf_counter() - started:.2f}s"
+            except Exception as exc:
+                db.rollback()
+                results[name] = f"failed: {exc}"
+                logger.warning("Schema step %s failed during migration: %s", name, exc)
+    finally:
+        db.close()
+    return results
+
+
+def reset_schema_readiness() -> None:
+    """Forget cached readiness so the next check re-reads the version table."""
+    global _recorded_versions
+    with _lock:
+        _ready.clear()
+        _recorded_versions = None
@@ -0,0 +1,436 @@
+"""Per-tenant global search for the menu command palette.
+
+``/menu/search_entities`` used to run a leading-wildcard ``ILIKE`` over
+buyers, suppliers, sales_dispatch and gate_entry on every keystroke, which
+no B-tree index can serve. ``search_documents`` now holds one lower-cased
+document per searchable record of every ``SOURCES`` entity:
+
+* ``install_search_index_tracking`` rewrites a record's document from every
+  ORM flush that adds, edits or deletes it (see ``derived_tables``).
+* ``rebuild_search_index`` re-reads a company's sources after writes that
+  bypass the ORM (bulk imports, SQL fixes).
+* ``search`` answers from one ranked query. On PostgreSQL with ``pg_trgm``
+  the GIN trigram index serves the ``LIKE '%term%'`` filters and
+  ``similarity()`` breaks ties. ``SEARCH_BUDGET_MS`` caps the statement time,
+  and when the budget is exceeded the search returns no records instead of
+  blocking the palette. Other databases rank the candidates in process, and
+  without the table the sources are scanned directly.
+
+A company's documents are built by the ``derived_table_backfill`` job (or
+``rebuild_search_index``); until then its searches scan the sources.
+"""
+import logging
+import os
+import re
+import time
+import weakref
+from dataclasses import dataclass
+from datetime import datetime
+from difflib import SequenceMatcher
+from functools import lru_cache
+from importlib import import_module
+from types import SimpleNamespace
+from typing import Callable
+
+from sqlalchemy import and_, case, func, literal, or_, select
+from sqlalchemy.exc import OperationalError
+
+from app.services.derived_tables import (
+    DerivedTable,
+    build_company,
+    company_built,
+    dialect_insert,
+    install_derived_table_tracking,
+    register_derived_table,
+    reset_ready_cache,
+    tables_ready,
+)
+from app.services.metrics import inc, observe
+
+logger = logging.getLogger(__name__)
+
+SEARCH_RESULT_LIMIT = 12
+SEARCH_BUDGET_MS = int(os.getenv("SEARCH_BUDGET_MS", "250"))
+MIN_QUERY_LENGTH = 2
+
+DERIVED_TABLE = "search_index"
+
+_trigram_binds: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _dash(value) -> str:
+    return str(value) if value not in (None, "") else "--"
+
+
+@dataclass(frozen=True)
+class SearchSource:
+    model: str                      # "module:Class"
+    fields: tuple[str, ...]         # attributes folded into the search text
+    title: Callable
+    subtitle: Callable
+    route: str
+    icon: str
+    active: Callable = lambda row: True
+
+
+# entity_type -> source. Order is the tie-break between equally ranked hits.
+SOURCES = {
+    "buyer": SearchSource(
+        "app.database.models.criteria:buyers", ("buyer_name", "country"),
+        lambda r: r.buyer_name, lambda r: "Customer Master", "/criteria/buyers", "fa-users",
+        lambda r: bool(r.buyer_name),
+    ),
+    "supplier": SearchSource(
+        "app.database.models.criteria:suppliers", ("supplier_name", "phone"),
+        lambda r: r.supplier_name, lambda r: "Supplier Master", "/criteria/suppliers", "fa-truck-field",
+        lambda r: bool(r.supplier_name),
+    ),
+    "invoice": SearchSource(
+        "app.database.models.inventory_management:sales_dispatch", ("invoice_no", "po_number", "buyer_name"),
+        lambda r: f"Inv #{r.invoice_no}" if r.invoice_no else f"PO {r.po_number}",
+        lambda r: f"PO: {_dash(r.po_number)} | Buyer: {_dash(r.buyer_name)}",
+        "/inventory/sales_report", "fa-file-invoice",
+        lambda r: bool(r.invoice_no or r.po_number),
+    ),
+    "batch": SearchSource(
+        "app.database.models.processing:GateEntry", ("batch_number", "vehicle_number", "supplier_name"),
+        lambda r: f"Batch #{r.batch_number}",
+        lambda r: f"Vehicle: {_dash(r.vehicle_number)} | Supplier: {_dash(r.supplier_name)}",
+        "/summary/processing", "fa-truck-ramp-box",
+        lambda r: bool(r.batch_number) and not r.is_cancelled,
+    ),
+    "employee": SearchSource(
+        "app.database.models.attendance:EmployeeRegistration",
+        ("employee_id", "employee_name", "designation", "department", "mobile"),
+        lambda r: f"{r.employee_name} ({r.employee_id})",
+        lambda r: f"{_dash(r.designation)} | {_dash(r.department)}",
+        "/attendance/employee/register", "fa-id-badge",
+        lambda r: bool(r.employee_name),
+    ),
+    "quotation": SearchSource(
+        "app.database.models.crm_quotation:CRMQuotation", ("quotation_no", "customer_name", "po_number"),
+        lambda r: f"Quotation {r.quotation_no}",
+        lambda r: f"Customer: {_dash(r.customer_name)} | {_dash(r.status)}",
+        "/crm/quotation/entry", "fa-file-signature",
+        lambda r: bool(r.quotation_no) and not r.is_cancelled,
+    ),
+    "container": SearchSource(
+        "app.database.models.invoices:ContainerStuffing", ("container_no", "seal_no", "invoice_no", "po_number", "buyer_name"),
+        lambda r: f"Container {r.container_no}",
+        lambda r: f"Invoice: {_dash(r.invoice_no)} | Buyer: {_dash(r.buyer_name)}",
+        "/export_documents/container_stuffing/entry", "fa-box",
+        lambda r: bool(r.container_no) and not r.is_cancelled,
+    ),
+    "voucher": SearchSource(
+        "app.database.models.enterprise_finance:VoucherHeader", ("voucher_no", "reference_no", "narration"),
+        lambda r: f"Voucher {r.voucher_no}",
+        lambda r: f"{_dash(r.voucher_date)} | Ref: {_dash(r.reference_no)}",
+        "/finance_accounts/journal_entry/entry", "fa-book",
+        lambda r: bool(r.voucher_no) and str(r.status or "").upper() != "CANCELLED",
+    ),
+}
+
+
+def _model(source: SearchSource):
+    module_name, class_name = source.model.split(":")
+    return getattr(import_module(module_name), class_name)
+
+
+@lru_cache(maxsize=1)
+def _sources_by_table() -> dict:
+    return {_model(source).__tablename__: (entity_type, source) for entity_type, source in SOURCES.items()}
+
+
+def normalize(value) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+
+def _document_table():
+    from app.database.models.search_index import SearchDocument
+
+    return SearchDocument.__table__
+
+
+def _table_ready(connection) -> bool:
+    return tables_ready(connection, DERIVED_TABLE)
+
+
+def _trigram_ready(connection) -> bool:
+    engine = connection.engine
+    if engine not in _trigram_binds:
+        _trigram_binds[engine] = connection.dialect.name == "postgresql" and bool(connection.exec_driver_sql(
+            "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+        ).first())
+    return _trigram_binds[engine]
+
+
+def _document(entity_type: str, source: SearchSource, row) -> dict | None:
+    company_id = getattr(row, "company_id", None)
+    if not company_id or getattr(row, "id", None) is None or not source.active(row):
+        return None
+    title = str(source.title(row))[:255]
+    parts = [title] + [getattr(row, name, None) for name in source.fields]
+    return {
+        "company_id": str(company_id),
+        "entity_type": entity_type,
+        "entity_id": int(row.id),
+        "title": title,
+        "subtitle": str(source.subtitle(row))[:500],
+        "title_key": normalize(title),
+        "search_text": normalize(" ".join(str(part) for part in parts if part not in (None, ""))),
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def _scan_company(connection, company_id: str):
+    for entity_type, source in SOURCES.items():
+        table = _model(source).__table__
+        rows = connection.execution_options(yield_per=1000).execute(
+            select(table).where(table.c.company_id == company_id)
+        )
+        for row in rows:
+            document = _document(entity_type, source, SimpleNamespace(**row._mapping))
+            if document:
+                yield document
+
+
+def _companies(connection) -> set:
+    companies = set()
+    for source in SOURCES.values():
+        table = _model(source).__table__
+        companies.update(connection.execute(select(table.c.company_id).distinct()).scalars())
+    return companies
+
+
+def _write_documents(connection, rows: list[dict]) -> None:
+    """Insert ``rows``, replacing any stored document of the same record."""
+    table = _document_table()
+    insert = dialect_insert(connection)
+    if insert is None:
+        connection.execute(
+            table.delete().where(or_(*(
+                and_(table.c.entity_type == row["entity_type"], table.c.entity_id == row["entity_id"]) for row in rows
+            )))
+        )
+        connection.execute(table.insert(), rows)
+        return
+    stmt = insert(table)
+    columns = [name for name in rows[0] if name not in ("entity_type", "entity_id")]
+    connection.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.entity_type, table.c.entity_id],
+            set_={name: stmt.excluded[name] for name in columns},
+        ),
+        rows,
+    )
+
+
+def _store_company(connection, company_id: str) -> int:
+    table = _document_table()
+    connection.execute(table.delete().where(table.c.company_id == company_id))
+    count, batch = 0, []
+    for document in _scan_company(connection, company_id):
+        batch.append(document)
+        if len(batch) >= 1000:
+            _write_documents(connection, batch)
+            count, batch = count + len(batch), []
+    if batch:
+        _write_documents(connection, batch)
+        count += len(batch)
+    return count
+
+
+def rebuild_search_index(db, company_id: str) -> int:
+    """Re-index one company's records in the caller's transaction (commit
+    afterwards); returns the number of documents."""
+    connection = db.connection()
+    if not _table_ready(connection):
+        return 0
+    return build_company(connection, DERIVED_TABLE, company_id)
+
+
+def _score(title_key: str, search_text: str, needle: str) -> int:
+    if title_key == needle:
+        return 4
+    if title_key.startswith(needle):
+        return 3
+    if search_text.startswith(needle) or f" {needle}" in search_text:
+        return 2
+    return 1
+
+
+def _result(entity_type: str, title: str, subtitle: str | None) -> dict:
+    source = SOURCES[entity_type]
+    return {"title": title, "desc": subtitle or "", "icon": source.icon, "route": source.route, "type": entity_type}
+
+
+def _collect(hits, limit: int) -> list[dict]:
+    """First ``limit`` hits, dropping repeats (one invoice has many dispatch lines)."""
+    seen, results = set(), []
+    for entity_type, title, subtitle in hits:
+        if (entity_type, title) in seen:
+            continue
+        seen.add((entity_type, title))
+        results.append(_result(entity_type, title, subtitle))
+        if len(results) >= limit:
+            break
+    return results
+
+
+def _rank_in_process(candidates, needle: str):
+    order = list(SOURCES)
+    return sorted(
+        candidates,
+        key=lambda hit: (
+            -_score(hit["title_key"], hit["search_text"], needle),
+            -SequenceMatcher(None, needle, hit["title_key"]).ratio(),
+            order.index(hit["entity_type"]),
+            hit["title_key"],
+        ),
+    )
+
+
+def _scan_sources(db, company_id: str, needle: str, limit: int) -> list[dict]:
+    """No index table: match each source directly and rank here."""
+    candidates = []
+    tokens = needle.split()
+    for entity_type, source in SOURCES.items():
+        model = _model(source)
+        columns = [getattr(model, name) for name in source.fields]
+        criteria = [or_(*(column.ilike(f"%{token}%") for column in columns)) for token in tokens]
+        for row in db.query(model).filter(model.company_id == company_id, *criteria).limit(limit * 3):
+            document = _document(entity_type, source, row)
+            if document and all(token in document["search_text"] for token in tokens):
+                candidates.append(document)
+    ranked = _rank_in_process(candidates, needle)
+    return _collect(((hit["entity_type"], hit["title"], hit["subtitle"]) for hit in ranked), limit)
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search(db, company_id: str, query: str, limit: int = SEARCH_RESULT_LIMIT) -> list[dict]:
+    """Ranked ``{"title", "desc", "icon", "route", "type"}`` hits for ``query``.
+
+    Every whitespace-separated term must occur in the record. Exact and
+    prefix title matches rank first, then word-prefix matches, then the rest.
+    """
+    needle = normalize(query)
+    if not company_id or len(needle) < MIN_QUERY_LENGTH:
+        return []
+
+    started = time.perf_counter()
+    connection = db.connection()
+    if not _table_ready(connection) or not company_built(connection, DERIVED_TABLE, company_id):
+        results = _scan_sources(db, company_id, needle, limit)
+        observe("bknr_search_seconds", time.perf_counter() - started, backend="scan")
+        return results
+
+    table = _document_table()
+    escaped = _escape_like(needle)
+    rank = case(
+        (table.c.title_key == needle, 4),
+        (table.c.title_key.like(f"{escaped}%", escape="\\"), 3),
+        (or_(
+            table.c.search_text.like(f"{escaped}%", escape="\\"),
+            table.c.search_text.like(f"% {escaped}%", escape="\\"),
+        ), 2),
+        else_=1,
+    )
+    trigram = _trigram_ready(connection)
+    similarity = func.similarity(table.c.search_text, needle) if trigram else literal(0)
+    candidates = limit * 3
+    stmt = (
+        select(table.c.entity_type, table.c.title, table.c.subtitle, table.c.title_key, table.c.search_text)
+        .where(
+            table.c.company_id == company_id,
+            and_(*(table.c.search_text.like(f"%{_escape_like(token)}%", escape="\\") for token in needle.split())),
+        )
+        .order_by(rank.desc(), similarity.desc(), table.c.updated_at.desc(), table.c.id.desc())
+        .limit(candidates)
+    )
+
+    backend = "trigram" if trigram else "table"
+    if connection.dialect.name == "postgresql":
+        savepoint = db.begin_nested()
+        try:
+            # Local to the savepoint, which is rolled back below either way.
+            db.execute(select(func.set_config("statement_timeout", f"{SEARCH_BUDGET_MS}ms", True)))
+            rows = db.execute(stmt).all()
+        except OperationalError as exc:
+            rows = None
+            logger.warning("Search for %r in %s exceeded %s ms: %s", needle, company_id, SEARCH_BUDGET_MS, exc)
+        finally:
+            savepoint.rollback()
+        if rows is None:
+            inc("bknr_search_timeouts_total")
+            observe("bknr_search_seconds", time.perf_counter() - started, backend=backend)
+            return []
+        hits = [(row.entity_type, row.title, row.subtitle) for row in rows]
+    else:
+        rows = [dict(row._mapping) for row in db.execute(stmt)]
+        hits = [(row["entity_type"], row["title"], row["subtitle"]) for row in _rank_in_process(rows, needle)]
+
+    results = _collect(hits, limit)
+    observe("bknr_search_seconds", time.perf_counter() - started, backend=backend)
+    return results
+
+
+def _collect_changes(session) -> tuple[list[dict], dict] | None:
+    """``(documents to write, {entity_type: ids to clear})`` for this flush, ``None`` when nothing changed."""
+    tables = _sources_by_table()
+    documents, cleared = [], {}
+
+    def touch(obj, keep: bool):
+        entity_type, source = tables[obj.__tablename__]
+        entity_id = getattr(obj, "id", None)
+        if entity_id is None:
+            return
+        cleared.setdefault(entity_type, set()).add(int(entity_id))
+        document = _document(entity_type, source, obj) if keep else None
+        if document:
+            documents.append(document)
+
+    for obj in session.new:
+        if getattr(obj, "__tablename__", None) in tables:
+            touch(obj, True)
+    for obj in session.dirty:
+        if getattr(obj, "__tablename__", None) in tables and session.is_modified(obj, include_collections=False):
+            touch(obj, True)
+    for obj in session.deleted:
+        if getattr(obj, "__tablename__", None) in tables:
+            touch(obj, False)
+    return (documents, cleared) if cleared else None
+
+
+def _apply_changes(connection, changes: tuple[list[dict], dict]) -> None:
+    documents, cleared = changes
+    table = _document_table()
+    for entity_type, ids in cleared.items():
+        connection.execute(table.delete().where(table.c.entity_type == entity_type, table.c.entity_id.in_(sorted(ids))))
+    if documents:
+        _write_documents(connection, documents)
+
+
+def install_search_index_tracking(session_factory) -> None:
+    """Keep ``search_documents`` in step with source writes made through ``session_factory``."""
+    install_derived_table_tracking(session_factory, DERIVED_TABLE)
+
+
+def reset_search_index_cache() -> None:
+    reset_ready_cache(DERIVED_TABLE)
+    _trigram_binds.clear()
+
+
+# rebuild_search_index re-reads the sources after a skipped update.
+register_derived_table(DerivedTable(
+    name=DERIVED_TABLE,
+    label="Search index update",
+    sources=_sources_by_table,
+    tables=lambda: (_document_table(),),
+    collect=_collect_changes,
+    apply=_apply_changes,
+    companies=_companies,
+    build_company=_store_company,
+))
@@ -0,0 +1,482 @@
+"""FIFO storage layers and month-end closings for cold-storage billing.
+
+The storage cost report used to load every ``stock_entry`` row up to the
+billing date and replay FIFO consumption from the first movement of each
+batch/freezer/glaze/grade/variety/packing-style combo on every view. This
+module keeps that replay's result in three tables
+(``app.database.models.storage_fifo``):
+
+* ``storage_fifo_layers``: one row per IN movement with the cartons still
+  held and the date the layer ran out.
+* ``storage_fifo_consumptions``: the cartons each OUT movement took from
+  each layer, so dispatches of any month can be billed.
+* ``storage_combo_closings``: per combo, production_for/production_at and
+  month with movements, the opening, IN, OUT and closing cartons.
+
+``install_fifo_tracking`` re-derives only the combos touched by an ORM flush
+of ``stock_entry`` rows (see ``derived_tables``). ``rebuild_storage_fifo`` (also run by
+``scripts/rebuild_storage_fifo.py``) regenerates a company's history after
+writes that bypass the ORM. The ``derived_table_backfill`` job builds each
+company once; until then ``billing_state`` replays its movements in memory,
+since the combos refreshed by flushes alone miss the untouched ones.
+``billing_state`` reads one month: the previous closing, the month's
+movements and the layers still open at its start.
+"""
+import hashlib
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import inspect, or_, select
+
+from app.services.derived_tables import (
+    DerivedTable,
+    build_company,
+    company_built,
+    install_derived_table_tracking,
+    register_derived_table,
+    reset_ready_cache,
+    tables_ready,
+)
+
+logger = logging.getLogger(__name__)
+
+COMBO_FIELDS = ("batch_number", "freezer", "glaze", "grade", "variety", "packing_style")
+# stock_entry attributes the layers and closings are derived from.
+TRACKED_FIELDS = COMBO_FIELDS + (
+    "company_id", "date", "cargo_movement_type", "no_of_mc", "quantity",
+    "production_for", "production_at", "species", "brand",
+)
+
+DERIVED_TABLE = "storage_fifo"
+
+
+def _as_date(value) -> date | None:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if value:
+        try:
+            return date.fromisoformat(str(value)[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def combo_values(row) -> tuple[str, ...]:
+    """The combo a movement belongs to; ``None`` and "" are the same value."""
+    return tuple("" if getattr(row, name, None) is None else str(getattr(row, name)) for name in COMBO_FIELDS)
+
+
+def combo_key(values: tuple[str, ...]) -> str:
+    return hashlib.sha1("\x1f".join(values).encode("utf-8")).hexdigest()
+
+
+def _tables():
+    from app.database.models.storage_fifo import StorageComboClosing, StorageFifoConsumption, StorageFifoLayer
+
+    return StorageFifoLayer.__table__, StorageFifoConsumption.__table__, StorageComboClosing.__table__
+
+
+def _stock_table():
+    from app.database.models.inventory_management import stock_entry
+
+    return stock_entry.__table__
+
+
+def _table_ready(connection) -> bool:
+    return tables_ready(connection, DERIVED_TABLE)
+
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+
+def replay_movements(movements) -> tuple[list[dict], list[dict]]:
+    """FIFO layers and monthly closings of one combo.
+
+    ``movements`` are that combo's ``stock_entry`` rows ordered by date and
+    id. Anything other than an IN movement consumes the oldest layers first;
+    closings count every movement, including OUTs beyond the stock held.
+    """
+    layers: list[dict] = []
+    groups: dict = {}
+    for row in movements:
+        day = _as_date(row.date)
+        if day is None:
+            continue
+        qty_mc = int(row.no_of_mc or 0)
+        group = groups.setdefault(
+            (row.production_for, row.production_at),
+            {"first": row, "first_date": day, "months": {}},
+        )
+        month = group["months"].setdefault(day.replace(day=1), {"in_mc": 0, "in_qty": 0.0, "out_mc": 0})
+
+        if row.cargo_movement_type == "IN":
+            qty_kg = float(row.quantity or 0)
+            layers.append({
+                "stock_entry_id": row.id,
+                "sequence": len(layers),
+                "in_date": day,
+                "qty_received": qty_mc,
+                "quantity_kg": qty_kg,
+                "remaining_mc": qty_mc,
+                "depleted_on": None if qty_mc > 0 else day,
+                "consumptions": [],
+            })
+            month["in_mc"] += qty_mc
+            month["in_qty"] += qty_kg
+            continue
+
+        month["out_mc"] += qty_mc
+        pending = qty_mc
+        for layer in layers:
+            if pending <= 0:
+                break
+            take = min(layer["remaining_mc"], pending)
+            if take > 0:
+                layer["remaining_mc"] -= take
+                pending -= take
+                layer["consumptions"].append({"stock_entry_id": row.id, "out_date": day, "mc_taken": take})
+                if layer["remaining_mc"] == 0:
+                    layer["depleted_on"] = day
+
+    closings: list[dict] = []
+    for (production_for, production_at), group in groups.items():
+        first = group["first"]
+        months = sorted(group["months"])
+        balance = 0
+        for index, month in enumerate(months):
+            stats = group["months"][month]
+            closing = balance + stats["in_mc"] - stats["out_mc"]
+            closings.append({
+                "production_for": production_for,
+                "production_at": production_at,
+                "species": first.species,
+                "brand": first.brand,
+                "period_month": month,
+                "next_period_month": months[index + 1] if index + 1 < len(months) else None,
+                "opening_mc": balance,
+                "in_mc": stats["in_mc"],
+                "in_qty": stats["in_qty"],
+                "out_mc": stats["out_mc"],
+                "closing_mc": closing,
+                "first_entry_id": first.id,
+                "first_movement_date": group["first_date"],
+            })
+            balance = closing
+    return layers, closings
+
+
+def _movement_query(stock, company_id: str):
+    columns = [stock.c[name] for name in ("id", "date", "cargo_movement_type", "no_of_mc", "quantity",
+                                           "production_for", "production_at", "species", "brand")]
+    columns += [stock.c[name] for name in COMBO_FIELDS]
+    return select(*columns).where(stock.c.company_id == company_id)
+
+
+def _combo_filter(stock, values: tuple[str, ...]):
+    conditions = []
+    for name, value in zip(COMBO_FIELDS, values):
+        column = stock.c[name]
+        conditions.append(or_(column == "", column.is_(None)) if value == "" else column == value)
+    return conditions
+
+
+def _delete_combo(connection, company_id: str, key: str | None = None) -> None:
+    layers, consumptions, closings = _tables()
+    layer_ids = select(layers.c.id).where(layers.c.company_id == company_id)
+    if key is not None:
+        layer_ids = layer_ids.where(layers.c.combo_key == key)
+    connection.execute(consumptions.delete().where(consumptions.c.layer_id.in_(layer_ids)))
+    for table in (layers, closings):
+        statement = table.delete().where(table.c.company_id == company_id)
+        if key is not None:
+            statement = statement.where(table.c.combo_key == key)
+        connection.execute(statement)
+
+
+def _store_combo(connection, company_id: str, values: tuple[str, ...], movements) -> None:
+    layers_table, consumptions_table, closings_table = _tables()
+    key = combo_key(values)
+    combo = {"company_id": company_id, "combo_key": key, **dict(zip(COMBO_FIELDS, values))}
+    layers, closings = replay_movements(movements)
+
+    consumptions = []
+    for layer in layers:
+        row = {name: value for name, value in layer.items() if name != "consumptions"}
+        layer_id = connection.execute(layers_table.insert().values(**combo, **row)).inserted_primary_key[0]
+        consumptions.extend({"company_id": company_id, "layer_id": layer_id, **taken} for taken in layer["consumptions"])
+    if consumptions:
+        connection.execute(consumptions_table.insert(), consumptions)
+    if closings:
+        connection.execute(closings_table.insert(), [{**combo, **closing} for closing in closings])
+
+
+def refresh_combos(connection, company_id: str, combos) -> int:
+    """Re-derive the layers and closings of ``combos`` (tuples of
+    ``COMBO_FIELDS`` values) from their ``stock_entry`` rows."""
+    stock = _stock_table()
+    count = 0
+    for values in combos:
+        movements = connection.execute(
+            _movement_query(stock, company_id)
+            .where(*_combo_filter(stock, values))
+            .order_by(stock.c.date.asc(), stock.c.id.asc())
+        ).all()
+        _delete_combo(connection, company_id, combo_key(values))
+        _store_combo(connection, company_id, values, movements)
+        count += 1
+    return count
+
+
+def _company_movements(connection, company_id: str) -> dict:
+    stock = _stock_table()
+    grouped: dict = defaultdict(list)
+    rows = connection.execute(
+        _movement_query(stock, company_id).order_by(stock.c.date.asc(), stock.c.id.asc())
+    ).all()
+    for row in rows:
+        grouped[combo_values(row)].append(row)
+    return grouped
+
+
+def rebuild_storage_fifo(db, company_id: str) -> int:
+    """Regenerate one company's layers and closings from its full stock
+    history in the caller's transaction (commit afterwards); returns the
+    number of combos."""
+    connection = db.connection()
+    if not _table_ready(connection):
+        return len(_company_movements(connection, company_id))
+    return build_company(connection, DERIVED_TABLE, company_id)
+
+
+def _store_company(connection, company_id: str) -> int:
+    grouped = _company_movements(connection, company_id)
+    _delete_combo(connection, company_id)
+    for values, movements in grouped.items():
+        _store_combo(connection, company_id, values, movements)
+    return len(grouped)
+
+
+def _companies(connection) -> set:
+    stock = _stock_table()
+    return set(connection.execute(select(stock.c.company_id).distinct()).scalars())
+
+
+# ---------------------------------------------------------------------------
+# Billing reads
+# ---------------------------------------------------------------------------
+
+def _matches(row, production_for: str, production_at: str, freezer: str) -> bool:
+    return (
+        (not production_for or row["production_for"] == production_for)
+        and (not production_at or row["production_at"] == production_at)
+        and (not freezer or row["freezer"] == freezer)
+    )
+
+
+def _stored_month(connection, company_id: str, start: date, end: date, production_for: str, production_at: str, freezer: str):
+    layers, consumptions, closings = _tables()
+    month = start.replace(day=1)
+
+    closing_query = select(closings).where(
+        closings.c.company_id == company_id,
+        closings.c.period_month <= month,
+        or_(closings.c.next_period_month.is_(None), closings.c.next_period_month > month),
+        or_(closings.c.period_month == month, closings.c.closing_mc != 0),
+    )
+    layer_filter = [
+        layers.c.company_id == company_id,
+        layers.c.in_date <= end,
+        or_(layers.c.depleted_on.is_(None), layers.c.depleted_on >= start),
+    ]
+    if production_for:
+        closing_query = closing_query.where(closings.c.production_for == production_for)
+    if production_at:
+        closing_query = closing_query.where(closings.c.production_at == production_at)
+    if freezer:
+        closing_query = closing_query.where(closings.c.freezer == freezer)
+        layer_filter.append(layers.c.freezer == freezer)
+
+    closing_rows = [dict(row._mapping) for row in connection.execute(closing_query)]
+    layer_rows = [dict(row._mapping) for row in connection.execute(
+        select(layers).where(*layer_filter).order_by(layers.c.combo_key, layers.c.sequence)
+    )]
+    taken_rows = [dict(row._mapping) for row in connection.execute(
+        select(consumptions)
+        .join(layers, layers.c.id == consumptions.c.layer_id)
+        .where(*layer_filter, consumptions.c.out_date <= end)
+    )]
+    return closing_rows, layer_rows, taken_rows
+
+
+def _replayed_month(connection, company_id: str, start: date, end: date):
+    """The same rows as ``_stored_month``, replayed in memory (tables missing)."""
+    month = start.replace(day=1)
+    closing_rows, layer_rows, taken_rows = [], [], []
+    for values, movements in _company_movements(connection, company_id).items():
+        combo = {"combo_key": combo_key(values), **dict(zip(COMBO_FIELDS, values))}
+        layers, closings = replay_movements(movements)
+        for closing in closings:
+            latest = closing["next_period_month"] is None or closing["next_period_month"] > month
+            if closing["period_month"] <= month and latest and (closing["period_month"] == month or closing["closing_mc"] != 0):
+                closing_rows.append({**combo, **closing})
+        for layer in layers:
+            if layer["in_date"] > end or (layer["depleted_on"] is not None and layer["depleted_on"] < start):
+                continue
+            layer_id = (combo["combo_key"], layer["sequence"])
+            layer_rows.append({**combo, **layer, "id": layer_id})
+            taken_rows.extend({**taken, "layer_id": layer_id} for taken in layer["consumptions"] if taken["out_date"] <= end)
+    return closing_rows, layer_rows, taken_rows
+
+
+def billing_state(db, company_id: str, start: date, end: date, production_for: str = "", production_at: str = "", freezer: str = "") -> list[dict]:
+    """Per-combo FIFO state for billing ``start``..``end`` (within one month).
+
+    Each combo carries its opening/IN/OUT cartons for the period, the first
+    movement (``first_entry_id`` / ``earliest_in_date``), ``layers`` held at
+    ``end`` and the ``dispatches`` taken from layers inside the period, in
+    movement order. Combos are ordered by their first movement.
+    """
+    connection = db.connection()
+    if _table_ready(connection) and company_built(connection, DERIVED_TABLE, company_id):
+        closing_rows, layer_rows, taken_rows = _stored_month(
+            connection, company_id, start, end, production_for, production_at, freezer,
+        )
+    else:
+        closing_rows, layer_rows, taken_rows = _replayed_month(connection, company_id, start, end)
+
+    month = start.replace(day=1)
+    combos: dict = {}
+    for row in closing_rows:
+        if not _matches(row, production_for, production_at, freezer):
+            continue
+        active = row["period_month"] == month
+        opening = row["opening_mc"] if active else row["closing_mc"]
+        in_mc = row["in_mc"] if active else 0
+        out_mc = row["out_mc"] if active else 0
+        in_qty = row["in_qty"] if active else 0.0
+        combo = combos.get(row["combo_key"])
+        first = (_as_date(row["first_movement_date"]), row["first_entry_id"] or 0)
+        if combo is None:
+            combo = combos[row["combo_key"]] = {
+                **{name: row[name] for name in COMBO_FIELDS},
+                "opening_mc": 0, "monthly_in_mc": 0, "monthly_out_mc": 0, "monthly_in_qty": 0.0,
+                "_first": None, "layers": [], "dispatches": [],
+            }
+        combo["opening_mc"] += opening
+        combo["monthly_in_mc"] += in_mc
+        combo["monthly_out_mc"] += out_mc
+        combo["monthly_in_qty"] += in_qty
+        if combo["_first"] is None or first < combo["_first"]:
+            combo["_first"] = first
+            combo.update({
+                "species": row["species"], "brand": row["brand"],
+                "production_for": row["production_for"], "production_at": row["production_at"],
+                "first_entry_id": row["first_entry_id"], "earliest_in_date": first[0],
+            })
+
+    combos = {
+        key: combo for key, combo in combos.items()
+        if combo["opening_mc"] or combo["monthly_in_mc"] or combo["monthly_out_mc"]
+    }
+
+    taken_by_layer: dict = defaultdict(list)
+    for taken in taken_rows:
+        taken_by_layer[taken["layer_id"]].append(taken)
+    for layer in sorted(layer_rows, key=lambda row: (row["combo_key"], row["sequence"])):
+        combo = combos.get(layer["combo_key"])
+        if combo is None:
+            continue
+        taken = taken_by_layer.get(layer["id"], [])
+        block = {
+            "date": _as_date(layer["in_date"]),
+            "sequence": layer["sequence"],
+            "qty_received": layer["qty_received"],
+            "quantity_kg": layer["quantity_kg"],
+            "current_qty": layer["qty_received"] - sum(row["mc_taken"] for row in taken),
+        }
+        combo["layers"].append(block)
+        for row in taken:
+            out_date = _as_date(row["out_date"])
+            if out_date >= start:
+                combo["dispatches"].append({"layer": block, "out_date": out_date, "mc_taken": row["mc_taken"],
+                                            "_order": (out_date, row["stock_entry_id"], block["sequence"])})
+
+    ordered = sorted(combos.values(), key=lambda combo: combo["_first"])
+    for combo in ordered:
+        del combo["_first"]
+        combo["dispatches"].sort(key=lambda dispatch: dispatch["_order"])
+        for dispatch in combo["dispatches"]:
+            del dispatch["_order"]
+    return ordered
+
+
+# ---------------------------------------------------------------------------
+# Tracking
+# ---------------------------------------------------------------------------
+
+def _old_and_new(obj) -> tuple[dict, dict, bool]:
+    state = inspect(obj)
+    old, new, changed = {}, {}, False
+    for name in TRACKED_FIELDS:
+        history = state.attrs[name].history
+        current = getattr(obj, name, None)
+        old[name] = history.deleted[0] if history.deleted else current
+        new[name] = current
+        changed = changed or history.has_changes()
+    return old, new, changed
+
+
+def _collect_combos(session) -> set:
+    from types import SimpleNamespace
+
+    touched: set = set()
+
+    def add(values: dict):
+        if values.get("company_id"):
+            touched.add((str(values["company_id"]), combo_values(SimpleNamespace(**values))))
+
+    for obj in list(session.new) + list(session.deleted):
+        if getattr(obj, "__tablename__", None) == "stock_entry":
+            add({name: getattr(obj, name, None) for name in TRACKED_FIELDS})
+    for obj in session.dirty:
+        if getattr(obj, "__tablename__", None) != "stock_entry":
+            continue
+        old, new, changed = _old_and_new(obj)
+        if changed:
+            add(old)
+            add(new)
+    return touched
+
+
+def _refresh_touched(connection, touched: set) -> None:
+    by_company: dict = defaultdict(list)
+    for company_id, values in touched:
+        by_company[company_id].append(values)
+    for company_id, combos in by_company.items():
+        refresh_combos(connection, company_id, combos)
+
+
+def install_fifo_tracking(session_factory) -> None:
+    """Keep the FIFO layers in step with ``stock_entry`` writes made through ``session_factory``."""
+    install_derived_table_tracking(session_factory, DERIVED_TABLE)
+
+
+def reset_fifo_tracking_cache() -> None:
+    reset_ready_cache(DERIVED_TABLE)
+
+
+# rebuild_storage_fifo regenerates the layers after a skipped update.
+register_derived_table(DerivedTable(
+    name=DERIVED_TABLE,
+    label="Storage FIFO layer update",
+    sources=lambda: ("stock_entry",),
+    tables=_tables,
+    collect=_collect_combos,
+    apply=_refresh_touched,
+    companies=_companies,
+    build_company=_store_company,
+))
@@ -1,7 +1,8 @@
 import logging
+from collections import defaultdict
 from datetime import datetime
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, func
 
 from app.database.models.advanced_seafood_erp import (
     PondMaster, HarvestLot, ProductionBatch, ProductionConversion, 
@@ -10,172 +11,223 @@ from app.database.models.advanced_seafood_erp import (
 # Import existing ERP tables to construct the dynamic traceability mapping
 from app.database.models.processing import RawMaterialPurchasing, Production
 from app.database.models.inventory_management import stock_entry, sales_dispatch
+from app.services import lineage
 
 logger = logging.getLogger(__name__)
 
-class TraceabilityWorkflowService:
 
-    # =========================================================================
-    # 1. TRACEABILITY PATH ENGINES
-    # =========================================================================
+def _ids(reached: dict, node_type: str) -> set[int]:
+    return {int(key) for nodes in reached.values() for kind, key in nodes if kind == node_type}
 
-    @staticmethod
-    def trace_lot_forward(db: Session, lot_number: str) -> dict:
-        """
-        Traverses supply chain FORWARD:
-        Farmer Lot -> RM Purchase Batch -> Advanced Production Conversions -> Stock Warehouse -> Shipment Invoice.
-        """
-        result = {
-            "lot_number": lot_number,
-            "source_farmer": None,
-            "purchase_batch": None,
-            "production_batches": [],
-            "warehouse_stocks": [],
-            "shipments": []
+
+def _rows_by_id(db: Session, model, ids, *options) -> list:
+    if not ids:
+        return []
+    return db.query(model).options(*options).filter(model.id.in_(sorted(ids))).order_by(model.id).all()
+
+
+def _group(rows, field: str) -> dict:
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[getattr(row, field)].append(row)
+    return grouped
+
+
+class _LineageRows:
+    """Every row reached from a set of lots, loaded with one query per table."""
+
+    def __init__(self, db: Session, reached: dict):
+        self.harvest = {
+            lot.lot_number: lot
+            for lot in _rows_by_id(db, HarvestLot, _ids(reached, "harvest"), joinedload(HarvestLot.pond))
         }
+        self.purchases = _group(_rows_by_id(db, RawMaterialPurchasing, _ids(reached, "rmp")), "batch_number")
+        batches = _rows_by_id(db, ProductionBatch, _ids(reached, "production"))
+        self.production = _group(batches, "batch_number")
+        conversions = []
+        if batches:
+            conversions = db.query(ProductionConversion).filter(
+                ProductionConversion.batch_id.in_([pb.id for pb in batches])
+            ).order_by(ProductionConversion.id).all()
+        self.conversions = _group(conversions, "batch_id")
+        self.stocks = _group(_rows_by_id(db, stock_entry, _ids(reached, "stock")), "batch_number")
+        self.dispatches = _group(_rows_by_id(db, sales_dispatch, _ids(reached, "dispatch")), "po_number")
+
+
+def _forward_trace(lot_number: str, rows: _LineageRows) -> dict:
+    result = {
+        "lot_number": lot_number,
+        "source_farmer": None,
+        "purchase_batch": None,
+        "production_batches": [],
+        "warehouse_stocks": [],
+        "shipments": []
+    }
+
+    # 1. Resolve Harvest Lot Source
+    lot = rows.harvest.get(lot_number)
+    if not lot:
+        return result
 
-        # 1. Resolve Harvest Lot Source
-        lot = db.query(HarvestLot).filter(HarvestLot.lot_number == lot_number).first()
-        if not lot:
-            return result
-        
-        result["source_farmer"] = {
-            "farmer": lot.pond.farmer_name,
-            "pond_location": lot.pond.pond_location,
-            "mpeda_reg_no": lot.pond.mpeda_reg_no,
-            "quantity_harvested": lot.quantity_harvested
+    result["source_farmer"] = {
+        "farmer": lot.pond.farmer_name,
+        "pond_location": lot.pond.pond_location,
+        "mpeda_reg_no": lot.pond.mpeda_reg_no,
+        "quantity_harvested": lot.quantity_harvested
+    }
+
+    # 2. Raw Material Purchasing records linked to this lot/batch
+    rm = rows.purchases.get(lot_number, [])
+    if rm:
+        result["purchase_batch"] = {
+            "batch_number": lot_number,
+            "species": rm[0].species,
+            "variety": rm[0].variety_name,
+            "received_qty": sum(r.received_qty or 0 for r in rm),
+            "total_cost": sum(r.amount or 0 for r in rm)
         }
 
-        # 2. Resolve Raw Material Purchasing records linked to this lot/batch
-        rm = db.query(RawMaterialPurchasing).filter(
-            RawMaterialPurchasing.batch_number == lot_number
-        ).all()
-        
-        if rm:
-            result["purchase_batch"] = {
-                "batch_number": lot_number,
-                "species": rm[0].species,
-                "variety": rm[0].variety_name,
-                "received_qty": sum(r.received_qty for r in rm),
-                "total_cost": sum(r.amount for r in rm)
-            }
-
-        # 3. Resolve advanced production batches linked to this lot/batch number
-        prod_batches = db.query(ProductionBatch).filter(
-            ProductionBatch.batch_number == lot_number
-        ).all()
-        
-        for pb in prod_batches:
-            conversions = db.query(ProductionConversion).filter(
-                ProductionConversion.batch_id == pb.id
-            ).all()
-            
-            result["production_batches"].append({
-                "batch_number": pb.batch_number,
-                "start_date": pb.start_date.strftime('%Y-%m-%d %H:%M:%S'),
+    # 3. Advanced production batches linked to this lot/batch number
+    for pb in rows.production.get(lot_number, []):
+        result["production_batches"].append({
+            "batch_number": pb.batch_number,
+            "start_date": pb.start_date.strftime('%Y-%m-%d %H:%M:%S') if pb.start_date else None,
+            "yield_percent": pb.yield_percent,
+            "stages": [
+                {
+                    "from": c.from_stage,
+                    "to": c.to_stage,
+                    "input": c.input_weight,
+                    "output": c.output_weight,
+                    "process_loss": c.process_loss
+                } for c in rows.conversions.get(pb.id, [])
+            ]
+        })
+
+    # 4. Current stocks in cold storage warehouse
+    for s in rows.stocks.get(lot_number, []):
+        result["warehouse_stocks"].append({
+            "location": s.location,
+            "brand": s.brand,
+            "packing_style": s.packing_style,
+            "grade": s.grade,
+            "quantity": s.quantity,
+            "no_of_mc": s.no_of_mc
+        })
+
+    # 5. Finalized export shipments (dispatch lines reference the lot as po_number)
+    for d in rows.dispatches.get(lot_number, []):
+        result["shipments"].append({
+            "invoice_no": d.invoice_no,
+            "buyer": d.buyer_name,
+            "country": d.country,
+            "container_no": d.container_no,
+            "amount_usd": d.amount_usd,
+            "exchange_rate": d.exchange_rate
+        })
+
+    return result
+
+
+def _backward_trace(container_no: str, dispatches: list, rows: _LineageRows) -> dict:
+    result = {
+        "container_no": container_no,
+        "shipments": [],
+        "linked_batches": [],
+        "source_farmers": []
+    }
+    if not dispatches:
+        return result
+
+    # 1. Shipments inside the container
+    batch_nos = []
+    for d in dispatches:
+        result["shipments"].append({
+            "invoice_no": d.invoice_no,
+            "buyer": d.buyer_name,
+            "country": d.country,
+            "po_number": d.po_number,
+            "amount_usd": d.amount_usd
+        })
+        if d.po_number and d.po_number not in batch_nos:
+            batch_nos.append(d.po_number)
+
+    for b_no in batch_nos:
+        # 2. Processing batches
+        batches = rows.production.get(b_no)
+        if batches:
+            pb = batches[0]
+            result["linked_batches"].append({
+                "batch_number": b_no,
                 "yield_percent": pb.yield_percent,
                 "stages": [
-                    {
-                        "from": c.from_stage,
-                        "to": c.to_stage,
-                        "input": c.input_weight,
-                        "output": c.output_weight,
-                        "process_loss": c.process_loss
-                    } for c in conversions
+                    {"from": c.from_stage, "to": c.to_stage, "input": c.input_weight, "output": c.output_weight}
+                    for c in rows.conversions.get(pb.id, [])
                 ]
             })
 
-        # 4. Resolve current stocks in cold storage warehouse
-        stocks = db.query(stock_entry).filter(
-            stock_entry.batch_number == lot_number
-        ).all()
-        
-        for s in stocks:
-            result["warehouse_stocks"].append({
-                "location": s.location,
-                "brand": s.brand,
-                "packing_style": s.packing_style,
-                "grade": s.grade,
-                "quantity": s.quantity,
-                "no_of_mc": s.no_of_mc
+        # 3. Supplier / Harvest Lot
+        lot = rows.harvest.get(b_no)
+        if lot:
+            result["source_farmers"].append({
+                "lot_number": b_no,
+                "farmer": lot.pond.farmer_name,
+                "pond_location": lot.pond.pond_location,
+                "mpeda_reg_no": lot.pond.mpeda_reg_no,
+                "harvest_date": lot.harvest_date.strftime('%Y-%m-%d'),
+                "quantity": lot.quantity_harvested
             })
 
-        # 5. Resolve finalized export shipments
-        # Search by lot_number or reference PO in sales dispatch records
-        dispatches = db.query(sales_dispatch).filter(
-            sales_dispatch.po_number == lot_number
-        ).all()
-        
-        for d in dispatches:
-            result["shipments"].append({
-                "invoice_no": d.invoice_no,
-                "buyer": d.buyer_name,
-                "country": d.country,
-                "container_no": d.container_no,
-                "amount_usd": d.amount_usd,
-                "exchange_rate": d.exchange_rate
-            })
+    return result
 
-        return result
+
+class TraceabilityWorkflowService:
+
+    # =========================================================================
+    # 1. TRACEABILITY PATH ENGINES
+    # =========================================================================
+
+    @staticmethod
+    def trace_lot_forward(db: Session, company_id: str, lot_number: str) -> dict:
+        """
+        Traverses supply chain FORWARD:
+        Farmer Lot -> RM Purchase Batch -> Advanced Production Conversions -> Stock Warehouse -> Shipment Invoice.
+        """
+        return TraceabilityWorkflowService.trace_lots_forward(db, company_id, [lot_number])[lot_number]
 
     @staticmethod
-    def trace_container_backward(db: Session, container_no: str) -> dict:
+    def trace_container_backward(db: Session, company_id: str, container_no: str) -> dict:
         """
         Traverses supply chain BACKWARD:
         Container No -> Sales Dispatch Invoices -> Warehouse Stock Entries -> Processing Batches -> RM Purchase Lots -> Source Farmer Pond.
         """
-        result = {
-            "container_no": container_no,
-            "shipments": [],
-            "linked_batches": [],
-            "source_farmers": []
-        }
-
-        # 1. Trace shipments inside the container
-        dispatches = db.query(sales_dispatch).filter(
-            sales_dispatch.container_no == container_no
-        ).all()
-
-        if not dispatches:
-            return result
-
-        batch_nos = set()
+        return TraceabilityWorkflowService.trace_containers_backward(db, company_id, [container_no])[container_no]
 
-        for d in dispatches:
-            result["shipments"].append({
-                "invoice_no": d.invoice_no,
-                "buyer": d.buyer_name,
-                "country": d.country,
-                "po_number": d.po_number,
-                "amount_usd": d.amount_usd
-            })
-            if d.po_number:
-                batch_nos.add(d.po_number)
-
-        # 2. Trace warehouse stock and processing batches
-        for b_no in batch_nos:
-            pb = db.query(ProductionBatch).filter(ProductionBatch.batch_number == b_no).first()
-            if pb:
-                conversions = db.query(ProductionConversion).filter(ProductionConversion.batch_id == pb.id).all()
-                result["linked_batches"].append({
-                    "batch_number": b_no,
-                    "yield_percent": pb.yield_percent,
-                    "stages": [{"from": c.from_stage, "to": c.to_stage, "input": c.input_weight, "output": c.output_weight} for c in conversions]
-                })
-
-            # 3. Trace back to Supplier / Harvest Lot
-            lot = db.query(HarvestLot).filter(HarvestLot.lot_number == b_no).first()
-            if lot:
-                result["source_farmers"].append({
-                    "lot_number": b_no,
-                    "farmer": lot.pond.farmer_name,
-                    "pond_location": lot.pond.pond_location,
-                    "mpeda_reg_no": lot.pond.mpeda_reg_no,
-                    "harvest_date": lot.harvest_date.strftime('%Y-%m-%d'),
-                    "quantity": lot.quantity_harvested
-                })
+    @staticmethod
+    def trace_lots_forward(db: Session, company_id: str, lot_numbers) -> dict:
+        """Forward trace for a set of one company's lots: ``{lot_number: trace}`` from a fixed number of queries."""
+        lot_numbers = list(dict.fromkeys(lot_numbers))
+        rows = _LineageRows(db, lineage.descendants(db, company_id, "lot", lot_numbers))
+        return {lot_number: _forward_trace(lot_number, rows) for lot_number in lot_numbers}
 
-        return result
+    @staticmethod
+    def trace_containers_backward(db: Session, company_id: str, container_nos) -> dict:
+        """Backward trace for a set of one company's containers: ``{container_no: trace}`` from a fixed number of queries."""
+        container_nos = list(dict.fromkeys(container_nos))
+        upstream = lineage.ancestors(db, company_id, "container", container_nos)
+        lots = {key for nodes in upstream.values() for kind, key in nodes if kind == "lot"}
+        reached = lineage.descendants(db, company_id, "lot", lots)
+        # Dispatch lines without a po_number reach the container but no lot.
+        reached["*"] = {node for nodes in upstream.values() for node in nodes if node[0] == "dispatch"}
+        rows = _LineageRows(db, reached)
+        by_container = defaultdict(list)
+        for dispatch_lines in rows.dispatches.values():
+            for d in dispatch_lines:
+                by_container[d.container_no].append(d)
+        return {
+            container_no: _backward_trace(container_no, sorted(by_container.get(container_no, []), key=lambda d: d.id), rows)
+            for container_no in container_nos
+        }
 
     # =========================================================================
     # 2. WORKFLOW APPROVAL STATE MACHINE
@@ -1,6 +1,7 @@
 """Canonical account permission helpers shared by middleware and admin flows."""
 
 import os
+from functools import lru_cache
 
 from app.config import SUPER_ADMIN_EMAILS
 
@@ -33,11 +34,24 @@ def permission_set(value):
     return {normalize_permission(item) for item in raw if str(item or "").strip()}
 
 
+@lru_cache(maxsize=1024)
+def _frozen_permissions(raw):
+    return frozenset(permission_set(list(raw) if isinstance(raw, tuple) else raw))
+
+
+def granted_permissions(value) -> frozenset:
+    """``permission_set`` frozen and cached per distinct session value, so a
+    session's permission string is parsed once rather than on every check."""
+    if isinstance(value, (list, set)):
+        value = tuple(sorted(str(item) for item in value))
+    return _frozen_permissions(value)
+
+
 def has_permission(session, required):
     email = str(session.get("email") or "").strip().lower()
     if is_super_admin(email):
         return True
-    granted = permission_set(session.get("permissions"))
+    granted = granted_permissions(session.get("permissions"))
     if "ALL" in granted:
         return True
     choices = required if isinstance(required, (list, tuple, set)) else (required,)
@@ -206,6 +220,41 @@ ROUTE_PERMISSION_RULES = (
 )
 
 
+def compile_route_rules(rules):
+    """Character trie of rule prefixes plus a map of slash-less exact paths.
+
+    Each trie node that ends a prefix stores the rule's position under the
+    ``None`` key; the lowest position along a path's walk is the first rule
+    the ordered scan would have matched.
+    """
+    trie, exact = {}, {}
+    for index, (prefix, _) in enumerate(rules):
+        node = trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node.setdefault(None, index)
+        exact.setdefault(prefix.rstrip("/"), index)
+    return trie, exact
+
+
+def match_route_rule(normalized, compiled):
+    """Index of the first rule matching ``normalized``, or ``None``."""
+    trie, exact = compiled
+    best = exact.get(normalized)
+    node = trie
+    for char in normalized:
+        node = node.get(char)
+        if node is None:
+            break
+        index = node.get(None)
+        if index is not None and (best is None or index < best):
+            best = index
+    return best
+
+
+_COMPILED_ROUTE_RULES = compile_route_rules(ROUTE_PERMISSION_RULES)
+
+
 def required_permission_for_path(path, method="GET"):
     normalized = str(path or "").rstrip("/") or "/"
     # Master data is shared reference data for assigned operational forms.
@@ -213,7 +262,5 @@ def required_permission_for_path(path, method="GET"):
     # continue through the matching master permission below.
     if normalized.startswith("/criteria/api/") and str(method).upper() == "GET":
         return None
-    for prefix, permission in ROUTE_PERMISSION_RULES:
-        if normalized == prefix.rstrip("/") or normalized.startswith(prefix):
-            return permission
-    return None
+    index = match_route_rule(normalized, _COMPILED_ROUTE_RULES)
+    return None if index is None else ROUTE_PERMISSION_RULES[index][1]
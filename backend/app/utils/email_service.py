@@ -3,8 +3,6 @@ import os
 import smtplib
 from email.message import EmailMessage
 
-import requests
-
 from app.utils.timezone import ist_now
 
 SMTP_EMAIL = os.getenv("SMTP_EMAIL") or os.getenv("BREVO_SENDER_EMAIL") or os.getenv("SUPPORT_EMAIL", "bknr.solutions@gmail.com")
@@ -64,6 +62,8 @@ def send_email(to_email, subject, html, text=None, from_email=None, reply_to=Non
     if BREVO_API_KEY:
         try:
             import base64
+            import requests
+
             payload_data = {
                 "sender": {"name": SENDER_NAME, "email": SMTP_EMAIL or SUPPORT_EMAIL},
                 "to": [{"email": to_email}],
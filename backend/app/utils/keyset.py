@@ -0,0 +1,82 @@
+"""Keyset (seek) pagination for registers listed newest first.
+
+A page is the next ``limit`` rows strictly after the last row of the previous
+page in ``ORDER BY c1 DESC, c2 DESC, ...`` order, so the database walks an
+index instead of counting off an ``OFFSET`` and page cost stays flat however
+long the history gets. The cursor handed to the client is the last row's sort
+key, base64-encoded JSON; it is opaque to the UI and only valid for the same
+ordering.
+"""
+import base64
+import json
+from datetime import date, datetime, time
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    """Cursor that was not issued for this ordering or was tampered with."""
+
+
+def page_limit(value, default: int = DEFAULT_PAGE_SIZE) -> int:
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values) -> str:
+    plain = [value.isoformat() if isinstance(value, (date, datetime, time)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(plain, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def _coerce(column, value):
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is time:
+        return time.fromisoformat(value)
+    return python_type(value)
+
+
+def decode_cursor(token: str, columns) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns) or None in values:
+            raise ValueError("cursor shape does not match ordering")
+        return [_coerce(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor(str(exc)) from exc
+
+
+def _after(columns, values):
+    """Rows sorting after ``values`` in descending order (non-null keys)."""
+    clauses = []
+    for index, column in enumerate(columns):
+        equal = [columns[prior] == values[prior] for prior in range(index)]
+        clauses.append(and_(*equal, column < values[index]))
+    return or_(*clauses)
+
+
+def keyset_page(query, columns, cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE):
+    """Return ``(rows, next_cursor)`` for ``query`` ordered by ``columns`` descending.
+
+    ``columns`` must end with a unique, non-null column (normally the primary
+    key) so the ordering is total. ``next_cursor`` is ``None`` on the last page.
+    Raises ``InvalidCursor`` for a cursor that does not decode against ``columns``.
+    """
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns)))
+    rows = query.order_by(*(column.desc() for column in columns)).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column in columns])
@@ -1,3 +1,4 @@
+from sqlalchemy import literal_column, select, union_all
 from sqlalchemy.orm import Session
 from app.database.models.processing import (
     GateEntry,
@@ -9,168 +10,86 @@ from app.database.models.processing import (
     Production
 )
 
+# Stage name reported to the user -> model, in processing order.
+STAGE_MODELS = {
+    "RawMaterialPurchasing": RawMaterialPurchasing,
+    "DeHeading": DeHeading,
+    "Grading": Grading,
+    "Peeling": Peeling,
+    "Soaking": Soaking,
+    "Production": Production,
+}
+
+# Stages that lock a batch at each screen; the first one found is reported.
+DOWNSTREAM_STAGES = {
+    "gate_entry": ("RawMaterialPurchasing",),
+    "rmp": ("DeHeading", "Grading", "Peeling", "Soaking", "Production"),
+    "deheading": ("Grading", "Peeling", "Soaking", "Production"),
+    "grading": ("Peeling", "Soaking", "Production"),
+    "peeling": ("Soaking", "Production"),
+    "soaking": ("Production",),
+}
+
+BATCH_CHUNK_SIZE = 500
+
+
+def batches_used_downstream(db: Session, company_id: str, batch_numbers, stage: str) -> dict[str, str]:
+    """Map each batch already used after ``stage`` to the first stage using it.
+
+    One ``UNION ALL`` query per ``BATCH_CHUNK_SIZE`` batches, so list views
+    can flag every row they show instead of checking rows one by one.
+    """
+    batches = sorted({str(b) for b in batch_numbers or () if b})
+    if not batches or not company_id:
+        return {}
+
+    stages = DOWNSTREAM_STAGES[stage]
+    used: dict[str, tuple[int, str]] = {}
+    for start in range(0, len(batches), BATCH_CHUNK_SIZE):
+        chunk = batches[start:start + BATCH_CHUNK_SIZE]
+        query = union_all(*(
+            select(literal_column(str(rank)).label("rank"), STAGE_MODELS[name].batch_number.label("batch_number"))
+            .where(
+                STAGE_MODELS[name].batch_number.in_(chunk),
+                STAGE_MODELS[name].company_id == company_id,
+                STAGE_MODELS[name].is_cancelled == False,
+            )
+            .distinct()
+            for rank, name in enumerate(stages)
+        ))
+        for rank, batch_number in db.execute(query):
+            if batch_number not in used or rank < used[batch_number][0]:
+                used[batch_number] = (rank, stages[rank])
+    return {batch_number: name for batch_number, (_, name) in used.items()}
+
+
+def _used_downstream(db: Session, batch_number: str, company_id: str, stage: str) -> tuple[bool, str | None]:
+    if not batch_number or not company_id:
+        return False, None
+    used_in = batches_used_downstream(db, company_id, [batch_number], stage).get(str(batch_number))
+    return used_in is not None, used_in
+
+
 def is_batch_used_in_rmp(db: Session, batch_number: str, company_id: str) -> bool:
     """Check if the batch has moved from Gate Entry to Raw Material Purchasing."""
-    if not batch_number or not company_id:
-        return False
-    exists = db.query(RawMaterialPurchasing.id).filter(
-        RawMaterialPurchasing.batch_number == batch_number,
-        RawMaterialPurchasing.company_id == company_id,
-        RawMaterialPurchasing.is_cancelled == False
-    ).first()
-    return exists is not None
+    return _used_downstream(db, batch_number, company_id, "gate_entry")[0]
 
 def is_batch_used_downstream_from_rmp(db: Session, batch_number: str, company_id: str) -> tuple[bool, str | None]:
     """Check if the RMP batch is used in subsequent stages (DeHeading, Grading, Peeling, Soaking, Production)."""
-    if not batch_number or not company_id:
-        return False, None
-
-    # Check Deheading
-    if db.query(DeHeading.id).filter(
-        DeHeading.batch_number == batch_number,
-        DeHeading.company_id == company_id,
-        DeHeading.is_cancelled == False
-    ).first():
-        return True, "DeHeading"
-
-    # Check Grading
-    if db.query(Grading.id).filter(
-        Grading.batch_number == batch_number,
-        Grading.company_id == company_id,
-        Grading.is_cancelled == False
-    ).first():
-        return True, "Grading"
-
-    # Check Peeling
-    if db.query(Peeling.id).filter(
-        Peeling.batch_number == batch_number,
-        Peeling.company_id == company_id,
-        Peeling.is_cancelled == False
-    ).first():
-        return True, "Peeling"
-
-    # Check Soaking
-    if db.query(Soaking.id).filter(
-        Soaking.batch_number == batch_number,
-        Soaking.company_id == company_id,
-        Soaking.is_cancelled == False
-    ).first():
-        return True, "Soaking"
-
-    # Check Production
-    if db.query(Production.id).filter(
-        Production.batch_number == batch_number,
-        Production.company_id == company_id,
-        Production.is_cancelled == False
-    ).first():
-        return True, "Production"
-
-    return False, None
+    return _used_downstream(db, batch_number, company_id, "rmp")
 
 def is_batch_used_downstream_from_deheading(db: Session, batch_number: str, company_id: str) -> tuple[bool, str | None]:
     """Check if DeHeading batch is used downstream (Grading, Peeling, Soaking, Production)."""
-    if not batch_number or not company_id:
-        return False, None
-
-    # Check Grading
-    if db.query(Grading.id).filter(
-        Grading.batch_number == batch_number,
-        Grading.company_id == company_id,
-        Grading.is_cancelled == False
-    ).first():
-        return True, "Grading"
-
-    # Check Peeling
-    if db.query(Peeling.id).filter(
-        Peeling.batch_number == batch_number,
-        Peeling.company_id == company_id,
-        Peeling.is_cancelled == False
-    ).first():
-        return True, "Peeling"
-
-    # Check Soaking
-    if db.query(Soaking.id).filter(
-        Soaking.batch_number == batch_number,
-        Soaking.company_id == company_id,
-        Soaking.is_cancelled == False
-    ).first():
-        return True, "Soaking"
-
-    # Check Production
-    if db.query(Production.id).filter(
-        Production.batch_number == batch_number,
-        Production.company_id == company_id,
-        Production.is_cancelled == False
-    ).first():
-        return True, "Production"
-
-    return False, None
+    return _used_downstream(db, batch_number, company_id, "deheading")
 
 def is_batch_used_downstream_from_grading(db: Session, batch_number: str, company_id: str) -> tuple[bool, str | None]:
     """Check if Grading batch is used downstream (Peeling, Soaking, Production)."""
-    if not batch_number or not company_id:
-        return False, None
-
-    # Check Peeling
-    if db.query(Peeling.id).filter(
-        Peeling.batch_number == batch_number,
-        Peeling.company_id == company_id,
-        Peeling.is_cancelled == False
-    ).first():
-        return True, "Peeling"
-
-    # Check Soaking
-    if db.query(Soaking.id).filter(
-        Soaking.batch_number == batch_number,
-        Soaking.company_id == company_id,
-        Soaking.is_cancelled == False
-    ).first():
-        return True, "Soaking"
-
-    # Check Production
-    if db.query(Production.id).filter(
-        Production.batch_number == batch_number,
-        Production.company_id == company_id,
-        Production.is_cancelled == False
-    ).first():
-        return True, "Production"
-
-    return False, None
+    return _used_downstream(db, batch_number, company_id, "grading")
 
 def is_batch_used_downstream_from_peeling(db: Session, batch_number: str, company_id: str) -> tuple[bool, str | None]:
     """Check if Peeling batch is used downstream (Soaking, Production)."""
-    if not batch_number or not company_id:
-        return False, None
-
-    # Check Soaking
-    if db.query(Soaking.id).filter(
-        Soaking.batch_number == batch_number,
-        Soaking.company_id == company_id,
-        Soaking.is_cancelled == False
-    ).first():
-        return True, "Soaking"
-
-    # Check Production
-    if db.query(Production.id).filter(
-        Production.batch_number == batch_number,
-        Production.company_id == company_id,
-        Production.is_cancelled == False
-    ).first():
-        return True, "Production"
-
-    return False, None
+    return _used_downstream(db, batch_number, company_id, "peeling")
 
 def is_batch_used_downstream_from_soaking(db: Session, batch_number: str, company_id: str) -> tuple[bool, str | None]:
     """Check if Soaking batch is used downstream (Production)."""
-    if not batch_number or not company_id:
-        return False, None
-
-    # Check Production
-    if db.query(Production.id).filter(
-        Production.batch_number == batch_number,
-        Production.company_id == company_id,
-        Production.is_cancelled == False
-    ).first():
-        return True, "Production"
-
-    return False, None
+    return _used_downstream(db, batch_number, company_id, "soaking")
@@ -0,0 +1,131 @@
+"""Measure worker import time with ``python -X importtime`` and write a JSON report.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.import_time --runs 5 --output import_time.json --compare benchmarks/import_time_report.json
+
+Each run imports ``app.main`` in a fresh interpreter (what a worker does
+before it can answer its health check), parses the ``-X importtime`` tree and
+reports the median total, the slowest modules by self and cumulative time and
+any of ``HEAVY_MODULES`` that were loaded. Heavy optional libraries belong
+inside the handlers that use them; ``--budget-ms`` exits non-zero when the
+median import exceeds the budget.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_MODULE = "app.main"
+STARTUP_BUDGET_MS = int(os.environ.get("SVBK_STARTUP_BUDGET_MS", "6000"))
+
+# Imported lazily by the code paths that need them, never at worker boot.
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "xhtml2pdf", "weasyprint", "reportlab", "pyhanko", "requests")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(output: str) -> list[dict]:
+    """``-X importtime`` stderr as ``[{"module", "self_us", "cumulative_us", "depth"}]``."""
+    entries = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            entries.append({
+                "module": match.group(4),
+                "self_us": int(match.group(1)),
+                "cumulative_us": int(match.group(2)),
+                "depth": len(match.group(3)) // 2,
+            })
+    return entries
+
+
+def _import_once(module: str, database_url: str) -> list[dict]:
+    env = dict(os.environ, DATABASE_URL=database_url)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=False,
+    )
+    entries = parse_importtime(completed.stderr)
+    if completed.returncode != 0 or not any(entry["module"] == module for entry in entries):
+        tail = completed.stderr.strip().splitlines()[-5:]
+        raise RuntimeError(f"import {module} failed: " + " | ".join(tail))
+    return entries
+
+
+def measure_import_time(module: str = DEFAULT_MODULE, runs: int = 3, top: int = 15, database_url: str | None = None) -> dict:
+    """Import ``module`` ``runs`` times in fresh interpreters; returns the report dict."""
+    with tempfile.TemporaryDirectory() as scratch:
+        url = database_url or f"sqlite:///{Path(scratch) / 'import_time_test.db'}"
+        # The first import compiles bytecode; only warm imports are timed.
+        _import_once(module, url)
+        samples = [_import_once(module, url) for _ in range(max(runs, 1))]
+
+    totals = [next(entry["cumulative_us"] for entry in entries if entry["module"] == module) for entries in samples]
+    median_run = samples[sorted(range(len(totals)), key=totals.__getitem__)[len(totals) // 2]]
+    loaded = {entry["module"].split(".")[0] for entry in median_run}
+
+    def ranked(key):
+        return [
+            {"module": entry["module"], "ms": round(entry[key] / 1000, 1)}
+            for entry in sorted(median_run, key=lambda entry: entry[key], reverse=True)[:top]
+        ]
+
+    return {
+        "module": module,
+        "runs": len(totals),
+        "median_ms": round(statistics.median(totals) / 1000, 1),
+        "min_ms": round(min(totals) / 1000, 1),
+        "max_ms": round(max(totals) / 1000, 1),
+        "modules_imported": len(median_run),
+        "heavy_modules_loaded": sorted(loaded.intersection(HEAVY_MODULES)),
+        "top_cumulative": ranked("cumulative_us"),
+        "top_self": ranked("self_us"),
+    }
+
+
+def _compare(current: dict, previous: dict) -> None:
+    before, after = previous.get("median_ms"), current["median_ms"]
+    if before:
+        print(f"median import {before} ms -> {after} ms ({(after - before) / before * 100:+.1f}%)")
+    added = sorted(set(current["heavy_modules_loaded"]) - set(previous.get("heavy_modules_loaded", [])))
+    if added:
+        print(f"newly loaded at boot: {', '.join(added)}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default=DEFAULT_MODULE)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    report = measure_import_time(args.module, args.runs, args.top, args.database_url)
+    report["python"] = platform.python_version()
+    report["platform"] = platform.platform()
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    print(text)
+    if args.compare:
+        _compare(report, json.loads(Path(args.compare).read_text()))
+    if args.budget_ms is not None and report["median_ms"] > args.budget_ms:
+        print(f"import of {args.module} took {report['median_ms']} ms, budget {args.budget_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
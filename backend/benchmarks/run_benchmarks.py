@@ -0,0 +1,199 @@
+"""Time hot ERP code paths against a synthetic tenant and write JSON results.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.run_benchmarks --database-url sqlite:////tmp/svbk_bench_test.db \\
+        --batches 200 --vouchers 2000 --employees 150 --output bench.json --compare previous.json
+
+The database name must contain "test" (same guard as the test suite); its
+tables are dropped and recreated. Each case is timed directly (no HTTP) and
+its SQL statements are counted with ``collect_queries``.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+DEFAULT_DATABASE_URL = "sqlite:////tmp/svbk_bench_test.db"
+
+
+def _request(tenant):
+    from starlette.requests import Request
+
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [],
+        "query_string": b"",
+        "session": {
+            "company_code": tenant.company_code,
+            "company_id": tenant.company_code,
+            "email": tenant.email,
+            "role": "admin",
+            "permissions": "ALL",
+        },
+    })
+
+
+def _run(result):
+    return asyncio.run(result) if asyncio.iscoroutine(result) else result
+
+
+def build_cases(tenant):
+    """Return ``{name: callable(db)}`` for every benchmarked code path."""
+    from app.routers.attendance.salary_reports import get_salary_report
+    from app.routers.dashboard.inventory_dashboard import get_inventory_dashboard
+    from app.routers.summary.periodic_report import get_periodic_summary_report
+    from app.services.accounting_reports import AccountingReportsService
+    from app.services.cache import cache_delete_pattern
+    from app.services.floor_balance_sync import refresh_floor_balance
+
+    code = tenant.company_code
+    fy = f"{tenant.start_date.year}-{str(tenant.start_date.year + 1)[2:]}"
+
+    def inventory_dashboard(db):
+        cache_delete_pattern("bknr:inventory_dashboard:*")
+        return _run(get_inventory_dashboard(
+            request=_request(tenant), format="json", sel_species="ALL", sel_variety="ALL",
+            sel_grade="ALL", sel_glaze="ALL", sel_prod_at="ALL", sel_prod_for="ALL",
+            sel_fy=fy, location=None, production_for=None, db=db,
+        ))
+
+    return {
+        "trial_balance": lambda db: AccountingReportsService.get_trial_balance(
+            db, code, date(tenant.start_date.year + 1, 3, 31)
+        ),
+        "floor_balance_refresh": lambda db: refresh_floor_balance(db, code),
+        "periodic_report": lambda db: _run(get_periodic_summary_report(
+            request=_request(tenant), date_filter_type="fy", selected_month=None, start_date=None,
+            end_date=None, fy=fy, production_for=None, production_at=None, prod_type="RMP",
+            batch=None, search=None, db=db,
+        )),
+        "salary_sheet": lambda db: get_salary_report(
+            month=tenant.month, dept="ALL", location="ALL", request=_request(tenant), db=db,
+        ),
+        "inventory_dashboard": inventory_dashboard,
+    }
+
+
+def run_case(session_factory, func, repeat):
+    from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+
+    timings, queries, error = [], [], None
+    for _ in range(repeat):
+        db = session_factory()
+        install_query_instrumentation(db.get_bind())
+        try:
+            # Several legacy paths print progress; keep stdout for the JSON report.
+            with collect_queries() as stats, contextlib.redirect_stdout(sys.stderr):
+                started = time.perf_counter()
+                func(db)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(stats.query_count)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            db.rollback()
+            break
+        finally:
+            db.close()
+    if not timings:
+        return {"error": error}
+    return {
+        "runs": len(timings),
+        "median_ms": round(statistics.median(timings), 2),
+        "min_ms": round(min(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "queries": max(queries),
+        **({"error": error} if error else {}),
+    }
+
+
+def compare(results, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text())["results"]
+    lines = []
+    for name, current in results.items():
+        previous = baseline.get(name) or {}
+        if "median_ms" not in current or "median_ms" not in previous:
+            continue
+        ratio = current["median_ms"] / previous["median_ms"] if previous["median_ms"] else 0
+        lines.append(
+            f"{name:24} {previous['median_ms']:>10.1f} -> {current['median_ms']:>10.1f} ms "
+            f"({ratio:.2f}x)  queries {previous.get('queries')} -> {current.get('queries')}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark hot ERP code paths on a synthetic tenant.")
+    parser.add_argument("--database-url", default=os.getenv("SVBK_BENCH_DATABASE_URL", DEFAULT_DATABASE_URL))
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--vouchers", type=int, default=500)
+    parser.add_argument("--employees", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--case", action="append", help="Run only the named case (repeatable).")
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    parser.add_argument("--compare", help="Previous JSON results to compare against.")
+    args = parser.parse_args(argv)
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("ENVIRONMENT", "test")
+    os.environ.setdefault("SVBK_SKIP_STARTUP_TASKS", "1")
+    os.environ.setdefault("SESSION_SECRET_KEY", "svbk-bench-session-secret-not-for-production")
+
+    from tests.conftest import assert_safe_test_database
+
+    assert_safe_test_database(args.database_url)
+
+    from app.database import Base, SessionLocal, engine
+    import app.main  # noqa: F401  (registers every model on Base.metadata)
+    from benchmarks.synthetic_tenant import seed_synthetic_tenant
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    seed_started = time.perf_counter()
+    with SessionLocal() as db:
+        tenant = seed_synthetic_tenant(
+            db, batches=args.batches, vouchers=args.vouchers, employees=args.employees,
+        )
+    seed_seconds = time.perf_counter() - seed_started
+
+    cases = build_cases(tenant)
+    selected = args.case or list(cases)
+    results = {name: run_case(SessionLocal, cases[name], args.repeat) for name in selected}
+
+    report = {
+        "meta": {
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "database": engine.dialect.name,
+            "python": platform.python_version(),
+            "batches": args.batches,
+            "vouchers": args.vouchers,
+            "employees": args.employees,
+            "repeat": args.repeat,
+            "seed_seconds": round(seed_seconds, 2),
+        },
+        "results": results,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload)
+    print(payload)
+    if args.compare:
+        print(compare(results, args.compare))
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
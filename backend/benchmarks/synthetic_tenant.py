@@ -0,0 +1,247 @@
+"""Seed a configurable synthetic tenant for the benchmark suite.
+
+Builds on ``tests/factories.py`` so the tenant looks exactly like the ones the
+API tests use, then adds bulk processing, stock, accounting and HR rows.
+Everything is deterministic for a given size so runs are comparable.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+from app.database.models.attendance import DailyAttendance, EmployeeRegistration
+from app.database.models.enterprise_finance import (
+    AccountGroup,
+    LedgerMaster,
+    VoucherDetail,
+    VoucherHeader,
+    VoucherType,
+)
+from app.database.models.floor_balance import FloorBalance
+from app.database.models.inventory_management import InventorySummary, stock_entry
+from app.database.models.processing import RawMaterialPurchasing
+from tests.factories import create_tenant_bundle, seed_gate_masters
+
+SPECIES = ("VANNAMEI", "BLACK TIGER")
+COUNTS = ("20/30", "30/40", "40/50", "50/60")
+GRADES = ("16/20", "21/25", "26/30", "31/40")
+LEDGERS_PER_GROUP = 8
+
+
+@dataclass
+class SyntheticTenant:
+    company_code: str
+    email: str
+    production_for: str
+    plant: str
+    start_date: date
+    month: str
+    batches: int
+    vouchers: int
+    employees: int
+
+
+def seed_synthetic_tenant(
+    db,
+    *,
+    code: str = "BENCH01",
+    batches: int = 50,
+    vouchers: int = 500,
+    employees: int = 100,
+    start_date: date = date(2026, 4, 1),
+) -> SyntheticTenant:
+    bundle = create_tenant_bundle(
+        db,
+        code=code,
+        company_name=f"Benchmark Tenant {code}",
+        email=f"bench.{code.lower()}@example.test",
+        mobile="9000000001",
+    )
+    masters = seed_gate_masters(db, code, suffix="Bench")
+    production_for = masters["production_for"]
+    plant = masters["plant"]
+
+    _seed_processing(db, code, production_for, plant, batches, start_date)
+    _seed_accounts(db, code, vouchers, start_date)
+    _seed_employees(db, code, plant, employees, start_date)
+    db.commit()
+
+    return SyntheticTenant(
+        company_code=code,
+        email=bundle.user.email,
+        production_for=production_for,
+        plant=plant,
+        start_date=start_date,
+        month=start_date.strftime("%Y-%m"),
+        batches=batches,
+        vouchers=vouchers,
+        employees=employees,
+    )
+
+
+def _seed_processing(db, code, production_for, plant, batches, start_date):
+    for index in range(batches):
+        batch = f"{code}-B{index + 1:05d}"
+        day = start_date + timedelta(days=index % 28)
+        species = SPECIES[index % len(SPECIES)]
+        count = COUNTS[index % len(COUNTS)]
+        received = 500.0 + (index % 7) * 25
+        db.add(RawMaterialPurchasing(
+            company_id=code,
+            batch_number=batch,
+            supplier_name="Synthetic Supplier Bench",
+            species=species,
+            variety_name="HOSO",
+            count=count,
+            received_qty=received,
+            rate_per_kg=310.0,
+            amount=received * 310.0,
+            production_for=production_for,
+            peeling_at=plant,
+            date=day,
+            time=time(9, 0),
+            email="bench@example.test",
+        ))
+        db.add(FloorBalance(
+            company_id=code,
+            location=plant,
+            production_for=production_for,
+            batch_number=batch,
+            source_type="RMP",
+            species=species,
+            variety="HOSO",
+            count=count,
+            available_qty=received,
+            inventory_value=received * 310.0,
+            date=day.isoformat(),
+            time="09:00:00",
+        ))
+        grade = GRADES[index % len(GRADES)]
+        db.add(stock_entry(
+            company_id=code,
+            batch_number=batch,
+            cargo_movement_type="IN",
+            location=plant,
+            production_at=plant,
+            production_for=production_for,
+            species=species,
+            variety="PD",
+            grade=grade,
+            glaze="20%",
+            packing_style="10 x 1 KG",
+            freezer="IQF",
+            no_of_mc=20,
+            loose=0,
+            quantity=200.0,
+            product_kg_value=520.0,
+            inventory_value=104000.0,
+            status="ACTIVE",
+            date=day,
+            time="10:00:00",
+            email="bench@example.test",
+        ))
+
+    for species in SPECIES:
+        for grade in GRADES:
+            db.add(InventorySummary(
+                company_id=code,
+                species=species,
+                variety="PD",
+                grade=grade,
+                packing_style="10 x 1 KG",
+                glaze="20%",
+                production_for=production_for,
+                production_at=plant,
+                freezer="IQF",
+                available_qty=200.0 * batches / (len(SPECIES) * len(GRADES)),
+                available_mc=20,
+                available_loose=0,
+                avg_rate=520.0,
+            ))
+    db.flush()
+
+
+def _seed_accounts(db, code, vouchers, start_date):
+    roots = []
+    for name, group_type in (("Assets", "ASSET"), ("Liabilities", "LIABILITY"), ("Income", "INCOME"), ("Expenses", "EXPENSE")):
+        root = AccountGroup(company_id=code, group_name=name, group_type=group_type)
+        db.add(root)
+        db.flush()
+        child = AccountGroup(company_id=code, group_name=f"{name} - Operations", group_type=group_type, parent_group_id=root.id)
+        db.add(child)
+        roots.append(child)
+    db.flush()
+
+    ledgers = []
+    for group in roots:
+        for index in range(LEDGERS_PER_GROUP):
+            ledger = LedgerMaster(
+                company_id=code,
+                ledger_name=f"{group.group_name} Ledger {index + 1}",
+                group_id=group.id,
+                opening_balance=1000.0 * index,
+                opening_balance_type="DR" if group.group_type in {"ASSET", "EXPENSE"} else "CR",
+                created_by="bench",
+            )
+            db.add(ledger)
+            ledgers.append(ledger)
+    voucher_type = VoucherType(company_id=code, name="Journal", prefix="JV")
+    db.add(voucher_type)
+    db.flush()
+
+    for index in range(vouchers):
+        header = VoucherHeader(
+            company_id=code,
+            voucher_no=f"JV-{index + 1:06d}",
+            voucher_date=start_date + timedelta(days=index % 180),
+            voucher_type_id=voucher_type.id,
+            status="POSTED",
+            created_by="bench",
+        )
+        db.add(header)
+        db.flush()
+        amount = 100.0 + index % 97
+        debit = ledgers[index % len(ledgers)]
+        credit = ledgers[(index * 7 + 3) % len(ledgers)]
+        db.add_all([
+            VoucherDetail(voucher_id=header.id, ledger_id=debit.id, debit_amount=amount, credit_amount=0.0),
+            VoucherDetail(voucher_id=header.id, ledger_id=credit.id, debit_amount=0.0, credit_amount=amount),
+        ])
+    db.flush()
+
+
+def _seed_employees(db, code, plant, employees, start_date):
+    month_days = [start_date + timedelta(days=offset) for offset in range(28)]
+    for index in range(employees):
+        employee_id = f"{code}-E{index + 1:05d}"
+        db.add(EmployeeRegistration(
+            company_id=code,
+            employee_id=employee_id,
+            employee_name=f"Synthetic Employee {index + 1}",
+            department="PROCESSING" if index % 3 else "ADMIN",
+            designation="Operator",
+            employee_type="STAFF",
+            production_at=plant,
+            location=plant,
+            current_salary=18000.0 + (index % 10) * 500,
+            joining_date=start_date - timedelta(days=365),
+            status="ACTIVE",
+        ))
+        db.flush()
+        for day in month_days:
+            if day.weekday() == 6:
+                continue
+            db.add(DailyAttendance(
+                company_id=code,
+                employee_id=employee_id,
+                employee_name=f"Synthetic Employee {index + 1}",
+                production_at=plant,
+                shift_name="GENERAL",
+                duty_date=day,
+                first_in=datetime.combine(day, time(9, 0)),
+                exit_time=datetime.combine(day, time(18, 0)),
+                working_hours=9.0,
+                duty_status="APPROVED",
+                status="PRESENT",
+                movements=[],
+            ))
+    db.flush()
@@ -0,0 +1,146 @@
+"""Compare header-bell polling from N open tabs with the SSE notification hub.
+
+The legacy path is what every tab did every 30 s: the announcements query
+plus five COUNT queries against the source tables. The hub path is one
+counter read per ``NOTIFICATION_POLL_SECONDS`` for every subscribed company,
+plus a feed rebuild for companies whose counters changed. Runs against a
+throwaway SQLite database seeded with ``--rows`` source rows per company
+(``DATABASE_URL`` must still be set, since ``app.database`` is imported).
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, or_
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models.attendance import DailyAttendance
+from app.database.models.helpdesk import CompanyAnnouncement, SupportTicket
+from app.database.models.inventory_management import cold_storage_holding, pending_orders
+from app.database.models.notification_counters import NotificationCounter
+from app.database.models.processing import GateEntry
+from app.services import notification_counters
+from app.services.notification_counters import COUNTERS, NotificationHub, install_notification_tracking
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+
+LEGACY_POLL_SECONDS = 30
+
+
+def legacy_poll(db, comp_code):
+    today = date.today()
+    db.query(CompanyAnnouncement).filter(
+        or_(CompanyAnnouncement.company_id == comp_code, CompanyAnnouncement.created_by == "bknr.solutions@gmail.com")
+    ).order_by(CompanyAnnouncement.created_at.desc()).limit(10).all()
+    db.query(GateEntry).filter(GateEntry.company_id == comp_code, GateEntry.date == today).count()
+    db.query(DailyAttendance).filter(DailyAttendance.company_id == comp_code, DailyAttendance.duty_date == today).count()
+    db.query(SupportTicket).filter(SupportTicket.status == "OPEN").count()
+    db.query(pending_orders).filter(pending_orders.company_id == comp_code).count()
+    db.query(cold_storage_holding).filter(
+        cold_storage_holding.company_id == comp_code, cold_storage_holding.status == "HOLDING"
+    ).count()
+
+
+def seed(factory, companies, rows):
+    today = date.today()
+    with factory() as db:
+        for company_id in companies:
+            for i in range(rows):
+                db.add_all([
+                    GateEntry(company_id=company_id, batch_number=f"{company_id}-{i}", date=today),
+                    DailyAttendance(company_id=company_id, employee_id=f"E{i}", duty_date=today),
+                    pending_orders(company_id=company_id, po_number=f"PO-{i}"),
+                    cold_storage_holding(company_id=company_id, batch_number=f"CS-{i}", status="HOLDING"),
+                ])
+            db.add(CompanyAnnouncement(company_id=company_id, message="Shift change at 6 PM", created_by="admin"))
+        db.add(SupportTicket(company_id=companies[0], subject="Scale drift", status="OPEN"))
+        db.commit()
+
+
+def measure_legacy(factory, tabs, companies):
+    with factory() as db, collect_queries() as stats:
+        started = time.perf_counter()
+        for tab in range(tabs):
+            legacy_poll(db, companies[tab % len(companies)])
+        elapsed = time.perf_counter() - started
+    polls_per_minute = 60 / LEGACY_POLL_SECONDS
+    return {
+        "queries_per_round": stats.query_count,
+        "db_ms_per_round": round(elapsed * 1000, 2),
+        "queries_per_minute": int(stats.query_count * polls_per_minute),
+        "db_ms_per_minute": round(elapsed * 1000 * polls_per_minute, 2),
+    }
+
+
+async def measure_hub(factory, tabs, companies):
+    hub = NotificationHub(session_factory=factory, interval=3600)
+    queues = [await hub.subscribe(companies[tab % len(companies)]) for tab in range(tabs)]
+    with collect_queries() as idle:
+        started = time.perf_counter()
+        await hub.poll()
+        idle_ms = (time.perf_counter() - started) * 1000
+
+    with factory() as db:
+        db.add(GateEntry(company_id=companies[0], batch_number="LIVE-1", date=date.today()))
+        db.commit()
+    with collect_queries() as changed:
+        started = time.perf_counter()
+        notified = await hub.poll()
+        changed_ms = (time.perf_counter() - started) * 1000
+    for company_id, queue in zip((companies[t % len(companies)] for t in range(tabs)), queues):
+        hub.unsubscribe(company_id, queue)
+
+    polls_per_minute = 60 / notification_counters.NOTIFICATION_POLL_SECONDS
+    return {
+        "queries_per_idle_poll": idle.query_count,
+        "db_ms_per_idle_poll": round(idle_ms, 2),
+        "queries_per_changed_poll": changed.query_count,
+        "db_ms_per_changed_poll": round(changed_ms, 2),
+        "streams_notified_on_change": notified,
+        "queries_per_minute_idle": int(idle.query_count * polls_per_minute),
+        "db_ms_per_minute_idle": round(idle_ms * polls_per_minute, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tabs", type=int, default=500)
+    parser.add_argument("--companies", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'notifications.db'}")
+        for spec in COUNTERS.values():
+            notification_counters._model(spec).__table__.create(bind=engine, checkfirst=True)
+        NotificationCounter.__table__.create(bind=engine)
+        install_query_instrumentation(engine)
+        notification_counters.reset_notification_cache()
+        factory = sessionmaker(bind=engine)
+        install_notification_tracking(factory)
+
+        companies = [f"C{i:03d}" for i in range(args.companies)]
+        seed(factory, companies, args.rows)
+        report = {
+            "tabs": args.tabs,
+            "companies": args.companies,
+            "legacy_polling": measure_legacy(factory, args.tabs, companies),
+            "sse_hub": asyncio.run(measure_hub(factory, args.tabs, companies)),
+        }
+        engine.dispose()
+
+    legacy = report["legacy_polling"]["db_ms_per_minute"]
+    hub = report["sse_hub"]["db_ms_per_minute_idle"]
+    report["db_time_reduction"] = round(legacy / hub, 1) if hub else None
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
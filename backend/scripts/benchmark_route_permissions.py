@@ -0,0 +1,78 @@
+"""Compare the ordered ROUTE_PERMISSION_RULES scan with the compiled route trie.
+
+Paths cover every rule (its prefix, a sub-path and a sibling suffix) plus
+unmatched paths, so the legacy scan's worst case (late or missing rules) is
+included. Permission checks compare re-parsing the session string on every
+call with the cached frozen set.
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.utils import access_control
+from app.utils.access_control import ROUTE_PERMISSION_RULES, normalize_permission, permission_set
+
+
+def legacy_required_permission(path):
+    normalized = str(path or "").rstrip("/") or "/"
+    for prefix, permission in ROUTE_PERMISSION_RULES:
+        if normalized == prefix.rstrip("/") or normalized.startswith(prefix):
+            return permission
+    return None
+
+
+def legacy_has_permission(session, required):
+    granted = permission_set(session.get("permissions"))
+    if "ALL" in granted:
+        return True
+    choices = required if isinstance(required, (list, tuple, set)) else (required,)
+    return any(normalize_permission(choice) in granted for choice in choices)
+
+
+def sample_paths():
+    paths = []
+    for prefix, _ in ROUTE_PERMISSION_RULES:
+        base = prefix.rstrip("/")
+        paths += [base, base + "/42/edit", base + "_extra"]
+    return paths + ["/unknown/page", "/home", "/auth/profile", "/crm/quotations/12"]
+
+
+def run(repeat):
+    paths = sample_paths()
+    mismatches = [p for p in paths if legacy_required_permission(p) != access_control.required_permission_for_path(p, "POST")]
+
+    session = {"email": "user@example.test", "permissions": ",".join(
+        sorted({p for _, rule in ROUTE_PERMISSION_RULES for p in ((rule,) if isinstance(rule, str) else rule)})[::2]
+    )}
+    required = [rule for _, rule in ROUTE_PERMISSION_RULES]
+
+    def per_path(func):
+        return timeit.timeit(lambda: [func(p) for p in paths], number=repeat) / (repeat * len(paths)) * 1e6
+
+    def per_check(func):
+        return timeit.timeit(lambda: [func(session, r) for r in required], number=repeat) / (repeat * len(required)) * 1e6
+
+    print(json.dumps({
+        "rules": len(ROUTE_PERMISSION_RULES),
+        "paths": len(paths),
+        "mismatches": mismatches,
+        "route_match_us": {
+            "legacy_scan": round(per_path(legacy_required_permission), 3),
+            "compiled_trie": round(per_path(lambda p: access_control.required_permission_for_path(p, "POST")), 3),
+        },
+        "permission_check_us": {
+            "parse_each_call": round(per_check(legacy_has_permission), 3),
+            "frozen_cached": round(per_check(access_control.has_permission), 3),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    run(parser.parse_args().repeat)
@@ -0,0 +1,76 @@
+"""Compare worker cold-start cost of runtime ensure-schema DDL vs the readiness registry.
+
+The legacy path runs every ensure step the way a fresh worker used to on its
+first requests (rolled back afterwards, so the database is left untouched).
+The registry path is what a fresh worker does now: one SELECT on
+``schema_ensure_steps`` followed by in-memory checks. Run against a database
+that has been through ``alembic upgrade head``.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.database import SessionLocal
+from app.services import schema_readiness
+
+
+def legacy_cold_start(db):
+    failures = []
+    transaction = db.begin()
+    try:
+        for name in schema_readiness.SCHEMA_STEPS:
+            try:
+                with db.begin_nested():
+                    schema_readiness._step_function(name)(db)
+            except Exception as exc:
+                failures.append(f"{name}: {exc}")
+    finally:
+        transaction.rollback()
+    return failures
+
+
+def registry_cold_start(db):
+    schema_readiness.reset_schema_readiness()
+    schema_readiness.load_schema_readiness(db)
+    return [name for name in schema_readiness.SCHEMA_STEPS if not schema_readiness.is_schema_step_ready(name)]
+
+
+def measure(fn, runs):
+    timings = []
+    detail = []
+    for _ in range(runs):
+        with SessionLocal() as db:
+            started = time.perf_counter()
+            detail = fn(db)
+            timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "runs": runs,
+        "median_ms": round(statistics.median(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "detail": detail,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {
+        "legacy_ensure_steps": measure(legacy_cold_start, args.runs),
+        "readiness_registry": measure(registry_cold_start, args.runs),
+    }
+    legacy = report["legacy_ensure_steps"]["median_ms"]
+    registry = report["readiness_registry"]["median_ms"]
+    report["speedup"] = round(legacy / registry, 1) if registry else None
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
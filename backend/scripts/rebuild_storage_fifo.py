@@ -0,0 +1,41 @@
+"""Regenerate storage FIFO layers and monthly combo closings from stock_entry history."""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.database import SessionLocal
+from app.database.models.inventory_management import stock_entry
+from app.services.storage_fifo import rebuild_storage_fifo
+
+
+def run(companies, apply):
+    db = SessionLocal()
+    try:
+        if not companies:
+            companies = [
+                row[0] for row in db.query(stock_entry.company_id)
+                .filter(stock_entry.company_id.isnot(None)).distinct().order_by(stock_entry.company_id).all()
+            ]
+        summary = {company: rebuild_storage_fifo(db, company) for company in companies}
+        if apply:
+            db.commit()
+        else:
+            db.rollback()
+        print(json.dumps({"applied": apply, "combos": summary}, indent=2))
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--company", action="append", default=[], help="company code; repeat for several (default: all)")
+    parser.add_argument("--apply", action="store_true")
+    args = parser.parse_args()
+    run(args.company, args.apply)
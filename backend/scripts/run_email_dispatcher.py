@@ -0,0 +1,39 @@
+"""Deliver queued outbound email as a process of its own (EMAIL_DISPATCHER=external)."""
+
+import argparse
+import json
+import signal
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.database import BackgroundSessionLocal
+from app.services.email_queue import default_transport, dispatch_pending, run_email_dispatcher
+
+
+def run_once():
+    transport = default_transport()
+    if transport is None:
+        raise SystemExit("No email transport configured (SMTP_SERVER / SMTP_PASSWORD / BREVO_API_KEY)")
+    db = BackgroundSessionLocal()
+    try:
+        print(json.dumps(dispatch_pending(db, transport), indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--once", action="store_true", help="deliver one batch and exit")
+    args = parser.parse_args()
+    if args.once:
+        run_once()
+    else:
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        try:
+            run_email_dispatcher(BackgroundSessionLocal, stop)
+        except KeyboardInterrupt:
+            stop.set()
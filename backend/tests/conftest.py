@@ -74,6 +74,17 @@ def test_engine():
     import app.database.models.advanced_seafood_erp
     import app.database.models.feature_flags
     import app.database.models.system_settings
+    import app.database.models.financial_periods
+    import app.database.models.storage_fifo
+    import app.database.models.net_stock
+    import app.database.models.outbound_email
+    import app.database.models.search_index
+    import app.database.models.notification_counters
+    import app.database.models.lineage
+    import app.database.models.production_cost_pools
+    import app.database.models.job_leases
+    import app.database.models.hr_kpi_rollups
+    import app.database.models.derived_tables
 
     Base.metadata.create_all(bind=engine)
     yield engine
@@ -0,0 +1,26 @@
+import pytest
+
+from app.database.models.enterprise_finance import VoucherHeader
+from app.database.models.processing import RawMaterialPurchasing
+from benchmarks.run_benchmarks import build_cases, run_case
+from benchmarks.synthetic_tenant import seed_synthetic_tenant
+
+
+pytestmark = [pytest.mark.integration, pytest.mark.database]
+
+
+def test_synthetic_tenant_seeds_requested_volume_and_cases_report_query_counts(db_session):
+    """Keep the benchmark seeder in step with the models it writes."""
+    from app.database import SessionLocal
+
+    tenant = seed_synthetic_tenant(db_session, code="BENCHT01", batches=4, vouchers=6, employees=2)
+
+    assert db_session.query(RawMaterialPurchasing).filter_by(company_id="BENCHT01").count() == 4
+    assert db_session.query(VoucherHeader).filter_by(company_id="BENCHT01").count() == 6
+
+    cases = build_cases(tenant)
+    for name in ("trial_balance", "salary_sheet"):
+        result = run_case(SessionLocal, cases[name], repeat=1)
+        assert "error" not in result, result
+        assert result["runs"] == 1
+        assert result["queries"] > 0
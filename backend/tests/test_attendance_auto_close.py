@@ -0,0 +1,117 @@
+"""Stale attendance auto-close: set-based close, bulk audit and the leased scheduled job."""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.database.models.attendance import DailyAttendance, EmployeeRegistration, EmployeeStatutoryMaster
+from app.database.models.hr_kpi_rollups import HrKpiRollup
+from app.database.models.job_leases import JobLease
+from app.database.models.processing import AuditLog, Peeling, Production
+from app.services import attendance_auto_close, hr_kpi_rollups
+from app.services.attendance_auto_close import close_stale_attendance, run_attendance_auto_close
+from app.services.hr_kpi_rollups import load_hr_kpi_rollups
+from app.services.job_leases import acquire_job_lease
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+
+
+pytestmark = pytest.mark.unit
+
+NOW = datetime(2026, 10, 19, 9, 0)
+
+
+@pytest.fixture
+def factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'attendance.db'}")
+    Base.metadata.create_all(bind=engine, tables=[
+        EmployeeRegistration.__table__, DailyAttendance.__table__, AuditLog.__table__, JobLease.__table__,
+        EmployeeStatutoryMaster.__table__, Production.__table__, Peeling.__table__, HrKpiRollup.__table__,
+    ])
+    install_query_instrumentation(engine)
+    hr_kpi_rollups.reset_hr_kpi_cache()
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+    hr_kpi_rollups.reset_hr_kpi_cache()
+
+
+def _duty(company_id, employee_id, hours_ago, status="OPEN", location="UNIT-1"):
+    first_in = NOW - timedelta(hours=hours_ago)
+    return DailyAttendance(
+        company_id=company_id, employee_id=employee_id, employee_name=f"Worker {employee_id}",
+        production_at=location, duty_date=first_in.date(), first_in=first_in, status=status,
+        movements=[{"type": "IN", "time": first_in.strftime("%H:%M"), "date": first_in.strftime("%Y-%m-%d")}],
+    )
+
+
+def test_stale_duties_close_in_four_statements(factory):
+    db = factory()
+    db.add_all([_duty("AC1", f"E{index:02d}", 25 + index) for index in range(12)])
+    db.add_all([
+        _duty("AC1", "FRESH", 23),
+        _duty("AC1", "DONE", 30, status="CLOSED"),
+        _duty("AC1", "PLANT2", 30, location=" unit-2 "),
+        _duty("AC2", "OTHER", 30),
+    ])
+    db.commit()
+    loaded = db.query(DailyAttendance).filter(DailyAttendance.employee_id == "E00").one()
+    load_hr_kpi_rollups(db, "AC1", [NOW.date() - timedelta(days=3), NOW.date()])
+    load_hr_kpi_rollups(db, "AC2", [NOW.date()])
+
+    with collect_queries() as stats:
+        closed = close_stale_attendance(db, "AC1", location="UNIT-1", closed_by="hr@example.test", now=NOW)
+    # UPDATE ... RETURNING, exit/movement executemany, audit insert, rollup delete
+    assert stats.query_count == 4
+    assert sorted(row["employee_id"] for row in closed) == [f"E{index:02d}" for index in range(12)]
+    db.commit()
+    # The oldest closed duty is from 2026-10-17: AC1 rows from then on are stale, AC2 is untouched.
+    assert [(row.company_id, row.day) for row in db.query(HrKpiRollup).order_by(HrKpiRollup.company_id)] == [
+        ("AC1", NOW.date() - timedelta(days=3)), ("AC2", NOW.date()),
+    ]
+
+    assert loaded.status == "CLOSED"
+    assert loaded.exit_time == loaded.first_in + timedelta(hours=24)
+    assert (loaded.working_hours, loaded.duty_type, loaded.calculated_ot_hours) == (24.0, "DOUBLE", 8.0)
+    assert (loaded.duty_status, loaded.ot_status) == ("PENDING", "PENDING")
+    assert [movement["type"] for movement in loaded.movements] == ["IN", "AUTO OUT"]
+    still_open = db.query(DailyAttendance.employee_id).filter(DailyAttendance.status == "OPEN")
+    assert sorted(employee_id for (employee_id,) in still_open) == ["FRESH", "OTHER", "PLANT2"]
+
+    audits = db.query(AuditLog).filter(AuditLog.field_name == "AUTO_OUT_24H").all()
+    assert len(audits) == 12
+    assert {audit.edited_by for audit in audits} == {"hr@example.test"}
+    audit = next(audit for audit in audits if audit.record_id == loaded.id)
+    assert audit.new_value == "Emp: Worker E00 (E00) | Auto closed after 24 hours | 24.0 Hrs | Duty approval pending"
+
+    assert close_stale_attendance(db, "AC1", employee_id="PLANT2", now=NOW)[0]["employee_id"] == "PLANT2"
+    db.commit()
+
+
+def test_scheduled_job_closes_every_company_in_batches_under_the_lease(factory, monkeypatch):
+    monkeypatch.setattr(attendance_auto_close, "ist_now", lambda: NOW)
+    monkeypatch.setattr(attendance_auto_close, "ATTENDANCE_AUTO_CLOSE_BATCH_SIZE", 4)
+    db = factory()
+    db.add_all([_duty(f"C{index % 3}", f"E{index}", 26) for index in range(10)])
+    db.commit()
+
+    other_worker = factory()
+    token = acquire_job_lease(other_worker, attendance_auto_close.LEASE_NAME, 300)
+    assert token
+    assert run_attendance_auto_close(factory) == "skipped"
+    assert db.query(DailyAttendance).filter(DailyAttendance.status == "OPEN").count() == 10
+
+    other_worker.query(JobLease).update({"locked_until": datetime.utcnow() - timedelta(seconds=1)})
+    other_worker.commit()
+    assert run_attendance_auto_close(factory) == "closed"
+    db.expire_all()
+    assert db.query(DailyAttendance).filter(DailyAttendance.status == "OPEN").count() == 0
+    assert db.query(AuditLog).filter(AuditLog.edited_by == "SYSTEM").count() == 10
+    lease = db.get(JobLease, attendance_auto_close.LEASE_NAME)
+    assert lease.holder is None and lease.locked_until is None
+
+    assert run_attendance_auto_close(factory) == "clean"
@@ -0,0 +1,213 @@
+"""Bulk workbook import: streamed validation, one upsert per table, error reports and derived-data refresh."""
+import asyncio
+import json
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from openpyxl import Workbook, load_workbook
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from app.database import Base
+from app.database.models import criteria
+from app.database.models.attendance import EmployeeRegistration
+from app.database.models.enterprise_finance import AccountGroup, LedgerMaster
+from app.database.models.hr_kpi_rollups import HrKpiRollup
+from app.database.models.inventory_management import stock_entry
+from app.database.models.lineage import LineageEdge
+from app.database.models.production_cost_pools import ProductionCostPool, ProductionCostPoolGeneration
+from app.database.models.search_index import SearchDocument
+from app.routers import data_management
+from app.services import bulk_import, hr_kpi_rollups, lineage, master_data, production_cost_pools, search_index
+from app.services.bulk_import import run_bulk_import
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+
+
+pytestmark = pytest.mark.unit
+
+MASTER_TABLES = (
+    criteria.species, criteria.grades, criteria.glazes, criteria.freezers, criteria.brands,
+    criteria.production_types, criteria.production_at, criteria.peeling_at, criteria.production_for,
+    criteria.purchasing_locations, criteria.suppliers, criteria.vehicle_numbers, criteria.varieties,
+    criteria.packing_styles, criteria.HOSO_HLSO_Yields, criteria.grade_to_hoso,
+)
+TABLES = (
+    *MASTER_TABLES, EmployeeRegistration, AccountGroup, LedgerMaster, stock_entry,
+    SearchDocument, HrKpiRollup, ProductionCostPool, ProductionCostPoolGeneration, LineageEdge,
+    *(search_index._model(source) for source in search_index.SOURCES.values()),
+)
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    Base.metadata.create_all(bind=engine, tables={model.__table__ for model in TABLES})
+    install_query_instrumentation(engine)
+    for reset in (search_index.reset_search_index_cache, hr_kpi_rollups.reset_hr_kpi_cache,
+                  production_cost_pools.reset_cost_pool_cache, master_data.reset_master_data_cache,
+                  lineage.reset_lineage_cache):
+        reset()
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        criteria.production_at(company_id="BI1", production_at="Unit-1"),
+        criteria.species(company_id="BI1", species_name="Vannamei"),
+        criteria.varieties(company_id="BI1", variety_name="HLSO"),
+        criteria.grades(company_id="BI1", grade_name="16/20"),
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+    search_index.reset_search_index_cache()
+
+
+def _workbook(path, header, rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "Data"
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+def test_employees_merge_with_one_upsert_and_report_rejected_rows(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_import, "BULK_IMPORT_CHUNK_ROWS", 2)
+    db.add_all([
+        EmployeeRegistration(company_id="BI1", employee_id="E1", employee_name="Old Name", department="QA", mobile="111"),
+        EmployeeRegistration(company_id="OTHER", employee_id="X9", employee_name="Someone Else"),
+    ])
+    db.commit()
+    path = _workbook(tmp_path / "employees.xlsx", ["Emp ID", "Name", "Unit", "Joined", "Salary"], [
+        ["E1", "Ravi Kumar", "unit-1", date(2024, 1, 5), 18000],
+        ["E2", "Sita", "Unit-1", "2025-03-01", "21000"],
+        [None, None, None, None, None],
+        ["E3", "Mohan", "Unit-9", None, 15000],
+        ["E2", "Sita Again", "Unit-1", None, None],
+        ["X9", "Poached", "Unit-1", None, None],
+        ["E4", None, None, "someday", "lots"],
+        ["E5", "Lakshmi", None, None, None],
+    ])
+    mapping = {"employee_id": "Emp ID", "employee_name": "Name", "production_at": "Unit",
+               "joining_date": "Joined", "current_salary": "Salary"}
+
+    with collect_queries() as stats:
+        result = run_bulk_import(db, "BI1", "EmployeeRegistration", path, "Data", mapping, report_dir=str(tmp_path))
+    db.commit()
+
+    assert (result.inserted, result.updated, result.rejected) == (2, 1, 4)
+    merges = [sql for sql in stats.fingerprints if sql.lstrip().upper().startswith("INSERT INTO EMPLOYEE_REGISTRATION")]
+    assert len(merges) == 1 and stats.fingerprints[merges[0]] == 1
+
+    rows = {row.employee_id: row for row in db.query(EmployeeRegistration).filter(EmployeeRegistration.company_id == "BI1")}
+    assert sorted(rows) == ["E1", "E2", "E5"]
+    # Mapped columns are updated, the rest of an existing record is kept.
+    assert (rows["E1"].employee_name, rows["E1"].production_at, rows["E1"].department, rows["E1"].mobile) == (
+        "Ravi Kumar", "Unit-1", "QA", "111",
+    )
+    assert (rows["E2"].joining_date, rows["E2"].current_salary, rows["E2"].status) == (date(2025, 3, 1), 21000.0, "ACTIVE")
+    assert db.query(EmployeeRegistration).filter(EmployeeRegistration.employee_id == "X9").one().company_id == "OTHER"
+    assert db.query(SearchDocument).filter(SearchDocument.company_id == "BI1").count() == 3
+
+    report = load_workbook(tmp_path / result.error_report, read_only=True)
+    lines = list(report.active.iter_rows(values_only=True))
+    assert lines[0] == ("Excel Row", "Errors", "Emp ID", "Name", "Unit", "Joined", "Salary")
+    assert [(line[0], line[1]) for line in lines[1:]] == [
+        (5, "production_at: 'Unit-9' is not in the masters"),
+        (6, "duplicate of row 3 in this file"),
+        (7, "employee_id already belongs to another company"),
+        (8, "employee_name: required; joining_date: 'someday' is not a valid date; current_salary: 'lots' is not a valid number"),
+    ]
+    assert lines[4][2:4] == ("E4", None)
+
+
+def _route_request(query=b"", company="BI1"):
+    return Request({
+        "type": "http",
+        "query_string": query,
+        "headers": [],
+        "session": {"company_code": company, "email": "accounts@example.test"},
+    })
+
+
+def test_ledger_opening_balances_import_through_the_route(db, tmp_path, monkeypatch):
+    logged = []
+    monkeypatch.setattr(data_management, "log_data_action", lambda *args: logged.append(args))
+    db.add_all([
+        AccountGroup(company_id="BI1", group_name="Sundry Debtors", group_type="ASSET"),
+        AccountGroup(company_id="OTHER", group_name="Foreign Group", group_type="ASSET"),
+    ])
+    db.add(LedgerMaster(company_id="BI1", ledger_name="Ocean Traders", group_id=1, opening_balance=10, created_by="setup"))
+    db.commit()
+    os.makedirs("uploads")
+    _workbook(tmp_path / "uploads" / "ledgers.xlsx", ["Ledger", "Group", "Opening", "Dr/Cr"], [
+        ["Ocean Traders", "sundry debtors", 2500.5, "DR"],
+        ["Blue Fin Exports", 1, 900, "CR"],
+        ["Stray Ledger", 2, 100, "DR"],
+    ])
+    payload = data_management.ImportMappingPayload(
+        filename="ledgers.xlsx", table_name="LedgerMaster", sheet_name="Data",
+        mapping={"ledger_name": "Ledger", "group_id": "Group", "opening_balance": "Opening", "opening_balance_type": "Dr/Cr"},
+    )
+
+    response = asyncio.run(data_management.execute_dynamic_import(payload, _route_request(), db))
+
+    assert response["success"] is True
+    assert (response["rows_imported"], response["rows_updated"], response["rows_rejected"]) == (1, 1, 1)
+    assert not os.path.exists("uploads/ledgers.xlsx")
+    assert logged[-1][1:4] == ("IMPORT", "LedgerMaster", "Success")
+    assert logged[-1][4] == "Bulk imported 1 records (1 updated, 1 rejected)."
+    ledgers = {row.ledger_name: row for row in db.query(LedgerMaster)}
+    assert (ledgers["Ocean Traders"].opening_balance, ledgers["Ocean Traders"].created_by) == (2500.5, "setup")
+    assert (ledgers["Blue Fin Exports"].group_id, ledgers["Blue Fin Exports"].created_by) == (1, "accounts@example.test")
+
+    filename = response["error_report"].rsplit("/", 1)[1]
+    download = asyncio.run(data_management.download_import_errors(filename, _route_request()))
+    assert download.path == os.path.join("uploads", filename)
+    with pytest.raises(HTTPException):
+        asyncio.run(data_management.download_import_errors(filename, _route_request(company="OTHER")))
+
+
+def test_opening_stock_is_inserted_and_drops_its_cost_pool_months(db, tmp_path):
+    db.add(stock_entry(company_id="BI1", date=date(2026, 9, 30), production_at="Unit-1", quantity=5, cargo_movement_type="IN"))
+    db.commit()
+    kept = [
+        {"company_id": company_id, "parent_type": "lot", "parent_key": "B-0", "child_type": child_type,
+         "child_key": "1", "source_table": source_table, "source_id": 1, "created_at": date(2026, 10, 1)}
+        for company_id, child_type, source_table in (("OTHER", "stock", "stock_entry"), ("BI1", "dispatch", "sales_dispatch"))
+    ]
+    db.execute(LineageEdge.__table__.insert(), kept)
+    pools = ProductionCostPool.__table__
+    db.execute(pools.insert(), [
+        {"company_id": "BI1", "month": month, "pools": json.dumps({}), "built_at": date(2026, 10, 1)}
+        for month in ("2026-09", "2026-10")
+    ])
+    db.commit()
+    path = _workbook(tmp_path / "stock.xlsx", ["Date", "Batch", "Unit", "Species", "Variety", "Grade", "Qty"], [
+        [date(2026, 10, 1), "B-1", "UNIT-1", "vannamei", "hlso", "16/20", 120.5],
+        [date(2026, 10, 1), "B-1", "UNIT-1", "vannamei", "hlso", "16/20", 40],
+    ])
+    mapping = {"date": "Date", "batch_number": "Batch", "production_at": "Unit", "species": "Species",
+               "variety": "Variety", "grade": "Grade", "quantity": "Qty"}
+
+    result = run_bulk_import(db, "BI1", "StockEntry", path, "Data", mapping, report_dir=str(tmp_path))
+    db.commit()
+
+    assert (result.inserted, result.updated, result.rejected, result.error_report) == (2, 0, 0, None)
+    imported = db.query(stock_entry).filter(stock_entry.batch_number == "B-1").all()
+    assert {(row.production_at, row.species, row.variety, row.cargo_movement_type, row.is_cancelled) for row in imported} == {
+        ("Unit-1", "Vannamei", "HLSO", "IN", False),
+    }
+    assert [row.month for row in db.execute(pools.select())] == ["2026-09"]
+    # Only the importing company's stock edges are rederived.
+    edges = {(edge.company_id, edge.child_type, edge.parent_key) for edge in db.query(LineageEdge)}
+    assert edges == {("OTHER", "stock", "B-0"), ("BI1", "dispatch", "B-0"), ("BI1", "stock", "B-1")}
+    assert db.query(LineageEdge).filter(LineageEdge.parent_key == "B-1").count() == 2
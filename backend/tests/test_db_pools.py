@@ -0,0 +1,103 @@
+"""Per-purpose pools: settings, PgBouncer transaction mode and the connection leak detector."""
+import logging
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import pools
+from app.database.pools import build_engine, connect_args_for, pool_settings
+from app.services import connection_leaks, metrics
+from app.services.connection_leaks import install_leak_detector
+
+
+pytestmark = pytest.mark.unit
+
+
+def test_each_purpose_reads_its_own_pool_size(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "12")
+    monkeypatch.setenv("DB_BACKGROUND_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("DB_REPORTING_LEAK_SECONDS", "0")
+
+    web = pool_settings("web", "postgresql+psycopg2://erp@db/erp")
+    background = pool_settings("background", "postgresql+psycopg2://erp@db/erp")
+    reporting = pool_settings("reporting", "postgresql+psycopg2://erp@replica/erp")
+
+    assert (web.pool_size, web.max_overflow, web.leak_seconds) == (12, 5, 30)
+    # DB_POOL_SIZE is the web pool's setting only.
+    assert (background.pool_size, background.max_overflow, background.leak_seconds) == (2, 0, 900)
+    assert (reporting.url, reporting.leak_seconds) == ("postgresql+psycopg2://erp@replica/erp", 0)
+
+
+def test_transaction_pooling_disables_prepared_statements_and_flags_session_state(tmp_path, caplog):
+    assert connect_args_for("postgresql+psycopg://erp@bouncer/erp", transaction_pooling=True) == {"prepare_threshold": None}
+    assert connect_args_for("postgresql+psycopg2://erp@bouncer/erp", transaction_pooling=True) == {}
+    assert connect_args_for("postgresql+psycopg://erp@bouncer/erp") == {}
+
+    settings = pools.PoolSettings(
+        purpose="web", url=f"sqlite:///{tmp_path / 'pool.db'}", pool_size=1, max_overflow=0,
+        pool_timeout=1, pool_recycle=300, leak_seconds=0, transaction_pooling=True,
+    )
+    engine = build_engine(settings)
+    with caplog.at_level(logging.WARNING, logger="BKNR_ERP.db"), engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        for statement in ("SET search_path TO erp", "SET search_path TO erp", "SET LOCAL lock_timeout = '3s'"):
+            with pytest.raises(OperationalError):
+                conn.execute(text(statement))
+            conn.rollback()
+    engine.dispose()
+
+    flagged = [record.getMessage() for record in caplog.records]
+    assert flagged == ["Session-level state under DB_POOL_MODE=transaction will leak to other clients: SET search_path TO erp"]
+
+
+def _hold_connection(factory):
+    session = factory()
+    session.execute(text("SELECT 1"))
+    return session
+
+
+def test_connections_held_past_the_threshold_are_logged_once_with_their_stack(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(connection_leaks, "LEAK_SCAN_SECONDS", 0)
+    metrics.reset_metrics()
+    settings = pool_settings("background", f"sqlite:///{tmp_path / 'leak.db'}")
+    engine = build_engine(settings)
+    detector = install_leak_detector(engine, "background", threshold=0.05)
+    assert install_leak_detector(engine, "background", threshold=0.05) is detector
+    factory = sessionmaker(bind=engine)
+
+    leaked = _hold_connection(factory)
+    with factory() as short_lived:
+        short_lived.execute(text("SELECT 1"))
+    time.sleep(0.1)
+
+    with caplog.at_level(logging.WARNING, logger="BKNR_ERP.db"):
+        assert detector.scan() == 1
+        assert detector.scan() == 0
+    message = caplog.records[0].getMessage()
+    assert message.startswith("DB connection from the background pool held for 0s (limit 0s) by thread MainThread")
+    assert "in _hold_connection" in message and "test_db_pools.py" in message
+    assert "sqlalchemy" not in message
+    assert 'bknr_db_connection_leaks_total{pool="background"} 1' in metrics.render_metrics()
+    assert detector.gauges()[0][2] >= 0.1
+
+    leaked.close()
+    assert detector.oldest_checkout_seconds() == 0.0
+    engine.dispose()
+    assert install_leak_detector(engine, "background", threshold=0) is None
+
+
+def test_background_sessions_keep_derived_tables_in_step():
+    from app.database import ENGINES, BackgroundSessionLocal, ReportingSessionLocal, SessionLocal
+    from app.services import derived_tables, notification_counters
+
+    assert set(ENGINES) == {"web", "background", "reporting"}
+    assert len({id(engine) for engine, _ in ENGINES.values()}) == 3
+    assert SessionLocal.kw["bind"] is ENGINES["web"][0]
+    assert ReportingSessionLocal.kw["bind"] is ENGINES["reporting"][0]
+    assert notification_counters.DERIVED_TABLE in derived_tables._enabled[BackgroundSessionLocal]
@@ -0,0 +1,299 @@
+"""Incremental IMAP poller tests against an in-process IMAP stand-in."""
+import os
+import socket
+import threading
+import time
+from datetime import date
+from email.message import EmailMessage
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models.crm_quotation import CRMQuotation, CRMQuotationLine, CRMQuotationReply
+from app.database.models.system_settings import SystemSetting
+from app.services import email_poller
+from app.services.email_poller import (
+    InboundMailbox,
+    _compress_uids,
+    load_checkpoint,
+    poll_inbound_emails,
+)
+
+
+pytestmark = pytest.mark.unit
+
+
+def _message(subject, message_id, body="Please confirm the price."):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = "Buyer <buyer@example.test>"
+    msg["Date"] = "Mon, 05 Oct 2026 10:00:00 +0000"
+    msg["Message-ID"] = message_id
+    msg.set_content(body)
+    return msg.as_bytes()
+
+
+class FakeIMAP:
+    """Minimal UID-capable IMAP server double used in place of IMAP4_SSL."""
+
+    capabilities = ("IMAP4REV1",)
+
+    def __init__(self, uidvalidity=7):
+        self.uidvalidity = uidvalidity
+        self.messages = {}
+        self.seen = set()
+        self.fetches = []
+        self.logins = 0
+        self.failing_fetches = set()   # "HEADER" / "RFC822": answer that FETCH with NO
+
+    def __call__(self, host, port):
+        return self
+
+    def add(self, uid, raw):
+        self.messages[uid] = raw
+
+    def login(self, user, password):
+        self.logins += 1
+        return "OK", [b"Logged in"]
+
+    def select(self, mailbox):
+        return "OK", [str(len(self.messages)).encode()]
+
+    def response(self, code):
+        return code, [str(self.uidvalidity).encode()]
+
+    def noop(self):
+        return "OK", [b"NOOP completed"]
+
+    def logout(self):
+        return "BYE", [b"Logging out"]
+
+    def _uid_set(self, spec):
+        uids = set()
+        for part in spec.split(","):
+            if ":" in part:
+                start, end = part.split(":")
+                end = max(self.messages, default=0) if end == "*" else int(end)
+                uids.update(uid for uid in self.messages if int(start) <= uid <= end)
+            elif int(part) in self.messages:
+                uids.add(int(part))
+        return sorted(uids)
+
+    def uid(self, command, *args):
+        if command == "SEARCH":
+            criteria = args[-1]
+            if criteria == "UNSEEN":
+                found = [uid for uid in sorted(self.messages) if uid not in self.seen]
+            elif criteria == "ALL":
+                found = sorted(self.messages)
+            else:
+                spec = criteria.split(" ", 1)[1]
+                found = self._uid_set(spec) or [max(self.messages)]
+            return "OK", [" ".join(map(str, found)).encode()]
+        if command == "FETCH":
+            spec, items = args
+            self.fetches.append((spec, items))
+            if any(kind in items for kind in self.failing_fetches):
+                return "NO", [b"FETCH failed"]
+            data = []
+            for uid in self._uid_set(spec):
+                raw = self.messages[uid]
+                if "HEADER.FIELDS" in items:
+                    payload = raw.split(b"\n\n", 1)[0] + b"\r\n\r\n"
+                else:
+                    payload = raw
+                    self.seen.add(uid)
+                data.append((f"{uid} (UID {uid} BODY[] {{{len(payload)}}}".encode(), payload))
+                data.append(b")")
+            return "OK", data
+        raise AssertionError(f"unexpected UID command {command}")
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    for model in (SystemSetting, CRMQuotation, CRMQuotationLine, CRMQuotationReply):
+        model.__table__.create(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(CRMQuotation(
+        company_id="C1",
+        quotation_no="QT-2026-0001",
+        quotation_date=date(2026, 10, 1),
+        valid_until=date(2026, 10, 31),
+        customer_name="Buyer",
+        status="SENT",
+    ))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def skip_schema_ensure(monkeypatch):
+    import app.routers.crm_quotation_router as crm_router
+
+    monkeypatch.setattr(crm_router, "ensure_crm_quotation_schema", lambda db: None)
+
+
+def test_compress_uids_builds_sequence_sets():
+    assert _compress_uids([9, 3, 4, 5, 11, 12]) == "3:5,9,11:12"
+    assert _compress_uids([]) == ""
+
+
+def test_poller_downloads_bodies_only_for_quotation_subjects(db):
+    server = FakeIMAP()
+    server.add(1, _message("Re: Price Quotation #QT-2026-0001", "<a@example.test>"))
+    server.add(2, _message("Weekly newsletter", "<b@example.test>"))
+    mailbox = InboundMailbox("sales@example.test", "secret", connection_factory=server)
+
+    result = poll_inbound_emails(db, mailbox)
+
+    assert result["success"] is True
+    assert result["count"] == 1
+    body_fetches = [spec for spec, items in server.fetches if "HEADER.FIELDS" not in items]
+    assert body_fetches == ["1"]
+    assert server.seen == {1}
+    reply = db.query(CRMQuotationReply).one()
+    assert reply.quotation_no == "QT-2026-0001"
+    assert reply.sender_email == "buyer@example.test"
+    assert "confirm the price" in reply.message_body
+    assert db.query(CRMQuotation).one().status == "CUSTOMER REPLIED"
+    assert load_checkpoint(db, "sales@example.test") == {"uidvalidity": 7, "last_uid": 2}
+
+
+def test_poller_fetches_only_new_uids_and_reuses_connection(db):
+    server = FakeIMAP()
+    server.add(1, _message("Re: QT-2026-0001", "<a@example.test>"))
+    mailbox = InboundMailbox("sales@example.test", "secret", connection_factory=server)
+    poll_inbound_emails(db, mailbox)
+
+    server.fetches.clear()
+    result = poll_inbound_emails(db, mailbox)
+    assert result["count"] == 0
+    assert server.fetches == []
+
+    server.add(2, _message("Re: QT-2026-0001 revised", "<c@example.test>"))
+    server.add(3, _message("Re: QT-2026-0001 again", "<d@example.test>"))
+    result = poll_inbound_emails(db, mailbox)
+
+    assert result["count"] == 2
+    assert server.fetches[0][0] == "2:3"
+    assert server.logins == 1
+    assert db.query(CRMQuotationReply).count() == 3
+
+
+def test_uidvalidity_change_restarts_from_unread_mail(db):
+    server = FakeIMAP()
+    server.add(5, _message("Re: QT-2026-0001", "<a@example.test>"))
+    mailbox = InboundMailbox("sales@example.test", "secret", connection_factory=server)
+    poll_inbound_emails(db, mailbox)
+
+    server.uidvalidity = 8
+    server.add(1, _message("Re: QT-2026-0001 moved", "<e@example.test>"))
+    result = poll_inbound_emails(db, mailbox)
+
+    assert result["count"] == 1
+    assert load_checkpoint(db, "sales@example.test")["uidvalidity"] == 8
+
+
+def test_duplicate_message_ids_skip_body_download(db, monkeypatch):
+    monkeypatch.setattr(email_poller, "IMAP_FETCH_BATCH_SIZE", 1)
+    server = FakeIMAP()
+    server.add(1, _message("Re: QT-2026-0001", "<same@example.test>"))
+    server.add(2, _message("Fwd: QT-2026-0001", "<same@example.test>"))
+    mailbox = InboundMailbox("sales@example.test", "secret", connection_factory=server)
+
+    result = poll_inbound_emails(db, mailbox)
+
+    assert result["count"] == 1
+    assert [spec for spec, items in server.fetches if "HEADER.FIELDS" not in items] == ["1"]
+
+
+def test_checkpoint_stays_below_messages_whose_fetch_failed(db):
+    server = FakeIMAP()
+    server.add(1, _message("Re: QT-2026-0001", "<a@example.test>"))
+    mailbox = InboundMailbox("sales@example.test", "secret", connection_factory=server)
+    poll_inbound_emails(db, mailbox)
+
+    server.add(2, _message("Weekly newsletter", "<b@example.test>"))
+    server.add(3, _message("Re: QT-2026-0001 revised", "<c@example.test>"))
+    server.failing_fetches = {"HEADER"}
+    assert poll_inbound_emails(db, mailbox)["count"] == 0
+    assert load_checkpoint(db, "sales@example.test")["last_uid"] == 1
+
+    server.failing_fetches = {"RFC822"}
+    assert poll_inbound_emails(db, mailbox)["count"] == 0
+    assert load_checkpoint(db, "sales@example.test")["last_uid"] == 2
+
+    server.failing_fetches = set()
+    assert poll_inbound_emails(db, mailbox)["count"] == 1
+    assert load_checkpoint(db, "sales@example.test")["last_uid"] == 3
+    assert db.query(CRMQuotationReply).count() == 2
+
+
+class IdleServer:
+    """IMAP4-shaped client over a socket pair, with a thread playing the server side of IDLE."""
+
+    capabilities = ("IMAP4REV1", "IDLE")
+    state = "SELECTED"
+
+    def __init__(self, notify_after=None):
+        self.sock, self.server = socket.socketpair()
+        self.file = self.sock.makefile("rb")
+        self.notify_after = notify_after
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def __call__(self, host, port):
+        return self
+
+    def _serve(self):
+        for line in self.server.makefile("rb"):
+            if line.endswith(b" IDLE\r\n"):
+                tag = line.split()[0]
+                self.server.sendall(b"+ idling\r\n")
+                if self.notify_after is not None:
+                    time.sleep(self.notify_after)
+                    self.server.sendall(b"* 4 EXISTS\r\n")
+            elif line == b"DONE\r\n":
+                self.server.sendall(tag + b" OK IDLE terminated\r\n* OK still here\r\n")
+
+    def login(self, user, password):
+        return "OK", [b"Logged in"]
+
+    def noop(self):
+        return "OK", [b"NOOP completed"]
+
+    def logout(self):
+        self.server.close()
+        self.sock.close()
+
+    def _new_tag(self):
+        return b"A001"
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+    def readline(self):
+        return self.file.readline()
+
+    def socket(self):
+        return self.sock
+
+
+@pytest.mark.parametrize("notify_after, has_mail", [(None, False), (0.05, True)])
+def test_idle_wakes_on_new_mail_or_times_out_and_keeps_the_connection_usable(notify_after, has_mail):
+    server = IdleServer(notify_after)
+    mailbox = InboundMailbox("sales@example.test", "secret", connection_factory=server)
+
+    started = time.monotonic()
+    assert mailbox.idle(timeout=0.5) is has_mail
+    elapsed = time.monotonic() - started
+    assert elapsed < 0.4 if has_mail else elapsed >= 0.5
+    # The file object survived the wait: the next server line still reads.
+    assert server.readline() == b"* OK still here\r\n"
+    mailbox.close()
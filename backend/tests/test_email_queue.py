@@ -0,0 +1,188 @@
+"""Outbound email queue: batching, connection reuse, retries and leases against a local SMTP stand-in."""
+import logging
+import os
+import socket
+import socketserver
+import threading
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models.outbound_email import OutboundEmail
+from app.services import email_queue
+from app.services.brevo_email import BrevoTransport
+from app.services.email_queue import SmtpTransport, claim_due, dispatch_pending, enqueue_email
+from app.services.metrics import render_metrics, reset_metrics
+
+
+pytestmark = pytest.mark.unit
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO, MAIL, RCPT, DATA, RSET, QUIT."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 localhost ESMTP stand-in")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip().strip("<>")
+                if address in server.rejected:
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                if server.fail_data:
+                    self.reply("451 Try again later")
+                else:
+                    server.messages.append(sorted(recipients))
+                    self.reply("250 Queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SmtpHandler)
+    server.daemon_threads = True
+    server.connections, server.messages, server.rejected, server.fail_data = 0, [], set(), False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbound.db'}")
+    OutboundEmail.__table__.create(bind=engine)
+    reset_metrics()
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _transport(server):
+    return SmtpTransport("127.0.0.1", server.server_address[1], sender="SVBK <noreply@example.com>")
+
+
+def _queue(db, recipients, subject="Vehicle Arrived", company_id="EQ1", **extra):
+    row = enqueue_email(db, recipients, subject, "<p>B-104</p>", text="B-104", company_id=company_id, **extra)
+    db.commit()
+    return row
+
+
+def test_identical_messages_share_one_connection_and_are_chunked(db, smtp_server, monkeypatch):
+    monkeypatch.setattr(email_queue, "EMAIL_QUEUE_MAX_RECIPIENTS", 2)
+    _queue(db, ["QC@example.com", "stores@example.com "], category="gate_entry")
+    _queue(db, "stores@example.com; gm@example.com", category="gate_entry")
+    _queue(db, ["accounts@example.com"], subject="Other")
+    assert enqueue_email(db, [" ", ""], "Nobody", "<p></p>") is None
+
+    transport = _transport(smtp_server)
+    assert dispatch_pending(db, transport) == {"sent": 3, "retried": 0, "failed": 0}
+
+    assert transport.connections == 1
+    assert smtp_server.messages == [
+        ["gm@example.com", "qc@example.com"], ["stores@example.com"], ["accounts@example.com"],
+    ]
+    assert {row.status for row in db.query(OutboundEmail)} == {"SENT"}
+    assert dispatch_pending(db, _transport(smtp_server)) == {"sent": 0, "retried": 0, "failed": 0}
+
+    metrics = render_metrics()
+    assert 'bknr_email_messages_total{category="gate_entry",outcome="sent"} 2' in metrics
+    assert 'bknr_email_queue_delay_seconds_count{category="gate_entry"} 2' in metrics
+
+
+def test_identical_messages_of_different_companies_are_sent_apart(db, smtp_server):
+    _queue(db, ["qc@example.com"])
+    _queue(db, ["owner@example.org"], company_id="EQ2")
+
+    assert dispatch_pending(db, _transport(smtp_server)) == {"sent": 2, "retried": 0, "failed": 0}
+    assert sorted(smtp_server.messages) == [["owner@example.org"], ["qc@example.com"]]
+
+
+def test_temporary_failures_back_off_and_rejections_fail_at_once(db, smtp_server, monkeypatch):
+    monkeypatch.setattr(email_queue, "EMAIL_QUEUE_MAX_ATTEMPTS", 2)
+    retried = _queue(db, ["qc@example.com"])
+    rejected = _queue(db, ["ghost@example.com"], subject="Approval")
+    smtp_server.rejected.add("ghost@example.com")
+    smtp_server.fail_data = True
+
+    started = datetime.utcnow()
+    assert dispatch_pending(db, _transport(smtp_server)) == {"sent": 0, "retried": 1, "failed": 1}
+    db.refresh(retried)
+    assert retried.status == "PENDING" and "451" in retried.last_error
+    assert retried.next_attempt_at >= started + timedelta(seconds=email_queue.EMAIL_QUEUE_BACKOFF_SECONDS)
+    assert db.get(OutboundEmail, rejected.id).status == "FAILED"
+
+    # Not due yet; then the second and last attempt fails for good.
+    assert claim_due(db) == []
+    retried.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert dispatch_pending(db, _transport(smtp_server)) == {"sent": 0, "retried": 0, "failed": 1}
+    assert (db.get(OutboundEmail, retried.id).status, db.get(OutboundEmail, retried.id).attempts) == ("FAILED", 2)
+
+
+def test_expired_lease_is_claimed_again(db, smtp_server):
+    row = _queue(db, ["qc@example.com"])
+    assert [claimed.id for claimed in claim_due(db)] == [row.id]
+    assert claim_due(db) == []
+
+    db.get(OutboundEmail, row.id).locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert dispatch_pending(db, _transport(smtp_server)) == {"sent": 1, "retried": 0, "failed": 0}
+    assert db.get(OutboundEmail, row.id).attempts == 2
+
+
+def test_unreachable_server_defers_the_whole_run(db, smtp_server):
+    port = smtp_server.server_address[1]
+    smtp_server.shutdown()
+    smtp_server.server_close()
+    _queue(db, ["qc@example.com"])
+    _queue(db, ["gm@example.com"], subject="Other")
+
+    assert dispatch_pending(db, SmtpTransport("127.0.0.1", port, timeout=2)) == {"sent": 0, "retried": 2, "failed": 0}
+    assert {row.status for row in db.query(OutboundEmail)} == {"PENDING"}
+
+
+def test_brevo_timeout_defers_the_whole_run(db, caplog):
+    silent = socket.create_server(("127.0.0.1", 0))  # accepts the connection, never answers
+    _queue(db, ["qc@example.com"])
+    _queue(db, ["gm@example.com"], subject="Other")
+    try:
+        transport = BrevoTransport(api_key="test", url=f"http://127.0.0.1:{silent.getsockname()[1]}/", timeout=0.2)
+        with caplog.at_level(logging.WARNING, logger="BKNR_ERP.email_queue"):
+            assert dispatch_pending(db, transport) == {"sent": 0, "retried": 2, "failed": 0}
+    finally:
+        silent.close()
+    # One timed-out send; the second message is not attempted.
+    assert [record.getMessage()[:47] for record in caplog.records] == ["Email transport unavailable, deferring the run:"]
+    assert {row.status for row in db.query(OutboundEmail)} == {"PENDING"}
@@ -0,0 +1,103 @@
+"""Financial-period index: FY helpers and month counts maintained on ORM writes."""
+import os
+from datetime import date
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models.financial_periods import FinancialPeriod
+from app.database.models.processing import GateEntry
+from app.services.financial_periods import (
+    financial_years,
+    fy_bounds,
+    fy_label,
+    install_period_tracking,
+    parse_fy_start,
+    period_months,
+    rebuild_financial_periods,
+    reconcile_financial_periods,
+)
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'periods.db'}")
+    install_query_instrumentation(engine)
+    GateEntry.__table__.create(bind=engine)
+    FinancialPeriod.__table__.create(bind=engine)
+    factory = sessionmaker(bind=engine)
+    install_period_tracking(factory)
+    session = factory()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _gate(company, day):
+    return GateEntry(company_id=company, date=day, batch_number=f"{company}-{day.isoformat()}")
+
+
+def test_fy_helpers_accept_start_year_or_label():
+    assert parse_fy_start("2025-26") == 2025
+    assert parse_fy_start("2025") == 2025
+    assert parse_fy_start("", 2030) == 2030
+    assert fy_label(2025) == "2025-26"
+    assert fy_bounds(2025) == (date(2025, 4, 1), date(2026, 3, 31))
+
+
+def test_months_are_counted_on_insert_update_and_delete(db):
+    march, april = _gate("FP1", date(2026, 3, 10)), _gate("FP1", date(2026, 4, 2))
+    db.add_all([march, april, _gate("FP1", date(2026, 4, 20)), _gate("FP2", date(2024, 7, 1))])
+    db.commit()
+
+    assert period_months(db, "FP1") == [(date(2026, 3, 1), 1), (date(2026, 4, 1), 2)]
+    assert financial_years(db, "FP1") == [2026, 2025]
+
+    db.get(GateEntry, march.id).date = date(2026, 5, 1)
+    db.delete(db.get(GateEntry, april.id))
+    db.commit()
+
+    assert period_months(db, "FP1") == [(date(2026, 4, 1), 1), (date(2026, 5, 1), 1)]
+    assert financial_years(db, "FP1") == [2026]
+    assert period_months(db, "FP2", fy_start_year=2024) == [(date(2024, 7, 1), 1)]
+
+    with collect_queries() as stats:
+        financial_years(db, "FP1")
+    assert stats.query_count == 1
+
+
+def test_rows_written_outside_the_orm_are_recounted(db):
+    db.execute(GateEntry.__table__.insert().values(company_id="FP3", date=date(2023, 11, 5)))
+    db.commit()
+
+    assert financial_years(db, "FP3") == [2023]
+    assert db.query(FinancialPeriod).filter_by(company_id="FP3").count() == 1
+
+    db.execute(GateEntry.__table__.delete())
+    rebuild_financial_periods(db, "FP3")
+    db.commit()
+    assert financial_years(db, "FP3") == []
+
+
+def test_reconcile_repairs_months_that_drifted_after_the_first_build(db):
+    db.add_all([_gate("FP4", date(2025, 6, 3)), _gate("FP4", date(2025, 6, 9))])
+    db.commit()
+    assert period_months(db, "FP4") == [(date(2025, 6, 1), 2)]
+
+    gate = GateEntry.__table__
+    db.execute(gate.insert().values(company_id="FP4", date=date(2025, 8, 1)))
+    db.execute(gate.delete().where(gate.c.date == date(2025, 6, 9)))
+    db.commit()
+    assert period_months(db, "FP4") == [(date(2025, 6, 1), 2)]
+
+    assert reconcile_financial_periods(db) == 2
+    db.commit()
+    assert period_months(db, "FP4") == [(date(2025, 6, 1), 1), (date(2025, 8, 1), 1)]
+    assert reconcile_financial_periods(db, "FP4") == 0
@@ -0,0 +1,160 @@
+"""Batched forex revaluation: consolidated journals, single-pass reversal, fixed query count.
+
+Runs against SQLite in-memory, unittest.TestCase style like the other accounting tests.
+"""
+import os
+import unittest
+from collections import defaultdict
+from datetime import date
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models.enterprise_finance import (
+    AccountGroup,
+    CostCenter,
+    FinanceAuditTrail,
+    FinancialYearMaster,
+    ForexRevaluation,
+    LedgerMaster,
+    VoucherDetail,
+    VoucherHeader,
+    VoucherType,
+)
+from app.database.models.payments import CustomerReceivable
+from app.services.forex_revaluation import run_forex_revaluation
+from app.services.posting_engine import PostingEngineService
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+from app.services.bill_accounting import amount_line
+
+
+MODELS = (
+    FinancialYearMaster, AccountGroup, LedgerMaster, CostCenter, VoucherType,
+    VoucherHeader, VoucherDetail, FinanceAuditTrail, CustomerReceivable, ForexRevaluation,
+)
+
+
+def ledger_balances(db):
+    balances = defaultdict(float)
+    for line in db.query(VoucherDetail).join(VoucherHeader).filter(VoucherHeader.status == "POSTED"):
+        balances[line.ledger.ledger_name] += float(line.debit_amount or 0) - float(line.credit_amount or 0)
+    return {name: round(value, 2) for name, value in balances.items()}
+
+
+class TestForexRevaluation(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        for m in MODELS:
+            m.__table__.create(self.engine)
+        install_query_instrumentation(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+
+    def seed(self, count, company_id="C1"):
+        for i in range(count):
+            self.db.add(CustomerReceivable(
+                company_id=company_id, invoice_no=f"EXP-{i:03d}", buyer_name=f"Buyer {i % 4}",
+                country="USA", invoice_date=date(2026, 6, 1), due_date=date(2026, 9, 1), created_by="TEST", currency="USD",
+                exchange_rate=83.0 + (i % 3), invoice_value_foreign=10_000.0,
+                invoice_value_inr=10_000.0 * (83.0 + (i % 3)), balance_amount=10_000.0 * (83.0 + (i % 3)),
+            ))
+        self.db.add_all([
+            CustomerReceivable(company_id=company_id, invoice_no="LOCAL-1", buyer_name="Buyer 0", country="India",
+                               invoice_date=date(2026, 6, 1), due_date=date(2026, 9, 1), created_by="TEST", currency="INR", invoice_value_inr=5000.0, balance_amount=5000.0),
+            CustomerReceivable(company_id=company_id, invoice_no="EUR-1", buyer_name="Buyer 1", country="Spain",
+                               invoice_date=date(2026, 6, 1), due_date=date(2026, 9, 1), created_by="TEST", currency="EUR", exchange_rate=90.0,
+                               invoice_value_foreign=100.0, invoice_value_inr=9000.0, balance_amount=9000.0),
+        ])
+        self.db.commit()
+
+    def test_one_consolidated_journal_with_a_line_per_invoice(self):
+        self.seed(6)
+        result = run_forex_revaluation(self.db, "C1", date(2026, 6, 30), {"USD": 84.0}, "TEST")
+        self.db.commit()
+
+        # Booking rates 83 / 84 / 85: two gains, two losses, two zero differences; EUR has no rate.
+        self.assertEqual((result["posted"], result["skipped"], result["reversed"]), (4, 3, 0))
+        self.assertEqual(result["net_gain_loss"], 0.0)
+        journal = self.db.get(VoucherHeader, result["journal_id"])
+        self.assertEqual(len(journal.details), 6)
+        self.assertEqual(sorted(d.remarks for d in journal.details if d.remarks.startswith("EXP")), ["EXP-000", "EXP-002", "EXP-003", "EXP-005"])
+        balances = ledger_balances(self.db)
+        self.assertEqual(balances["Unrealised Forex Gain A/c"], -20_000.0)
+        self.assertEqual(balances["Unrealised Forex Loss A/c"], 20_000.0)
+        self.assertEqual({row.journal_id for row in self.db.query(ForexRevaluation)}, {journal.id})
+
+        with self.assertRaises(ValueError):
+            run_forex_revaluation(self.db, "C1", date(2026, 6, 30), {"USD": 84.0}, "TEST")
+
+    def test_next_run_reverses_prior_in_one_contra_journal(self):
+        self.seed(6)
+        first = run_forex_revaluation(self.db, "C1", date(2026, 6, 30), {"USD": 84.0}, "TEST")
+        self.db.commit()
+        second = run_forex_revaluation(self.db, "C1", date(2026, 7, 31), {"USD": 86.0}, "TEST")
+        self.db.commit()
+
+        self.assertEqual(second["reversed"], 4)
+        self.assertTrue(all(row.is_reversed for row in self.db.query(ForexRevaluation).filter(ForexRevaluation.as_of_date == date(2026, 6, 30))))
+        audit = self.db.query(FinanceAuditTrail).filter(FinanceAuditTrail.action == "REVERSE").one()
+        self.assertEqual(audit.record_id, first["journal_id"])
+        # The repo's reverse_voucher honours the recorded contra instead of reversing twice.
+        self.assertEqual(
+            PostingEngineService.reverse_voucher(self.db, "C1", first["journal_id"], "again", "TEST").id,
+            second["reversal_journal_id"],
+        )
+        # Only the July revaluation remains: 6 invoices at (86 - booking 83/84/85) * 10,000.
+        balances = ledger_balances(self.db)
+        self.assertEqual(balances["Unrealised Forex Gain A/c"], -2 * (30_000.0 + 20_000.0 + 10_000.0))
+        self.assertNotIn("Unrealised Forex Loss A/c", {k for k, v in balances.items() if v})
+
+    def test_legacy_per_invoice_journals_are_reversed_by_the_consolidated_contra(self):
+        self.seed(2)
+        receivables = self.db.query(CustomerReceivable).filter(CustomerReceivable.currency == "USD").order_by(CustomerReceivable.id).all()
+        for source, cancelled in zip(receivables, (False, True)):
+            voucher = PostingEngineService.create_voucher(
+                self.db, "C1", "Journal", date(2026, 5, 31), "legacy",
+                [
+                    amount_line(f"{source.buyer_name} - Customer A/c", "Sundry Debtors", "ASSET", debit=500.0, remarks=source.invoice_no),
+                    amount_line("Unrealised Forex Gain A/c", "Indirect Incomes", "INCOME", credit=500.0, remarks=source.invoice_no),
+                ],
+                created_by="TEST",
+            )
+            if cancelled:
+                voucher.status = "CANCELLED"
+            self.db.add(ForexRevaluation(
+                company_id="C1", receivable_id=source.id, as_of_date=date(2026, 5, 31), currency_code="USD",
+                foreign_balance=10_000, booking_rate=83, closing_rate=83.05, gain_loss_amount=500.0,
+                journal_id=voucher.id, created_by="TEST",
+            ))
+        self.db.commit()
+
+        result = run_forex_revaluation(self.db, "C1", date(2026, 6, 30), {"USD": 83.0}, "TEST")
+        self.db.commit()
+
+        # The cancelled legacy journal gets no contra; both prior rows are closed.
+        self.assertEqual(result["reversed"], 1)
+        self.assertEqual(self.db.query(ForexRevaluation).filter(ForexRevaluation.is_reversed == False).count(), 1)
+        balances = ledger_balances(self.db)
+        self.assertEqual(balances["Unrealised Forex Gain A/c"], 0.0)  # legacy +500 contra'd
+        self.assertEqual(balances["Unrealised Forex Loss A/c"], 10_000.0)  # EXP-001 booked at 84
+
+    def test_query_count_does_not_grow_with_invoices(self):
+        counts = []
+        for company_id, invoices in (("SMALL", 3), ("LARGE", 45)):
+            self.seed(invoices, company_id=company_id)
+            run_forex_revaluation(self.db, company_id, date(2026, 6, 30), {"USD": 84.5}, "TEST")
+            self.db.commit()
+            with collect_queries() as stats:
+                run_forex_revaluation(self.db, company_id, date(2026, 7, 31), {"USD": 85.5}, "TEST")
+                self.db.commit()
+            counts.append(stats.query_count)
+        self.assertEqual(counts[0], counts[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
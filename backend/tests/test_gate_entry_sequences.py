@@ -0,0 +1,102 @@
+"""Gate entry auto-increment matrix built from the newest entry per combination."""
+import json
+import os
+from datetime import date
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models.attendance import EmployeeRegistration
+from app.database.models import criteria
+from app.database.models.criteria import peeling_at, production_for
+from app.database.models.processing import GateEntry
+from app.routers.processing.gate_entry import latest_gate_sequences, load_dropdowns
+from app.services.cache import cache_delete_pattern
+from app.services.database_performance import PERFORMANCE_INDEXES
+from app.services.master_data import reset_master_data_cache
+
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    for model in (
+        GateEntry, EmployeeRegistration, criteria.species, criteria.varieties, criteria.grades,
+        criteria.glazes, criteria.freezers, criteria.brands, criteria.packing_styles,
+        criteria.production_types, criteria.production_at, criteria.peeling_at,
+        criteria.production_for, criteria.purchasing_locations, criteria.suppliers,
+        criteria.vehicle_numbers, criteria.HOSO_HLSO_Yields, criteria.grade_to_hoso,
+    ):
+        model.__table__.create(bind=engine)
+    cache_delete_pattern("bknr:master_*")
+    reset_master_data_cache()
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        production_for(company_id="C1", production_for="EXPORT", apply_from=date(2026, 4, 1)),
+        production_for(company_id="C1", production_for="DOMESTIC", apply_from=date(2026, 4, 1)),
+        peeling_at(company_id="C1", peeling_at="Unit A"),
+        peeling_at(company_id="C1", peeling_at="Unit B"),
+    ])
+    entries = [
+        ("C1", "EXPORT", "unit a ", "B-001", "CH-1", "GP-A-1"),
+        ("C1", "EXPORT", "UNIT B", "B-002", "CH-2", "GP-B-1"),
+        ("C1", "EXPORT", "Unit A", "B-003", "CH-3", "GP-A-2"),
+        ("C1", "DOMESTIC", "Unit B", "D-001", "DC-1", "GP-B-2"),
+        ("C2", "EXPORT", "Unit A", "X-999", "XX-9", "GP-X-9"),
+    ]
+    for company, p_for, center, batch, challan, gate_pass in entries:
+        session.add(GateEntry(
+            company_id=company, production_for=p_for, receiving_center=center,
+            batch_number=batch, challan_number=challan, gate_pass_number=gate_pass,
+        ))
+        session.flush()
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+    cache_delete_pattern("bknr:master_*")
+    reset_master_data_cache()
+
+
+def test_latest_sequences_keep_newest_row_per_normalised_center(db):
+    latest = latest_gate_sequences(db, "C1")
+
+    assert {key: row.gate_pass_number for key, row in latest.items()} == {
+        ("EXPORT", "UNIT A"): "GP-A-2",
+        ("EXPORT", "UNIT B"): "GP-B-1",
+        ("DOMESTIC", "UNIT B"): "GP-B-2",
+    }
+
+
+def test_latest_sequences_group_on_the_expression_index(db):
+    db.execute(text(next(sql for sql in PERFORMANCE_INDEXES if "ix_gate_entry_company_center_sequence" in sql)))
+    plans = []
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        plans.extend(row[-1] for row in cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall())
+
+    event.listen(db.get_bind(), "before_cursor_execute", explain)
+    try:
+        latest_gate_sequences(db, "C1")
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", explain)
+    assert any("ix_gate_entry_company_center_sequence" in plan for plan in plans), plans
+    assert not any("TEMP B-TREE FOR GROUP BY" in plan for plan in plans), plans
+
+
+def test_load_dropdowns_auto_increment_matrix(db):
+    result = load_dropdowns(db, "C1")
+    last_batch, last_challan, last_gp = (json.loads(value) for value in result[6:9])
+
+    assert last_batch == {"EXPORT": "B-003", "DOMESTIC": "D-001"}
+    assert last_challan == {"EXPORT": "CH-3", "DOMESTIC": "DC-1"}
+    assert last_gp == {
+        "EXPORT": {"UNIT A": "GP-A-2", "UNIT B": "GP-B-1"},
+        "DOMESTIC": {"UNIT A": "", "UNIT B": "GP-B-2"},
+    }
+    assert result[9] == "GP-B-2"
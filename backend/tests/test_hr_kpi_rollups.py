@@ -0,0 +1,223 @@
+"""HR KPI rollups: one-read dashboard totals and invalidation on employee, attendance and production writes."""
+import json
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from app.database import Base
+from app.database.models.attendance import (
+    DailyAttendance,
+    EmployeeIncrement,
+    EmployeeRegistration,
+    EmployeeSalaryAdvance,
+    EmployeeStatutoryMaster,
+    Shift,
+)
+from app.database.models.hr_kpi_rollups import HrKpiRollup
+from app.database.models.processing import Peeling, Production
+from app.routers.dashboard.hr_command_center import hr_command_center
+from app.services import hr_kpi_rollups
+from app.services.hr_kpi_rollups import install_hr_kpi_tracking, load_hr_kpi_rollups, scoped_kpis
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+
+
+pytestmark = pytest.mark.unit
+
+TODAY = date(2026, 10, 19)
+YESTERDAY = TODAY - timedelta(days=1)
+TABLES = (
+    EmployeeRegistration, DailyAttendance, EmployeeStatutoryMaster, EmployeeIncrement, EmployeeSalaryAdvance,
+    Shift, Production, Peeling, HrKpiRollup,
+)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'hr.db'}")
+    Base.metadata.create_all(bind=engine, tables=[model.__table__ for model in TABLES])
+    install_query_instrumentation(engine)
+    hr_kpi_rollups.reset_hr_kpi_cache()
+    factory = sessionmaker(bind=engine)
+    install_hr_kpi_tracking(factory)
+    session = factory()
+    yield session
+    session.close()
+    engine.dispose()
+    hr_kpi_rollups.reset_hr_kpi_cache()
+
+
+def _employee(employee_id, location, department, employee_type, salary, company_id="HR1", **fields):
+    return EmployeeRegistration(
+        company_id=company_id, employee_id=employee_id, employee_name=f"Worker {employee_id}",
+        production_at=location, department=department, employee_type=employee_type,
+        current_salary=salary, status=fields.pop("status", "ACTIVE"), **fields,
+    )
+
+
+def _duty(employee_id, day, hours, company_id="HR1", **fields):
+    return DailyAttendance(
+        company_id=company_id, employee_id=employee_id, employee_name=f"Worker {employee_id}", duty_date=day,
+        first_in=datetime.combine(day, datetime.min.time()) + timedelta(hours=8), working_hours=hours,
+        status=fields.pop("status", "CLOSED"), **fields,
+    )
+
+
+def _seed(db):
+    db.add_all([
+        _employee("E1", "Unit-1", "PEELING", "CONTRACT", 15000, contractor_name="ABC",
+                  dob=date(1990, 10, 22), joining_date=date(2020, 10, 20)),
+        _employee("E2", "Unit-1", "PEELING", "STAFF", 30000, dob=date(1985, 11, 10), joining_date=date(2024, 1, 5)),
+        _employee("E3", " unit-2 ", "PACKING", "DAY", 12000),
+        _employee("E4", "Unit-1", "PACKING", "STAFF", 20000, status="INACTIVE", resignation_date=date(2026, 3, 1)),
+        _employee("E5", "Unit-1", "PEELING", "CONTRACT", 9000, contractor_name="ABC", joining_date=date(2026, 10, 25)),
+        _employee("X1", "Unit-1", "PEELING", "STAFF", 50000, company_id="OTHER"),
+    ])
+    db.flush()
+    db.add_all([
+        EmployeeStatutoryMaster(company_id="HR1", employee_id="E1", applicable_from=date(2026, 1, 1),
+                                pf_applicable=True, uan_number="", status="ACTIVE"),
+        EmployeeStatutoryMaster(company_id="HR1", employee_id="E2", applicable_from=date(2026, 1, 1),
+                                pf_applicable=True, uan_number="U-2", esi_applicable=True, status="ACTIVE"),
+        _duty("E1", TODAY, 9, calculated_ot_hours=1, ot_status="PENDING", duty_status="APPROVED"),
+        _duty("E2", TODAY, 5, calculated_ot_hours=0, ot_status="APPROVED", duty_status="APPROVED"),
+        _duty("E3", TODAY, 0, status="OPEN"),
+        _duty("E1", YESTERDAY, 8, calculated_ot_hours=0, duty_status="PENDING"),
+        _duty("X1", TODAY, 9, company_id="OTHER", calculated_ot_hours=4),
+        Production(company_id="HR1", date=TODAY, production_at="Unit-1", production_qty=100),
+        Production(company_id="HR1", date=TODAY, production_at="Unit-2", production_qty=40),
+        Peeling(company_id="HR1", date=TODAY, peeling_at="unit-1 ", peeled_qty=50),
+    ])
+    db.commit()
+
+
+def _dashboard(db, location="Unit-1"):
+    request = Request({
+        "type": "http",
+        "query_string": b"format=json",
+        "headers": [],
+        "session": {"company_code": "HR1", "email": "hr@example.test"},
+    })
+    response = hr_command_center(
+        request, db, format="json", dept_filter="", type_filter="", status_filter="",
+        location=location, dashboard_date=TODAY,
+    )
+    return json.loads(response.body)
+
+
+def _stale_rows(db, company_id="HR1"):
+    return {
+        (row.day, row.location)
+        for row in db.query(HrKpiRollup).filter(HrKpiRollup.company_id == company_id, HrKpiRollup.kpis == hr_kpi_rollups.STALE)
+    }
+
+
+def test_dashboard_reads_its_totals_from_the_rollups(db):
+    _seed(db)
+    data = _dashboard(db)
+
+    assert (data["total_employees"], data["active_employees"], data["present_today"]) == (4, 2, 2)
+    assert (data["half_day_today"], data["ot_workers_today"], data["absent_today"]) == (1, 1, 0)
+    assert (data["staff_count"], data["total_monthly_payroll_est"], data["avg_salary"]) == (1, 45000, 22500)
+    assert (data["contract_pct"], data["labor_cost_today"], data["cost_per_kg"]) == (50.0, 1500, 10.0)
+    assert data["attrition_rate"] == 25.0
+    assert (data["pending_ot_count"], data["pending_duty_count"]) == (1, 1)
+    assert [row["employee_id"] for row in data["pending_ot_rows"]] == ["E1"]
+    assert data["heatmap_data"] == {"PACKING": [0] * 7, "PEELING": [0, 0, 0, 0, 0, 1, 2]}
+    assert data["attendance_trend_counts"][-2:] == [1, 2]
+    assert data["contractor_analytics"] == [
+        {"name": "ABC", "manpower": 1, "present": 1, "salary": 15000.0, "productivity": 100.0},
+    ]
+    assert [(row["dept"], row["emps"], row["avg_sal"]) for row in data["dept_cost_center"]] == [("PEELING", 2, 22500.0)]
+    assert (data["pf_coverage_pct"], data["stat_missing_uan"], data["stat_missing_esi"]) == (100.0, 1, 1)
+    assert data["risk_missing_statutory"] == 2
+    assert [(row["employee_id"], row["date"]) for row in data["bday_7"]] == [("E1", "1990-10-22")]
+    assert [row["employee_id"] for row in data["bday_30"]] == ["E1", "E2"]
+    assert [row["employee_id"] for row in data["anniv_7"]] == ["E1"]
+
+    everywhere = _dashboard(db, location="ALL")
+    assert (everywhere["total_employees"], everywhere["present_today"]) == (5, 3)
+    assert everywhere["cost_per_kg"] == round((15000 + 30000 + 12000) / 30 / 190, 2)
+
+
+def test_warm_rollups_are_one_query(db):
+    _seed(db)
+    days = [TODAY - timedelta(days=offset) for offset in range(30)]
+    with collect_queries() as cold:
+        first = load_hr_kpi_rollups(db, "HR1", days)
+    # The range read + one query per source table, for all thirty days at once.
+    assert sum(count for sql, count in cold.fingerprints.items() if sql.lstrip().upper().startswith("SELECT")) == 7
+    assert db.query(HrKpiRollup).filter(HrKpiRollup.company_id == "HR1").count() == 30 * 2
+
+    with collect_queries() as warm:
+        second = load_hr_kpi_rollups(db, "HR1", days)
+    assert warm.query_count == 1
+    assert second == first
+    assert scoped_kpis(second[TODAY], allowed_locations=["UNIT-2"])["production_kg"] == {"PRODUCTION": 40.0}
+
+
+def test_writes_drop_only_the_days_they_touch(db):
+    _seed(db)
+    days = [TODAY - timedelta(days=offset) for offset in range(3)]
+    load_hr_kpi_rollups(db, "HR1", days)
+    load_hr_kpi_rollups(db, "OTHER", days)
+
+    def stored(company_id="HR1"):
+        return sorted({row.day for row in db.query(HrKpiRollup).filter(HrKpiRollup.company_id == company_id)})
+
+    db.add(Production(company_id="HR1", date=YESTERDAY, production_at="Unit-1", production_qty=10))
+    db.commit()
+    assert stored() == [TODAY - timedelta(days=2), TODAY]
+
+    # An attendance write also stales every later day's approval queue.
+    load_hr_kpi_rollups(db, "HR1", days)
+    duty = db.query(DailyAttendance).filter(DailyAttendance.employee_id == "E1", DailyAttendance.duty_date == YESTERDAY).one()
+    duty.duty_status = "APPROVED"
+    db.commit()
+    assert stored() == [TODAY - timedelta(days=2)]
+    assert scoped_kpis(load_hr_kpi_rollups(db, "HR1", [TODAY])[TODAY])["duty_pending"] == 0
+
+    # An employee write stales every day, but only at its old and new location.
+    load_hr_kpi_rollups(db, "HR1", days)
+    employee = db.query(EmployeeRegistration).filter(EmployeeRegistration.employee_id == "E3").one()
+    employee.production_at = "Unit-1"
+    db.commit()
+    assert _stale_rows(db) == {(day, location) for day in days for location in ("UNIT-1", "UNIT-2")}
+    assert stored("OTHER") == days[::-1]
+    assert scoped_kpis(load_hr_kpi_rollups(db, "HR1", [TODAY])[TODAY], "UNIT-1")["present"] == 3
+
+
+def test_employee_and_statutory_writes_rebuild_only_their_locations(db):
+    _seed(db)
+    days = [TODAY - timedelta(days=offset) for offset in range(3)]
+    before = load_hr_kpi_rollups(db, "HR1", days)
+
+    def built_at(location):
+        return {row.day: row.built_at for row in db.query(HrKpiRollup).filter(HrKpiRollup.location == location)}
+
+    unit_2 = built_at("UNIT-2")
+    statutory = db.query(EmployeeStatutoryMaster).filter(EmployeeStatutoryMaster.employee_id == "E1").one()
+    statutory.uan_number = "U-1"
+    db.commit()
+    assert _stale_rows(db) == {(day, "UNIT-1") for day in days}
+
+    rollups = load_hr_kpi_rollups(db, "HR1", days)
+    assert scoped_kpis(rollups[TODAY], "UNIT-1")["statutory"]["missing_uan"] == 0
+    assert scoped_kpis(rollups[TODAY], "UNIT-1")["present"] == scoped_kpis(before[TODAY], "UNIT-1")["present"]
+    assert _stale_rows(db) == set()
+    assert built_at("UNIT-2") == unit_2
+
+    # A new location is added to every stored day, not only to days built later.
+    db.add(_employee("E6", "Unit-3", "PACKING", "STAFF", 18000))
+    db.commit()
+    assert _stale_rows(db) == {(day, "UNIT-3") for day in days}
+    rollups = load_hr_kpi_rollups(db, "HR1", days)
+    assert scoped_kpis(rollups[YESTERDAY], "UNIT-3")["active"] == 1
+    assert scoped_kpis(rollups[TODAY])["total"] == scoped_kpis(before[TODAY])["total"] + 1
+    assert load_hr_kpi_rollups(db, "HR1", days) == rollups
@@ -0,0 +1,119 @@
+"""Inventory summary: signed deltas on stock writes, verifier and bulk rebuild."""
+import os
+from datetime import date
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models.inventory_management import InventorySummary, stock_entry
+from app.services import inventory_summary_service
+from app.services.inventory_summary_service import InventorySummaryService, install_inventory_summary_tracking
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+
+
+pytestmark = pytest.mark.unit
+
+FIELDS = ("available_qty", "available_mc", "available_loose", "avg_rate", "inventory_value", "last_transaction_date")
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'summary.db'}")
+    install_query_instrumentation(engine)
+    stock_entry.__table__.create(bind=engine)
+    InventorySummary.__table__.create(bind=engine)
+    inventory_summary_service.reset_inventory_summary_cache()
+    factory = sessionmaker(bind=engine)
+    install_inventory_summary_tracking(factory)
+    session = factory()
+    yield session
+    session.close()
+    engine.dispose()
+    inventory_summary_service.reset_inventory_summary_cache()
+
+
+def _stock(qty, day, rate=None, grade="16/20", glaze=None, **extra):
+    return stock_entry(
+        company_id="IS1", date=day, cargo_movement_type=extra.pop("kind", "IN"), quantity=qty, no_of_mc=qty // 10,
+        loose=1, product_kg_value=rate, species="Vannamei", variety="PD", grade=grade, packing_style="10 x 1 KG",
+        glaze=glaze, production_for="EXPORT", production_at="UNIT-1", freezer="IQF", **extra,
+    )
+
+
+def _summary(db):
+    return {
+        row.grade: tuple(round(getattr(row, name), 2) if isinstance(getattr(row, name), float) else getattr(row, name) for name in FIELDS)
+        for row in db.query(InventorySummary).filter_by(company_id="IS1").all()
+    }
+
+
+def test_deltas_match_a_full_rebuild(db):
+    cancelled = _stock(40, date(2026, 4, 9), rate=400.0)
+    latest = _stock(30, date(2026, 4, 20), rate=360.0)
+    db.add_all([_stock(100, date(2026, 4, 1), rate=350.0), _stock(20, date(2026, 4, 3)), cancelled, latest,
+                _stock(50, date(2026, 4, 2), rate=500.0, grade="21/25", glaze="20%")])
+    db.commit()
+
+    db.get(stock_entry, cancelled.id).is_cancelled = True
+    db.delete(db.get(stock_entry, latest.id))
+    db.add(_stock(10, date(2026, 4, 5), rate=380.0, kind="OUT"))
+    db.commit()
+    incremental = _summary(db)
+
+    assert incremental["16/20"] == (130.0, 13.0, 3.0, 243.33, 31633.33, date(2026, 4, 5))
+    assert InventorySummaryService.verify_inventory_summary(db, "IS1") == []
+
+    db.delete(db.query(stock_entry).filter_by(grade="21/25").one())
+    db.commit()
+    assert "21/25" not in _summary(db)
+
+    InventorySummaryService.refresh_inventory_summary(db, "IS1")
+    assert _summary(db) == {"16/20": incremental["16/20"]}
+
+
+def test_verifier_reports_drift_and_rebuild_is_one_insert(db):
+    db.add_all([_stock(100, date(2026, 4, 1), rate=350.0), _stock(60, date(2026, 4, 2), rate=350.0, grade="U10")])
+    db.commit()
+    db.query(InventorySummary).filter_by(grade="U10").update({"available_qty": 999.0})
+    db.commit()
+
+    drift = InventorySummaryService.verify_inventory_summary(db, "IS1")
+    assert [(d["key"]["grade"], d["field"]) for d in drift] == [("U10", "available_qty")]
+
+    with collect_queries() as stats:
+        assert InventorySummaryService.refresh_inventory_summary(db, "IS1") == 2
+    assert stats.query_count == 2
+    assert InventorySummaryService.verify_inventory_summary(db, "IS1") == []
+
+
+def test_null_key_parts_upsert_into_one_row(db):
+    for qty in (10, 20, 30):
+        db.add(_stock(qty, date(2026, 5, qty // 10), rate=300.0))  # glaze is NULL
+        db.commit()
+
+    assert _summary(db) == {"16/20": (60.0, 6.0, 3.0, 300.0, 18000.0, date(2026, 5, 3))}
+    assert InventorySummaryService.verify_inventory_summary(db, "IS1") == []
+    row = db.query(InventorySummary).one()
+    with pytest.raises(IntegrityError):
+        db.execute(InventorySummary.__table__.insert().values(
+            company_id="IS1", **{name: getattr(row, name) for name in inventory_summary_service.KEY_FIELDS},
+        ))
+    db.rollback()
+
+
+def test_null_and_empty_key_parts_are_one_grain_key(db):
+    db.add_all([_stock(10, date(2026, 5, 1), rate=300.0), _stock(20, date(2026, 5, 2), rate=300.0, glaze="")])
+    db.commit()
+    assert _summary(db) == {"16/20": (30.0, 3.0, 2.0, 300.0, 9000.0, date(2026, 5, 2))}
+    assert InventorySummaryService.verify_inventory_summary(db, "IS1") == []
+
+    assert InventorySummaryService.refresh_inventory_summary(db, "IS1") == 1
+    assert InventorySummaryService.verify_inventory_summary(db, "IS1") == []
+
+    db.delete(db.query(stock_entry).filter_by(glaze="").one())
+    db.commit()
+    assert _summary(db) == {"16/20": (10.0, 1.0, 1.0, 300.0, 3000.0, date(2026, 5, 1))}
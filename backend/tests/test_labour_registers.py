@@ -0,0 +1,130 @@
+"""Keyset-paginated labour and visitor registers: stable pages, filters and bounded queries."""
+import os
+from datetime import date, datetime, time, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models.attendance import ContractLabourAttendance, DailyTemporaryWorker, VisitorEntry
+from app.routers.attendance.labour_management import register_page
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+from app.utils.keyset import InvalidCursor, encode_cursor
+
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'registers.db'}")
+    for model in (ContractLabourAttendance, DailyTemporaryWorker, VisitorEntry):
+        model.__table__.create(bind=engine)
+    install_query_instrumentation(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _visitors(db, count, company_id="LR1", start=date(2026, 10, 1)):
+    for index in range(count):
+        db.add(VisitorEntry(
+            company_id=company_id,
+            visitor_name=f"Visitor {index:03d}",
+            mobile=f"98480{index:05d}",
+            purpose="Audit" if index % 5 == 0 else "Delivery",
+            # Several visitors per day so the id tiebreak is exercised.
+            visit_date=start + timedelta(days=index // 4),
+            in_time=time(9, 0),
+            production_at="PLANT-A" if index % 2 else "PLANT-B",
+            status="INSIDE",
+        ))
+    db.commit()
+
+
+def _walk(db, register, params, *criteria):
+    seen, cursor = [], None
+    while True:
+        page = register_page(db, register, "LR1", {**params, "cursor": cursor}, *criteria)
+        assert len(page["rows"]) <= int(params.get("limit", 100))
+        seen.extend(page["rows"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+def test_pages_cover_the_register_once_in_newest_first_order(db):
+    _visitors(db, 23)
+    _visitors(db, 3, company_id="OTHER")
+
+    rows = _walk(db, "visitors", {"limit": 5})
+
+    assert len(rows) == 23 and len({row["id"] for row in rows}) == 23
+    keys = [(row["visit_date"], row["id"]) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+    assert {row["company_id"] for row in rows} == {"LR1"}
+
+
+def test_filters_are_pushed_into_the_query(db):
+    _visitors(db, 40)
+
+    rows = _walk(db, "visitors", {
+        "limit": 3, "location": "PLANT-A", "q": "audit",
+        "date_from": "2026-10-02", "date_to": "2026-10-08",
+    })
+
+    assert rows and all(row["production_at"] == "PLANT-A" and row["purpose"] == "Audit" for row in rows)
+    assert all("2026-10-02" <= row["visit_date"] <= "2026-10-08" for row in rows)
+    assert register_page(db, "visitors", "LR1", {"q": "100%"})["rows"] == []
+
+
+def test_page_cost_does_not_grow_with_history(db):
+    _visitors(db, 300)
+    first = register_page(db, "visitors", "LR1", {"limit": 20})
+
+    with collect_queries() as stats:
+        page = register_page(db, "visitors", "LR1", {"limit": 20, "cursor": first["next_cursor"]})
+
+    assert len(page["rows"]) == 20 and stats.query_count == 1
+    (statement,) = stats.fingerprints
+    assert "LIMIT" in statement and "visitor_entries.id < ?" in statement
+
+
+def test_attendance_and_day_worker_registers(db):
+    base = datetime(2026, 10, 19, 8, 0)
+    for index in range(7):
+        db.add(ContractLabourAttendance(
+            company_id="LR1", labour_id=f"SA{index:05d}", labour_name=f"Worker {index}",
+            attendance_date=base.date(), in_time=base + timedelta(minutes=index % 3), status="INSIDE",
+        ))
+        db.add(DailyTemporaryWorker(
+            company_id="LR1", worker_name=f"Helper {index}", purpose="Loading",
+            worker_type="DAY WORKER" if index % 2 else "DAILY LABOUR",
+            work_date=base.date(), in_time=time(8, 0),
+        ))
+    # Yesterday's night shift, clocked in after today's first entries.
+    db.add(ContractLabourAttendance(
+        company_id="LR1", labour_id="SA00000", labour_name="Worker 0",
+        attendance_date=base.date() - timedelta(days=1), in_time=base + timedelta(hours=1), status="INSIDE",
+    ))
+    db.commit()
+
+    attendance = _walk(db, "contract_attendance", {"limit": 2, "date_from": "2026-10-19", "date_to": "2026-10-19"})
+    assert [(row["in_time"], row["id"]) for row in attendance] == sorted(
+        ((row["in_time"], row["id"]) for row in attendance), reverse=True
+    ) and len(attendance) == 7
+    history = _walk(db, "contract_attendance", {"limit": 3})
+    assert [row["attendance_date"] for row in history] == ["2026-10-19"] * 7 + ["2026-10-18"]
+
+    day_workers = _walk(db, "daily_workers", {"limit": 2}, DailyTemporaryWorker.worker_type == "DAY WORKER")
+    assert {row["worker_name"] for row in day_workers} == {"Helper 1", "Helper 3", "Helper 5"}
+
+
+def test_foreign_or_garbled_cursors_are_rejected(db):
+    _visitors(db, 3)
+    for cursor in ("not-a-cursor", encode_cursor([7]), encode_cursor(["yesterday", 1])):
+        with pytest.raises(InvalidCursor):
+            register_page(db, "visitors", "LR1", {"cursor": cursor})
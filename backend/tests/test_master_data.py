@@ -0,0 +1,101 @@
+"""Tenant master-data cache: typed maps, cached reads and version bumps."""
+import os
+from datetime import date
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models import criteria
+from app.services import master_data
+from app.services.cache import cache_delete_pattern
+from app.services.master_data import bump_master_data_version, get_tenant_masters, install_master_data_tracking
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+
+
+pytestmark = pytest.mark.unit
+
+MODELS = (
+    criteria.species, criteria.varieties, criteria.grades, criteria.glazes, criteria.freezers,
+    criteria.brands, criteria.packing_styles, criteria.production_types, criteria.production_at,
+    criteria.peeling_at, criteria.production_for, criteria.purchasing_locations, criteria.suppliers,
+    criteria.vehicle_numbers, criteria.HOSO_HLSO_Yields, criteria.grade_to_hoso,
+)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    install_query_instrumentation(engine)
+    for model in MODELS:
+        model.__table__.create(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        criteria.species(company_id="MDC1", species_name="Vannamei"),
+        criteria.varieties(company_id="MDC1", variety_name="PD", peeling_yield="80", soaking_yield="105"),
+        criteria.varieties(company_id="MDC2", variety_name="PD", peeling_yield="50"),
+        criteria.packing_styles(company_id="MDC1", packing_style="10 x 1 KG", mc_weight=10.0, slab_weight=1.0),
+        criteria.production_for(company_id="MDC1", production_for="EXPORT", apply_from=date(2026, 4, 1), status="Active"),
+        criteria.HOSO_HLSO_Yields(company_id="MDC1", species="Vannamei", hoso_count=30, hlso_yield_pct=65.0, hlso_count=46),
+        criteria.HOSO_HLSO_Yields(company_id="MDC1", species="VANNAMEI ", hoso_count=40, hlso_yield_pct=66.0, hlso_count=60),
+    ])
+    session.commit()
+    cache_delete_pattern("bknr:master_*")
+    master_data.reset_master_data_cache()
+    yield session
+    session.close()
+    engine.dispose()
+    cache_delete_pattern("bknr:master_*")
+    master_data.reset_master_data_cache()
+
+
+def test_typed_maps_are_keyed_by_normalised_name(db):
+    masters = get_tenant_masters(db, "MDC1")
+
+    assert masters.species == ("Vannamei",)
+    assert masters.variety(" pd ").peeling_yield == "80"
+    assert masters.packing_style("10 X 1 kg").mc_weight == 10.0
+    assert [y.hoso_count for y in masters.species_yields("vannamei")] == [30, 40]
+    assert masters.production_for[0].name == "EXPORT"
+    assert get_tenant_masters(db, "MDC2").variety("PD").peeling_yield == "50"
+
+
+def test_second_read_is_served_without_queries_until_version_bump(db):
+    get_tenant_masters(db, "MDC1")
+
+    with collect_queries() as stats:
+        masters = get_tenant_masters(db, "MDC1")
+    assert stats.query_count == 0
+    assert masters.grades == ()
+
+    db.add(criteria.grades(company_id="MDC1", grade_name="16/20"))
+    db.commit()
+    assert get_tenant_masters(db, "MDC1").grades == ()
+
+    bump_master_data_version("MDC1")
+    with collect_queries() as stats:
+        masters = get_tenant_masters(db, "MDC1")
+    assert stats.query_count > 0
+    assert masters.grades == ("16/20",)
+
+
+def test_committed_orm_writes_to_the_masters_bump_the_version(db):
+    factory = sessionmaker(bind=db.get_bind())
+    install_master_data_tracking(factory)
+    assert get_tenant_masters(db, "MDC1").variety_names == ("PD",)
+
+    with factory() as qa:  # e.g. QA testing adding a product it has not seen before
+        qa.add(criteria.varieties(company_id="MDC1", variety_name="PDTO"))
+        qa.flush()
+        qa.rollback()
+    with collect_queries() as stats:
+        get_tenant_masters(db, "MDC1")
+    assert stats.query_count == 0
+
+    with factory() as qa:
+        qa.add(criteria.varieties(company_id="MDC1", variety_name="PDTO"))
+        qa.commit()
+    assert get_tenant_masters(db, "MDC1").variety_names == ("PD", "PDTO")
+    assert get_tenant_masters(db, "MDC2").variety_names == ("PD",)
@@ -0,0 +1,104 @@
+"""Prometheus-style metrics: exposition format and multi-worker merge."""
+import json
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services import metrics
+from app.services.metrics import (
+    MetricsMiddleware,
+    inc,
+    observe,
+    record_cache_lookup,
+    render_metrics,
+    timed_job,
+)
+
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture(autouse=True)
+def local_registry(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", "")
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    metrics.reset_metrics()
+    yield
+    metrics.reset_metrics()
+
+
+def test_histogram_exposition_is_cumulative():
+    observe("bknr_http_request_duration_seconds", 0.02, method="GET", route="/x", status="2xx")
+    observe("bknr_http_request_duration_seconds", 3.0, method="GET", route="/x", status="2xx")
+
+    text = render_metrics()
+
+    labels = 'method="GET",route="/x",status="2xx"'
+    assert "# TYPE bknr_http_request_duration_seconds histogram" in text
+    assert f'bknr_http_request_duration_seconds_bucket{{{labels},le="0.01"}} 0' in text
+    assert f'bknr_http_request_duration_seconds_bucket{{{labels},le="0.025"}} 1' in text
+    assert f'bknr_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f"bknr_http_request_duration_seconds_count{{{labels}}} 2" in text
+
+
+def test_cache_lookups_are_labelled_by_area():
+    record_cache_lookup("bknr:inventory_dashboard:C1:abc", True)
+    record_cache_lookup("bknr:inventory_dashboard:C1:abc", False)
+    record_cache_lookup("session-key", False)
+
+    text = render_metrics()
+
+    assert 'bknr_cache_requests_total{area="inventory_dashboard",result="hit"} 1' in text
+    assert 'bknr_cache_requests_total{area="other",result="miss"} 1' in text
+
+
+def test_middleware_labels_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/lots/{lot_id}")
+    def get_lot(lot_id: int):
+        return {"id": lot_id}
+
+    client = TestClient(app)
+    client.get("/lots/1")
+    client.get("/lots/2")
+    client.get("/nowhere")
+
+    text = render_metrics()
+    assert 'method="GET",route="/lots/{lot_id}",status="2xx"} 2' in text
+    assert 'route="unmatched",status="4xx"' in text
+
+
+def test_timed_job_records_outcome():
+    timed_job("snapshot", lambda: "skipped")()
+    with pytest.raises(RuntimeError):
+        timed_job("snapshot", lambda: (_ for _ in ()).throw(RuntimeError("boom")))()
+
+    text = render_metrics()
+    assert 'bknr_scheduler_job_duration_seconds_count{job="snapshot",outcome="skipped"} 1' in text
+    assert 'bknr_scheduler_job_duration_seconds_count{job="snapshot",outcome="error"} 1' in text
+
+
+def test_shared_directory_merges_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    other_worker = {
+        "worker": "999999",
+        "at": 0,
+        "counters": [["bknr_cache_requests_total", [["area", "reports"], ["result", "hit"]], 4]],
+        "histograms": [],
+        "gauges": [["bknr_db_pool_checked_out", [], 3]],
+    }
+    (tmp_path / "worker-999999.json").write_text(json.dumps(other_worker))
+    inc("bknr_cache_requests_total", area="reports", result="hit")
+
+    text = render_metrics()
+
+    assert 'bknr_cache_requests_total{area="reports",result="hit"} 5' in text
+    # Gauges from a stale snapshot are dropped; counters are kept.
+    assert 'worker="999999"' not in text
+    assert (tmp_path / f"worker-{os.getpid()}.json").exists()
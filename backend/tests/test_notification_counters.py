@@ -0,0 +1,166 @@
+"""Header-bell counters: maintained on flush, one-query reads and the SSE hub fan-out."""
+import asyncio
+import os
+from datetime import date, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models.attendance import DailyAttendance
+from app.database.models.helpdesk import CompanyAnnouncement, SupportTicket
+from app.database.models.inventory_management import cold_storage_holding, pending_orders
+from app.database.models.notification_counters import NotificationCounter
+from app.database.models.processing import GateEntry
+from app.services import notification_counters
+from app.services.notification_counters import (
+    COUNTERS,
+    NotificationHub,
+    install_notification_tracking,
+    notification_feed,
+    rebuild_notification_counters,
+)
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'notifications.db'}")
+    for spec in COUNTERS.values():
+        notification_counters._model(spec).__table__.create(bind=engine, checkfirst=True)
+    NotificationCounter.__table__.create(bind=engine)
+    install_query_instrumentation(engine)
+    notification_counters.reset_notification_cache()
+    factory = sessionmaker(bind=engine)
+    install_notification_tracking(factory)
+    yield factory
+    engine.dispose()
+    notification_counters.reset_notification_cache()
+
+
+def _seed(db, company_id="NC1"):
+    today = date.today()
+    db.add_all([
+        GateEntry(company_id=company_id, batch_number="B-1", date=today),
+        GateEntry(company_id=company_id, batch_number="B-0", date=today - timedelta(days=1)),
+        DailyAttendance(company_id=company_id, employee_id="E1", duty_date=today),
+        pending_orders(company_id=company_id, po_number="PO-1"),
+        pending_orders(company_id=company_id, po_number="PO-2"),
+        cold_storage_holding(company_id=company_id, batch_number="CS-1", status="HOLDING"),
+        cold_storage_holding(company_id=company_id, batch_number="CS-2", status="RELEASED"),
+        CompanyAnnouncement(company_id=company_id, message="Shift change at 6 PM", created_by="admin@nc1"),
+    ])
+    db.commit()
+
+
+def _counts(feed):
+    return {item["title"]: item["desc"].split(" ")[0] for item in feed}
+
+
+def test_feed_matches_source_counts_and_follows_writes(factory):
+    db = factory()
+    _seed(db)
+    _seed(db, company_id="OTHER")
+    db.add(SupportTicket(company_id="OTHER", subject="Scale drift", status="OPEN"))
+    db.commit()
+
+    counts = _counts(notification_feed(db, "NC1"))
+    assert counts["Material Gate Entry Completed"] == "1"
+    assert counts["Shift Attendance Logged"] == "1"
+    assert counts["Open Support Tickets"] == "1"  # tickets were never company-scoped
+    assert counts["Pending Export Orders"] == "2"
+    assert counts["Cold Storage Stock"] == "1"
+    assert counts["admin@nc1"] == "Shift"
+
+    db.add(GateEntry(company_id="NC1", batch_number="B-2", date=date.today()))
+    db.query(cold_storage_holding).filter(cold_storage_holding.batch_number == "CS-1").filter(
+        cold_storage_holding.company_id == "NC1"
+    ).one().status = "RELEASED"
+    db.delete(db.query(pending_orders).filter(pending_orders.company_id == "NC1").first())
+    db.query(SupportTicket).one().status = "RESOLVED"
+    db.add(CompanyAnnouncement(company_id="*", message="Maintenance tonight", created_by="bknr.solutions@gmail.com"))
+    db.commit()
+
+    feed = notification_feed(db, "NC1")
+    counts = _counts(feed)
+    assert counts["Material Gate Entry Completed"] == "2"
+    assert counts["Pending Export Orders"] == "1"
+    assert "Cold Storage Stock" not in counts and "Open Support Tickets" not in counts
+    assert "Maintenance tonight" in [item["desc"] for item in feed]
+    assert _counts(notification_feed(db, "OTHER"))["Pending Export Orders"] == "2"
+    db.close()
+
+
+def test_cached_read_is_one_query_and_rebuild_catches_bypassed_writes(factory):
+    db = factory()
+    _seed(db)
+    notification_feed(db, "NC1")
+
+    with collect_queries() as stats:
+        notification_feed(db, "NC1")
+    assert stats.query_count == 1
+
+    db.execute(pending_orders.__table__.insert().values(company_id="NC1", po_number="PO-BULK"))
+    db.commit()
+    assert _counts(notification_feed(db, "NC1"))["Pending Export Orders"] == "2"
+    rebuild_notification_counters(db, "NC1")
+    db.commit()
+    assert _counts(notification_feed(db, "NC1"))["Pending Export Orders"] == "3"
+    db.close()
+
+
+def test_concurrent_first_reads_keep_the_counts_already_seeded(factory):
+    db = factory()
+    _seed(db)
+    day = date.today().isoformat()
+    with db.get_bind().begin() as other:
+        notification_counters._store_scope(other, "NC1", day, replace=False)
+
+    # This read raced the one above: its seed must not hit the unique key.
+    notification_counters._store_scope(db.connection(), "NC1", day, replace=False)
+    db.commit()
+    assert _counts(notification_feed(db, "NC1"))["Pending Export Orders"] == "2"
+    assert db.query(NotificationCounter).filter(NotificationCounter.company_id == "NC1").count() == len([
+        spec for spec in COUNTERS.values() if "company" in spec.scopes
+    ])
+    db.close()
+
+
+def test_hub_polls_once_for_every_tab_and_notifies_only_changed_companies(factory):
+    with factory() as db:
+        _seed(db)
+        _seed(db, company_id="OTHER")
+
+    async def scenario():
+        hub = NotificationHub(session_factory=factory, interval=3600)
+        nc1 = [await hub.subscribe("NC1") for _ in range(3)]
+        other = [await hub.subscribe("OTHER") for _ in range(2)]
+        assert all(queue.get_nowait() for queue in nc1 + other)  # initial feed on connect
+
+        with collect_queries() as idle:
+            assert await hub.poll() == 0
+        assert idle.query_count == 1
+
+        with factory() as db:
+            db.add(DailyAttendance(company_id="NC1", employee_id="E2", duty_date=date.today()))
+            db.commit()
+        with collect_queries() as changed:
+            assert await hub.poll() == 3
+        assert changed.query_count == 1  # announcement list unchanged, served from cache
+        assert all(_counts(queue.get_nowait())["Shift Attendance Logged"] == "2" for queue in nc1)
+        assert all(queue.empty() for queue in other)
+
+        for queue in nc1:
+            hub.unsubscribe("NC1", queue)
+        for queue in other:
+            hub.unsubscribe("OTHER", queue)
+        assert hub.subscriber_count() == 0
+        if hub._task:
+            hub._task.cancel()
+
+    asyncio.run(scenario())
@@ -0,0 +1,222 @@
+"""Production cost pools: SQL aggregation, reuse across periods and invalidation on writes."""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.database.models.bills import DieselLog, ElectricityLog, OtherExpense
+from app.database.models.criteria import production_at
+from app.database.models.enterprise_finance import SalaryProcessing
+from app.database.models.general_stock import GeneralStock
+from app.database.models.inventory_management import stock_entry
+from app.database.models.production_cost_pools import ProductionCostPool, ProductionCostPoolGeneration
+from app.services import production_cost_pools
+from app.services.production_cost_automation import (
+    build_monthly_production_cost_preview,
+    build_production_cost_comparison,
+)
+from app.services.production_cost_pools import install_cost_pool_tracking, load_cost_pools
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+
+
+pytestmark = pytest.mark.unit
+
+AS_OF = date(2026, 10, 19)
+SOURCES = (production_at, stock_entry, SalaryProcessing, ElectricityLog, DieselLog, OtherExpense, GeneralStock)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pools.db'}")
+    Base.metadata.create_all(bind=engine, tables=[
+        model.__table__ for model in (*SOURCES, ProductionCostPool, ProductionCostPoolGeneration)
+    ])
+    install_query_instrumentation(engine)
+    production_cost_pools.reset_cost_pool_cache()
+    factory = sessionmaker(bind=engine)
+    install_cost_pool_tracking(factory)
+    session = factory()
+    session.info["factory"] = factory
+    yield session
+    session.close()
+    engine.dispose()
+    production_cost_pools.reset_cost_pool_cache()
+
+
+def _seed(db, company_id="PC1"):
+    unit_1 = production_at(company_id=company_id, production_at="Unit-1")
+    unit_2 = production_at(company_id=company_id, production_at="Unit-2")
+    db.add_all([unit_1, unit_2])
+    db.flush()
+
+    def stock(day, unit, po_number, variety, quantity, movement="IN", cancelled=False):
+        return stock_entry(
+            company_id=company_id, date=day, production_at=unit, po_number=po_number, variety=variety,
+            batch_number=f"B-{day.day}", quantity=quantity, cargo_movement_type=movement, is_cancelled=cancelled,
+        )
+
+    def salary(month, unit, gross, status, pf=0.0):
+        return SalaryProcessing(
+            company_id=company_id, month_year=month, employee_id=f"E-{month}-{unit}", employee_name="Worker",
+            production_at=unit, gross_salary=gross, pf_employer=pf, status=status,
+        )
+
+    def consumable(day, po_number, item, amount):
+        return GeneralStock(
+            company_id=company_id, date=day, production_at="Unit-1", po_number=po_number,
+            item_name=item, movement_type="OUT", quantity=1, amount=amount,
+        )
+
+    db.add_all([
+        stock(date(2026, 9, 10), "Unit-1", "PO-1", "PD", 500),
+        stock(date(2026, 10, 5), "Unit-1", "PO-1", "PD NS", 300),
+        stock(AS_OF, "Unit-1", "PO-2", "PD", 200),
+        stock(AS_OF, " unit-2 ", "PO-2", "PD", 100),
+        stock(AS_OF, "Unit-1", "PO-2", "PD", 999, movement="OUT"),
+        stock(AS_OF, "Unit-1", "PO-2", "PD", 50, cancelled=True),
+        salary("2026-09", "Unit-1", 30000, "APPROVED"),
+        salary("2026-10", "Unit-1", 31000, "PAID", pf=1000),
+        salary("2026-10", "Unit-2", 5000, "DRAFT"),
+        ElectricityLog(unit_id=unit_1.id, reading_date=date(2026, 9, 10), total_cost=9000),
+        ElectricityLog(unit_id=unit_1.id, reading_date=AS_OF, total_cost=1000),
+        ElectricityLog(unit_id=unit_2.id, reading_date=AS_OF, total_cost=400),
+        DieselLog(unit_id=unit_1.id, log_date=AS_OF, type="OUT", consumption=6, net_val=600),
+        DieselLog(unit_id=unit_1.id, log_date=AS_OF, type="IN", purchase_qty=50, net_val=5000),
+        OtherExpense(unit_id=unit_1.id, date=AS_OF, category="Canteen", amount=300, status="POSTED"),
+        OtherExpense(unit_id=unit_1.id, date=AS_OF, category="Freight", amount=800, status="POSTED"),
+        consumable(AS_OF, "PO-1", "MASTER CARTON", 700),
+        consumable(AS_OF, "", "STPP", 150),
+        consumable(AS_OF, "N/A", "GLOVES", 50),
+        consumable(date(2026, 10, 25), "", "GLOVES", 999),
+    ])
+    db.commit()
+    return unit_1, unit_2
+
+
+def _detail_total(period, key):
+    return round(sum(row["amount"] for row in period["source_details"][key]), 2)
+
+
+def test_comparison_periods_are_cut_from_the_monthly_pools(db):
+    _seed(db)
+    _seed(db, company_id="OTHER")
+
+    comparison = build_production_cost_comparison(db, "PC1", as_of_date=AS_OF)
+    today, last_month, this_month, year = (comparison[key] for key in ("today", "last_month", "this_month", "year"))
+
+    assert today["total_output_weight_kg"] == 300
+    assert today["common_costs"] == {
+        "salary_cost": round(32000 / 31, 2),
+        "electricity_cost": 1400.0,
+        "diesel_cost": 600.0,
+        "other_expense_cost": 300.0,
+        "other_consumables_cost": 50.0,
+    }
+    assert today["carton_costs"] == {"PO-1": 700.0} and today["chemical_costs"] == {"COMMON": 150.0}
+    assert any("FREIGHT" in warning for warning in today["warnings"])
+    assert any("PO PO-1 has no matching" in warning for warning in today["warnings"])
+    # The drill-down rows add up to the pooled totals and keep batch detail.
+    assert {row["batch_number"] for row in today["allocations"]} == {"B-19"}
+    for key, cost in (("salary", "salary_cost"), ("electricity", "electricity_cost"), ("diesel", "diesel_cost")):
+        assert _detail_total(today, key) == today["common_costs"][cost]
+    assert sum(row["weight_kg"] for row in today["source_details"]["production"]) == 300
+
+    assert last_month["total_output_weight_kg"] == 500
+    assert last_month["common_costs"]["salary_cost"] == 30000
+    assert last_month["common_costs"]["electricity_cost"] == 9000
+    assert this_month["total_output_weight_kg"] == 600
+    assert year["total_output_weight_kg"] == 1100
+    assert year["non_ns_output_weight_kg"] == 800
+    assert year["common_costs"]["salary_cost"] == round(30000 + 32000 * 19 / 31, 2)
+    assert year["common_costs"]["electricity_cost"] == 10400
+    assert year["source_details"]["production"] == []
+
+    unit_only = build_monthly_production_cost_preview(db, "PC1", "2026-10", "unit-2", period_end=AS_OF)
+    assert unit_only["total_output_weight_kg"] == 100
+    assert unit_only["common_costs"]["electricity_cost"] == 400
+    assert unit_only["common_costs"]["salary_cost"] == 0
+    assert any("No approved or paid salary" in warning for warning in unit_only["warnings"])
+
+
+def test_warm_comparison_reads_every_pool_in_one_query(db):
+    _seed(db)
+    with collect_queries() as cold:
+        first = build_production_cost_comparison(db, "PC1", as_of_date=AS_OF)
+    assert sum(count for sql, count in cold.fingerprints.items() if "GROUP BY" in sql) == 6
+    assert db.query(ProductionCostPool).filter(ProductionCostPool.company_id == "PC1").count() == 10
+
+    with collect_queries() as warm:
+        second = build_production_cost_comparison(db, "PC1", as_of_date=AS_OF)
+    # One read of the ten stored months + today's six drill-down queries.
+    assert warm.query_count == 7
+    assert second == first
+
+
+def test_writes_drop_only_the_months_they_touch(db):
+    unit_1, _ = _seed(db)
+    load_cost_pools(db, "PC1", ["2026-09", "2026-10"])
+
+    db.add(ElectricityLog(unit_id=unit_1.id, reading_date=date(2026, 9, 20), total_cost=500))
+    db.commit()
+    assert [row.month for row in db.query(ProductionCostPool)] == ["2026-10"]
+    preview = build_monthly_production_cost_preview(db, "PC1", "2026-09", include_details=False)
+    assert preview["common_costs"]["electricity_cost"] == 9500
+
+    moved = db.query(stock_entry).filter(stock_entry.date == date(2026, 10, 5)).one()
+    moved.date = date(2026, 9, 5)
+    db.commit()
+    assert db.query(ProductionCostPool).count() == 0
+    assert load_cost_pools(db, "PC1", ["2026-09"])["2026-09"]["output"][0][:2] == ["2026-09-05", "UNIT-1"]
+
+    unit_1.production_at = "Unit-1A"
+    db.commit()
+    assert db.query(ProductionCostPool).count() == 0
+    renamed = build_monthly_production_cost_preview(db, "PC1", "2026-09", "Unit-1A", include_details=False)
+    assert renamed["common_costs"]["electricity_cost"] == 9500
+
+
+def test_pools_built_over_uncommitted_writes_roll_back_with_them(db):
+    _seed(db)
+    load_cost_pools(db, "PC1", ["2026-10"])
+
+    db.add(stock_entry(company_id="PC1", date=AS_OF, production_at="Unit-1", po_number="PO-9",
+                       variety="PD", quantity=1000, cargo_movement_type="IN"))
+    db.flush()
+    preview = build_monthly_production_cost_preview(db, "PC1", "2026-10", period_end=AS_OF, include_details=False)
+    assert preview["total_output_weight_kg"] == 1600
+    db.rollback()
+
+    # The rollback restores the pools the flush dropped, not the ones built after it.
+    assert [row.month for row in db.query(ProductionCostPool)] == ["2026-10"]
+    preview = build_monthly_production_cost_preview(db, "PC1", "2026-10", period_end=AS_OF, include_details=False)
+    assert preview["total_output_weight_kg"] == 600
+
+
+def test_pools_aggregated_while_a_write_commits_are_not_stored(db, monkeypatch):
+    unit_id = _seed(db)[0].id
+    seeded = db.query(ProductionCostPoolGeneration.generation).scalar()
+    aggregate = production_cost_pools._aggregate
+
+    def aggregate_while_another_request_writes(connection, company_id, months):
+        built = aggregate(connection, company_id, months)
+        with db.info["factory"]() as other:
+            other.add(ElectricityLog(unit_id=unit_id, reading_date=AS_OF, total_cost=250))
+            other.commit()
+        return built
+
+    monkeypatch.setattr(production_cost_pools, "_aggregate", aggregate_while_another_request_writes)
+    assert load_cost_pools(db, "PC1", ["2026-10"])["2026-10"]["electricity"]
+    db.commit()
+    assert db.query(ProductionCostPool).count() == 0
+    assert db.query(ProductionCostPoolGeneration.generation).scalar() == seeded + 1
+
+    monkeypatch.setattr(production_cost_pools, "_aggregate", aggregate)
+    preview = build_monthly_production_cost_preview(db, "PC1", "2026-10", include_details=False)
+    assert preview["common_costs"]["electricity_cost"] == 1650
+    assert [row.month for row in db.query(ProductionCostPool)] == ["2026-10"]
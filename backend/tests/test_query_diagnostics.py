@@ -0,0 +1,78 @@
+"""Per-request SQL instrumentation and N+1 warnings."""
+import logging
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.services import query_diagnostics
+from app.services.query_diagnostics import (
+    QueryDiagnosticsMiddleware,
+    collect_queries,
+    fingerprint,
+    install_query_instrumentation,
+    recent_requests,
+)
+
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    install_query_instrumentation(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE lots (id INTEGER PRIMARY KEY, qty INTEGER)"))
+        conn.execute(text("INSERT INTO lots (id, qty) VALUES (1, 5), (2, 7), (3, 9)"))
+    yield engine
+    engine.dispose()
+
+
+def test_fingerprint_ignores_literals_and_bind_values():
+    assert fingerprint("SELECT * FROM lots WHERE id = 17 AND code = 'A''B'") == fingerprint(
+        "SELECT *  FROM lots\n WHERE id = 4 AND code = 'X'"
+    )
+    assert fingerprint("SELECT 1 FROM t WHERE id IN (?, ?, ?)") == "SELECT ? FROM t WHERE id IN (?)"
+
+
+def test_collect_queries_counts_statements_and_checkouts(engine):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    with collect_queries("job") as stats:
+        with engine.connect() as conn:
+            for lot_id in (1, 2, 3):
+                conn.execute(text("SELECT qty FROM lots WHERE id = :id"), {"id": lot_id})
+
+    assert stats.query_count == 3
+    assert stats.checkouts == 1
+    assert stats.duplicates() == [("SELECT qty FROM lots WHERE id = ?", 3)]
+    assert query_diagnostics.current_query_stats() is None
+
+
+def test_middleware_sets_server_timing_and_warns_on_repeated_statements(engine, monkeypatch, caplog):
+    monkeypatch.setattr(query_diagnostics, "DUPLICATE_THRESHOLD", 3)
+    query_diagnostics.clear_recent_requests()
+
+    app = FastAPI()
+    app.add_middleware(QueryDiagnosticsMiddleware)
+
+    @app.get("/lots")
+    def list_lots():
+        with engine.connect() as conn:
+            return [conn.execute(text("SELECT qty FROM lots WHERE id = :id"), {"id": i}).scalar() for i in (1, 2, 3)]
+
+    with caplog.at_level(logging.WARNING, logger="BKNR_ERP.sql"):
+        response = TestClient(app).get("/lots")
+
+    assert response.json() == [5, 7, 9]
+    assert 'db;dur=' in response.headers["Server-Timing"]
+    assert 'desc="3 queries"' in response.headers["Server-Timing"]
+    assert "Possible N+1 in GET /lots" in caplog.text
+    assert recent_requests()[0]["query_count"] == 3
@@ -0,0 +1,99 @@
+"""Schema readiness registry: recorded steps skip runtime DDL."""
+import os
+import sys
+import types
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models.system_settings import SchemaEnsureStep
+from app.services import schema_readiness
+from app.services.schema_readiness import (
+    apply_schema_steps,
+    ensure_schema_step,
+    is_schema_step_ready,
+    load_schema_readiness,
+)
+
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def steps(monkeypatch):
+    calls = []
+    module = types.ModuleType("fake_schema_steps")
+
+    def apply_widgets(db):
+        calls.append("widgets")
+        db.execute(text("CREATE TABLE IF NOT EXISTS widgets (id INTEGER PRIMARY KEY)"))
+
+    def apply_broken(db):
+        calls.append("broken")
+        raise RuntimeError("boom")
+
+    module.apply_widgets = apply_widgets
+    module.apply_broken = apply_broken
+    monkeypatch.setitem(sys.modules, "fake_schema_steps", module)
+    monkeypatch.setattr(schema_readiness, "SCHEMA_STEPS", {
+        "widgets": (2, "fake_schema_steps:apply_widgets"),
+        "broken": (1, "fake_schema_steps:apply_broken"),
+    })
+    schema_readiness.reset_schema_readiness()
+    yield calls
+    schema_readiness.reset_schema_readiness()
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:")
+    SchemaEnsureStep.__table__.create(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def test_recorded_step_is_ready_without_running_ddl(engine, steps):
+    db = sessionmaker(bind=engine)()
+    db.add(SchemaEnsureStep(name="widgets", version=2))
+    db.commit()
+
+    assert load_schema_readiness(db) == {"widgets"}
+    assert ensure_schema_step(db, "widgets") is True
+    assert steps == []
+    db.close()
+
+
+def test_outdated_step_is_applied_once_and_recorded(engine, steps):
+    db = sessionmaker(bind=engine)()
+    db.add(SchemaEnsureStep(name="widgets", version=1))
+    db.commit()
+
+    assert ensure_schema_step(db, "widgets", commit=True) is True
+    assert ensure_schema_step(db, "widgets", commit=True) is True
+
+    assert steps == ["widgets"]
+    assert db.get(SchemaEnsureStep, "widgets").version == 2
+    assert "widgets" in inspect(engine).get_table_names()
+    db.close()
+
+
+def test_failing_step_keeps_session_usable(engine, steps):
+    db = sessionmaker(bind=engine)()
+
+    assert ensure_schema_step(db, "broken") is False
+    assert not is_schema_step_ready("broken")
+    assert db.execute(text("SELECT 1")).scalar() == 1
+    db.close()
+
+
+def test_migration_applies_pending_steps(engine, steps):
+    with engine.begin() as connection:
+        results = apply_schema_steps(connection)
+
+    assert results["widgets"].startswith("applied")
+    assert results["broken"].startswith("failed")
+    with sessionmaker(bind=engine)() as db:
+        assert [row.name for row in db.query(SchemaEnsureStep).all()] == ["widgets"]
@@ -0,0 +1,159 @@
+"""Global menu search: maintained search_documents, ranking, tenancy and the scan fallback."""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models.attendance import EmployeeRegistration
+from app.database.models.criteria import buyers, suppliers
+from app.database.models.derived_tables import DerivedTableBuild
+from app.database.models.inventory_management import sales_dispatch
+from app.database.models.job_leases import JobLease
+from app.database.models.processing import GateEntry
+from app.database.models.search_index import SearchDocument
+from app.services import search_index
+from app.services.derived_tables import run_derived_table_backfill
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+from app.services.search_index import SOURCES, install_search_index_tracking, rebuild_search_index, search
+
+
+pytestmark = pytest.mark.unit
+
+
+def _factory(tmp_path, with_index=True):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    for source in SOURCES.values():
+        search_index._model(source).__table__.create(bind=engine)
+    if with_index:
+        for model in (SearchDocument, DerivedTableBuild, JobLease):
+            model.__table__.create(bind=engine)
+    install_query_instrumentation(engine)
+    search_index.reset_search_index_cache()
+    factory = sessionmaker(bind=engine)
+    install_search_index_tracking(factory)
+    return engine, factory
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine, factory = _factory(tmp_path)
+    session = factory()
+    yield session
+    session.close()
+    engine.dispose()
+    search_index.reset_search_index_cache()
+
+
+def _seed(db, company_id="SI1"):
+    db.add_all([
+        buyers(company_id=company_id, buyer_name="Sea Gold Foods"),
+        buyers(company_id=company_id, buyer_name="Golden Harvest Seafoods"),
+        suppliers(company_id=company_id, supplier_name="Gold Coast Aqua", phone="9848012345"),
+        GateEntry(company_id=company_id, batch_number="B-104", vehicle_number="AP39TX1234", supplier_name="Gold Coast Aqua"),
+        GateEntry(company_id=company_id, batch_number="B-105", vehicle_number="AP39TX9999", is_cancelled=True),
+        EmployeeRegistration(company_id=company_id, employee_id=f"{company_id}-E7", employee_name="Ravi Goldsmith", department="QA"),
+    ])
+    # One invoice, many dispatch lines.
+    for _ in range(3):
+        db.add(sales_dispatch(company_id=company_id, invoice_no="INV-88", po_number="PO-GOLD-1", buyer_name="Sea Gold Foods"))
+    db.commit()
+
+
+def _backfill(db):
+    assert run_derived_table_backfill(sessionmaker(bind=db.get_bind())) == "clean"
+
+
+def test_search_ranks_one_query_over_every_entity(db):
+    _seed(db)
+    _seed(db, company_id="OTHER")
+    _backfill(db)
+
+    results = search(db, "SI1", "gold")
+    titles = [row["title"] for row in results]
+
+    # Titles starting with the term first, then later words, then other fields.
+    assert set(titles) == {
+        "Sea Gold Foods", "Golden Harvest Seafoods", "Gold Coast Aqua",
+        "Batch #B-104", "Ravi Goldsmith (SI1-E7)", "Inv #INV-88",
+    }
+    assert titles[:2] == ["Gold Coast Aqua", "Golden Harvest Seafoods"]
+    assert titles.count("Inv #INV-88") == 1
+    assert {row["type"] for row in results} >= {"buyer", "supplier", "batch", "employee", "invoice"}
+    assert all(row["route"] and row["icon"] for row in results)
+
+    with collect_queries() as stats:
+        assert [row["title"] for row in search(db, "SI1", "b-104")] == ["Batch #B-104"]
+    assert stats.query_count == 2  # "is the company built?" + the ranked search
+
+    assert search(db, "SI1", "ap39 1234") == search(db, "SI1", "AP39TX1234")
+    assert search(db, "SI1", "b-105") == []
+    assert search(db, "SI1", "g") == []
+
+
+def test_flushes_keep_documents_current(db):
+    _seed(db)
+    _backfill(db)
+    assert search(db, "SI1", "sea gold")[0]["title"] == "Sea Gold Foods"
+
+    buyer = db.query(buyers).filter(buyers.buyer_name == "Sea Gold Foods").one()
+    buyer.buyer_name = "Ocean Pearl Exports"
+    db.add(suppliers(company_id="SI1", supplier_name="Pearl Hatcheries"))
+    gate = db.query(GateEntry).filter(GateEntry.batch_number == "B-104").one()
+    gate.is_cancelled = True
+    db.commit()
+
+    assert [row["title"] for row in search(db, "SI1", "pearl")] == ["Pearl Hatcheries", "Ocean Pearl Exports"]
+    assert search(db, "SI1", "b-104") == []
+
+    db.delete(db.query(suppliers).filter(suppliers.supplier_name == "Pearl Hatcheries").one())
+    db.commit()
+    assert [row["title"] for row in search(db, "SI1", "pearl")] == ["Ocean Pearl Exports"]
+    assert db.query(SearchDocument).filter(SearchDocument.company_id == "SI1").count() == 7
+
+
+def test_rebuild_picks_up_writes_that_bypass_the_orm(db):
+    _seed(db)
+    _backfill(db)
+    db.execute(buyers.__table__.insert().values(company_id="SI1", buyer_name="Bulk Imported Tuna"))
+    db.commit()
+    assert "Bulk Imported Tuna" not in [row["title"] for row in search(db, "SI1", "tuna")]
+
+    assert rebuild_search_index(db, "SI1") == 9
+    db.commit()
+    assert [row["title"] for row in search(db, "SI1", "tuna")] == ["Bulk Imported Tuna"]
+
+
+def test_companies_are_searched_from_the_sources_until_the_backfill_builds_them(db):
+    _seed(db)
+    db.add(GateEntry(company_id="EMPTY", batch_number="B-1", is_cancelled=True))
+    db.commit()
+
+    assert [row["title"] for row in search(db, "SI1", "gold")][:2] == ["Gold Coast Aqua", "Golden Harvest Seafoods"]
+    assert db.query(DerivedTableBuild).count() == 0  # searching never builds
+
+    _backfill(db)
+    built = {(row.name, row.company_id) for row in db.query(DerivedTableBuild)}
+    assert built == {("search_index", "SI1"), ("search_index", "EMPTY")}
+    assert run_derived_table_backfill(sessionmaker(bind=db.get_bind())) == "clean"
+    assert db.query(DerivedTableBuild).count() == 2  # an empty company is not rebuilt on every run
+
+    assert rebuild_search_index(db, "SI1") == 8  # rebuilding over stored documents replaces them
+    db.commit()
+    assert db.query(SearchDocument).filter(SearchDocument.company_id == "SI1").count() == 8
+
+
+def test_without_the_index_table_sources_are_scanned(tmp_path):
+    engine, factory = _factory(tmp_path, with_index=False)
+    db = factory()
+    try:
+        _seed(db)
+        titles = [row["title"] for row in search(db, "SI1", "gold")]
+        assert titles[:2] == ["Gold Coast Aqua", "Golden Harvest Seafoods"]
+        assert titles.count("Inv #INV-88") == 1 and "Batch #B-104" in titles
+    finally:
+        db.close()
+        engine.dispose()
+        search_index.reset_search_index_cache()
@@ -0,0 +1,29 @@
+"""Worker boot budget: ``import app.main`` stays under STARTUP_BUDGET_MS and loads no heavy optional library."""
+import pytest
+
+from benchmarks.import_time import HEAVY_MODULES, STARTUP_BUDGET_MS, measure_import_time, parse_importtime
+
+
+pytestmark = [pytest.mark.unit, pytest.mark.slow]
+
+
+def test_parse_importtime_reads_self_and_cumulative_times():
+    entries = parse_importtime(
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     zipimport\n"
+        "import time:      2500 |       9100 |   app.main\n"
+    )
+    assert entries == [
+        {"module": "zipimport", "self_us": 120, "cumulative_us": 120, "depth": 2},
+        {"module": "app.main", "self_us": 2500, "cumulative_us": 9100, "depth": 1},
+    ]
+
+
+def test_worker_import_stays_within_the_startup_budget():
+    report = measure_import_time(runs=1, top=10)
+
+    assert report["heavy_modules_loaded"] == [], (
+        f"{report['heavy_modules_loaded']} imported at boot; import them inside the handlers "
+        f"that use them (one of {HEAVY_MODULES})"
+    )
+    assert report["median_ms"] <= STARTUP_BUDGET_MS, report["top_cumulative"]
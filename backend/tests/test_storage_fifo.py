@@ -0,0 +1,149 @@
+"""Storage FIFO layers: incremental maintenance, rebuilds and monthly billing state."""
+import os
+from datetime import date
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models.derived_tables import DerivedTableBuild
+from app.database.models.inventory_management import stock_entry
+from app.database.models.job_leases import JobLease
+from app.database.models.storage_fifo import StorageComboClosing, StorageFifoConsumption, StorageFifoLayer
+from app.services import storage_fifo
+from app.services.derived_tables import run_derived_table_backfill
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+from app.services.storage_fifo import billing_state, install_fifo_tracking, rebuild_storage_fifo
+
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fifo.db'}")
+    install_query_instrumentation(engine)
+    for model in (stock_entry, StorageFifoLayer, StorageFifoConsumption, StorageComboClosing, DerivedTableBuild, JobLease):
+        model.__table__.create(bind=engine)
+    storage_fifo.reset_fifo_tracking_cache()
+    factory = sessionmaker(bind=engine)
+    install_fifo_tracking(factory)
+    session = factory()
+    yield session
+    session.close()
+    engine.dispose()
+    storage_fifo.reset_fifo_tracking_cache()
+
+
+def _move(kind, day, mc, batch="B1", grade="16/20", **extra):
+    return stock_entry(
+        company_id="FIFO1", date=day, cargo_movement_type=kind, no_of_mc=mc, quantity=mc * 10.0,
+        batch_number=batch, freezer="IQF", glaze="20%", grade=grade, variety="PD",
+        packing_style="10 x 1 KG", production_for="EXPORT", production_at="UNIT-1", **extra,
+    )
+
+
+def _backfill(db):
+    assert run_derived_table_backfill(sessionmaker(bind=db.get_bind())) == "clean"
+    db.expire_all()
+
+
+def _snapshot(db):
+    layers = sorted(
+        (row.combo_key, row.sequence, row.stock_entry_id, row.in_date, row.qty_received, row.remaining_mc, row.depleted_on)
+        for row in db.query(StorageFifoLayer).all()
+    )
+    taken = sorted(
+        (row.stock_entry_id, row.out_date, row.mc_taken)
+        for row in db.query(StorageFifoConsumption).all()
+    )
+    closings = sorted(
+        (row.combo_key, row.period_month, row.next_period_month, row.opening_mc, row.in_mc, row.out_mc, row.closing_mc)
+        for row in db.query(StorageComboClosing).all()
+    )
+    return layers, taken, closings
+
+
+def test_layers_follow_stock_writes_and_match_a_rebuild(db):
+    first_in = _move("IN", date(2026, 3, 5), 100)
+    db.add_all([first_in, _move("IN", date(2026, 4, 2), 50), _move("IN", date(2026, 4, 1), 8, grade="21/25")])
+    db.commit()
+    db.add(_move("OUT", date(2026, 4, 10), 120))
+    db.commit()
+    # A back-dated dispatch re-orders the FIFO consumption of its combo.
+    db.add(_move("OUT", date(2026, 3, 20), 30))
+    db.commit()
+
+    layers = {row.stock_entry_id: row for row in db.query(StorageFifoLayer).filter_by(grade="16/20").all()}
+    assert layers[first_in.id].remaining_mc == 0
+    assert layers[first_in.id].depleted_on == date(2026, 4, 10)
+    assert sum(row.remaining_mc for row in layers.values()) == 0
+
+    db.get(stock_entry, first_in.id).no_of_mc = 160
+    db.commit()
+    updated = db.query(StorageFifoLayer).filter_by(stock_entry_id=first_in.id).one()
+    assert (updated.remaining_mc, updated.depleted_on) == (10, None)
+    incremental = _snapshot(db)
+
+    rebuild_storage_fifo(db, "FIFO1")
+    db.commit()
+    assert _snapshot(db) == incremental
+    assert [row[-1] for row in incremental[2] if row[1] == date(2026, 4, 1)] in ([60, 8], [8, 60])
+
+
+def test_billing_starts_from_previous_closing(db):
+    db.add_all([
+        _move("IN", date(2026, 1, 10), 100),
+        _move("OUT", date(2026, 2, 3), 40),
+        _move("IN", date(2026, 4, 5), 20),
+        _move("OUT", date(2026, 4, 12), 70),
+        _move("OUT", date(2026, 5, 2), 5),
+    ])
+    db.commit()
+    replayed = billing_state(db, "FIFO1", date(2026, 4, 1), date(2026, 4, 30))
+    _backfill(db)
+    assert billing_state(db, "FIFO1", date(2026, 4, 1), date(2026, 4, 30)) == replayed
+
+    march = billing_state(db, "FIFO1", date(2026, 3, 1), date(2026, 3, 31))
+    assert len(march) == 1
+    assert (march[0]["opening_mc"], march[0]["monthly_in_mc"], march[0]["monthly_out_mc"]) == (60, 0, 0)
+    assert [layer["current_qty"] for layer in march[0]["layers"]] == [60]
+    assert march[0]["earliest_in_date"] == date(2026, 1, 10)
+
+    april = billing_state(db, "FIFO1", date(2026, 4, 1), date(2026, 4, 30))[0]
+    assert (april["opening_mc"], april["monthly_in_mc"], april["monthly_out_mc"]) == (60, 20, 70)
+    assert [(d["layer"]["date"], d["out_date"], d["mc_taken"]) for d in april["dispatches"]] == [
+        (date(2026, 1, 10), date(2026, 4, 12), 60),
+        (date(2026, 4, 5), date(2026, 4, 12), 10),
+    ]
+    # Remaining as of the billing end, before May's dispatch.
+    assert [layer["current_qty"] for layer in april["layers"]] == [0, 10]
+
+    assert billing_state(db, "FIFO1", date(2026, 4, 1), date(2026, 4, 30), production_for="DOMESTIC") == []
+
+    with collect_queries() as stats:
+        billing_state(db, "FIFO1", date(2026, 6, 1), date(2026, 6, 30))
+    assert stats.query_count <= 4
+
+
+def test_companies_are_replayed_until_the_backfill_builds_them(db):
+    db.execute(stock_entry.__table__.insert(), [
+        {"company_id": "FIFO2", "date": date(2026, 4, 1), "cargo_movement_type": "IN", "no_of_mc": 12,
+         "quantity": 120.0, "batch_number": batch, "freezer": "IQF", "grade": "U10"}
+        for batch in ("B8", "B9")
+    ])
+    db.commit()
+    # The first ORM write after deploy only refreshes its own combo.
+    db.add(stock_entry(company_id="FIFO2", date=date(2026, 4, 3), cargo_movement_type="OUT", no_of_mc=2,
+                       quantity=20.0, batch_number="B9", freezer="IQF", grade="U10"))
+    db.commit()
+    assert db.query(StorageFifoLayer).filter_by(company_id="FIFO2").count() == 1
+
+    state = billing_state(db, "FIFO2", date(2026, 4, 1), date(2026, 4, 30))
+    assert sorted((combo["batch_number"], combo["layers"][0]["current_qty"]) for combo in state) == [("B8", 12), ("B9", 10)]
+
+    _backfill(db)
+    assert db.query(StorageFifoLayer).filter_by(company_id="FIFO2").count() == 2
+    assert billing_state(db, "FIFO2", date(2026, 4, 1), date(2026, 4, 30)) == state
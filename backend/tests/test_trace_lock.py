@@ -0,0 +1,63 @@
+"""Trace lock: bulk downstream-usage lookup for list views."""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+from app.utils.trace_lock import (
+    STAGE_MODELS,
+    batches_used_downstream,
+    is_batch_used_downstream_from_grading,
+    is_batch_used_downstream_from_rmp,
+    is_batch_used_in_rmp,
+)
+
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_lock.db'}")
+    install_query_instrumentation(engine)
+    for model in STAGE_MODELS.values():
+        model.__table__.create(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _use(db, stage, batch, company="TL1", cancelled=False):
+    db.execute(STAGE_MODELS[stage].__table__.insert().values(
+        company_id=company, batch_number=batch, is_cancelled=cancelled,
+    ))
+
+
+def test_bulk_lookup_reports_the_first_downstream_stage_in_one_query(db):
+    _use(db, "RawMaterialPurchasing", "B1")
+    _use(db, "Peeling", "B1")
+    _use(db, "Grading", "B1")
+    _use(db, "Production", "B2")
+    _use(db, "DeHeading", "B3", cancelled=True)
+    _use(db, "DeHeading", "B4", company="OTHER")
+    db.commit()
+
+    batches = ["B1", "B2", "B3", "B4", "B5", None]
+    with collect_queries() as stats:
+        used = batches_used_downstream(db, "TL1", batches, "rmp")
+    assert used == {"B1": "Grading", "B2": "Production"}
+    assert stats.query_count == 1
+
+    assert batches_used_downstream(db, "TL1", batches, "grading") == {"B1": "Peeling", "B2": "Production"}
+    assert batches_used_downstream(db, "TL1", batches, "gate_entry") == {"B1": "RawMaterialPurchasing"}
+    assert batches_used_downstream(db, "TL1", [], "rmp") == {}
+
+    assert is_batch_used_in_rmp(db, "B1", "TL1") is True
+    assert is_batch_used_in_rmp(db, "B2", "TL1") is False
+    assert is_batch_used_downstream_from_rmp(db, "B3", "TL1") == (False, None)
+    assert is_batch_used_downstream_from_grading(db, "B1", "TL1") == (True, "Peeling")
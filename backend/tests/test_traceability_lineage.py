@@ -0,0 +1,177 @@
+"""Traceability: lineage edges kept on flush and set-wise lot / container walks."""
+import os
+from datetime import date, datetime
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models.derived_tables import DerivedTableBuild
+from app.database.models.job_leases import JobLease
+from app.database.models.advanced_seafood_erp import HarvestLot, PondMaster, ProductionBatch, ProductionConversion
+from app.database.models.inventory_management import sales_dispatch, stock_entry
+from app.database.models.lineage import LineageEdge
+from app.database.models.processing import RawMaterialPurchasing
+from app.services import derived_tables
+from app.services.derived_tables import run_derived_table_backfill
+from app.services.lineage import install_lineage_tracking, rebuild_lineage_edges
+from app.services.query_diagnostics import collect_queries, install_query_instrumentation
+from app.services.traceability_workflow import TraceabilityWorkflowService as Trace
+
+
+pytestmark = pytest.mark.unit
+
+TABLES = (PondMaster, HarvestLot, RawMaterialPurchasing, ProductionBatch, ProductionConversion, stock_entry, sales_dispatch)
+
+
+def _factory(tmp_path, with_edges=True):
+    engine = create_engine(f"sqlite:///{tmp_path / 'lineage.db'}")
+    for model in TABLES:
+        model.__table__.create(bind=engine)
+    if with_edges:
+        for model in (LineageEdge, DerivedTableBuild, JobLease):
+            model.__table__.create(bind=engine)
+    install_query_instrumentation(engine)
+    derived_tables.reset_ready_cache()
+    factory = sessionmaker(bind=engine)
+    install_lineage_tracking(factory)
+    return engine, factory
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine, factory = _factory(tmp_path)
+    session = factory()
+    yield session
+    session.close()
+    engine.dispose()
+    derived_tables.reset_ready_cache()
+
+
+def _seed(db, lots=3, company_id="TR1"):
+    pond = PondMaster(company_id=company_id, farmer_name="Venkata Rao", pond_location="Bhimavaram", mpeda_reg_no="AP-77")
+    db.add(pond)
+    db.flush()
+    for i in range(lots):
+        lot_no = f"LOT-{i}"
+        batch = ProductionBatch(company_id=company_id, batch_number=lot_no, start_date=datetime(2026, 10, 1), yield_percent=80.0 + i)
+        db.add_all([
+            HarvestLot(company_id=company_id, lot_number=lot_no, pond_id=pond.id, harvest_date=date(2026, 9, 30), quantity_harvested=1000.0),
+            RawMaterialPurchasing(company_id=company_id, batch_number=lot_no, species="Vannamei", variety_name="HOSO", received_qty=600.0, amount=240000.0),
+            RawMaterialPurchasing(company_id=company_id, batch_number=lot_no, species="Vannamei", variety_name="HOSO", received_qty=400.0, amount=160000.0),
+            batch,
+            stock_entry(company_id=company_id, batch_number=lot_no, location="CS-1", brand="SVBK", grade="31/40", quantity=500.0),
+            # Containers hold two lots each.
+            sales_dispatch(company_id=company_id, invoice_no=f"INV-{i}", container_no=f"CONT-{i // 2}", buyer_name="Boston Seafoods", po_number=lot_no, amount_usd=9000.0),
+        ])
+        db.flush()
+        db.add_all([
+            ProductionConversion(batch_id=batch.id, from_stage="HOSO", to_stage="HLSO", input_weight=1000.0, output_weight=850.0),
+            ProductionConversion(batch_id=batch.id, from_stage="HLSO", to_stage="PD", input_weight=850.0, output_weight=700.0),
+        ])
+    db.commit()
+
+
+def test_single_traces_keep_their_shape(db):
+    _seed(db)
+
+    forward = Trace.trace_lot_forward(db, "TR1", "LOT-1")
+    assert forward["source_farmer"]["farmer"] == "Venkata Rao"
+    assert forward["purchase_batch"] == {
+        "batch_number": "LOT-1", "species": "Vannamei", "variety": "HOSO", "received_qty": 1000.0, "total_cost": 400000.0,
+    }
+    assert [stage["to"] for stage in forward["production_batches"][0]["stages"]] == ["HLSO", "PD"]
+    assert forward["warehouse_stocks"][0]["quantity"] == 500.0
+    assert [(s["invoice_no"], s["container_no"]) for s in forward["shipments"]] == [("INV-1", "CONT-0")]
+
+    backward = Trace.trace_container_backward(db, "TR1", "CONT-0")
+    assert [s["invoice_no"] for s in backward["shipments"]] == ["INV-0", "INV-1"]
+    assert [b["batch_number"] for b in backward["linked_batches"]] == ["LOT-0", "LOT-1"]
+    assert [f["lot_number"] for f in backward["source_farmers"]] == ["LOT-0", "LOT-1"]
+
+    assert Trace.trace_lot_forward(db, "TR1", "NOPE")["source_farmer"] is None
+    assert Trace.trace_container_backward(db, "TR1", "NOPE")["shipments"] == []
+
+
+def test_set_walks_use_a_fixed_number_of_queries(db):
+    _seed(db, lots=40)
+    assert run_derived_table_backfill(sessionmaker(bind=db.get_bind())) == "clean"
+
+    counts = []
+    for lots in (2, 40):
+        with collect_queries() as stats:
+            traces = Trace.trace_lots_forward(db, "TR1", [f"LOT-{i}" for i in range(lots)])
+        assert len(traces) == lots and all(t["shipments"] for t in traces.values())
+        counts.append(stats.query_count)
+    assert counts == [8, 8]  # built check + edge walk + one query per stage table
+
+    with collect_queries() as stats:
+        traces = Trace.trace_containers_backward(db, "TR1", [f"CONT-{i}" for i in range(20)])
+    assert all(len(t["source_farmers"]) == 2 for t in traces.values())
+    assert stats.query_count == 10  # container walk + lot walk (each with its built check) + one query per stage table
+
+
+def test_flushes_rewrite_edges_and_rebuild_matches(db):
+    _seed(db)
+    assert rebuild_lineage_edges(db, "TR1") > 0
+    db.commit()
+    dispatch = db.query(sales_dispatch).filter(sales_dispatch.invoice_no == "INV-2").one()
+    dispatch.container_no = "CONT-0"
+    db.delete(db.query(stock_entry).filter(stock_entry.batch_number == "LOT-0").one())
+    db.commit()
+
+    assert [s["invoice_no"] for s in Trace.trace_container_backward(db, "TR1", "CONT-0")["shipments"]] == ["INV-0", "INV-1", "INV-2"]
+    assert Trace.trace_container_backward(db, "TR1", "CONT-1")["shipments"] == []
+    assert Trace.trace_lot_forward(db, "TR1", "LOT-0")["warehouse_stocks"] == []
+
+    edges = sorted((e.parent_key, e.child_type, e.child_key) for e in db.query(LineageEdge))
+    assert rebuild_lineage_edges(db, "TR1") == len(edges)
+    db.commit()
+    assert sorted((e.parent_key, e.child_type, e.child_key) for e in db.query(LineageEdge)) == edges
+
+
+def test_without_the_edge_table_sources_are_walked(tmp_path):
+    engine, factory = _factory(tmp_path, with_edges=False)
+    db = factory()
+    try:
+        _seed(db)
+        backward = Trace.trace_container_backward(db, "TR1", "CONT-0")
+        assert [f["lot_number"] for f in backward["source_farmers"]] == ["LOT-0", "LOT-1"]
+        assert Trace.trace_lot_forward(db, "TR1", "LOT-2")["shipments"][0]["container_no"] == "CONT-1"
+    finally:
+        db.close()
+        engine.dispose()
+        derived_tables.reset_ready_cache()
+
+
+def test_walks_stay_inside_the_company_before_and_after_the_backfill(db):
+    _seed(db, lots=2, company_id="TR1")
+    # Another company reusing the lot and container numbers (harvest lots are globally unique).
+    db.add_all([
+        RawMaterialPurchasing(company_id="TR2", batch_number="LOT-0", species="Vannamei", variety_name="HOSO", received_qty=50.0, amount=9000.0),
+        stock_entry(company_id="TR2", batch_number="LOT-0", location="CS-9", brand="OTHER", grade="21/25", quantity=40.0),
+        sales_dispatch(company_id="TR2", invoice_no="TR2-INV", container_no="CONT-0", buyer_name="Other", po_number="LOT-0", amount_usd=100.0),
+    ])
+    db.commit()
+    factory = sessionmaker(bind=db.get_bind())
+
+    def traces():
+        forward = Trace.trace_lot_forward(db, "TR1", "LOT-0")
+        backward = Trace.trace_container_backward(db, "TR2", "CONT-0")
+        return (
+            [s["invoice_no"] for s in forward["shipments"]],
+            [w["location"] for w in forward["warehouse_stocks"]],
+            forward["purchase_batch"]["received_qty"],
+            [s["invoice_no"] for s in backward["shipments"]],
+            backward["linked_batches"],
+        )
+
+    expected = (["INV-0"], ["CS-1"], 1000.0, ["TR2-INV"], [])
+    assert traces() == expected  # not built yet: walked from the source tables
+    assert run_derived_table_backfill(factory) == "clean"
+    assert {(b.name, b.company_id) for b in db.query(DerivedTableBuild)} == {("lineage", "TR1"), ("lineage", "TR2")}
+    assert traces() == expected  # built: walked through the edges
+    assert run_derived_table_backfill(factory) == "clean"  # nothing left to build
+    assert db.query(DerivedTableBuild).count() == 2
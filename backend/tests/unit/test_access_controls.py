@@ -1,7 +1,11 @@
 import pytest
 
 from app.utils.access_control import (
+    ROUTE_PERMISSION_RULES,
+    compile_route_rules,
+    granted_permissions,
     has_permission,
+    match_route_rule,
     normalize_permission,
     required_permission_for_path,
 )
@@ -25,3 +29,30 @@ def test_permission_rules_cover_sensitive_routes():
 def test_authenticated_master_reads_are_shared_but_writes_are_protected():
     assert required_permission_for_path("/criteria/api/suppliers", "GET") is None
     assert required_permission_for_path("/criteria/api/suppliers", "POST") == "suppliers"
+
+
+def test_compiled_rules_match_the_ordered_scan():
+    def first_rule(normalized, rules):
+        for index, (prefix, _) in enumerate(rules):
+            if normalized == prefix.rstrip("/") or normalized.startswith(prefix):
+                return index
+        return None
+
+    paths = ["/", "/unknown", "/admin"]
+    for prefix, _ in ROUTE_PERMISSION_RULES:
+        paths += [prefix.rstrip("/"), prefix.rstrip("/") + "/7", prefix.rstrip("/") + "_x"]
+    compiled = compile_route_rules(ROUTE_PERMISSION_RULES)
+    assert [match_route_rule(p, compiled) for p in paths] == [first_rule(p, ROUTE_PERMISSION_RULES) for p in paths]
+
+    # An earlier, shorter prefix still wins over a later, longer one.
+    shadowing = (("/reports/gate", "a"), ("/reports/gate_entry", "b"), ("/reports/gate_entry/", "c"))
+    assert match_route_rule("/reports/gate_entry", compile_route_rules(shadowing)) == 0
+    assert match_route_rule("/reports/gate_entry", compile_route_rules(shadowing[1:])) == 0
+
+
+def test_session_permissions_are_parsed_once_per_value():
+    first = granted_permissions("gate_entry, journal_entries")
+    assert first == frozenset({"gate_entry", "journal_entry"})
+    assert granted_permissions("gate_entry, journal_entries") is first
+    assert granted_permissions(["journal_entries", "gate_entry"]) == first
+    assert not has_permission({"email": "user@example.test", "permissions": None}, "gate_entry")
@@ -225,9 +225,35 @@ export default function Header({ toggleTheme, user, handleLogout, sidebarOpen, s
       })
       .catch(err => console.error('Error fetching global dropdowns in header:', err));
 
-    void loadNotifications();
-    const notificationInterval = window.setInterval(loadNotifications, 30000);
-    return () => window.clearInterval(notificationInterval);
+    // Counter changes are pushed over SSE; poll every 30s only when the stream is unavailable.
+    let notificationInterval = null;
+    const startPolling = () => {
+      if (!notificationInterval) notificationInterval = window.setInterval(loadNotifications, 30000);
+    };
+    let notificationStream = null;
+    if (window.EventSource) {
+      notificationStream = new EventSource(apiUrl('/menu/notifications/stream'), { withCredentials: true });
+      notificationStream.addEventListener('notifications', event => {
+        try {
+          setNotifications(JSON.parse(event.data) || []);
+        } catch (error) {
+          console.warn('Error reading notification stream in Header.jsx:', error);
+        }
+      });
+      notificationStream.onerror = () => {
+        if (notificationStream.readyState === EventSource.CLOSED) {
+          void loadNotifications();
+          startPolling();
+        }
+      };
+    } else {
+      void loadNotifications();
+      startPolling();
+    }
+    return () => {
+      if (notificationStream) notificationStream.close();
+      if (notificationInterval) window.clearInterval(notificationInterval);
+    };
   }, [loadNotifications]);
 
   const markNotificationsRead = () => {
@@ -628,7 +628,7 @@ function DataManagement({ activePage }) {
     const otp = window.prompt(`${generated.message}\nEnter 6-digit Admin OTP:`); if (!otp) return;
     const verify = await fetch('/data-management/verify-otp', { method: 'POST', credentials: 'include', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ action, otp }) });
     const verified = await verify.json(); if (!verified.success) return setMessage(verified.error || 'Invalid OTP');
-    try { await callback(verified.download_token || ''); setMessage(`${action.toUpperCase()} completed successfully.`); load(); } catch (error) { setMessage(error.message); }
+    try { const note = await callback(verified.download_token || ''); setMessage(note || `${action.toUpperCase()} completed successfully.`); load(); } catch (error) { setMessage(error.message); }
   };
   const inspectFile = async () => {
     if (!upload) return setMessage('Select an Excel file first.');
@@ -674,6 +674,8 @@ function DataManagement({ activePage }) {
     setTargetTable('');
     setSheet('');
     setMapping({});
+    if (data.error_report) window.open(data.error_report, '_blank');
+    if (data.rows_rejected !== undefined) return `IMPORT completed: ${data.rows_imported} inserted, ${data.rows_updated} updated, ${data.rows_rejected} rejected.`;
   });
   const recovery = action => secureAction(action, cleanupTable, async () => {
     const endpoint = action === 'undo' ? '/data-management/undo-import' : '/data-management/clear-table';
@@ -35,6 +35,12 @@ export default function LabourManagement() {
   const [contractMenuOpen, setContractMenuOpen] = useState(false);
   const [editingContract, setEditingContract] = useState(null);
   const [contractAudit, setContractAudit] = useState({ open: false, loading: false, worker: null, audits: [] });
+  const [cursors, setCursors] = useState({});
+  const [counts, setCounts] = useState({ contract_total: 0, contract_active: 0, inside: 0, closed: 0 });
+  const [contractFilter, setContractFilter] = useState({ q: '', location: '' });
+  // The filter the shown rows were fetched with; the inputs may have changed since.
+  const [appliedContractFilter, setAppliedContractFilter] = useState({ q: '', location: '' });
+  const [loadingMore, setLoadingMore] = useState('');
 
   const notify = (message, type = 'success') => {
     setNotice({ message, type });
@@ -49,6 +55,10 @@ export default function LabourManagement() {
       if (!response.ok || data.status !== 'success') throw new Error(data.error || 'Unable to load worker register');
       setContractRows(data.contract_labour || []);
       setContractAttendance(data.contract_attendance || []);
+      setCursors(data.cursors || {});
+      setCounts(data.summary || {});
+      setContractFilter({ q: '', location: '' });
+      setAppliedContractFilter({ q: '', location: '' });
       const l = data.lookups || { contractors: [], purposes: [], locations: [] };
       setLookups(l);
       setMembers(current => current.map(m => ({
@@ -67,6 +77,48 @@ export default function LabourManagement() {
 
   useEffect(() => { loadData(); }, []);
 
+  // Registers are keyset-paged on the server; `cursor` continues after the last row shown.
+  const fetchRegisterPage = async (path, params) => {
+    const query = new URLSearchParams(Object.entries(params).filter(([, value]) => value));
+    const response = await sessionFetch(`/attendance/labour-management/${path}?${query}`);
+    const data = await response.json();
+    if (!response.ok || data.status !== 'success') throw new Error(data.error || 'Unable to load register');
+    return data;
+  };
+
+  const searchContracts = async event => {
+    event?.preventDefault();
+    setLoading(true);
+    try {
+      const applied = { ...contractFilter };
+      const data = await fetchRegisterPage('contract', applied);
+      setContractRows(data.rows || []);
+      setAppliedContractFilter(applied);
+      setCursors(current => ({ ...current, contract_labour: data.next_cursor }));
+    } catch (error) {
+      notify(error.message, 'error');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  const loadMore = async register => {
+    const attendanceDay = counts.attendance_date || today();
+    const [path, params, setRows] = register === 'contract_labour'
+      ? ['contract', appliedContractFilter, setContractRows]
+      : ['attendance', { date_from: attendanceDay, date_to: attendanceDay }, setContractAttendance];
+    setLoadingMore(register);
+    try {
+      const data = await fetchRegisterPage(path, { ...params, cursor: cursors[register] });
+      setRows(current => [...current, ...(data.rows || [])]);
+      setCursors(current => ({ ...current, [register]: data.next_cursor }));
+    } catch (error) {
+      notify(error.message, 'error');
+    } finally {
+      setLoadingMore('');
+    }
+  };
+
   const updateMember = (index, key, value) => {
     setMembers(current => current.map((member, rowIndex) => rowIndex === index ? { ...member, [key]: value } : member));
   };
@@ -153,17 +205,19 @@ export default function LabourManagement() {
     );
   }, [punchId, contractRows]);
 
-  const addPunchIds = () => {
+  const addPunchIds = async () => {
     const incoming = punchId.split(/[\s,]+/).map(value => value.trim().toUpperCase()).filter(Boolean);
     if (!incoming.length) return;
-    const resolved = incoming.map(value => {
-      const isNum = /^\d+$/.test(value);
-      const suffix = isNum ? String(Number(value)).padStart(5, '0') : '';
-      const worker = (suffix && contractRows.find(row => (row.labour_id || '').toUpperCase().endsWith(suffix))) ||
-        contractRows.find(row => (row.labour_id || '').toUpperCase() === value) ||
-        contractRows.find(row => (row.labour_id || '').toUpperCase().endsWith(value));
-      return worker ? { fullId: worker.labour_id, name: worker.labour_name } : null;
-    }).filter(Boolean);
+    let resolved = [];
+    try {
+      // Resolved on the server: the register on screen is only the first page.
+      const response = await sessionFetch(`/attendance/labour-management/contract/resolve?ids=${encodeURIComponent(incoming.join(','))}`);
+      const data = await response.json();
+      if (!response.ok || data.status !== 'success') throw new Error(data.error || 'Unable to look up Worker IDs');
+      resolved = (data.workers || []).map(worker => ({ fullId: worker.labour_id, name: worker.labour_name }));
+    } catch (error) {
+      return notify(error.message, 'error');
+    }
     if (!resolved.length) return notify('Worker ID not found', 'error');
     setPunchQueue(current => {
       const queued = new Map(current.map(item => [item.fullId, item]));
@@ -258,9 +312,11 @@ export default function LabourManagement() {
   };
 
   const summary = useMemo(() => ({
-    activeContract: contractRows.filter(row => row.status === 'ACTIVE').length,
-    inside: contractAttendance.filter(row => row.status === 'INSIDE').length,
-  }), [contractRows, contractAttendance]);
+    activeContract: counts.contract_active || 0,
+    inside: counts.inside || 0,
+    closed: counts.closed || 0,
+  }), [counts]);
+  const contractFiltered = Boolean(appliedContractFilter.q || appliedContractFilter.location);
 
   return (
     <div className="labour-page">
@@ -317,17 +373,23 @@ export default function LabourManagement() {
             </div>
           </form>}
 
-          <div className="labour-section"><div className="labour-section-title" style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', width: '100%', position: 'relative' }}><div><h2>Contract Worker Register</h2><p>{contractRows.length} registered workers {selectedContract ? `· Selected: ${selectedContract.labour_name} (${selectedContract.labour_id})` : '· Click a row to select actions'}</p></div>{selectedContract && <div className="master-menu-container" style={{ position: 'relative' }}><button type="button" className="master-dots-trigger" title="Worker Actions" onClick={e => { e.stopPropagation(); setContractMenuOpen(open => !open); }} style={{ background: 'var(--header-bg, #334155)', border: '1px solid var(--border, #475569)', color: 'var(--text, #fff)', width: '36px', height: '36px', borderRadius: '8px', cursor: 'pointer', display: 'flex', alignItems: 'center', justifyContent: 'center', fontSize: '16px' }}><i className="fa-solid fa-ellipsis-vertical" /></button>{contractMenuOpen && <div className="master-dropdown-menu" style={{ position: 'absolute', right: 0, top: '42px', background: 'var(--card-bg, #1e293b)', border: '1px solid var(--border, #334155)', borderRadius: '8px', padding: '6px', minWidth: '170px', boxShadow: 'var(--shadow, 0 10px 15px -3px rgba(0,0,0,0.3))', zIndex: 100 }}><div className="master-menu-item" style={{ padding: '8px 12px', fontSize: '12px', fontWeight: '700', cursor: 'pointer', display: 'flex', alignItems: 'center', gap: '8px', borderRadius: '4px', color: 'var(--text, #f8fafc)' }} onClick={() => { setEditingContract({ ...selectedContract }); setContractMenuOpen(false); }}><i className="fa-solid fa-pen-to-square" style={{ color: 'var(--accent, #60a5fa)' }} /> Edit Worker</div><div className="master-menu-item" style={{ padding: '8px 12px', fontSize: '12px', fontWeight: '700', cursor: 'pointer', display: 'flex', alignItems: 'center', gap: '8px', borderRadius: '4px', color: 'var(--text, #f8fafc)' }} onClick={() => openContractAudit(selectedContract)}><i className="fa-solid fa-clock-rotate-left" style={{ color: 'var(--accent, #60a5fa)' }} /> Audit Trail</div>{selectedContract.status !== 'Cancelled' && <div className="master-menu-item danger" style={{ padding: '8px 12px', fontSize: '12px', fontWeight: '700', cursor: 'pointer', display: 'flex', alignItems: 'center', gap: '8px', borderRadius: '4px', color: 'var(--danger, #ef4444)' }} onClick={() => { cancelContractWorker(selectedContract); setContractMenuOpen(false); }}><i className="fa-solid fa-ban" /> Cancel Registration</div>}</div>}</div>}</div>
+          <div className="labour-section"><div className="labour-section-title" style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', width: '100%', position: 'relative' }}><div><h2>Contract Worker Register</h2><p>{contractFiltered ? `${contractRows.length}${cursors.contract_labour ? '+' : ''} matching` : `${counts.contract_total || contractRows.length} registered`} workers {selectedContract ? `· Selected: ${selectedContract.labour_name} (${selectedContract.labour_id})` : '· Click a row to select actions'}</p></div>{selectedContract && <div className="master-menu-container" style={{ position: 'relative' }}><button type="button" className="master-dots-trigger" title="Worker Actions" onClick={e => { e.stopPropagation(); setContractMenuOpen(open => !open); }} style={{ background: 'var(--header-bg, #334155)', border: '1px solid var(--border, #475569)', color: 'var(--text, #fff)', width: '36px', height: '36px', borderRadius: '8px', cursor: 'pointer', display: 'flex', alignItems: 'center', justifyContent: 'center', fontSize: '16px' }}><i className="fa-solid fa-ellipsis-vertical" /></button>{contractMenuOpen && <div className="master-dropdown-menu" style={{ position: 'absolute', right: 0, top: '42px', background: 'var(--card-bg, #1e293b)', border: '1px solid var(--border, #334155)', borderRadius: '8px', padding: '6px', minWidth: '170px', boxShadow: 'var(--shadow, 0 10px 15px -3px rgba(0,0,0,0.3))', zIndex: 100 }}><div className="master-menu-item" style={{ padding: '8px 12px', fontSize: '12px', fontWeight: '700', cursor: 'pointer', display: 'flex', alignItems: 'center', gap: '8px', borderRadius: '4px', color: 'var(--text, #f8fafc)' }} onClick={() => { setEditingContract({ ...selectedContract }); setContractMenuOpen(false); }}><i className="fa-solid fa-pen-to-square" style={{ color: 'var(--accent, #60a5fa)' }} /> Edit Worker</div><div className="master-menu-item" style={{ padding: '8px 12px', fontSize: '12px', fontWeight: '700', cursor: 'pointer', display: 'flex', alignItems: 'center', gap: '8px', borderRadius: '4px', color: 'var(--text, #f8fafc)' }} onClick={() => openContractAudit(selectedContract)}><i className="fa-solid fa-clock-rotate-left" style={{ color: 'var(--accent, #60a5fa)' }} /> Audit Trail</div>{selectedContract.status !== 'Cancelled' && <div className="master-menu-item danger" style={{ padding: '8px 12px', fontSize: '12px', fontWeight: '700', cursor: 'pointer', display: 'flex', alignItems: 'center', gap: '8px', borderRadius: '4px', color: 'var(--danger, #ef4444)' }} onClick={() => { cancelContractWorker(selectedContract); setContractMenuOpen(false); }}><i className="fa-solid fa-ban" /> Cancel Registration</div>}</div>}</div>}</div>
+            <form className="labour-register-filters" onSubmit={searchContracts}>
+              <input placeholder="Search ID, name, contractor or mobile" value={contractFilter.q} onChange={e => setContractFilter(filter => ({ ...filter, q: e.target.value }))} />
+              <select value={contractFilter.location} onChange={e => setContractFilter(filter => ({ ...filter, location: e.target.value }))}><option value="">All locations</option>{lookups.locations.map(location => <option key={location} value={location}>{location}</option>)}</select>
+              <button type="submit" className="labour-btn secondary">Search</button>
+            </form>
             <RegisterTable loading={loading} columns={['Sl. No', 'Worker ID', 'Name', 'Contractor', 'Mobile', 'Department', 'Location', 'Joining', 'Status', 'Meta Date', 'Meta User']}>
-              {contractRows.map((row, index) => { const isSelected = selectedContract?.id === row.id; return <tr key={row.id} style={{ cursor: 'pointer', background: isSelected ? 'color-mix(in srgb, var(--accent) 15%, var(--card-bg))' : undefined }} onClick={() => { setSelectedContract(isSelected ? null : row); setContractMenuOpen(false); }}><td><strong>{contractRows.length - index}</strong></td><td><strong>{row.labour_id}</strong></td><td>{row.labour_name}</td><td>{row.contractor_name || '-'}</td><td>{row.mobile || '-'}</td><td>{row.department || '-'}</td><td>{row.production_at || '-'}</td><td>{row.joining_date}</td><td>{row.status}</td><td>{row.date || '-'}</td><td>{row.email || '-'}</td></tr>; })}
+              {contractRows.map((row, index) => { const isSelected = selectedContract?.id === row.id; return <tr key={row.id} style={{ cursor: 'pointer', background: isSelected ? 'color-mix(in srgb, var(--accent) 15%, var(--card-bg))' : undefined }} onClick={() => { setSelectedContract(isSelected ? null : row); setContractMenuOpen(false); }}><td><strong>{contractFiltered ? index + 1 : (counts.contract_total || contractRows.length) - index}</strong></td><td><strong>{row.labour_id}</strong></td><td>{row.labour_name}</td><td>{row.contractor_name || '-'}</td><td>{row.mobile || '-'}</td><td>{row.department || '-'}</td><td>{row.production_at || '-'}</td><td>{row.joining_date}</td><td>{row.status}</td><td>{row.date || '-'}</td><td>{row.email || '-'}</td></tr>; })}
             </RegisterTable>
+            {cursors.contract_labour && <div className="labour-load-more"><button type="button" className="labour-btn secondary" disabled={loadingMore === 'contract_labour'} onClick={() => loadMore('contract_labour')}>{loadingMore === 'contract_labour' ? 'Loading...' : 'Load more workers'}</button></div>}
           </div>
         </>
       ) : (
         <div className="labour-section contract-terminal">
           <div className="labour-section-title">
             <div><h2>Contract Worker Punching</h2><p>Select IN or OUT, scan multiple Worker IDs, then punch all at once.</p></div>
-            <div className="terminal-status"><span>{contractAttendance.filter(row => row.status === 'INSIDE').length} Inside</span><span>{contractAttendance.filter(row => row.status === 'CLOSED').length} Completed</span></div>
+            <div className="terminal-status"><span>{summary.inside} Inside</span><span>{summary.closed} Completed</span></div>
           </div>
           <div className="punch-mode-row">
             <button type="button" className={`punch-mode in ${punchMode === 'IN' ? 'active' : ''}`} onClick={() => setPunchMode('IN')}><i className="fa-solid fa-right-to-bracket" /> IN</button>
@@ -386,9 +448,10 @@ export default function LabourManagement() {
           <div className="labour-table-scroll punch-table-scroll">
             <table className="labour-table punch-table">
               <thead><tr><th>Sl. No</th><th>Worker ID</th><th>Name</th><th>Contractor</th><th>Location</th><th>IN</th><th>OUT</th><th>Status</th></tr></thead>
-              <tbody>{loading ? <tr><td colSpan="8" className="labour-empty">Loading punches...</td></tr> : contractAttendance.length ? contractAttendance.map((row, index) => <tr key={row.id}><td><strong>{contractAttendance.length - index}</strong></td><td><strong>{row.labour_id}</strong></td><td>{row.labour_name}</td><td>{row.contractor_name || '-'}</td><td>{row.production_at || '-'}</td><td>{formatPunchTime(row.in_time)}</td><td>{formatPunchTime(row.out_time)}</td><td><span className={`punch-status ${row.status === 'INSIDE' ? 'inside' : 'closed'}`}>{row.status === 'INSIDE' ? 'INSIDE' : 'OUT'}</span></td></tr>) : <tr><td colSpan="8" className="labour-empty">No contract worker punches today</td></tr>}</tbody>
+              <tbody>{loading ? <tr><td colSpan="8" className="labour-empty">Loading punches...</td></tr> : contractAttendance.length ? contractAttendance.map((row, index) => <tr key={row.id}><td><strong>{Math.max(summary.inside + summary.closed, contractAttendance.length) - index}</strong></td><td><strong>{row.labour_id}</strong></td><td>{row.labour_name}</td><td>{row.contractor_name || '-'}</td><td>{row.production_at || '-'}</td><td>{formatPunchTime(row.in_time)}</td><td>{formatPunchTime(row.out_time)}</td><td><span className={`punch-status ${row.status === 'INSIDE' ? 'inside' : 'closed'}`}>{row.status === 'INSIDE' ? 'INSIDE' : 'OUT'}</span></td></tr>) : <tr><td colSpan="8" className="labour-empty">No contract worker punches today</td></tr>}</tbody>
             </table>
           </div>
+          {cursors.contract_attendance && <div className="labour-load-more"><button type="button" className="labour-btn secondary" disabled={loadingMore === 'contract_attendance'} onClick={() => loadMore('contract_attendance')}>{loadingMore === 'contract_attendance' ? 'Loading...' : 'Load more punches'}</button></div>}
         </div>
       )}
 
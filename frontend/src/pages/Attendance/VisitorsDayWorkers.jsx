@@ -1,10 +1,12 @@
-import React, { useCallback, useEffect, useState } from 'react';
+import React, { useCallback, useEffect, useRef, useState } from 'react';
 import { sessionFetch } from '../../utils/sessionFetch';
 import './LabourManagement.css';
 
 const today = () => new Date().toISOString().slice(0, 10);
 const currentTime = () => new Date().toTimeString().slice(0, 5);
 const blankVisitor = () => ({ visitor_name: '', mobile: '', organization: '', purpose: '', person_to_meet: '', person_to_meet_email: '', visit_date: today(), in_time: currentTime(), production_at: '', remarks: '' });
+const blankFilters = () => ({ q: '', location: '', date_from: '', date_to: '' });
+const registerQuery = params => new URLSearchParams(Object.entries(params).filter(([, value]) => value)).toString();
 const blankDayWorker = () => ({ worker_name: '', purpose: '', approved_by_name: '', approved_by_email: '', work_date: today(), in_time: currentTime(), production_at: '', remarks: '' });
 
 export default function VisitorsDayWorkers() {
@@ -23,6 +25,12 @@ export default function VisitorsDayWorkers() {
   const [saving, setSaving] = useState(false);
   const [outBusy, setOutBusy] = useState('');
   const [notice, setNotice] = useState(null);
+  const [filters, setFilters] = useState(blankFilters());
+  const [cursors, setCursors] = useState({});
+  const [loadingMore, setLoadingMore] = useState('');
+  // The 10s refresh re-reads as many rows as are on screen (server caps a page at 500).
+  const appliedFilters = useRef(blankFilters());
+  const rowsShown = useRef(0);
 
   const notify = useCallback((message, type = 'success') => {
     setNotice({ message, type });
@@ -32,11 +40,13 @@ export default function VisitorsDayWorkers() {
   const loadData = useCallback(async (showLoading = true) => {
     if (showLoading) setLoading(true);
     try {
-      const response = await sessionFetch('/attendance/visitors-day-workers?format=json');
+      const query = registerQuery({ format: 'json', ...appliedFilters.current, limit: Math.max(100, rowsShown.current) });
+      const response = await sessionFetch(`/attendance/visitors-day-workers?${query}`);
       const data = await response.json();
       if (!response.ok || data.status !== 'success') throw new Error(data.error || 'Unable to load entries');
       setVisitors(data.visitors || []);
       setDayWorkers(data.day_workers || []);
+      setCursors(data.cursors || {});
       setLookups(data.lookups || { purposes: [], locations: [], users: [] });
       setDayCharges(Object.fromEntries((data.day_workers || []).map(row => [row.id, row.day_charge ?? 0])));
       setCanEditLockedCharge(Boolean(data.permissions?.can_edit_locked_day_charge));
@@ -59,6 +69,36 @@ export default function VisitorsDayWorkers() {
     };
   }, [loadData]);
 
+  useEffect(() => { rowsShown.current = Math.max(visitors.length, dayWorkers.length); }, [visitors, dayWorkers]);
+
+  const applyFilters = event => {
+    event.preventDefault();
+    appliedFilters.current = { ...filters };
+    rowsShown.current = 0;
+    loadData();
+  };
+
+  const loadMore = async register => {
+    setLoadingMore(register);
+    try {
+      const path = register === 'visitors' ? 'visitors' : 'day-workers';
+      const response = await sessionFetch(`/attendance/visitors-day-workers/${path}?${registerQuery({ ...appliedFilters.current, cursor: cursors[register] })}`);
+      const data = await response.json();
+      if (!response.ok || data.status !== 'success') throw new Error(data.error || 'Unable to load entries');
+      const rows = data.rows || [];
+      if (register === 'visitors') setVisitors(current => [...current, ...rows]);
+      else {
+        setDayWorkers(current => [...current, ...rows]);
+        setDayCharges(current => ({ ...current, ...Object.fromEntries(rows.map(row => [row.id, row.day_charge ?? 0])) }));
+      }
+      setCursors(current => ({ ...current, [register]: data.next_cursor }));
+    } catch (error) {
+      notify(error.message, 'error');
+    } finally {
+      setLoadingMore('');
+    }
+  };
+
   const submit = async (event, type) => {
     event.preventDefault();
     setSaving(true);
@@ -140,6 +180,14 @@ export default function VisitorsDayWorkers() {
       <button className={activeTab === 'visitors' ? 'active' : ''} onClick={() => setActiveTab('visitors')}>Visitors</button>
       <button className={activeTab === 'day-workers' ? 'active' : ''} onClick={() => setActiveTab('day-workers')}>Day Workers</button>
     </div>
+    <form className="labour-register-filters" onSubmit={applyFilters}>
+      <input placeholder="Search name, mobile, purpose or person" value={filters.q} onChange={event => setFilters({ ...filters, q: event.target.value })} />
+      <select value={filters.location} onChange={event => setFilters({ ...filters, location: event.target.value })}><option value="">All locations</option>{lookups.locations.map(value => <option key={value} value={value}>{value}</option>)}</select>
+      <input type="date" title="From date" value={filters.date_from} onChange={event => setFilters({ ...filters, date_from: event.target.value })} />
+      <input type="date" title="To date" value={filters.date_to} onChange={event => setFilters({ ...filters, date_to: event.target.value })} />
+      <button type="submit" className="labour-btn secondary">Filter</button>
+      <button type="button" className="labour-btn secondary" onClick={() => { setFilters(blankFilters()); appliedFilters.current = blankFilters(); rowsShown.current = 0; loadData(); }}>Reset</button>
+    </form>
 
     {activeTab === 'visitors' ? <>
       <form className="labour-section visitor-entry-form" onSubmit={event => submit(event, 'visitor')}>
@@ -206,11 +254,12 @@ export default function VisitorsDayWorkers() {
             })}
             <tr style={{ background: 'rgba(37, 99, 235, 0.08)', fontWeight: '800', borderTop: '2px solid #2563eb' }}>
               <td colSpan="2">Grand Total:</td>
-              <td colSpan="12"><strong>{visitors.length} Visitors Total</strong></td>
+              <td colSpan="12"><strong>{visitors.length}{cursors.visitors ? '+' : ''} Visitors Total</strong></td>
             </tr>
           </>;
         })()}
       </EntryTable>
+      {cursors.visitors && <div className="labour-load-more"><button type="button" className="labour-btn secondary" disabled={loadingMore === 'visitors'} onClick={() => loadMore('visitors')}>{loadingMore === 'visitors' ? 'Loading...' : 'Load more visitors'}</button></div>}
     </> : <>
       <form className="labour-section visitor-entry-form" onSubmit={event => submit(event, 'day-worker')}>
         <div className="labour-section-title"><div><h2>Day Worker Entry Form</h2></div></div>
@@ -285,13 +334,14 @@ export default function VisitorsDayWorkers() {
             })}
             <tr style={{ background: 'rgba(37, 99, 235, 0.08)', fontWeight: '800', borderTop: '2px solid #2563eb' }}>
               <td colSpan="2">Grand Total:</td>
-              <td colSpan="7"><strong>{dayWorkers.length} Workers Total</strong></td>
+              <td colSpan="7"><strong>{dayWorkers.length}{cursors.day_workers ? '+' : ''} Workers Total</strong></td>
               <td style={{ color: '#10b981', fontWeight: '800', fontSize: '13px' }}>₹ {grandTotalCharge.toFixed(2)}</td>
               <td colSpan="4"></td>
             </tr>
           </>;
         })()}
       </EntryTable>
+      {cursors.day_workers && <div className="labour-load-more"><button type="button" className="labour-btn secondary" disabled={loadingMore === 'day_workers'} onClick={() => loadMore('day_workers')}>{loadingMore === 'day_workers' ? 'Loading...' : 'Load more workers'}</button></div>}
     </>}
     {auditOpen && <div className="labour-audit-backdrop" onClick={() => setAuditOpen(false)}><aside className="labour-audit-panel" onClick={event => event.stopPropagation()}><div className="labour-audit-head"><div><span>Day Worker Charges</span><h2>Audit Trail</h2></div><button type="button" onClick={() => setAuditOpen(false)}>×</button></div><div className="labour-audit-list">{auditLoading ? <div className="labour-empty">Loading audit trail...</div> : chargeAudits.length ? chargeAudits.map(audit => <article key={audit.id}><strong>{audit.worker_name} · {audit.work_date}</strong><p>₹{Number(audit.old_value || 0).toFixed(2)} → ₹{Number(audit.new_value || 0).toFixed(2)}</p><small>{audit.edited_by} · {String(audit.edited_at || '').replace('T', ' ').slice(0, 19)}</small></article>) : <div className="labour-empty">No charge changes found</div>}</div></aside></div>}
   </div>;